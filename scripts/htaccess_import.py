@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+"""
+Importador de .htaccess a rewrite_rules
+Convierte las reglas de mod_rewrite de un document_root al esquema de virtual_hosts.yaml
+y verifica con un corpus de URLs que el resultado sea equivalente y más barato
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+from typing import Callable, List, Optional, Tuple
+
+import yaml
+
+# Importar módulos del servidor
+sys.path.insert(0, str(Path(__file__).parent.parent / 'src'))
+from rewrite.context import RequestContext
+from rewrite.htaccess_parser import HtaccessInterpreter, convert_htaccess, parse_htaccess
+from rewrite.result import RewriteResult
+from rewrite.rewrite_engine import RewriteEngine
+from utils.file_metadata import FileMetadataCache
+
+
+def load_corpus(path: Path) -> List[Tuple[str, str, str]]:
+    """
+    Lee el corpus de URLs: una por línea, opcionalmente precedida por el método
+
+    Ejemplo:
+        /blog/hola?page=2
+        POST /api/usuarios
+    """
+    corpus = []
+    for line in path.read_text(encoding='utf-8').splitlines():
+        line = line.strip()
+        if not line or line.startswith('#'):
+            continue
+        method, _, url = line.partition(' ') if ' ' in line else ('GET', '', line)
+        request_path, _, query = url.partition('?')
+        corpus.append((method.upper(), request_path or '/', query))
+    return corpus
+
+
+def outcome(result: RewriteResult) -> Tuple:
+    """Forma comparable de un resultado (la ruta no importa en un 403/410)"""
+    if result.is_redirect:
+        return (result.status, result.location)
+    if result.is_terminal:
+        return (result.status,)
+    return (result.path, result.query)
+
+
+def measure(func: Callable[[], object], rounds: int) -> float:
+    """Microsegundos promedio por llamada"""
+    started = time.perf_counter()
+    for _ in range(rounds):
+        func()
+    return (time.perf_counter() - started) / rounds * 1e6
+
+
+def build_report(htaccess_path: Path, document_root: Path, host: str,
+                 corpus_path: Optional[Path], rounds: int) -> Tuple[str, bool]:
+    """
+    Importa el .htaccess y arma el reporte
+
+    Returns:
+        (reporte, todas_equivalentes)
+    """
+    text = htaccess_path.read_text(encoding='utf-8')
+    htaccess = parse_htaccess(text)
+    conversion = convert_htaccess(htaccess)
+
+    lines = []
+    lines.append("=" * 60)
+    lines.append("📥 IMPORTACIÓN DE .HTACCESS")
+    lines.append("=" * 60)
+    lines.append(f"📄 Archivo: {htaccess_path}")
+    lines.append(f"📋 Reglas: {len(htaccess.rules)} encontradas, {len(conversion.rules)} importadas, "
+                 f"{conversion.skipped} omitidas")
+    lines.append("")
+
+    if conversion.warnings:
+        lines.append("⚠️  ADVERTENCIAS:")
+        lines.extend(f"  • {warning}" for warning in conversion.warnings)
+        lines.append("")
+
+    lines.append("🧾 rewrite_rules para virtual_hosts.yaml:")
+    lines.append(yaml.safe_dump({'rewrite_rules': conversion.rules}, allow_unicode=True,
+                                sort_keys=False, default_flow_style=None).rstrip())
+    lines.append("")
+
+    if corpus_path is None:
+        return '\n'.join(lines), conversion.skipped == 0
+
+    corpus = load_corpus(corpus_path)
+    vhost = {'domain': host, 'document_root': str(document_root), 'rewrite_rules': conversion.rules}
+    # Sin memo ni cache de metadatos: costo de evaluar las reglas en cada request
+    compiled = RewriteEngine(vhost, str(document_root), memo_size=0,
+                             metadata=FileMetadataCache(enabled=False))
+    memoized = RewriteEngine(vhost, str(document_root))
+    interpreter = HtaccessInterpreter(htaccess, str(document_root))
+
+    def runtime_htaccess(request_path: str, query: str, context: RequestContext) -> RewriteResult:
+        # Lo que hace Apache con AllowOverride: leer y parsear el .htaccess en cada request
+        parsed = parse_htaccess(htaccess_path.read_text(encoding='utf-8'))
+        return HtaccessInterpreter(parsed, str(document_root)).rewrite(request_path, query, context)
+
+    mismatches = []
+    totals = [0.0, 0.0, 0.0]
+    for method, request_path, query in corpus:
+        context = RequestContext(host=host, method=method, query_string=query)
+        expected = outcome(interpreter.rewrite(request_path, query, context))
+        actual = outcome(compiled.rewrite(request_path, query, context))
+        if expected != actual:
+            mismatches.append((method, request_path, query, expected, actual))
+
+        totals[0] += measure(lambda: runtime_htaccess(request_path, query, context), rounds)
+        totals[1] += measure(lambda: compiled.rewrite(request_path, query, context), rounds)
+        totals[2] += measure(lambda: memoized.rewrite(request_path, query, context), rounds)
+
+    count = len(corpus) or 1
+    lines.append("🔁 EQUIVALENCIA:")
+    lines.append(f"  • URLs: {len(corpus)}, equivalentes: {len(corpus) - len(mismatches)}, "
+                 f"distintas: {len(mismatches)}")
+    for method, request_path, query, expected, actual in mismatches:
+        url = f"{request_path}?{query}" if query else request_path
+        lines.append(f"  ❌ {method} {url}: .htaccess={expected} importado={actual}")
+    lines.append("")
+    lines.append("⏱️  COSTO POR REQUEST (promedio):")
+    lines.append(f"  • .htaccess leído y evaluado en cada request: {totals[0] / count:8.1f} µs")
+    lines.append(f"  • Reglas compiladas (sin memo):               {totals[1] / count:8.1f} µs")
+    lines.append(f"  • Reglas compiladas con memo:                 {totals[2] / count:8.1f} µs")
+
+    return '\n'.join(lines), not mismatches and conversion.skipped == 0
+
+
+def main():
+    """Función principal"""
+    parser = argparse.ArgumentParser(description='Importador de .htaccess a rewrite_rules')
+    parser.add_argument('document_root', help='document_root del sitio')
+    parser.add_argument('--htaccess', help='Ruta del .htaccess (por defecto <document_root>/.htaccess)')
+    parser.add_argument('--urls', help='Corpus de URLs para verificar equivalencia y costo')
+    parser.add_argument('--host', default='localhost', help='Host de los requests del corpus')
+    parser.add_argument('--rounds', type=int, default=200, help='Repeticiones por URL al medir')
+    parser.add_argument('--output', help='Guardar las rewrite_rules en este archivo YAML')
+
+    args = parser.parse_args()
+
+    document_root = Path(args.document_root).resolve()
+    htaccess_path = Path(args.htaccess) if args.htaccess else document_root / '.htaccess'
+    if not htaccess_path.exists():
+        print(f"❌ No se encontró {htaccess_path}")
+        sys.exit(1)
+
+    report, clean = build_report(htaccess_path, document_root, args.host,
+                                 Path(args.urls) if args.urls else None, args.rounds)
+    print(report)
+
+    if args.output:
+        conversion = convert_htaccess(parse_htaccess(htaccess_path.read_text(encoding='utf-8')))
+        with open(args.output, 'w', encoding='utf-8') as f:
+            yaml.safe_dump({'rewrite_rules': conversion.rules}, f, allow_unicode=True, sort_keys=False)
+        print(f"\n💾 Reglas guardadas en {args.output}")
+
+    sys.exit(0 if clean else 2)
+
+
+if __name__ == '__main__':
+    main()
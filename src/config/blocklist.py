@@ -0,0 +1,98 @@
+"""
+Lista de bloqueo de seguridad por virtual host
+Directorios, archivos, extensiones y prefijos prohibidos, compilados una vez al cargar la configuración
+"""
+
+from typing import Any, Dict, Iterable, Optional
+
+
+DEFAULT_BLOCKED_DIRECTORIES = ('.git', '.svn', '.hg', '.bzr', 'node_modules', '.vscode', '.idea')
+
+DEFAULT_BLOCKED_FILES = ('.env', '.htaccess', '.htpasswd', 'config.php', 'wp-config.php',
+                         '.gitignore', '.gitattributes', '.gitmodules')
+
+DEFAULT_BLOCKED_EXTENSIONS = ('.bak', '.backup', '.old', '.orig', '.tmp', '.log', '.swp', '.swo')
+
+# Archivos que empiezan con . que están específicamente bloqueados
+DEFAULT_BLOCKED_DOT_FILES = ('.env', '.htaccess', '.htpasswd', '.gitignore', '.gitattributes',
+                             '.gitmodules', '.git', '.svn', '.hg', '.bzr')
+
+
+def _normalize(values: Optional[Iterable[str]]) -> tuple:
+    """Pasa a minúsculas y descarta valores vacíos"""
+    if not values:
+        return ()
+    if isinstance(values, str):
+        values = [values]
+    return tuple(str(value).strip().lower() for value in values if str(value).strip())
+
+
+class Blocklist:
+    """
+    Matcher compilado de rutas y archivos prohibidos
+
+    Los directorios y nombres exactos se guardan en frozensets; prefijos y
+    extensiones en tuplas para str.startswith / str.endswith, que recorren
+    todas las alternativas en una sola llamada en C.
+
+    Un virtual host puede ampliar las listas por defecto en
+    virtual_hosts.yaml con blocked_directories, blocked_files,
+    blocked_extensions y blocked_dot_files.
+    """
+
+    __slots__ = ('directories', 'files', 'extensions', 'prefixes')
+
+    def __init__(self, directories: Iterable[str] = DEFAULT_BLOCKED_DIRECTORIES,
+                 files: Iterable[str] = DEFAULT_BLOCKED_FILES,
+                 extensions: Iterable[str] = DEFAULT_BLOCKED_EXTENSIONS,
+                 prefixes: Iterable[str] = DEFAULT_BLOCKED_DOT_FILES):
+        """
+        Compila la lista de bloqueo
+
+        Args:
+            directories: Segmentos de ruta prohibidos (ej: .git)
+            files: Nombres de archivo prohibidos
+            extensions: Sufijos prohibidos (ej: .bak)
+            prefixes: Prefijos de nombre prohibidos (ej: .env)
+        """
+        self.directories = frozenset(_normalize(directories))
+        self.files = frozenset(_normalize(files))
+        self.extensions = tuple(sorted(set(_normalize(extensions))))
+        self.prefixes = tuple(sorted(set(_normalize(prefixes))))
+
+    @classmethod
+    def for_vhost(cls, vhost: Dict[str, Any]) -> 'Blocklist':
+        """Compila la lista por defecto más las entradas propias del virtual host"""
+        return cls(
+            DEFAULT_BLOCKED_DIRECTORIES + _normalize(vhost.get('blocked_directories')),
+            DEFAULT_BLOCKED_FILES + _normalize(vhost.get('blocked_files')),
+            DEFAULT_BLOCKED_EXTENSIONS + _normalize(vhost.get('blocked_extensions')),
+            DEFAULT_BLOCKED_DOT_FILES + _normalize(vhost.get('blocked_dot_files')),
+        )
+
+    def is_blocked_path(self, path: str) -> bool:
+        """
+        Verifica si algún segmento de la ruta es un directorio bloqueado
+
+        Args:
+            path: Ruta relativa al document_root (ej: app/.git/config)
+        """
+        if not path:
+            return False
+        return not self.directories.isdisjoint(path.lower().split('/'))
+
+    def is_blocked_file(self, filename: str) -> bool:
+        """
+        Verifica si el nombre del archivo final está bloqueado
+
+        Args:
+            filename: Nombre del archivo (sin directorio)
+        """
+        name = filename.lower()
+        return (name in self.files or
+                name.endswith(self.extensions) or
+                name.startswith(self.prefixes))
+
+    def __repr__(self) -> str:
+        return (f"Blocklist(directories={len(self.directories)}, files={len(self.files)}, "
+                f"extensions={len(self.extensions)}, prefixes={len(self.prefixes)})")
@@ -1,7 +1,13 @@
 import os
 import yaml
 from dotenv import load_dotenv
-from typing import Dict, List, Any, Optional
+from typing import TYPE_CHECKING, Dict, List, Any, Optional, Tuple
+
+from .blocklist import Blocklist
+from .vhost_router import VirtualHostRouter
+
+if TYPE_CHECKING:
+    from rewrite.rewrite_engine import RewriteEngine
 
 class ConfigManager:
     """Maneja la configuración del servidor web desde .env y virtual_hosts.yaml"""
@@ -16,6 +22,11 @@ class ConfigManager:
         # Configuración cargada
         self._config = self._load_config()
         self._virtual_hosts = self._load_virtual_hosts()
+        self._blocklists = self._compile_blocklists()
+        # Los motores de rewrite se compilan al iniciar el servidor (ver
+        # compile_rewrite_engines): rewrite depende de módulos que importan config
+        self._rewrite_engines: Dict[int, Tuple[Dict[str, Any], Optional['RewriteEngine']]] = {}
+        self._router = self._build_router()
     
     def _load_config(self) -> Dict[str, Any]:
         """Carga configuración desde variables de entorno"""
@@ -32,10 +43,50 @@ class ConfigManager:
             'dashboard_port': int(os.getenv('PORT', 8000)),
             'max_concurrent_connections': int(os.getenv('MAX_CONCURRENT_CONNECTIONS', 300)),
             'compression_enabled': os.getenv('COMPRESSION_ENABLED', 'true').lower() == 'true',
+            'compression_min_size': int(os.getenv('COMPRESSION_MIN_SIZE', 1024)),
+            'compression_max_size': int(os.getenv('COMPRESSION_MAX_SIZE', 8388608)),
+            'compression_executor_threshold': int(os.getenv('COMPRESSION_EXECUTOR_THRESHOLD', 65536)),
+            'compression_gzip_level': int(os.getenv('COMPRESSION_GZIP_LEVEL', 6)),
+            'compression_brotli_quality': int(os.getenv('COMPRESSION_BROTLI_QUALITY', 5)),
+            'compression_zstd_level': int(os.getenv('COMPRESSION_ZSTD_LEVEL', 3)),
+            'compression_cache_max_bytes': int(os.getenv('COMPRESSION_CACHE_MAX_BYTES', 33554432)),
             'ssl_enabled': os.getenv('SSL_ENABLED', 'true').lower() == 'true',
             'default_http_port': int(os.getenv('DEFAULT_HTTP_PORT', 3080)),
             'default_https_port': int(os.getenv('DEFAULT_HTTPS_PORT', 3453)),
             
+            # Archivos estáticos
+            'static_send_mode': os.getenv('STATIC_SEND_MODE', 'auto').lower(),
+            'static_sendfile_min_size': int(os.getenv('STATIC_SENDFILE_MIN_SIZE', 65536)),
+            'static_chunk_size': int(os.getenv('STATIC_CHUNK_SIZE', 262144)),
+            'static_cache_enabled': os.getenv('STATIC_CACHE_ENABLED', 'true').lower() == 'true',
+            'static_cache_max_bytes': int(os.getenv('STATIC_CACHE_MAX_BYTES', 67108864)),
+            'static_cache_max_object_size': int(os.getenv('STATIC_CACHE_MAX_OBJECT_SIZE', 1048576)),
+            'static_cache_validate_interval': float(os.getenv('STATIC_CACHE_VALIDATE_INTERVAL', 1.0)),
+            'static_etag_mode': os.getenv('STATIC_ETAG_MODE', 'strong').lower(),
+            'static_precompressed_enabled': os.getenv('STATIC_PRECOMPRESSED_ENABLED', 'true').lower() == 'true',
+            'static_precompressed_check_ttl': float(os.getenv('STATIC_PRECOMPRESSED_CHECK_TTL', 5.0)),
+            'static_path_cache_enabled': os.getenv('STATIC_PATH_CACHE_ENABLED', 'true').lower() == 'true',
+            'static_path_cache_max_entries': int(os.getenv('STATIC_PATH_CACHE_MAX_ENTRIES', 10000)),
+            'static_path_cache_negative_ttl': float(os.getenv('STATIC_PATH_CACHE_NEGATIVE_TTL', 2.0)),
+            'static_path_cache_validate_interval': float(os.getenv('STATIC_PATH_CACHE_VALIDATE_INTERVAL', 1.0)),
+            
+            # Rewrite engine
+            'rewrite_memo_size': int(os.getenv('REWRITE_MEMO_SIZE', 4096)),
+            'rewrite_memo_fact_ttl': float(os.getenv('REWRITE_MEMO_FACT_TTL', 2.0)),
+            'rewrite_instrumentation': os.getenv('REWRITE_INSTRUMENTATION', 'false').lower() == 'true',
+            
+            # Cache de metadatos de filesystem (stat / realpath)
+            'file_metadata_ttl': float(os.getenv('FILE_METADATA_TTL', 1.0)),
+            'file_metadata_max_entries': int(os.getenv('FILE_METADATA_MAX_ENTRIES', 50000)),
+            'docroot_manifest_enabled': os.getenv('DOCROOT_MANIFEST_ENABLED', 'false').lower() == 'true',
+            'docroot_manifest_max_entries': int(os.getenv('DOCROOT_MANIFEST_MAX_ENTRIES', 200000)),
+            'docroot_manifest_rescan_interval': float(os.getenv('DOCROOT_MANIFEST_RESCAN_INTERVAL', 30.0)),
+            'docroot_manifest_inotify': os.getenv('DOCROOT_MANIFEST_INOTIFY', 'true').lower() == 'true',
+            
+            # Executor de I/O de filesystem
+            'io_executor_threads': int(os.getenv('IO_EXECUTOR_THREADS', 16)),
+            'io_executor_per_root_limit': int(os.getenv('IO_EXECUTOR_PER_ROOT_LIMIT', 4)),
+            
             # Logging
             'logs_enabled': os.getenv('LOGS', 'true').lower() == 'true',
             'log_file_path': os.getenv('LOG_FILE_PATH', '/var/log/webserver/access.log'),
@@ -49,6 +100,13 @@ class ConfigManager:
             # PHP-FPM
             'php_fpm_default_socket': os.getenv('PHP_FPM_DEFAULT_SOCKET', '/run/php/php8.3-fpm.sock'),
             'php_fpm_timeout': int(os.getenv('PHP_FPM_TIMEOUT', 30)),
+            'php_fpm_pool_min_size': int(os.getenv('PHP_FPM_POOL_MIN_SIZE', 0)),
+            'php_fpm_pool_max_size': int(os.getenv('PHP_FPM_POOL_MAX_SIZE', 8)),
+            'php_fpm_pool_idle_timeout': float(os.getenv('PHP_FPM_POOL_IDLE_TIMEOUT', 10.0)),
+            'php_fpm_multiplex': os.getenv('PHP_FPM_MULTIPLEX', 'true').lower() == 'true',
+            'php_fpm_multiplex_max_requests': int(os.getenv('PHP_FPM_MULTIPLEX_MAX_REQUESTS', 32)),
+            'php_stream_threshold': int(os.getenv('PHP_STREAM_THRESHOLD', 65536)),
+            'php_max_body_size': int(os.getenv('PHP_MAX_BODY_SIZE', 1048576)),
             'php_fpm_sockets_71': os.getenv('PHP_FPM_SOCKETS_71'),
             'php_fpm_sockets_74': os.getenv('PHP_FPM_SOCKETS_74'),
             'php_fpm_sockets_82': os.getenv('PHP_FPM_SOCKETS_82'),
@@ -78,6 +136,62 @@ class ConfigManager:
             print(f"Error al cargar virtual hosts: {e}")
             return []
     
+    def _compile_blocklists(self) -> Dict[int, Tuple[Dict[str, Any], Blocklist]]:
+        """
+        Compila la lista de bloqueo de cada virtual host
+
+        Se indexa por id() del dict del vhost (guardando también el dict para
+        verificar identidad) en lugar de guardarla dentro del vhost, que el
+        dashboard serializa a JSON.
+        """
+        blocklists = {}
+        for vhost in self._virtual_hosts:
+            blocklists[id(vhost)] = (vhost, Blocklist.for_vhost(vhost))
+        return blocklists
+
+    def _compile_rewrite_engine(self, vhost: Dict[str, Any]) -> Optional['RewriteEngine']:
+        """Compila las reglas de rewrite de un virtual host (None si no tiene)"""
+        if not vhost.get('rewrite_rules'):
+            return None
+        from rewrite.rewrite_engine import RewriteEngine
+        try:
+            return RewriteEngine(
+                vhost,
+                vhost.get('document_root', ''),
+                memo_size=self.get('rewrite_memo_size', 4096),
+                fact_ttl=self.get('rewrite_memo_fact_ttl', 2.0),
+                instrument=self.get('rewrite_instrumentation', False)
+            )
+        except Exception as e:
+            print(f"⚠️  Error en rewrite engine para {vhost.get('domain')}: {e}")
+            return None
+
+    def compile_rewrite_engines(self) -> None:
+        """Compila una vez las reglas de rewrite de cada virtual host (indexado como las blocklists)"""
+        self._rewrite_engines = {
+            id(vhost): (vhost, self._compile_rewrite_engine(vhost)) for vhost in self._virtual_hosts
+        }
+
+    def get_rewrite_engine(self, vhost: Dict[str, Any]) -> Optional['RewriteEngine']:
+        """Obtiene el motor de rewrite compilado de un virtual host (None si no tiene reglas)"""
+        entry = self._rewrite_engines.get(id(vhost))
+        if entry is None or entry[0] is not vhost:
+            entry = (vhost, self._compile_rewrite_engine(vhost))
+            self._rewrite_engines[id(vhost)] = entry
+        return entry[1]
+
+    def _build_router(self) -> VirtualHostRouter:
+        """Construye el índice de ruteo de virtual hosts"""
+        return VirtualHostRouter(self._virtual_hosts, self.get('default_http_port', 3080))
+
+    def get_blocklist(self, vhost: Dict[str, Any]) -> Blocklist:
+        """Obtiene la lista de bloqueo compilada de un virtual host"""
+        entry = self._blocklists.get(id(vhost))
+        if entry is None or entry[0] is not vhost:
+            entry = (vhost, Blocklist.for_vhost(vhost))
+            self._blocklists[id(vhost)] = entry
+        return entry[1]
+
     def get(self, key: str, default: Any = None) -> Any:
         """Obtiene un valor de configuración"""
         return self._config.get(key, default)
@@ -87,18 +201,27 @@ class ConfigManager:
         return self._virtual_hosts
     
     def get_virtual_host_by_domain(self, domain: str) -> Optional[Dict[str, Any]]:
-        """Obtiene un virtual host por dominio"""
-        for vhost in self._virtual_hosts:
-            if vhost.get('domain') == domain:
-                return vhost
-        return None
+        """Obtiene un virtual host por dominio, alias o comodín"""
+        return self._router.find(domain)
 
     def get_virtual_host_by_domain_and_port(self, domain: str, port: int) -> Optional[Dict[str, Any]]:
         """Obtiene un virtual host por dominio y puerto (para modo multi-puerto)"""
-        for vhost in self._virtual_hosts:
-            if vhost.get('domain') == domain and vhost.get('port') == port:
-                return vhost
-        return None
+        return self._router.find(domain, port)
+
+    def get_default_virtual_host(self, port: Optional[int] = None) -> Optional[Dict[str, Any]]:
+        """Obtiene el virtual host por defecto de un puerto (o el primero configurado)"""
+        return self._router.default_for(port)
+
+    def resolve_virtual_host(self, host: str, port: Optional[int] = None) -> Optional[Dict[str, Any]]:
+        """
+        Resuelve el virtual host de un request
+
+        Con SSL deshabilitado el ruteo es estricto por (dominio, puerto); con
+        SSL habilitado se rutea solo por dominio. Si nada coincide se usa el
+        default del puerto.
+        """
+        strict = not self.get('ssl_enabled', True)
+        return self._router.route(host, port, strict_port=strict)
 
     def get_unique_http_ports(self) -> List[int]:
         """Obtiene lista de puertos HTTP únicos cuando SSL_ENABLED=false"""
@@ -118,6 +241,12 @@ class ConfigManager:
         """Recarga la configuración"""
         self._config = self._load_config()
         self._virtual_hosts = self._load_virtual_hosts()
+        self._blocklists = self._compile_blocklists()
+        self.compile_rewrite_engines()
+        # Las decisiones memorizadas pueden apuntar a document_root o index viejos
+        from static_files.path_resolver import path_resolver
+        path_resolver.clear()
+        self._router = self._build_router()
         print("Configuración recargada")
 
 # Instancia global del gestor de configuración
@@ -0,0 +1,147 @@
+"""
+Tabla de ruteo de virtual hosts
+Índice por (dominio, puerto) y dominio, con server_aliases, comodines *.dominio y default por puerto
+"""
+
+from typing import Any, Dict, List, Optional, Tuple
+
+
+def normalize_host(host: str) -> str:
+    """Pasa el host a minúsculas y quita el punto final (example.com.)"""
+    return host.strip().lower().rstrip('.')
+
+
+class _WildcardNode:
+    """Nodo del trie de etiquetas invertidas (com -> example -> ...)"""
+
+    __slots__ = ('children', 'vhosts')
+
+    def __init__(self):
+        self.children: Dict[str, '_WildcardNode'] = {}
+        # Puerto (None = cualquier puerto) -> vhost del comodín que termina aquí
+        self.vhosts: Dict[Optional[int], Dict[str, Any]] = {}
+
+
+class VirtualHostRouter:
+    """
+    Resuelve el virtual host de un request en tiempo constante
+
+    Los nombres exactos (domain y server_aliases) se indexan en dos dicts:
+    (nombre, puerto) y nombre. Los comodines (*.example.com) se guardan en un
+    trie por etiquetas invertidas y gana el más específico. Ante nombres
+    repetidos gana el primer vhost del YAML, igual que la búsqueda lineal
+    anterior.
+
+    El default de cada puerto es el vhost marcado con default: true o, si no
+    hay ninguno, el primero que escucha en ese puerto.
+    """
+
+    def __init__(self, virtual_hosts: List[Dict[str, Any]], default_port: Optional[int] = None):
+        """
+        Construye el índice
+
+        Args:
+            virtual_hosts: Lista de virtual hosts cargada del YAML
+            default_port: Puerto asumido para vhosts sin 'port'
+        """
+        self._by_name_port: Dict[Tuple[str, int], Dict[str, Any]] = {}
+        self._by_name: Dict[str, Dict[str, Any]] = {}
+        self._wildcards = _WildcardNode()
+        self._port_defaults: Dict[int, Dict[str, Any]] = {}
+        self._default: Optional[Dict[str, Any]] = virtual_hosts[0] if virtual_hosts else None
+
+        explicit_defaults = set()
+        for vhost in virtual_hosts:
+            port = vhost.get('port', default_port)
+
+            for name in self._names(vhost):
+                if name.startswith('*.'):
+                    self._add_wildcard(name[2:], port, vhost)
+                else:
+                    self._by_name.setdefault(name, vhost)
+                    if port is not None:
+                        self._by_name_port.setdefault((name, port), vhost)
+
+            if port is None:
+                continue
+            if vhost.get('default', False) and port not in explicit_defaults:
+                self._port_defaults[port] = vhost
+                explicit_defaults.add(port)
+            else:
+                self._port_defaults.setdefault(port, vhost)
+
+    @staticmethod
+    def _names(vhost: Dict[str, Any]) -> List[str]:
+        """domain más server_aliases, normalizados"""
+        aliases = vhost.get('server_aliases') or []
+        if isinstance(aliases, str):
+            aliases = [aliases]
+        names = [vhost.get('domain', '')] + list(aliases)
+        return [normalize_host(str(name)) for name in names if name]
+
+    def _add_wildcard(self, suffix: str, port: Optional[int], vhost: Dict[str, Any]) -> None:
+        node = self._wildcards
+        for label in reversed(suffix.split('.')):
+            node = node.children.setdefault(label, _WildcardNode())
+        node.vhosts.setdefault(None, vhost)
+        if port is not None:
+            node.vhosts.setdefault(port, vhost)
+
+    def _match_wildcard(self, host: str, port: Optional[int]) -> Optional[Dict[str, Any]]:
+        """Busca el comodín más específico que cubre al host"""
+        labels = host.split('.')
+        node = self._wildcards
+        best = None
+
+        # El comodín necesita al menos una etiqueta adicional: *.a.com no cubre a.com
+        for depth in range(len(labels) - 1, 0, -1):
+            node = node.children.get(labels[depth])
+            if node is None:
+                break
+            candidate = node.vhosts.get(port) if port is not None else node.vhosts.get(None)
+            if candidate is not None:
+                best = candidate
+
+        return best
+
+    def find(self, host: str, port: Optional[int] = None) -> Optional[Dict[str, Any]]:
+        """
+        Busca el virtual host de un nombre, sin aplicar defaults
+
+        Args:
+            host: Header Host sin puerto
+            port: Puerto local; si se indica el ruteo es estricto por (nombre, puerto)
+
+        Returns:
+            El virtual host o None
+        """
+        host = normalize_host(host)
+        if port is not None:
+            vhost = self._by_name_port.get((host, port))
+        else:
+            vhost = self._by_name.get(host)
+        if vhost is not None:
+            return vhost
+        return self._match_wildcard(host, port)
+
+    def default_for(self, port: Optional[int] = None) -> Optional[Dict[str, Any]]:
+        """Virtual host por defecto del puerto (o el primero del YAML)"""
+        if port is not None:
+            vhost = self._port_defaults.get(port)
+            if vhost is not None:
+                return vhost
+        return self._default
+
+    def route(self, host: str, port: Optional[int] = None, strict_port: bool = True) -> Optional[Dict[str, Any]]:
+        """
+        Resuelve el virtual host de un request, aplicando el default del puerto
+
+        Args:
+            host: Header Host sin puerto
+            port: Puerto local del socket que recibió el request
+            strict_port: Si es True el nombre debe coincidir también en puerto
+        """
+        vhost = self.find(host, port if strict_port else None)
+        if vhost is not None:
+            return vhost
+        return self.default_for(port)
@@ -11,6 +11,14 @@ from typing import Dict, List, Any
 from config.config_manager import config
 from database.mongodb_client import mongodb_client
 from php_fpm.php_manager import php_manager
+from static_files.file_cache import static_file_cache
+from static_files.file_sender import file_sender
+from static_files.path_resolver import path_resolver
+from static_files.precompressed import precompressed_resolver
+from utils.compression import response_compressor
+from utils.io_executor import io_executor
+from utils.file_metadata import file_metadata
+from utils.docroot_manifest import docroot_manifests
 
 class DashboardServer:
     """Servidor del dashboard de administración"""
@@ -26,7 +34,14 @@ class DashboardServer:
             'static_requests': 0,
             'errors': 0,
             'start_time': time.time(),
-            'last_requests': []
+            'last_requests': [],
+            'static_cache': static_file_cache.get_stats(),
+            'static_delivery': file_sender.get_stats(),
+            'static_precompressed': precompressed_resolver.get_stats(),
+            'compression': response_compressor.get_stats(),
+            'path_resolution': path_resolver.get_stats(),
+            'io_executor': io_executor.get_stats(),
+            'file_metadata': file_metadata.get_stats()
         }
         self.setup_routes()
     
@@ -37,6 +52,7 @@ class DashboardServer:
         self.app.router.add_get('/api/stats', self.api_stats)
         self.app.router.add_get('/api/virtual-hosts', self.api_virtual_hosts)
         self.app.router.add_get('/api/php-status', self.api_php_status)
+        self.app.router.add_get('/api/rewrite-stats', self.api_rewrite_stats)
         self.app.router.add_get('/api/logs', self.api_logs)
         self.app.router.add_get('/api/logs/historical', self.api_historical_logs)
         self.app.router.add_get('/api/logs/filter-options', self.api_filter_options)
@@ -52,6 +68,7 @@ class DashboardServer:
     
     async def api_stats(self, request: web_request.Request) -> web.Response:
         """API de estadísticas del servidor"""
+        self._refresh_subsystem_stats()
         uptime = time.time() - self.stats['start_time']
         
         stats_data = {
@@ -81,13 +98,15 @@ class DashboardServer:
         """API de estado de PHP-FPM"""
         php_versions = php_manager.get_available_versions()
         php_status = await php_manager.test_all_connections()
+        transport_stats = php_manager.get_transport_stats()
         
         php_info = []
         for version in php_versions:
             php_info.append({
                 'version': version,
                 'status': 'online' if php_status.get(version, False) else 'offline',
-                'socket': config.get(f'php_fpm_sockets_{version.replace(".", "")}', 'N/A')
+                'socket': config.get(f'php_fpm_sockets_{version.replace(".", "")}', 'N/A'),
+                'transport': transport_stats.get(version)
             })
         
         return web.json_response({
@@ -95,6 +114,45 @@ class DashboardServer:
             'total_versions': len(php_versions)
         })
 
+    async def api_rewrite_stats(self, request: web_request.Request) -> web.Response:
+        """
+        API de instrumentación de rewrite por regla
+        
+        ?vhost=dominio[&port=N] limita a un virtual host; sin vhost devuelve
+        todos los que tienen reglas. ?reset=1 pone los contadores en cero
+        después de leerlos.
+        """
+        domain = request.query.get('vhost')
+        if domain:
+            try:
+                port = int(request.query['port']) if 'port' in request.query else None
+            except ValueError:
+                return web.json_response({'error': 'port inválido'}, status=400)
+            
+            vhost = (config.get_virtual_host_by_domain_and_port(domain, port) if port is not None
+                     else config.get_virtual_host_by_domain(domain))
+            if vhost is None:
+                return web.json_response({'error': f'Virtual host no encontrado: {domain}'}, status=404)
+            vhosts = [vhost]
+        else:
+            vhosts = config.get_virtual_hosts()
+        
+        reset = request.query.get('reset', '').lower() in ('1', 'true')
+        engines = []
+        for vhost in vhosts:
+            engine = config.get_rewrite_engine(vhost)
+            if engine is None:
+                continue
+            engines.append(engine.get_stats())
+            if reset:
+                engine.reset_stats()
+        
+        return web.json_response({
+            'enabled': config.get('rewrite_instrumentation', False),
+            'virtual_hosts': engines,
+            'total': len(engines)
+        })
+
     async def api_logs(self, request: web_request.Request) -> web.Response:
         """API de logs desde MongoDB"""
         try:
@@ -284,8 +342,21 @@ class DashboardServer:
             if ws in self.websockets:
                 self.websockets.remove(ws)
     
+    def _refresh_subsystem_stats(self):
+        """Actualiza en stats los contadores de los subsistemas (cache, envío, compresión, I/O, PHP-FPM)"""
+        self.stats['static_cache'] = static_file_cache.get_stats()
+        self.stats['static_delivery'] = file_sender.get_stats()
+        self.stats['static_precompressed'] = precompressed_resolver.get_stats()
+        self.stats['compression'] = response_compressor.get_stats()
+        self.stats['path_resolution'] = path_resolver.get_stats()
+        self.stats['io_executor'] = io_executor.get_stats()
+        self.stats['file_metadata'] = file_metadata.get_stats()
+        self.stats['docroot_manifest'] = docroot_manifests.get_stats()
+        self.stats['php_fpm'] = php_manager.get_transport_stats()
+
     async def _get_stats_for_broadcast(self) -> Dict[str, Any]:
         """Obtiene estadísticas para broadcast"""
+        self._refresh_subsystem_stats()
         uptime = time.time() - self.stats['start_time']
         return {
             **self.stats,
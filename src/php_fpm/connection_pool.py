@@ -0,0 +1,269 @@
+"""
+Pool de conexiones persistentes a PHP-FPM
+Reutiliza sockets Unix entre requests (FCGI_KEEP_CONN) en lugar de abrir uno por request
+"""
+
+import asyncio
+import time
+from collections import deque
+from typing import Any, Deque, Dict, Optional
+
+
+class PooledConnection:
+    """Conexión a PHP-FPM con sus tiempos de uso"""
+
+    __slots__ = ('reader', 'writer', 'created_at', 'last_used', 'uses')
+
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.reader = reader
+        self.writer = writer
+        self.created_at = time.monotonic()
+        self.last_used = self.created_at
+        self.uses = 0               # requests completados sobre esta conexión
+
+    def is_usable(self) -> bool:
+        """
+        Verificación sin I/O: PHP-FPM cierra las conexiones ociosas cuando
+        recicla un worker (pm.max_requests) y el event loop ya registró el EOF
+        """
+        return (not self.writer.is_closing() and not self.reader.at_eof()
+                and self.reader.exception() is None)
+
+    def close(self) -> None:
+        """Cierra el socket sin esperar"""
+        self.writer.close()
+
+
+class FastCGIConnectionPool:
+    """
+    Pool de conexiones a un socket de PHP-FPM
+
+    Cada conexión abierta ocupa un worker de PHP-FPM mientras está en el
+    pool, por lo que max_size debe quedar por debajo de pm.max_children.
+    Las conexiones liberadas se entregan directamente al primer request en
+    espera; las que pasan idle_timeout sin uso se cierran (dejando min_size)
+    con un timer que se arma al devolver una conexión ociosa, así que los
+    workers se liberan aunque no lleguen más requests.
+    """
+
+    def __init__(self, socket_path: str, min_size: int = 0, max_size: int = 8,
+                 idle_timeout: float = 10.0, connect_timeout: float = 5.0):
+        """
+        Inicializa el pool
+
+        Args:
+            socket_path: Socket Unix de PHP-FPM
+            min_size: Conexiones que se mantienen abiertas aunque estén ociosas
+            max_size: Máximo de conexiones simultáneas (las demás esperan)
+            idle_timeout: Segundos que una conexión puede quedar ociosa
+            connect_timeout: Segundos para abrir una conexión nueva
+        """
+        self.socket_path = socket_path
+        self.min_size = min(min_size, max_size)
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self.connect_timeout = connect_timeout
+
+        self._idle: Deque[PooledConnection] = deque()
+        self._waiters: Deque[asyncio.Future] = deque()
+        self._warming = False
+        self._closed = False
+        self._reaper: Optional[asyncio.TimerHandle] = None
+
+        # Conexiones abiertas o abriéndose (ociosas + en uso)
+        self.size = 0
+
+        self.opens = 0
+        self.reuses = 0
+        self.waits = 0
+        self.wait_seconds = 0.0
+        self.wait_timeouts = 0
+        self.discarded = 0          # fallaron la verificación al sacarlas del pool
+        self.expired = 0            # cerradas por idle_timeout
+        self.connect_errors = 0
+
+    async def acquire(self, timeout: Optional[float] = None) -> PooledConnection:
+        """
+        Obtiene una conexión: ociosa si hay, nueva si no se llegó a max_size,
+        o la próxima que se libere
+
+        Raises:
+            asyncio.TimeoutError: si no hay conexión disponible a tiempo
+            OSError: si no se pudo conectar al socket
+        """
+        self._expire_idle()
+        if self.size < self.min_size and not self._warming:
+            self._warming = True
+            asyncio.ensure_future(self._warm())
+
+        while True:
+            connection = self._pop_idle()
+            if connection is not None:
+                self.reuses += 1
+                return connection
+
+            if self.size < self.max_size:
+                return await self._open()
+
+            future = asyncio.get_running_loop().create_future()
+            self._waiters.append(future)
+            self.waits += 1
+            started = time.monotonic()
+            try:
+                connection = await asyncio.wait_for(future, timeout)
+            except BaseException as e:
+                if isinstance(e, asyncio.TimeoutError):
+                    self.wait_timeouts += 1
+                if future.done() and not future.cancelled() and future.exception() is None:
+                    # La conexión llegó justo cuando se canceló la espera
+                    handed = future.result()
+                    if handed is not None:
+                        self._put(handed)
+                    else:
+                        self._handoff(None)
+                else:
+                    future.cancel()
+                raise
+            finally:
+                self.wait_seconds += time.monotonic() - started
+
+            if connection is not None:
+                self.reuses += 1
+                return connection
+            # Se liberó un lugar: volver a intentar abrir
+
+    def release(self, connection: PooledConnection, reusable: bool = True) -> None:
+        """
+        Devuelve una conexión al pool
+
+        Args:
+            connection: Conexión obtenida con acquire
+            reusable: False si el request terminó con error y el estado del
+                socket es desconocido (se cierra)
+        """
+        if reusable and not self._closed and connection.is_usable():
+            connection.uses += 1
+            connection.last_used = time.monotonic()
+            self._put(connection)
+            return
+
+        connection.close()
+        self.size -= 1
+        self._handoff(None)
+
+    async def close(self) -> None:
+        """Cierra las conexiones ociosas y rechaza las que se devuelvan"""
+        self._closed = True
+        if self._reaper is not None:
+            self._reaper.cancel()
+            self._reaper = None
+        while self._idle:
+            connection = self._idle.pop()
+            connection.close()
+            self.size -= 1
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_exception(ConnectionError('Pool de PHP-FPM cerrado'))
+
+    async def _open(self) -> PooledConnection:
+        """Abre una conexión nueva reservando su lugar en el pool"""
+        self.size += 1
+        try:
+            reader, writer = await asyncio.wait_for(
+                asyncio.open_unix_connection(self.socket_path),
+                timeout=self.connect_timeout
+            )
+        except BaseException:
+            self.connect_errors += 1
+            self.size -= 1
+            self._handoff(None)
+            raise
+        self.opens += 1
+        return PooledConnection(reader, writer)
+
+    async def _warm(self) -> None:
+        """Abre conexiones hasta min_size en segundo plano"""
+        try:
+            while self.size < self.min_size and not self._closed:
+                self._put(await self._open())
+        except (OSError, asyncio.TimeoutError):
+            pass
+        finally:
+            self._warming = False
+
+    def _pop_idle(self) -> Optional[PooledConnection]:
+        """Conexión ociosa más reciente que pase la verificación"""
+        while self._idle:
+            connection = self._idle.pop()
+            if connection.is_usable():
+                return connection
+            connection.close()
+            self.size -= 1
+            self.discarded += 1
+        return None
+
+    def _expire_idle(self) -> None:
+        """Cierra las conexiones ociosas más viejas que idle_timeout"""
+        now = time.monotonic()
+        while (self._idle and self.size > self.min_size and
+               now - self._idle[0].last_used >= self.idle_timeout):
+            connection = self._idle.popleft()
+            connection.close()
+            self.size -= 1
+            self.expired += 1
+
+    def _reap(self) -> None:
+        """Timer: expira las conexiones ociosas vencidas y se rearma si quedan más"""
+        self._reaper = None
+        self._expire_idle()
+        self._arm_reaper()
+
+    def _arm_reaper(self) -> None:
+        """Programa _reap para cuando venza la conexión ociosa más vieja"""
+        if self._reaper is not None or self._closed or not self._idle or self.size <= self.min_size:
+            return
+        delay = self.idle_timeout - (time.monotonic() - self._idle[0].last_used)
+        self._reaper = asyncio.get_running_loop().call_later(max(delay, 0.0), self._reap)
+
+    def _put(self, connection: PooledConnection) -> None:
+        """Entrega la conexión a quien espera o la deja ociosa"""
+        if not self._handoff(connection):
+            self._idle.append(connection)
+            self._arm_reaper()
+
+    def _handoff(self, connection: Optional[PooledConnection]) -> bool:
+        """
+        Entrega la conexión (o el lugar libre si es None) al primer request en espera
+
+        Returns:
+            True si alguien la recibió
+        """
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(connection)
+                return True
+        return False
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Retorna contadores para el dashboard"""
+        checkouts = self.opens + self.reuses
+        return {
+            'socket': self.socket_path,
+            'size': self.size,
+            'idle': len(self._idle),
+            'in_use': self.size - len(self._idle),
+            'waiting': len(self._waiters),
+            'min_size': self.min_size,
+            'max_size': self.max_size,
+            'opens': self.opens,
+            'reuses': self.reuses,
+            'reuse_rate': round(self.reuses / checkouts, 4) if checkouts else 0.0,
+            'waits': self.waits,
+            'avg_wait_ms': round(self.wait_seconds / self.waits * 1000, 3) if self.waits else 0.0,
+            'wait_timeouts': self.wait_timeouts,
+            'discarded': self.discarded,
+            'expired': self.expired,
+            'connect_errors': self.connect_errors,
+        }
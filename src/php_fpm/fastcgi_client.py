@@ -2,7 +2,80 @@ import asyncio
 import struct
 import socket
 import os
-from typing import Dict, Optional, Tuple
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+from .connection_pool import FastCGIConnectionPool
+from .fastcgi_codec import (
+    FCGI_MAX_CONTENT, RecordReader, decode_params, encode_params, encode_record, encode_stream
+)
+from .multiplexer import FastCGIMultiplexer
+
+
+class FastCGIStream:
+    """
+    Salida de un request sobre una conexión propia (del pool o de un solo uso)
+
+    read() lee del socket solo cuando el consumidor pide el próximo
+    fragmento: si el cliente HTTP es lento, PHP-FPM se frena al llenarse el
+    buffer del socket en lugar de acumular la salida en memoria.
+    """
+    
+    def __init__(self, records: RecordReader, header: bytes, on_close: Callable[[bool], None]):
+        """
+        Args:
+            records: Lector de registros de la conexión
+            header: Primer header de respuesta ya leído
+            on_close: Recibe si la conexión quedó reutilizable (END_REQUEST completo)
+        """
+        self._records = records
+        self._header: Optional[bytes] = header
+        self._on_close = on_close
+        self._stderr: List[memoryview] = []
+        self._reusable = False
+        self._closed = False
+        self.finished = False
+    
+    @property
+    def stderr(self) -> bytes:
+        return b''.join(self._stderr)
+    
+    async def read(self):
+        """
+        Próximo fragmento de STDOUT como memoryview (vacío al terminar el request)
+        
+        Cada registro se lee completo (readexactly): una lectura corta
+        desalinearía el próximo request sobre una conexión persistente.
+        """
+        try:
+            while not self.finished:
+                header = self._header
+                self._header = None
+                req_type, req_id, content = await self._records.read(header)
+                
+                if req_type == FastCGIClient.FCGI_STDOUT:
+                    if content:
+                        return content
+                elif req_type == FastCGIClient.FCGI_STDERR:
+                    if content:
+                        self._stderr.append(content)
+                elif req_type == FastCGIClient.FCGI_END_REQUEST:
+                    # protocolStatus distinto de REQUEST_COMPLETE: no reutilizar
+                    protocol_status = content[4] if len(content) >= 5 else FastCGIClient.FCGI_REQUEST_COMPLETE
+                    self._reusable = protocol_status == FastCGIClient.FCGI_REQUEST_COMPLETE
+                    self.finished = True
+                    self.close()
+        except BaseException:
+            self.close()
+            raise
+        return b''
+    
+    def close(self) -> None:
+        """Libera la conexión (se descarta si el request no terminó)"""
+        if not self._closed:
+            self._closed = True
+            self._on_close(self.finished and self._reusable)
+
 
 class FastCGIClient:
     """Cliente FastCGI simple para comunicarse con PHP-FPM"""
@@ -19,86 +92,55 @@ class FastCGIClient:
     FCGI_DATA = 8
     FCGI_GET_VALUES = 9
     FCGI_GET_VALUES_RESULT = 10
+    FCGI_UNKNOWN_TYPE = 11
     
     FCGI_RESPONDER = 1
     FCGI_AUTHORIZER = 2
     FCGI_FILTER = 3
     
-    def __init__(self, socket_path: str, timeout: int = 30):
-        self.socket_path = socket_path
-        self.timeout = timeout
+    FCGI_KEEP_CONN = 1
+    FCGI_REQUEST_COMPLETE = 0
     
-    def _pack_fcgi_record(self, req_type: int, req_id: int, content: bytes) -> bytes:
-        """Empaqueta un registro FastCGI"""
-        content_length = len(content)
-        padding_length = (8 - (content_length % 8)) % 8
-        
-        header = struct.pack(
-            '!BBHHBx',
-            self.FCGI_VERSION_1,
-            req_type,
-            req_id,
-            content_length,
-            padding_length
-        )
-        
-        return header + content + b'\x00' * padding_length
+    # Contenido máximo de un registro (contentLength es de 16 bits)
+    FCGI_MAX_CONTENT = FCGI_MAX_CONTENT
     
-    def _pack_params(self, params: Dict[str, str]) -> bytes:
-        """Empaqueta parámetros FastCGI"""
-        result = b''
-        for key, value in params.items():
-            key_bytes = key.encode('utf-8')
-            value_bytes = value.encode('utf-8')
-            
-            key_len = len(key_bytes)
-            value_len = len(value_bytes)
-            
-            # Longitud de la clave
-            if key_len < 128:
-                result += struct.pack('!B', key_len)
-            else:
-                result += struct.pack('!I', key_len | 0x80000000)
-            
-            # Longitud del valor
-            if value_len < 128:
-                result += struct.pack('!B', value_len)
-            else:
-                result += struct.pack('!I', value_len | 0x80000000)
-            
-            result += key_bytes + value_bytes
-        
-        return result
+    IDEMPOTENT_METHODS = ('GET', 'HEAD', 'OPTIONS')
     
-    def _unpack_fcgi_record(self, data: bytes) -> Tuple[int, int, bytes]:
-        """Desempaqueta un registro FastCGI"""
-        if len(data) < 8:
-            return 0, 0, b''
-        
-        version, req_type, req_id, content_length, padding_length = struct.unpack('!BBHHBx', data[:8])
-        
-        if len(data) < 8 + content_length + padding_length:
-            return 0, 0, b''
-        
-        content = data[8:8 + content_length]
-        return req_type, req_id, content
+    # Segundos antes de volver a consultar FCGI_GET_VALUES tras un error
+    NEGOTIATION_RETRY = 30.0
     
-    async def execute_php(self, script_path: str, params: Dict[str, str], 
-                         post_data: bytes = b'') -> Tuple[bytes, bytes]:
-        """Ejecuta un script PHP a través de FastCGI"""
-        
-        # Verificar que el socket existe
-        if not os.path.exists(self.socket_path):
-            raise FileNotFoundError(f"Socket PHP-FPM no encontrado: {self.socket_path}")
+    def __init__(self, socket_path: str, timeout: int = 30,
+                 pool: Optional[FastCGIConnectionPool] = None,
+                 multiplex: bool = False, multiplex_max_requests: int = 32):
+        """
+        Args:
+            socket_path: Socket Unix de PHP-FPM
+            timeout: Segundos por operación
+            pool: Pool de conexiones persistentes (None: una conexión por request)
+            multiplex: Consultar FCGI_MPXS_CONNS y multiplexar si el backend lo soporta
+            multiplex_max_requests: Tope de requests simultáneos por conexión multiplexada
+        """
+        self.socket_path = socket_path
+        self.timeout = timeout
+        self.pool = pool
+        self.multiplex = multiplex
+        self.multiplex_max_requests = multiplex_max_requests
         
-        # Preparar parámetros FastCGI
+        # Resultado de la negociación (None mientras no se consultó o si falló)
+        self.multiplexer: Optional[FastCGIMultiplexer] = None
+        self._negotiation: Optional[asyncio.Future] = None
+        self._negotiated = False
+        self._negotiate_after = 0.0
+    
+    def _build_params(self, script_path: str, params: Dict[str, str], content_length: int) -> Dict[str, str]:
+        """Parámetros FastCGI del request"""
         fcgi_params = {
             'SCRIPT_FILENAME': script_path,
             'REQUEST_METHOD': params.get('REQUEST_METHOD', 'GET'),
             'REQUEST_URI': params.get('REQUEST_URI', '/'),
             'QUERY_STRING': params.get('QUERY_STRING', ''),
             'CONTENT_TYPE': params.get('CONTENT_TYPE', ''),
-            'CONTENT_LENGTH': str(len(post_data)),
+            'CONTENT_LENGTH': str(content_length),
             'SERVER_SOFTWARE': 'TechWebServer/1.0',
             'SERVER_NAME': params.get('SERVER_NAME', 'localhost'),
             'SERVER_PORT': params.get('SERVER_PORT', '3080'),
@@ -117,74 +159,257 @@ class FastCGIClient:
             if key.startswith('HTTP_') or key not in fcgi_params:
                 fcgi_params[key] = value
         
-        req_id = 1
-        
+        return fcgi_params
+    
+    async def execute_php(self, script_path: str, params: Dict[str, str], 
+                         post_data: bytes = b'') -> Tuple[bytes, bytes]:
+        """Ejecuta un script PHP a través de FastCGI y retorna (stdout, stderr) completos"""
+        stream = await self.open_php(script_path, params, post_data)
         try:
-            # Conectar al socket Unix
-            reader, writer = await asyncio.wait_for(
-                asyncio.open_unix_connection(self.socket_path),
-                timeout=self.timeout
-            )
-            
-            # 1. Enviar BEGIN_REQUEST
-            begin_request = struct.pack('!HB5x', self.FCGI_RESPONDER, 0)
-            writer.write(self._pack_fcgi_record(self.FCGI_BEGIN_REQUEST, req_id, begin_request))
-            
-            # 2. Enviar PARAMS
-            params_data = self._pack_params(fcgi_params)
-            if params_data:
-                writer.write(self._pack_fcgi_record(self.FCGI_PARAMS, req_id, params_data))
-            
-            # Enviar PARAMS vacío para indicar fin de parámetros
-            writer.write(self._pack_fcgi_record(self.FCGI_PARAMS, req_id, b''))
-            
-            # 3. Enviar STDIN (datos POST)
-            if post_data:
-                writer.write(self._pack_fcgi_record(self.FCGI_STDIN, req_id, post_data))
-            
-            # Enviar STDIN vacío para indicar fin de datos
-            writer.write(self._pack_fcgi_record(self.FCGI_STDIN, req_id, b''))
-            
-            await writer.drain()
-            
-            # Leer respuesta
-            stdout_data = b''
-            stderr_data = b''
-            
+            chunks = []
             while True:
-                header = await asyncio.wait_for(reader.read(8), timeout=self.timeout)
-                if len(header) < 8:
-                    break
-                
-                version, req_type, response_req_id, content_length, padding_length = struct.unpack('!BBHHBx', header)
-                
-                if content_length > 0:
-                    content = await asyncio.wait_for(reader.read(content_length), timeout=self.timeout)
-                else:
-                    content = b''
-                
-                if padding_length > 0:
-                    await asyncio.wait_for(reader.read(padding_length), timeout=self.timeout)
-                
-                if req_type == self.FCGI_STDOUT:
-                    if content:
-                        stdout_data += content
-                elif req_type == self.FCGI_STDERR:
-                    if content:
-                        stderr_data += content
-                elif req_type == self.FCGI_END_REQUEST:
-                    break
-            
-            writer.close()
-            await writer.wait_closed()
+                chunk = await stream.read()
+                if not chunk:
+                    return b''.join(chunks), stream.stderr
+                chunks.append(chunk)
+        except asyncio.TimeoutError:
+            raise TimeoutError(f"Timeout al comunicarse con PHP-FPM: {self.socket_path}")
+        except Exception as e:
+            raise RuntimeError(f"Error al ejecutar PHP: {e}")
+        finally:
+            stream.close()
+    
+    async def open_php(self, script_path: str, params: Dict[str, str], post_data=b'',
+                       content_length: Optional[int] = None):
+        """
+        Inicia un script PHP y retorna su salida como stream
+        
+        El stream (FastCGIStream o MultiplexedStream) expone read(), que
+        retorna b'' al terminar, stderr y close(), que hay que llamar aunque
+        la salida no se lea completa.
+        
+        Args:
+            post_data: Cuerpo del request en bytes, o un reader con
+                read(n) (request.content) que se envía en registros STDIN a
+                medida que llega
+            content_length: Bytes a leer del reader (obligatorio si no es bytes)
+        """
+        
+        # Verificar que el socket existe
+        if not os.path.exists(self.socket_path):
+            raise FileNotFoundError(f"Socket PHP-FPM no encontrado: {self.socket_path}")
+        
+        if isinstance(post_data, (bytes, bytearray)):
+            content_length = len(post_data)
+        fcgi_params = self._build_params(script_path, params, content_length)
+        
+        try:
+            multiplexer = await self._get_multiplexer()
+            if multiplexer is not None:
+                return await multiplexer.open(
+                    lambda req_id, writer: self._send_request(writer, req_id, fcgi_params, post_data,
+                                                              keep_conn=True)
+                )
             
-            return stdout_data, stderr_data
+            if self.pool is None:
+                return await self._open_unpooled(fcgi_params, post_data)
+            return await self._open_pooled(fcgi_params, post_data)
             
         except asyncio.TimeoutError:
             raise TimeoutError(f"Timeout al comunicarse con PHP-FPM: {self.socket_path}")
         except Exception as e:
             raise RuntimeError(f"Error al ejecutar PHP: {e}")
     
+    async def _open_pooled(self, fcgi_params: Dict[str, str], post_data) -> FastCGIStream:
+        """Request sobre una conexión del pool, que vuelve al pool al cerrar el stream"""
+        # Un request por conexión: el ID puede ser siempre 1
+        req_id = 1
+        
+        # Una conexión reutilizada puede haberla cerrado PHP-FPM (reciclado del
+        # worker) justo antes de usarla; si falla sin haber recibido nada se
+        # reintenta una vez con otra conexión, solo en métodos idempotentes y
+        # si el cuerpo no se leyó de un stream (no se puede volver a enviar)
+        retry = (fcgi_params['REQUEST_METHOD'] in self.IDEMPOTENT_METHODS
+                 and isinstance(post_data, (bytes, bytearray)))
+        
+        for attempt in range(2):
+            connection = await self.pool.acquire(self.timeout)
+            reused = connection.uses > 0
+            try:
+                records = RecordReader(connection.reader, self.timeout)
+                await self._send_request(connection.writer, req_id, fcgi_params, post_data,
+                                         keep_conn=True)
+                header = await records.read_header()
+            except (asyncio.IncompleteReadError, ConnectionError):
+                self.pool.release(connection, False)
+                if retry and reused and attempt == 0:
+                    continue
+                raise
+            except BaseException:
+                self.pool.release(connection, False)
+                raise
+            
+            return FastCGIStream(
+                records, header,
+                lambda reusable, connection=connection: self.pool.release(connection, reusable)
+            )
+    
+    async def _open_unpooled(self, fcgi_params: Dict[str, str], post_data) -> FastCGIStream:
+        """Un request por conexión (sin pool): el socket se cierra con el stream"""
+        reader, writer = await asyncio.wait_for(
+            asyncio.open_unix_connection(self.socket_path),
+            timeout=self.timeout
+        )
+        records = RecordReader(reader, self.timeout)
+        try:
+            await self._send_request(writer, 1, fcgi_params, post_data, keep_conn=False)
+            header = await records.read_header()
+        except BaseException:
+            writer.close()
+            raise
+        return FastCGIStream(records, header, lambda reusable: writer.close())
+    
+    async def _get_multiplexer(self) -> Optional[FastCGIMultiplexer]:
+        """
+        Transporte multiplexado si el backend lo soporta
+        
+        La primera llamada consulta FCGI_GET_VALUES; los requests que llegan
+        mientras tanto esperan esa misma consulta. Si el backend no responde
+        se usa el pool y se vuelve a consultar pasados NEGOTIATION_RETRY segundos.
+        """
+        if not self.multiplex or self._negotiated or time.monotonic() < self._negotiate_after:
+            return self.multiplexer
+        if self._negotiation is None:
+            self._negotiation = asyncio.ensure_future(self._negotiate())
+        try:
+            await asyncio.shield(self._negotiation)
+        finally:
+            if self._negotiation is not None and self._negotiation.done():
+                self._negotiation = None
+        return self.multiplexer
+    
+    async def _negotiate(self) -> None:
+        """Consulta FCGI_MPXS_CONNS / FCGI_MAX_REQS y elige el transporte"""
+        try:
+            values = await self.get_values(('FCGI_MPXS_CONNS', 'FCGI_MAX_REQS'))
+        except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError) as e:
+            print(f"⚠️  No se pudo consultar FCGI_GET_VALUES en {self.socket_path}: {e}")
+            self._negotiate_after = time.monotonic() + self.NEGOTIATION_RETRY
+            return
+        
+        self._negotiated = True
+        if values.get('FCGI_MPXS_CONNS') != '1':
+            print(f"ℹ️  {self.socket_path} no multiplexa conexiones: se usa el pool")
+            return
+        
+        max_requests = self.multiplex_max_requests
+        try:
+            max_requests = max(1, min(int(values.get('FCGI_MAX_REQS') or max_requests), max_requests))
+        except ValueError:
+            pass
+        self.multiplexer = FastCGIMultiplexer(self.socket_path, self.timeout, max_requests)
+        print(f"🔀 {self.socket_path} multiplexa conexiones ({max_requests} requests por conexión)")
+    
+    async def get_values(self, names: Tuple[str, ...]) -> Dict[str, str]:
+        """
+        Consulta variables de gestión con FCGI_GET_VALUES
+        
+        Usa una conexión propia: PHP-FPM la cierra después de responder.
+        
+        Returns:
+            Variables que el backend conoce (vacío si no soporta el registro)
+        """
+        reader, writer = await asyncio.wait_for(
+            asyncio.open_unix_connection(self.socket_path),
+            timeout=self.timeout
+        )
+        try:
+            query = encode_params({name: '' for name in names})
+            writer.write(encode_record(self.FCGI_GET_VALUES, 0, query))
+            await asyncio.wait_for(writer.drain(), timeout=self.timeout)
+            
+            records = RecordReader(reader, self.timeout)
+            while True:
+                req_type, req_id, content = await records.read()
+                if req_type == self.FCGI_GET_VALUES_RESULT:
+                    return decode_params(content)
+                if req_type == self.FCGI_UNKNOWN_TYPE:
+                    return {}
+        finally:
+            writer.close()
+    
+    def _encode_head(self, req_id: int, fcgi_params: Dict[str, str], keep_conn: bool) -> bytes:
+        """Registros BEGIN_REQUEST y PARAMS de un request"""
+        # 1. BEGIN_REQUEST (con KEEP_CONN PHP-FPM no cierra al terminar)
+        flags = self.FCGI_KEEP_CONN if keep_conn else 0
+        begin_request = struct.pack('!HB5x', self.FCGI_RESPONDER, flags)
+        
+        # 2. PARAMS, con el registro vacío que indica fin de parámetros
+        return b''.join((
+            encode_record(self.FCGI_BEGIN_REQUEST, req_id, begin_request),
+            encode_stream(self.FCGI_PARAMS, req_id, encode_params(fcgi_params), terminate=True),
+        ))
+    
+    def _encode_request(self, req_id: int, fcgi_params: Dict[str, str],
+                        post_data: bytes, keep_conn: bool) -> bytes:
+        """Registros BEGIN_REQUEST, PARAMS y STDIN de un request con el cuerpo en memoria"""
+        # 3. STDIN (datos POST) y STDIN vacío para indicar fin de datos
+        return b''.join((
+            self._encode_head(req_id, fcgi_params, keep_conn),
+            encode_stream(self.FCGI_STDIN, req_id, post_data, terminate=True),
+        ))
+    
+    async def _send_request(self, writer: asyncio.StreamWriter, req_id: int,
+                            fcgi_params: Dict[str, str], post_data, keep_conn: bool) -> None:
+        """
+        Envía BEGIN_REQUEST, PARAMS y STDIN
+        
+        Un cuerpo que llega como reader se copia de a un registro por vez,
+        esperando que PHP-FPM lo consuma (drain) antes de leer el siguiente:
+        la memoria usada no depende del tamaño del upload.
+        """
+        if isinstance(post_data, (bytes, bytearray)):
+            writer.write(self._encode_request(req_id, fcgi_params, post_data, keep_conn))
+            await asyncio.wait_for(writer.drain(), timeout=self.timeout)
+            return
+        
+        writer.write(self._encode_head(req_id, fcgi_params, keep_conn))
+        remaining = int(fcgi_params['CONTENT_LENGTH'])
+        while remaining > 0:
+            data = await asyncio.wait_for(
+                post_data.read(min(remaining, self.FCGI_MAX_CONTENT)), timeout=self.timeout
+            )
+            if not data:
+                raise ConnectionResetError("El cliente cerró la conexión antes de enviar el cuerpo completo")
+            remaining -= len(data)
+            writer.write(encode_record(self.FCGI_STDIN, req_id, data))
+            await asyncio.wait_for(writer.drain(), timeout=self.timeout)
+        
+        # STDIN vacío para indicar fin de datos
+        writer.write(encode_record(self.FCGI_STDIN, req_id))
+        await asyncio.wait_for(writer.drain(), timeout=self.timeout)
+    
+    def get_stats(self) -> Dict:
+        """Transporte en uso y sus contadores"""
+        if self.multiplexer is not None:
+            mode = 'multiplexed'
+        elif self.pool is not None:
+            mode = 'pooled'
+        else:
+            mode = 'single'
+        return {
+            'mode': mode,
+            'pool': self.pool.get_stats() if self.pool is not None else None,
+            'multiplexer': self.multiplexer.get_stats() if self.multiplexer is not None else None,
+        }
+    
+    async def close(self):
+        """Cierra las conexiones persistentes (pool y multiplexada)"""
+        if self.multiplexer is not None:
+            await self.multiplexer.close()
+        if self.pool is not None:
+            await self.pool.close()
+    
     async def test_connection(self) -> bool:
         """Prueba la conexión con PHP-FPM"""
         try:
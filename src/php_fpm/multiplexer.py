@@ -0,0 +1,268 @@
+"""
+Transporte FastCGI multiplexado
+Varios requests concurrentes sobre una conexión, con request IDs reales y un
+lector que reparte los registros de respuesta a cada request
+"""
+
+import asyncio
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional, Tuple
+
+from .fastcgi_codec import RecordReader, encode_record
+
+# Tipos de registro que enruta el lector
+FCGI_END_REQUEST = 3
+FCGI_STDOUT = 6
+FCGI_STDERR = 7
+FCGI_ABORT_REQUEST = 2
+
+
+class _PendingRequest:
+    """Request en curso: fragmentos de STDOUT recibidos y STDERR acumulado"""
+
+    __slots__ = ('chunks', 'stderr', 'aborted')
+
+    def __init__(self):
+        # Fragmentos de STDOUT; None al llegar END_REQUEST, o la excepción si se cayó la conexión
+        self.chunks: asyncio.Queue = asyncio.Queue()
+        self.stderr: List[memoryview] = []
+        self.aborted = False
+
+
+class MultiplexedStream:
+    """
+    Salida de un request multiplexado, fragmento por fragmento
+
+    El lector de la conexión no se puede frenar por un solo request, así que
+    los fragmentos que el consumidor todavía no leyó quedan en memoria.
+    """
+
+    def __init__(self, multiplexer: 'FastCGIMultiplexer', req_id: int, pending: _PendingRequest):
+        self._multiplexer = multiplexer
+        self._req_id = req_id
+        self._pending = pending
+        self.finished = False
+
+    @property
+    def stderr(self) -> bytes:
+        return b''.join(self._pending.stderr)
+
+    async def read(self):
+        """
+        Próximo fragmento de STDOUT como memoryview (vacío al terminar el request)
+
+        Raises:
+            asyncio.TimeoutError: si el backend no envió nada a tiempo
+            ConnectionError: si la conexión se cerró durante el request
+        """
+        if self.finished:
+            return b''
+        try:
+            chunk = await asyncio.wait_for(self._pending.chunks.get(), timeout=self._multiplexer.timeout)
+        except asyncio.TimeoutError:
+            self.close()
+            raise
+        if chunk is None:
+            self.finished = True
+            return b''
+        if isinstance(chunk, Exception):
+            self.finished = True
+            raise chunk
+        return chunk
+
+    def close(self) -> None:
+        """Libera el request; si no terminó se aborta en el backend"""
+        if not self.finished:
+            self.finished = True
+            self._multiplexer._abort(self._req_id, self._pending)
+
+
+class FastCGIMultiplexer:
+    """
+    Conexión FastCGI compartida por varios requests simultáneos
+
+    Solo debe usarse con backends que responden FCGI_MPXS_CONNS=1 a
+    FCGI_GET_VALUES (PHP-FPM responde 0: ahí se usa el pool). Cada request
+    toma un ID libre entre 1 y max_requests; si no hay, espera. Un request
+    que vence su timeout o se cierra sin terminar envía FCGI_ABORT_REQUEST y
+    su ID queda reservado hasta que llegue el END_REQUEST. Si la conexión se cae fallan todos los
+    requests en curso y el próximo la vuelve a abrir.
+    """
+
+    def __init__(self, socket_path: str, timeout: float = 30, max_requests: int = 32):
+        """
+        Args:
+            socket_path: Socket Unix del backend FastCGI
+            timeout: Segundos por request
+            max_requests: Requests simultáneos sobre la conexión (FCGI_MAX_REQS)
+        """
+        self.socket_path = socket_path
+        self.timeout = timeout
+        self.max_requests = max_requests
+
+        self._writer: Optional[asyncio.StreamWriter] = None
+        self._reader_task: Optional[asyncio.Task] = None
+        self._connect_lock: Optional[asyncio.Lock] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._free_ids: Deque[int] = deque(range(1, max_requests + 1))
+        self._pending: Dict[int, _PendingRequest] = {}
+
+        self.requests = 0
+        self.connects = 0
+        self.aborts = 0
+        self.connection_errors = 0
+        self.max_in_flight = 0
+        self.wait_seconds = 0.0
+
+    async def open(self, send: Callable[[int, asyncio.StreamWriter], Awaitable[None]]) -> MultiplexedStream:
+        """
+        Inicia un request sobre la conexión compartida
+
+        Args:
+            send: Recibe el request ID asignado y el writer, y escribe los
+                registros BEGIN_REQUEST/PARAMS/STDIN (con FCGI_KEEP_CONN). Los
+                registros de requests distintos pueden intercalarse.
+
+        Returns:
+            Stream con la salida; hay que cerrarlo aunque no se lea completa
+
+        Raises:
+            asyncio.TimeoutError: si no hubo ID libre a tiempo
+            ConnectionError: si no se pudo conectar
+        """
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_requests)
+        started = time.monotonic()
+        await asyncio.wait_for(self._slots.acquire(), timeout=self.timeout)
+        self.wait_seconds += time.monotonic() - started
+
+        try:
+            writer = await self._ensure_connected()
+        except BaseException:
+            self._slots.release()
+            raise
+
+        # El ID (y su lugar en el semáforo) se libera al llegar END_REQUEST
+        req_id = self._free_ids.popleft()
+        pending = _PendingRequest()
+        self._pending[req_id] = pending
+        self.requests += 1
+        self.max_in_flight = max(self.max_in_flight, len(self._pending))
+
+        stream = MultiplexedStream(self, req_id, pending)
+        try:
+            await send(req_id, writer)
+        except BaseException:
+            stream.close()
+            raise
+        return stream
+
+    async def execute(self, send: Callable[[int, asyncio.StreamWriter], Awaitable[None]]) -> Tuple[bytes, bytes]:
+        """
+        Ejecuta un request completo sobre la conexión compartida
+
+        Returns:
+            (stdout, stderr)
+        """
+        stream = await self.open(send)
+        try:
+            chunks = []
+            while True:
+                chunk = await stream.read()
+                if not chunk:
+                    return b''.join(chunks), stream.stderr
+                chunks.append(chunk)
+        finally:
+            stream.close()
+
+    async def close(self) -> None:
+        """Cierra la conexión y falla los requests en curso"""
+        if self._reader_task is not None:
+            self._reader_task.cancel()
+            self._reader_task = None
+        self._fail_all(ConnectionError('Transporte FastCGI cerrado'))
+
+    async def _ensure_connected(self) -> asyncio.StreamWriter:
+        """Abre la conexión compartida si no hay una activa"""
+        if self._writer is not None and not self._writer.is_closing():
+            return self._writer
+
+        if self._connect_lock is None:
+            self._connect_lock = asyncio.Lock()
+        async with self._connect_lock:
+            if self._writer is not None and not self._writer.is_closing():
+                return self._writer
+            try:
+                reader, writer = await asyncio.wait_for(
+                    asyncio.open_unix_connection(self.socket_path),
+                    timeout=self.timeout
+                )
+            except (OSError, asyncio.TimeoutError):
+                self.connection_errors += 1
+                raise
+            self.connects += 1
+            self._writer = writer
+            self._reader_task = asyncio.ensure_future(self._read_loop(reader, writer))
+            return writer
+
+    async def _read_loop(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        """Reparte STDOUT/STDERR/END_REQUEST a los requests según su ID"""
+        records = RecordReader(reader)
+        try:
+            while True:
+                req_type, req_id, content = await records.read()
+
+                pending = self._pending.get(req_id)
+                if pending is None:
+                    continue
+                if req_type == FCGI_STDOUT:
+                    if content and not pending.aborted:
+                        pending.chunks.put_nowait(content)
+                elif req_type == FCGI_STDERR:
+                    if content and not pending.aborted:
+                        pending.stderr.append(content)
+                elif req_type == FCGI_END_REQUEST:
+                    del self._pending[req_id]
+                    self._release_id(req_id)
+                    pending.chunks.put_nowait(None)
+        except (asyncio.IncompleteReadError, OSError) as e:
+            if writer is self._writer:
+                self.connection_errors += 1
+                self._fail_all(ConnectionError(f'Conexión FastCGI cerrada: {e}'))
+
+    def _abort(self, req_id: int, pending: _PendingRequest) -> None:
+        """Pide al backend que abandone un request vencido o cancelado"""
+        pending.aborted = True
+        self.aborts += 1
+        if self._writer is not None and not self._writer.is_closing() and req_id in self._pending:
+            self._writer.write(encode_record(FCGI_ABORT_REQUEST, req_id))
+
+    def _release_id(self, req_id: int) -> None:
+        self._free_ids.append(req_id)
+        if self._slots is not None:
+            self._slots.release()
+
+    def _fail_all(self, error: Exception) -> None:
+        """Cierra la conexión actual y falla (liberando sus IDs) todos los requests en curso"""
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+        pending, self._pending = self._pending, {}
+        for req_id, request in pending.items():
+            self._release_id(req_id)
+            request.chunks.put_nowait(error)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Retorna contadores para el dashboard"""
+        return {
+            'connected': self._writer is not None and not self._writer.is_closing(),
+            'in_flight': len(self._pending),
+            'max_in_flight': self.max_in_flight,
+            'max_requests': self.max_requests,
+            'requests': self.requests,
+            'connects': self.connects,
+            'aborts': self.aborts,
+            'connection_errors': self.connection_errors,
+            'avg_wait_ms': round(self.wait_seconds / self.requests * 1000, 3) if self.requests else 0.0,
+        }
@@ -3,14 +3,42 @@ from pathlib import Path
 from typing import Dict, Optional, Tuple
 from urllib.parse import parse_qs
 
+from .connection_pool import FastCGIConnectionPool
 from .fastcgi_client import FastCGIClient
 from config.config_manager import config
+from utils.io_executor import io_executor
+
+
+class PHPOutput:
+    """
+    Respuesta de un script PHP
+
+    Si stream es None la salida ya terminó y body es el contenido completo;
+    si no, body es lo recibido hasta ahora y el resto se lee de stream.
+    """
+
+    __slots__ = ('status', 'headers', 'body', 'stream')
+
+    def __init__(self, status: int, headers: Dict[str, str], body: bytes, stream=None):
+        self.status = status
+        self.headers = headers
+        self.body = body
+        self.stream = stream
+
 
 class PHPManager:
     """Gestor de PHP-FPM para diferentes versiones"""
     
+    # Bytes sin fin de headers CGI tras los cuales la salida se trata como cuerpo
+    HEADER_LIMIT = 65536
+    
     def __init__(self):
         self.clients: Dict[str, FastCGIClient] = {}
+        # Salida que se acumula antes de transmitir (0 = transmitir siempre)
+        self.stream_threshold = config.get('php_stream_threshold', 65536)
+        # Cuerpo máximo de un request (0 = sin límite); el virtual host puede
+        # indicar el suyo con max_body_size
+        self.max_body_size = config.get('php_max_body_size', 1048576)
         self._init_php_clients()
     
     def _init_php_clients(self):
@@ -24,10 +52,25 @@ class PHPManager:
         }
         
         timeout = config.get('php_fpm_timeout', 30)
+        pool_max_size = config.get('php_fpm_pool_max_size', 8)
         
         for version, socket_path in php_versions.items():
             if socket_path and os.path.exists(socket_path):
-                self.clients[version] = FastCGIClient(socket_path, timeout)
+                # Conexiones persistentes por socket (0 = una conexión por request)
+                pool = None
+                if pool_max_size > 0:
+                    pool = FastCGIConnectionPool(
+                        socket_path,
+                        min_size=config.get('php_fpm_pool_min_size', 0),
+                        max_size=pool_max_size,
+                        idle_timeout=config.get('php_fpm_pool_idle_timeout', 10.0),
+                        connect_timeout=timeout
+                    )
+                self.clients[version] = FastCGIClient(
+                    socket_path, timeout, pool,
+                    multiplex=config.get('php_fpm_multiplex', True),
+                    multiplex_max_requests=config.get('php_fpm_multiplex_max_requests', 32)
+                )
                 print(f"✅ PHP {version} disponible: {socket_path}")
             else:
                 print(f"⚠️  PHP {version} no disponible: {socket_path}")
@@ -40,6 +83,15 @@ class PHPManager:
         """Obtiene las versiones de PHP disponibles"""
         return list(self.clients.keys())
     
+    def get_transport_stats(self) -> Dict[str, Dict]:
+        """Transporte (multiplexado, pool o simple) y contadores por versión de PHP"""
+        return {version: client.get_stats() for version, client in self.clients.items()}
+    
+    async def close_connections(self):
+        """Cierra las conexiones persistentes a PHP-FPM"""
+        for client in self.clients.values():
+            await client.close()
+    
     async def test_all_connections(self) -> Dict[str, bool]:
         """Prueba todas las conexiones PHP-FPM"""
         results = {}
@@ -105,9 +157,17 @@ class PHPManager:
         except ValueError:
             return False
 
+    @staticmethod
+    def _check_script(file_path: Path, document_root: str) -> Tuple[bool, str]:
+        """Existencia del script y document_root resuelto (I/O bloqueante, corre en el executor)"""
+        return file_path.exists(), str(Path(document_root).resolve())
+
     def _build_fcgi_params(self, request, vhost: Dict, script_path: str,
-                          query_string: str = '') -> Dict[str, str]:
-        """Construye parámetros FastCGI desde el request HTTP"""
+                          query_string: str = '', document_root: Optional[str] = None) -> Dict[str, str]:
+        """Construye parámetros FastCGI desde el request HTTP
+
+        document_root es el del virtual host ya resuelto (ver _check_script)
+        """
         
         # Headers HTTP como variables CGI
         params = {}
@@ -151,7 +211,7 @@ class PHPManager:
             'GATEWAY_INTERFACE': 'CGI/1.1',
             'SERVER_PROTOCOL': 'HTTP/1.1',
             'REDIRECT_STATUS': '200',
-            'DOCUMENT_ROOT': str(Path(vhost['document_root']).resolve()),
+            'DOCUMENT_ROOT': document_root or vhost['document_root'],
         })
 
         # Agregar HTTPS si es conexión segura
@@ -161,24 +221,48 @@ class PHPManager:
         return params
     
     async def execute_php_file(self, request, vhost: Dict, file_path: Path, query_string: str = '') -> Tuple[int, Dict[str, str], bytes]:
-        """Ejecuta un archivo PHP y retorna status, headers y contenido
+        """Ejecuta un archivo PHP y retorna status, headers y contenido completo"""
+        output = await self.start_php_file(request, vhost, file_path, query_string, stream_threshold=None)
+        return output.status, output.headers, output.body
+    
+    async def start_php_file(self, request, vhost: Dict, file_path: Path, query_string: str = '',
+                             stream_threshold: Optional[int] = -1) -> PHPOutput:
+        """Ejecuta un archivo PHP y retorna su respuesta apenas se sabe cómo enviarla
+
+        Los headers CGI se parsean de los primeros registros STDOUT. Si la
+        salida termina antes de acumular stream_threshold bytes de cuerpo se
+        retorna completa; si no (o si el script envía X-Accel-Buffering: no)
+        se retorna con el stream abierto y el resto se lee con read_stream().
 
         Args:
             request: Request HTTP
             vhost: Configuración del virtual host
             file_path: Ruta del archivo PHP
             query_string: Query string (puede venir del rewrite engine)
+            stream_threshold: Bytes de cuerpo antes de transmitir (-1: valor
+                configurado, None: nunca transmitir)
         """
 
         php_version = vhost.get('php_version', '8.3')
         client = self.get_client(php_version)
 
         if not client:
-            return 500, {'content-type': 'text/plain'}, b'PHP version not available'
+            return PHPOutput(500, {'content-type': 'text/plain'}, b'PHP version not available')
 
-        if not file_path.exists():
-            return 404, {'content-type': 'text/plain'}, b'PHP file not found'
+        # exists y resolve pueden bloquear (ej: NFS): un único salto al executor de I/O
+        found, document_root = await io_executor.run(
+            vhost['document_root'], self._check_script, file_path, vhost['document_root']
+        )
+        if not found:
+            return PHPOutput(404, {'content-type': 'text/plain'}, b'PHP file not found')
 
+        if stream_threshold == -1:
+            stream_threshold = self.stream_threshold
+        # Un HEAD no lleva cuerpo: siempre se responde con la salida completa
+        if request.method == 'HEAD':
+            stream_threshold = None
+
+        stream = None
         try:
             # Si no se proporciona query_string, extraerlo del request
             if not query_string:
@@ -187,44 +271,125 @@ class PHPManager:
             # Asegurar que query_string nunca sea None
             
             # Construir parámetros FastCGI
-            fcgi_params = self._build_fcgi_params(request, vhost, str(file_path), query_string)
+            fcgi_params = self._build_fcgi_params(request, vhost, str(file_path), query_string, document_root)
             
-            # Leer datos POST si existen
+            # Cuerpo del request: se pasa a PHP-FPM a medida que llega
             post_data = b''
+            content_length = None
             if request.method in ['POST', 'PUT', 'PATCH']:
                 if request.can_read_body:
-                    post_data = await request.read()
+                    max_body_size = vhost.get('max_body_size', self.max_body_size)
+                    content_length = request.content_length
+                    if content_length is None:
+                        # Chunked: PHP necesita CONTENT_LENGTH, así que se lee
+                        # completo (hasta el límite) antes de ejecutar el script
+                        post_data = await self._read_body(request.content, max_body_size)
+                    elif not max_body_size or content_length <= max_body_size:
+                        post_data = request.content
+                    else:
+                        post_data = None
+                    
+                    if post_data is None:
+                        # Rechazar antes de recibir el cuerpo y sin ocupar un worker
+                        return PHPOutput(413, {'content-type': 'text/plain'}, b'Request Entity Too Large')
             
             # Ejecutar PHP
-            stdout_data, stderr_data = await client.execute_php(
+            stream = await client.open_php(
                 str(file_path), 
                 fcgi_params, 
-                post_data
+                post_data,
+                content_length
             )
             
-            if stderr_data:
-                print(f"PHP stderr: {stderr_data.decode('utf-8', errors='ignore')}")
-            
-            # Parsear respuesta
-            headers, content = self._parse_headers(stdout_data)
+            buffer = bytearray()
+            headers = None
+            while True:
+                chunk = await stream.read()
+                if not chunk:
+                    break
+                buffer += chunk
+                
+                if headers is None:
+                    # Esperar el fin de los headers CGI (pueden venir en varios registros)
+                    if (b'\r\n\r\n' not in buffer and b'\n\n' not in buffer
+                            and len(buffer) < self.HEADER_LIMIT):
+                        continue
+                    headers, content = self._parse_headers(bytes(buffer))
+                    buffer = bytearray(content)
+                    if headers.get('x-accel-buffering', '').lower() == 'no' and stream_threshold is not None:
+                        stream_threshold = 0
+                
+                if stream_threshold is not None and len(buffer) >= stream_threshold:
+                    # Salida grande: el resto se transmite a medida que llega
+                    return PHPOutput(*self._response_meta(headers), bytes(buffer), stream)
             
-            # Status code (por defecto 200)
-            status = 200
-            if 'status' in headers:
-                try:
-                    status = int(headers['status'].split()[0])
-                except:
-                    status = 200
+            stream.close()
+            self._log_stderr(stream)
             
-            # Content-Type por defecto
-            if 'content-type' not in headers:
-                headers['content-type'] = 'text/html; charset=UTF-8'
+            # Parsear respuesta
+            if headers is None:
+                headers, content = self._parse_headers(bytes(buffer))
+            else:
+                content = bytes(buffer)
             
-            return status, headers, content
+            return PHPOutput(*self._response_meta(headers), content)
             
         except Exception as e:
+            if stream is not None:
+                stream.close()
             print(f"Error ejecutando PHP: {e}")
-            return 500, {'content-type': 'text/plain'}, f'PHP execution error: {str(e)}'.encode()
+            return PHPOutput(500, {'content-type': 'text/plain'}, f'PHP execution error: {str(e)}'.encode())
+    
+    async def _read_body(self, content, max_body_size: int) -> Optional[bytes]:
+        """Lee un cuerpo sin Content-Length (None si supera max_body_size)"""
+        body = bytearray()
+        while True:
+            chunk = await content.readany()
+            if not chunk:
+                return bytes(body)
+            body += chunk
+            if max_body_size and len(body) > max_body_size:
+                return None
+    
+    async def read_stream(self, output: PHPOutput) -> bytes:
+        """Próximo fragmento de una salida transmitida (b'' al terminar)
+
+        Raises:
+            asyncio.TimeoutError, ConnectionError: si PHP-FPM dejó de responder
+                o cerró la conexión a mitad de la salida
+        """
+        chunk = await output.stream.read()
+        if not chunk:
+            self.finish_stream(output)
+        return chunk
+    
+    def finish_stream(self, output: PHPOutput) -> None:
+        """Libera la conexión de una salida transmitida (la aborta si no terminó)"""
+        if output.stream is not None:
+            output.stream.close()
+            self._log_stderr(output.stream)
+            output.stream = None
+    
+    def _log_stderr(self, stream) -> None:
+        stderr_data = stream.stderr
+        if stderr_data:
+            print(f"PHP stderr: {stderr_data.decode('utf-8', errors='ignore')}")
+    
+    def _response_meta(self, headers: Dict[str, str]) -> Tuple[int, Dict[str, str]]:
+        """Status y headers finales de la respuesta PHP"""
+        # Status code (por defecto 200)
+        status = 200
+        if 'status' in headers:
+            try:
+                status = int(headers['status'].split()[0])
+            except:
+                status = 200
+        
+        # Content-Type por defecto
+        if 'content-type' not in headers:
+            headers['content-type'] = 'text/html; charset=UTF-8'
+        
+        return status, headers
 
 # Instancia global del gestor PHP
 php_manager = PHPManager()
@@ -5,13 +5,31 @@ Proporciona soporte para reescritura de URLs basada en configuración YAML
 
 from .rewrite_engine import RewriteEngine
 from .rewrite_rule import RewriteRule
-from .conditions import Condition, FileNotExistsCondition, DirNotExistsCondition
+from .result import RewriteResult
+from .conditions import (
+    Condition, FilesystemCondition, FileNotExistsCondition, DirNotExistsCondition,
+    RequestCondition, HostCondition, MethodCondition, HeaderCondition, QueryCondition,
+    ClientIPCondition, CookieCondition
+)
+from .context import RequestContext
+from .instrumentation import RuleStats
 
 __all__ = [
     'RewriteEngine',
     'RewriteRule',
+    'RewriteResult',
     'Condition',
+    'FilesystemCondition',
     'FileNotExistsCondition',
     'DirNotExistsCondition',
+    'RequestCondition',
+    'HostCondition',
+    'MethodCondition',
+    'HeaderCondition',
+    'QueryCondition',
+    'ClientIPCondition',
+    'CookieCondition',
+    'RequestContext',
+    'RuleStats',
 ]
 
@@ -3,21 +3,46 @@ Condiciones para reglas de rewrite
 Implementa las condiciones que deben cumplirse para aplicar una regla
 """
 
-from pathlib import Path
+import ipaddress
+import os
+import re
 from abc import ABC, abstractmethod
+from typing import Hashable, Iterable, Optional, Tuple, Union
+
+from utils.docroot_manifest import DIR, FILE, ManifestRegistry, docroot_manifests
+from utils.file_metadata import FileMetadataCache, file_metadata
+from .context import EMPTY_CONTEXT, RequestContext
+
+
+# Costos relativos: las reglas evalúan sus condiciones de menor a mayor costo
+COST_ATTRIBUTE = 1      # comparación de un atributo del request
+COST_REGEX = 2          # regex sobre un header o el query string
+COST_NETWORK = 3        # parseo de IP y pertenencia a redes
+COST_FILESYSTEM = 10    # stat (aunque esté cacheado puede requerir I/O)
 
 
 class Condition(ABC):
     """Clase base para todas las condiciones de rewrite"""
     
+    # Orden de evaluación dentro de una regla (menor primero)
+    cost = COST_ATTRIBUTE
+    
+    # Si es True el resultado depende del disco y la memo lo registra como hecho
+    uses_filesystem = False
+    
+    # Si es True el resultado depende del RequestContext
+    uses_context = False
+    
     @abstractmethod
-    def evaluate(self, request_path: str, document_root: str) -> bool:
+    def evaluate(self, request_path: str, document_root: str,
+                 context: Optional[RequestContext] = None) -> bool:
         """
         Evalúa si la condición se cumple
         
         Args:
             request_path: Ruta del request (ej: /usuarios/123)
             document_root: Raíz del documento del virtual host
+            context: Datos del request (host, método, headers...)
             
         Returns:
             True si la condición se cumple, False en caso contrario
@@ -25,10 +50,59 @@ class Condition(ABC):
         pass
 
 
-class FileNotExistsCondition(Condition):
+class FilesystemCondition(Condition):
+    """
+    Base de las condiciones que consultan el filesystem
+
+    Resuelve la ruta dentro del document_root usando la cache de metadatos
+    compartida, de modo que file_not_exists, dir_not_exists y la resolución
+    de la ruta estática hacen como mucho un stat por ruta por ventana de TTL.
+    Si el document_root tiene manifiesto en memoria se responde sin syscalls.
+    """
+    
+    cost = COST_FILESYSTEM
+    uses_filesystem = True
+
+    def __init__(self, metadata: Optional[FileMetadataCache] = None,
+                 manifests: Optional[ManifestRegistry] = None):
+        """
+        Args:
+            metadata: Cache de metadatos (por defecto la instancia global)
+            manifests: Manifiestos de document_root (por defecto los globales)
+        """
+        self.metadata = metadata if metadata is not None else file_metadata
+        self.manifests = manifests if manifests is not None else docroot_manifests
+    
+    def _manifest_kind(self, request_path: str, document_root: str) -> Optional[str]:
+        """FILE, DIR o ABSENT según el manifiesto (None: consultar al filesystem)"""
+        entry = self.manifests.lookup(document_root, request_path)
+        return entry.kind if entry is not None else None
+
+    def _resolve(self, request_path: str, document_root: str) -> Optional[str]:
+        """
+        Resuelve la ruta del request dentro del document_root
+
+        Returns:
+            Ruta absoluta resuelta, o None si queda fuera del document_root
+        """
+        self.manifests.filesystem_access(request_path)
+
+        # Limpiar la ruta y resolver para evitar path traversal
+        clean_path = request_path.lstrip('/')
+        resolved = self.metadata.realpath(os.path.join(document_root, clean_path))
+        document_root_resolved = self.metadata.realpath(document_root)
+
+        # Verificar que está dentro del document_root
+        if not resolved.startswith(document_root_resolved):
+            return None
+        return resolved
+
+
+class FileNotExistsCondition(FilesystemCondition):
     """Condición: el archivo NO existe en el filesystem"""
     
-    def evaluate(self, request_path: str, document_root: str) -> bool:
+    def evaluate(self, request_path: str, document_root: str,
+                 context: Optional[RequestContext] = None) -> bool:
         """
         Verifica que el archivo NO existe
         
@@ -39,31 +113,26 @@ class FileNotExistsCondition(Condition):
         Returns:
             True si el archivo NO existe
         """
+        kind = self._manifest_kind(request_path, document_root)
+        if kind is not None:
+            return kind != FILE
+        
         try:
-            # Limpiar la ruta
-            clean_path = request_path.lstrip('/')
-            
-            # Construir ruta completa
-            file_path = Path(document_root) / clean_path
-            
-            # Resolver para evitar path traversal
-            file_path = file_path.resolve()
-            document_root_resolved = Path(document_root).resolve()
-            
-            # Verificar que está dentro del document_root
-            if not str(file_path).startswith(str(document_root_resolved)):
+            file_path = self._resolve(request_path, document_root)
+            if file_path is None:
                 return True  # Si está fuera, consideramos que "no existe"
             
             # Retornar True si NO es un archivo
-            return not file_path.is_file()
+            return not self.metadata.is_file(file_path)
         except (OSError, ValueError):
             return True  # Si hay error, consideramos que no existe
 
 
-class DirNotExistsCondition(Condition):
+class DirNotExistsCondition(FilesystemCondition):
     """Condición: el directorio NO existe en el filesystem"""
     
-    def evaluate(self, request_path: str, document_root: str) -> bool:
+    def evaluate(self, request_path: str, document_root: str,
+                 context: Optional[RequestContext] = None) -> bool:
         """
         Verifica que el directorio NO existe
         
@@ -74,23 +143,207 @@ class DirNotExistsCondition(Condition):
         Returns:
             True si el directorio NO existe
         """
+        kind = self._manifest_kind(request_path, document_root)
+        if kind is not None:
+            return kind != DIR
+        
         try:
-            # Limpiar la ruta
-            clean_path = request_path.lstrip('/')
-            
-            # Construir ruta completa
-            dir_path = Path(document_root) / clean_path
-            
-            # Resolver para evitar path traversal
-            dir_path = dir_path.resolve()
-            document_root_resolved = Path(document_root).resolve()
-            
-            # Verificar que está dentro del document_root
-            if not str(dir_path).startswith(str(document_root_resolved)):
+            dir_path = self._resolve(request_path, document_root)
+            if dir_path is None:
                 return True  # Si está fuera, consideramos que "no existe"
             
             # Retornar True si NO es un directorio
-            return not dir_path.is_dir()
+            return not self.metadata.is_dir(dir_path)
         except (OSError, ValueError):
             return True  # Si hay error, consideramos que no existe
 
+
+class RequestCondition(Condition):
+    """
+    Base de las condiciones sobre atributos del request (sin I/O)
+
+    Con negate=True la condición se cumple cuando el test falla (como el !
+    de RewriteCond en Apache). Sin contexto se evalúa contra un request
+    vacío.
+
+    reads identifica el atributo del request que consulta el test y read lo
+    lee sin evaluar la condición: la memo de rewrite usa esos valores como
+    clave, así que las condiciones solo se evalúan en las reglas candidatas.
+    """
+    
+    uses_context = True
+    
+    def __init__(self, negate: bool = False):
+        """
+        Args:
+            negate: Invierte el resultado
+        """
+        self.negate = negate
+    
+    def evaluate(self, request_path: str, document_root: str,
+                 context: Optional[RequestContext] = None) -> bool:
+        return self.test(context if context is not None else EMPTY_CONTEXT) != self.negate
+    
+    @abstractmethod
+    def test(self, context: RequestContext) -> bool:
+        """Verifica el atributo del request (antes de aplicar negate)"""
+        pass
+    
+    @property
+    @abstractmethod
+    def reads(self) -> Tuple[str, ...]:
+        """Atributo que consulta (condiciones con el mismo reads comparten valor)"""
+        pass
+    
+    @abstractmethod
+    def read(self, context: RequestContext) -> Hashable:
+        """Valor crudo del atributo, para la clave de la memo"""
+        pass
+
+
+def _compile(pattern: str, flags: int = 0) -> re.Pattern:
+    """Compila la regex de una condición"""
+    try:
+        return re.compile(pattern, flags)
+    except re.error as e:
+        raise ValueError(f"Regex de condición inválida: {pattern}. Error: {e}")
+
+
+def _as_list(values: Union[str, Iterable[str], None]) -> list:
+    """Acepta un valor o una lista de valores"""
+    if values is None:
+        return []
+    if isinstance(values, str):
+        return [values]
+    return list(values)
+
+
+class HostCondition(RequestCondition):
+    """Condición: el Host del request coincide con una regex (sin distinguir mayúsculas)"""
+    
+    def __init__(self, pattern: str, negate: bool = False):
+        super().__init__(negate)
+        self.pattern = _compile(pattern, re.IGNORECASE)
+    
+    def test(self, context: RequestContext) -> bool:
+        return self.pattern.search(context.host) is not None
+    
+    reads = ('host',)
+    
+    def read(self, context: RequestContext) -> Hashable:
+        return context.host
+
+
+class MethodCondition(RequestCondition):
+    """Condición: el método HTTP es uno de los indicados"""
+    
+    def __init__(self, methods: Union[str, Iterable[str]], negate: bool = False):
+        super().__init__(negate)
+        self.methods = frozenset(method.upper() for method in _as_list(methods))
+        if not self.methods:
+            raise ValueError("La condición method requiere al menos un método")
+    
+    def test(self, context: RequestContext) -> bool:
+        return context.method in self.methods
+    
+    reads = ('method',)
+    
+    def read(self, context: RequestContext) -> Hashable:
+        return context.method
+
+
+class HeaderCondition(RequestCondition):
+    """Condición: un header está presente y, si se indica, coincide con una regex"""
+    
+    cost = COST_REGEX
+    
+    def __init__(self, name: str, pattern: Optional[str] = None, negate: bool = False):
+        super().__init__(negate)
+        if not name:
+            raise ValueError("La condición header requiere 'name'")
+        self.name = name
+        self.pattern = _compile(pattern) if pattern else None
+    
+    def test(self, context: RequestContext) -> bool:
+        value = context.header(self.name)
+        if value is None:
+            return False
+        return self.pattern is None or self.pattern.search(value) is not None
+    
+    @property
+    def reads(self) -> Tuple[str, ...]:
+        return 'header', self.name.lower()
+    
+    def read(self, context: RequestContext) -> Hashable:
+        return context.header(self.name)
+
+
+class QueryCondition(RequestCondition):
+    """Condición: el query string original del request coincide con una regex"""
+    
+    cost = COST_REGEX
+    
+    def __init__(self, pattern: str, negate: bool = False):
+        super().__init__(negate)
+        self.pattern = _compile(pattern)
+    
+    def test(self, context: RequestContext) -> bool:
+        return self.pattern.search(context.query_string) is not None
+    
+    reads = ('query',)
+    
+    def read(self, context: RequestContext) -> Hashable:
+        return context.query_string
+
+
+class ClientIPCondition(RequestCondition):
+    """Condición: la IP del cliente pertenece a alguna de las redes (CIDR)"""
+    
+    cost = COST_NETWORK
+    
+    def __init__(self, networks: Union[str, Iterable[str]], negate: bool = False):
+        super().__init__(negate)
+        try:
+            self.networks = tuple(ipaddress.ip_network(network, strict=False)
+                                  for network in _as_list(networks))
+        except ValueError as e:
+            raise ValueError(f"Red inválida en la condición client_ip: {e}")
+        if not self.networks:
+            raise ValueError("La condición client_ip requiere al menos una red")
+    
+    def test(self, context: RequestContext) -> bool:
+        try:
+            address = ipaddress.ip_address(context.client_ip)
+        except ValueError:
+            return False
+        return any(address in network for network in self.networks)
+    
+    @property
+    def reads(self) -> Tuple[str, ...]:
+        return ('client_ip',) + tuple(str(network) for network in self.networks)
+    
+    def read(self, context: RequestContext) -> Hashable:
+        # La IP cruda multiplicaría las entradas de la memo por cliente: se
+        # usa la pertenencia a las redes, que es lo único que distingue
+        return self.test(context)
+
+
+class CookieCondition(RequestCondition):
+    """Condición: el request trae la cookie indicada"""
+    
+    def __init__(self, name: str, negate: bool = False):
+        super().__init__(negate)
+        if not name:
+            raise ValueError("La condición cookie requiere 'name'")
+        self.name = name
+    
+    def test(self, context: RequestContext) -> bool:
+        return self.name in context.cookies
+    
+    @property
+    def reads(self) -> Tuple[str, ...]:
+        return 'cookie', self.name
+    
+    def read(self, context: RequestContext) -> Hashable:
+        # Solo se consulta la presencia: el valor (ej: una sesión) no cambia el resultado
+        return self.name in context.cookies
@@ -0,0 +1,49 @@
+"""
+Contexto del request para las condiciones de rewrite
+Atributos en memoria (host, método, headers, query, IP, cookies) que no requieren I/O
+"""
+
+from typing import Mapping, Optional
+
+
+class RequestContext:
+    """
+    Datos del request que pueden consultar las condiciones de rewrite
+
+    Es independiente de aiohttp: el servidor lo construye a partir del
+    request. Los headers deben ser un mapping que ignore mayúsculas (como
+    los de aiohttp); si se pasa un dict común se normalizan las claves.
+    """
+
+    __slots__ = ('host', 'method', 'headers', 'query_string', 'client_ip', 'cookies')
+
+    def __init__(self, host: str = '', method: str = 'GET',
+                 headers: Optional[Mapping[str, str]] = None, query_string: str = '',
+                 client_ip: str = '', cookies: Optional[Mapping[str, str]] = None):
+        """
+        Args:
+            host: Header Host sin puerto
+            method: Método HTTP
+            headers: Headers del request
+            query_string: Query string original (sin '?')
+            client_ip: IP real del cliente
+            cookies: Cookies del request (nombre -> valor)
+        """
+        self.host = host.lower()
+        self.method = method.upper()
+        if isinstance(headers, dict):
+            headers = {name.lower(): value for name, value in headers.items()}
+        self.headers = headers if headers is not None else {}
+        self.query_string = query_string
+        self.client_ip = client_ip
+        self.cookies = cookies if cookies is not None else {}
+
+    def header(self, name: str) -> Optional[str]:
+        """Valor de un header (None si no está)"""
+        if isinstance(self.headers, dict):
+            return self.headers.get(name.lower())
+        return self.headers.get(name)
+
+
+# Contexto vacío para evaluaciones sin request (tests, herramientas offline)
+EMPTY_CONTEXT = RequestContext()
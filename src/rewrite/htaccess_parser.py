@@ -0,0 +1,610 @@
+"""
+Importador de .htaccess
+Parsea RewriteCond/RewriteRule de mod_rewrite, los convierte al esquema rewrite_rules
+y los interpreta con la semántica de Apache para verificar la equivalencia
+"""
+
+import ipaddress
+import os
+import re
+from typing import Any, Dict, List, Match, Optional, Tuple
+
+from .context import EMPTY_CONTEXT, RequestContext
+from .result import RewriteResult
+
+
+# Formas largas de los flags de mod_rewrite
+_FLAG_ALIASES = {
+    'LAST': 'L', 'REDIRECT': 'R', 'NOCASE': 'NC', 'QSAPPEND': 'QSA', 'QSDISCARD': 'QSD',
+    'FORBIDDEN': 'F', 'GONE': 'G', 'ORNEXT': 'OR', 'NOESCAPE': 'NE', 'PASSTHROUGH': 'PT',
+    'NOSUBREQ': 'NS', 'CHAIN': 'C', 'SKIP': 'S', 'ENV': 'E', 'COOKIE': 'CO', 'TYPE': 'T',
+    'HANDLER': 'H', 'PROXY': 'P', 'NEXT': 'N', 'ESCAPE': 'B',
+}
+
+# Flags sin efecto en este servidor: se ignoran con una advertencia
+_IGNORED_FLAGS = {'NE', 'NS', 'PT', 'DPI'}
+
+# Flags que cambian la semántica y no tienen equivalente: la regla no se importa
+_UNSUPPORTED_FLAGS = {'C', 'S', 'E', 'CO', 'T', 'H', 'P', 'N', 'B'}
+
+_REDIRECT_STATUSES = (301, 302, 303, 307, 308)
+
+# Directivas que no afectan al rewrite y pueden omitirse sin advertencia
+_WRAPPERS = re.compile(r'^</?(IfModule|IfDefine|IfVersion)\b', re.IGNORECASE)
+
+_VARIABLE = re.compile(r'%\{([^}]+)\}')
+
+
+class HtaccessCondition:
+    """RewriteCond tal como aparece en el .htaccess"""
+
+    __slots__ = ('test_string', 'pattern', 'flags', 'line')
+
+    def __init__(self, test_string: str, pattern: str, flags: Dict[str, Optional[str]], line: int):
+        self.test_string = test_string
+        self.pattern = pattern
+        self.flags = flags
+        self.line = line
+
+
+class HtaccessRule:
+    """RewriteRule con las RewriteCond que la preceden"""
+
+    __slots__ = ('pattern', 'substitution', 'flags', 'conditions', 'line')
+
+    def __init__(self, pattern: str, substitution: str, flags: Dict[str, Optional[str]],
+                 conditions: List[HtaccessCondition], line: int):
+        self.pattern = pattern
+        self.substitution = substitution
+        self.flags = flags
+        self.conditions = conditions
+        self.line = line
+
+
+class HtaccessFile:
+    """Contenido de rewrite de un .htaccess"""
+
+    def __init__(self):
+        self.engine_on = False
+        self.base = '/'
+        self.rules: List[HtaccessRule] = []
+        # (línea, texto) de directivas que el importador no traduce
+        self.unsupported: List[Tuple[int, str]] = []
+
+
+def _split_arguments(line: str) -> List[str]:
+    """Separa los argumentos de una directiva (comillas y espacios escapados con \\)"""
+    arguments: List[str] = []
+    current: List[str] = []
+    quote = None
+    index = 0
+    while index < len(line):
+        char = line[index]
+        if char == '\\' and index + 1 < len(line) and line[index + 1] in ' \t"\'':
+            current.append(line[index + 1])
+            index += 2
+            continue
+        if quote:
+            if char == quote:
+                quote = None
+            else:
+                current.append(char)
+        elif char in '"\'':
+            quote = char
+        elif char in ' \t':
+            if current:
+                arguments.append(''.join(current))
+                current = []
+        else:
+            current.append(char)
+        index += 1
+    if current:
+        arguments.append(''.join(current))
+    return arguments
+
+
+def _parse_flags(text: Optional[str]) -> Dict[str, Optional[str]]:
+    """[L,R=301,NC] -> {'L': None, 'R': '301', 'NC': None}"""
+    flags: Dict[str, Optional[str]] = {}
+    if not text:
+        return flags
+    for item in text.strip().strip('[]').split(','):
+        item = item.strip()
+        if not item:
+            continue
+        name, separator, value = item.partition('=')
+        name = name.strip().upper()
+        flags[_FLAG_ALIASES.get(name, name)] = value.strip() if separator else None
+    return flags
+
+
+def parse_htaccess(text: str) -> HtaccessFile:
+    """
+    Parsea las directivas de mod_rewrite de un .htaccess
+
+    Los bloques <IfModule> se recorren como si no estuvieran; el resto de las
+    directivas que no son de rewrite se registran en unsupported.
+
+    Args:
+        text: Contenido del archivo
+
+    Returns:
+        HtaccessFile con las reglas en orden
+    """
+    parsed = HtaccessFile()
+    pending: List[HtaccessCondition] = []
+    lines = text.splitlines()
+    number = 0
+
+    while number < len(lines):
+        raw = lines[number]
+        number += 1
+        line_number = number
+        # Continuación de línea con \ al final
+        while raw.rstrip().endswith('\\') and number < len(lines):
+            raw = raw.rstrip()[:-1] + ' ' + lines[number].strip()
+            number += 1
+
+        line = raw.strip()
+        if not line or line.startswith('#') or _WRAPPERS.match(line):
+            continue
+
+        arguments = _split_arguments(line)
+        directive = arguments[0].lower()
+
+        if directive == 'rewriteengine':
+            parsed.engine_on = len(arguments) > 1 and arguments[1].lower() == 'on'
+        elif directive == 'rewritebase':
+            base = arguments[1] if len(arguments) > 1 else '/'
+            parsed.base = base if base.endswith('/') else base + '/'
+        elif directive == 'rewritecond':
+            if len(arguments) < 3:
+                parsed.unsupported.append((line_number, f"RewriteCond incompleta: {line}"))
+                continue
+            flags = _parse_flags(arguments[3] if len(arguments) > 3 else None)
+            pending.append(HtaccessCondition(arguments[1], arguments[2], flags, line_number))
+        elif directive == 'rewriterule':
+            if len(arguments) < 3:
+                parsed.unsupported.append((line_number, f"RewriteRule incompleta: {line}"))
+                pending = []
+                continue
+            flags = _parse_flags(arguments[3] if len(arguments) > 3 else None)
+            parsed.rules.append(HtaccessRule(arguments[1], arguments[2], flags, pending, line_number))
+            pending = []
+        else:
+            parsed.unsupported.append((line_number, line))
+
+    if pending:
+        parsed.unsupported.append((pending[0].line, "RewriteCond sin RewriteRule a continuación"))
+    return parsed
+
+
+class ConversionResult:
+    """Reglas en el esquema de virtual_hosts.yaml más las advertencias del importador"""
+
+    def __init__(self):
+        self.rules: List[Dict[str, Any]] = []
+        self.warnings: List[str] = []
+        # Línea de cada regla importada (para el reporte)
+        self.lines: List[int] = []
+        self.skipped = 0
+
+
+def convert_pattern(pattern: str, nocase: bool = False) -> str:
+    """
+    Convierte el patrón de una RewriteRule de directorio al del motor
+
+    En .htaccess el patrón se busca (sin anclar) en la ruta sin la barra
+    inicial y la sustitución reemplaza la URL completa. RewriteEngine aplica
+    re.match sobre la ruta con barra y reemplaza solo lo que coincidió, por
+    lo que el patrón se ancla en ^/ y se completa con .* hasta el final.
+    """
+    anchored = pattern.startswith('^')
+    core = pattern[1:] if anchored else pattern
+    ends = pattern.endswith('$') and not pattern.endswith('\\$')
+
+    if nocase:
+        core = f"(?i:{core})"
+    elif '|' in core:
+        core = f"(?:{core})"
+
+    converted = '^/' + ('' if anchored else '.*?') + core
+    if not ends or '|' in pattern:
+        converted += '.*'
+    return converted
+
+
+def _convert_substitution(substitution: str, base: str) -> Tuple[str, Optional[str]]:
+    """
+    Convierte la ruta de la sustitución a la sintaxis de target (re.sub)
+
+    Returns:
+        (target, query) donde query es None si la sustitución no tiene '?'
+    """
+    path, separator, query = substitution.partition('?')
+    if not path.startswith(('/', 'http://', 'https://')):
+        path = base + path
+
+    target: List[str] = []
+    index = 0
+    while index < len(path):
+        char = path[index]
+        if char == '\\' and index + 1 < len(path):
+            target.append('\\\\' if path[index + 1] == '\\' else path[index + 1])
+            index += 2
+            continue
+        if char == '$' and index + 1 < len(path) and path[index + 1].isdigit():
+            target.append(f"\\g<{path[index + 1]}>")
+            index += 2
+            continue
+        target.append('\\\\' if char == '\\' else char)
+        index += 1
+
+    return ''.join(target), (query if separator else None)
+
+
+def _header_name(variable: str) -> Optional[str]:
+    """HTTP_USER_AGENT -> User-Agent, HTTP:X-Token -> X-Token"""
+    if variable.startswith('HTTP:'):
+        return variable[5:]
+    if variable.startswith('HTTP_') and variable != 'HTTP_HOST':
+        return '-'.join(part.capitalize() for part in variable[5:].split('_'))
+    return None
+
+
+def _methods_from_pattern(pattern: str) -> Optional[List[str]]:
+    """^(GET|HEAD)$ -> ['GET', 'HEAD'] (None si no es una lista simple de métodos)"""
+    body = pattern.strip('^$')
+    if body.startswith('(') and body.endswith(')'):
+        body = body[1:-1]
+    methods = body.split('|')
+    if all(re.fullmatch(r'[A-Za-z]+', method) for method in methods):
+        return [method.upper() for method in methods]
+    return None
+
+
+def _convert_condition(condition: HtaccessCondition) -> Tuple[Optional[Dict[str, Any]], Optional[str]]:
+    """
+    Traduce una RewriteCond a una condición del motor
+
+    Returns:
+        (condición, None) o (None, motivo por el que no se puede traducir)
+    """
+    if 'OR' in condition.flags:
+        return None, "condiciones encadenadas con [OR]"
+
+    pattern = condition.pattern
+    negate = pattern.startswith('!')
+    if negate:
+        pattern = pattern[1:]
+    nocase = 'NC' in condition.flags
+
+    variable = _VARIABLE.fullmatch(condition.test_string)
+    if variable is None:
+        return None, f"TestString no soportado: {condition.test_string}"
+    name = variable.group(1).upper() if ':' not in variable.group(1) else variable.group(1)
+
+    if name in ('REQUEST_FILENAME', 'SCRIPT_FILENAME'):
+        if negate and pattern == '-f':
+            return {'type': 'file_not_exists'}, None
+        if negate and pattern == '-d':
+            return {'type': 'dir_not_exists'}, None
+        return None, f"prueba de filesystem no soportada: {condition.pattern}"
+
+    if pattern.startswith(('-', '=', '<', '>')):
+        return None, f"operador no soportado: {condition.pattern}"
+
+    try:
+        compiled = re.compile(pattern)
+    except re.error as e:
+        return None, f"regex inválida '{pattern}': {e}"
+
+    regex = f"(?i){pattern}" if nocase else pattern
+    result: Dict[str, Any]
+
+    if name == 'HTTP_HOST':
+        result = {'type': 'host', 'pattern': pattern}
+    elif name == 'REQUEST_METHOD':
+        methods = _methods_from_pattern(pattern)
+        if methods is None:
+            return None, f"patrón de método no soportado: {pattern}"
+        result = {'type': 'method', 'methods': methods}
+    elif name == 'QUERY_STRING':
+        result = {'type': 'query', 'pattern': regex}
+    elif name == 'REMOTE_ADDR':
+        literal = pattern.strip('^$').replace('\\.', '.')
+        try:
+            network = str(ipaddress.ip_network(literal, strict=False))
+        except ValueError:
+            return None, f"REMOTE_ADDR solo se importa como IP exacta: {pattern}"
+        result = {'type': 'client_ip', 'networks': [network]}
+    elif _header_name(name) is not None:
+        # Apache evalúa un header ausente como ''; HeaderCondition no cumple sin el header
+        if compiled.search('') is not None:
+            return None, f"el patrón '{pattern}' coincide con un header ausente"
+        result = {'type': 'header', 'name': _header_name(name), 'pattern': regex}
+    else:
+        return None, f"variable no soportada: %{{{name}}}"
+
+    if negate:
+        result['negate'] = True
+    return result, None
+
+
+def convert_htaccess(htaccess: HtaccessFile) -> ConversionResult:
+    """
+    Convierte las reglas de un .htaccess al esquema rewrite_rules
+
+    Las reglas que no pueden expresarse con el motor se omiten con una
+    advertencia; las directivas ajenas al rewrite solo se informan.
+    """
+    conversion = ConversionResult()
+
+    for line, text in htaccess.unsupported:
+        conversion.warnings.append(f"línea {line}: directiva no importada: {text}")
+    if not htaccess.engine_on:
+        conversion.warnings.append("RewriteEngine no está en On: no hay reglas activas")
+        return conversion
+
+    for rule in htaccess.rules:
+        problem = _convert_rule(rule, htaccess.base, conversion)
+        if problem:
+            conversion.skipped += 1
+            conversion.warnings.append(f"línea {rule.line}: regla omitida ({problem})")
+    return conversion
+
+
+def _convert_rule(rule: HtaccessRule, base: str, conversion: ConversionResult) -> Optional[str]:
+    """Agrega la regla convertida; retorna el motivo si no se puede convertir"""
+    flags = rule.flags
+    unsupported = sorted(set(flags) & _UNSUPPORTED_FLAGS)
+    if unsupported:
+        return f"flags sin equivalente: {', '.join(unsupported)}"
+    for flag in sorted(set(flags) & _IGNORED_FLAGS):
+        conversion.warnings.append(f"línea {rule.line}: flag {flag} ignorado")
+    if rule.pattern.startswith('!'):
+        return "patrón negado"
+    if re.search(r'%(\d|\{)', rule.substitution):
+        return "la sustitución usa variables o referencias %N"
+
+    try:
+        re.compile(rule.pattern)
+    except re.error as e:
+        return f"regex inválida: {e}"
+
+    conditions = []
+    for condition in rule.conditions:
+        converted, problem = _convert_condition(condition)
+        if problem:
+            return f"RewriteCond de la línea {condition.line}: {problem}"
+        conditions.append(converted)
+
+    out_flags: List[str] = []
+    query_string = ''
+    if rule.substitution == '-':
+        target = '-'
+        has_query = False
+    else:
+        target, query = _convert_substitution(rule.substitution, base)
+        has_query = query is not None
+        query_string = query or ''
+
+    # Sin '?' en la sustitución Apache conserva el query original; con '?' lo
+    # reemplaza salvo [QSA]. El motor siempre usa query_string (+ original con QSA)
+    if 'QSD' not in flags and (not has_query or 'QSA' in flags):
+        out_flags.append('QSA')
+
+    if 'R' in flags or target.startswith(('http://', 'https://')):
+        value = flags.get('R')
+        status = int(value) if value and value.isdigit() else 302
+        if status not in _REDIRECT_STATUSES:
+            return f"código de redirección no soportado: {value}"
+        out_flags.append(f"R={status}")
+    elif 'F' in flags:
+        out_flags.append('F')
+    elif 'G' in flags:
+        out_flags.append('G')
+    elif 'L' in flags or 'END' in flags:
+        out_flags.append('L')
+
+    converted: Dict[str, Any] = {
+        'pattern': convert_pattern(rule.pattern, 'NC' in flags),
+        'target': target,
+    }
+    if query_string:
+        converted['query_string'] = query_string
+    if conditions:
+        converted['conditions'] = conditions
+    converted['flags'] = out_flags
+
+    conversion.rules.append(converted)
+    conversion.lines.append(rule.line)
+    return None
+
+
+class HtaccessInterpreter:
+    """
+    Evalúa un .htaccess con la semántica de mod_rewrite en contexto de directorio
+
+    Es el modelo de referencia para comprobar la equivalencia de las reglas
+    importadas: ruta sin la barra inicial, búsqueda sin anclar, RewriteCond
+    con [OR]/[NC]/!, referencias $N y %N, RewriteBase, y nueva vuelta sobre
+    las reglas mientras la URL cambie (como la reinyección interna de Apache).
+    """
+
+    def __init__(self, htaccess: HtaccessFile, document_root: str, max_rounds: int = 10):
+        self.htaccess = htaccess
+        self.document_root = document_root
+        self.max_rounds = max_rounds
+
+    def rewrite(self, request_path: str, query_string: str = '',
+                context: Optional[RequestContext] = None) -> RewriteResult:
+        """Aplica las reglas y retorna el resultado en la forma de RewriteEngine.rewrite"""
+        context = context if context is not None else EMPTY_CONTEXT
+        if not self.htaccess.engine_on:
+            return RewriteResult(request_path, query_string)
+
+        path, query = request_path, query_string
+        for _ in range(self.max_rounds):
+            result, stop = self._round(path, query, request_path, context)
+            if result.is_terminal or stop or result.path == path:
+                return result
+            path, query = result.path, result.query
+        return RewriteResult(path, query)
+
+    def _round(self, path: str, query: str, original_path: str,
+               context: RequestContext) -> Tuple[RewriteResult, bool]:
+        """Una pasada por las reglas; retorna (resultado, END)"""
+        for rule in self.htaccess.rules:
+            flags = rule.flags
+            relative = path[1:] if path.startswith('/') else path
+
+            pattern = rule.pattern
+            negated = pattern.startswith('!')
+            regex = re.compile(pattern[1:] if negated else pattern,
+                               re.IGNORECASE if 'NC' in flags else 0)
+            match = regex.search(relative)
+            if (match is None) != negated:
+                continue
+            if negated:
+                match = None
+
+            cond_match = self._conditions(rule.conditions, path, query, original_path, context, match)
+            if cond_match is False:
+                continue
+
+            if rule.substitution == '-':
+                new_path, new_query = path, query
+            else:
+                expanded = self._expand(rule.substitution, path, query, original_path, context,
+                                        match, cond_match)
+                target, separator, target_query = expanded.partition('?')
+                if not target.startswith(('/', 'http://', 'https://')):
+                    target = self.htaccess.base + target
+                new_path = target
+                if separator:
+                    new_query = target_query
+                    if 'QSA' in flags and query:
+                        new_query = f"{new_query}&{query}" if new_query else query
+                else:
+                    new_query = query
+                if 'QSD' in flags:
+                    new_query = ''
+
+            if 'F' in flags:
+                return RewriteResult(path, query, 403), True
+            if 'G' in flags:
+                return RewriteResult(path, query, 410), True
+            if 'R' in flags or new_path.startswith(('http://', 'https://')):
+                value = flags.get('R')
+                status = int(value) if value and value.isdigit() else 302
+                location = f"{new_path}?{new_query}" if new_query else new_path
+                return RewriteResult(new_path, new_query, status, location), True
+
+            path, query = new_path, new_query
+            if 'END' in flags:
+                return RewriteResult(path, query), True
+            if 'L' in flags:
+                break
+
+        return RewriteResult(path, query), False
+
+    def _variable(self, name: str, path: str, query: str, original_path: str,
+                  context: RequestContext) -> str:
+        """Valor de %{NOMBRE}"""
+        upper = name.upper()
+        if upper in ('REQUEST_FILENAME', 'SCRIPT_FILENAME'):
+            return os.path.join(self.document_root, path.lstrip('/'))
+        if upper == 'HTTP_HOST':
+            return context.host
+        if upper == 'REQUEST_METHOD':
+            return context.method
+        if upper == 'QUERY_STRING':
+            return query
+        if upper == 'REMOTE_ADDR':
+            return context.client_ip
+        if upper == 'REQUEST_URI':
+            return original_path
+        if upper == 'DOCUMENT_ROOT':
+            return self.document_root
+        if upper == 'HTTPS':
+            return 'off'
+        header = _header_name(name if ':' in name else upper)
+        if header is not None:
+            return context.header(header) or ''
+        return ''
+
+    def _expand(self, text: str, path: str, query: str, original_path: str, context: RequestContext,
+                match: Optional[Match], cond_match: Optional[Match]) -> str:
+        """Expande %{VAR}, $N y %N"""
+        text = _VARIABLE.sub(
+            lambda variable: self._variable(variable.group(1), path, query, original_path, context), text
+        )
+
+        def group(source: Optional[Match], number: int) -> str:
+            if source is None or number > source.re.groups:
+                return ''
+            return source.group(number) or ''
+
+        text = re.sub(r'\$(\d)', lambda ref: group(match, int(ref.group(1))), text)
+        return re.sub(r'%(\d)', lambda ref: group(cond_match, int(ref.group(1))), text)
+
+    def _conditions(self, conditions: List[HtaccessCondition], path: str, query: str,
+                    original_path: str, context: RequestContext, match: Optional[Match]):
+        """
+        Evalúa las RewriteCond con encadenamiento [OR]
+
+        c1 [OR] c2, c3 equivale a (c1 o c2) y c3.
+
+        Returns:
+            False si no se cumplen; si se cumplen, el último match de regex (o None)
+        """
+        groups: List[List[HtaccessCondition]] = []
+        joined = False
+        for condition in conditions:
+            if joined:
+                groups[-1].append(condition)
+            else:
+                groups.append([condition])
+            joined = 'OR' in condition.flags
+
+        last_match = None
+        for group in groups:
+            for condition in group:
+                value = self._expand(condition.test_string, path, query, original_path, context,
+                                     match, last_match)
+                outcome, cond_match = self._test(condition, value)
+                if cond_match is not None:
+                    last_match = cond_match
+                if outcome:
+                    break
+            else:
+                return False
+
+        return last_match
+
+    @staticmethod
+    def _test(condition: HtaccessCondition, value: str) -> Tuple[bool, Optional[Match]]:
+        """Aplica el CondPattern al TestString expandido"""
+        pattern = condition.pattern
+        negate = pattern.startswith('!')
+        if negate:
+            pattern = pattern[1:]
+
+        cond_match = None
+        if pattern == '-f':
+            outcome = os.path.isfile(value)
+        elif pattern == '-d':
+            outcome = os.path.isdir(value)
+        elif pattern == '-s':
+            outcome = os.path.isfile(value) and os.path.getsize(value) > 0
+        elif pattern in ('-l', '-L'):
+            outcome = os.path.islink(value)
+        elif pattern.startswith('='):
+            outcome = value == pattern[1:].strip('"')
+        else:
+            regex = re.compile(pattern, re.IGNORECASE if 'NC' in condition.flags else 0)
+            cond_match = regex.search(value)
+            outcome = cond_match is not None
+
+        return outcome != negate, (cond_match if not negate else None)
@@ -0,0 +1,49 @@
+"""
+Instrumentación de reglas de rewrite
+Contadores por regla para encontrar reglas muertas y condiciones caras
+"""
+
+from typing import Any, Dict
+
+
+class RuleStats:
+    """
+    Contadores de una RewriteRule
+
+    Solo existen si el motor se creó con instrument=True; sin instrumentación
+    el motor no mide nada. Los incrementos no toman locks: con requests
+    concurrentes en el executor de I/O los valores son aproximados.
+    """
+
+    __slots__ = ('evaluations', 'matches', 'condition_evaluations', 'condition_failures',
+                 'filesystem_probes', 'nanoseconds')
+
+    def __init__(self):
+        self.evaluations = 0            # veces que se probó la regex
+        self.matches = 0                # veces que se aplicó la regla
+        self.condition_evaluations = 0
+        self.condition_failures = 0
+        self.filesystem_probes = 0      # condiciones de filesystem evaluadas
+        self.nanoseconds = 0            # tiempo acumulado en matches + apply
+
+    def reset(self) -> None:
+        """Pone los contadores en cero"""
+        self.evaluations = 0
+        self.matches = 0
+        self.condition_evaluations = 0
+        self.condition_failures = 0
+        self.filesystem_probes = 0
+        self.nanoseconds = 0
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Contadores más promedios derivados"""
+        return {
+            'evaluations': self.evaluations,
+            'matches': self.matches,
+            'match_rate': round(self.matches / self.evaluations, 4) if self.evaluations else 0.0,
+            'condition_evaluations': self.condition_evaluations,
+            'condition_failures': self.condition_failures,
+            'filesystem_probes': self.filesystem_probes,
+            'nanoseconds': self.nanoseconds,
+            'avg_nanoseconds': self.nanoseconds // self.evaluations if self.evaluations else 0,
+        }
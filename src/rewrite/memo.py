@@ -0,0 +1,217 @@
+"""
+Memoización de resultados de rewrite
+LRU de (ruta, query) -> resultado, etiquetado con los hechos de filesystem de los que dependió
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, List, Optional, Set, Tuple
+
+from .conditions import Condition
+from .result import RewriteResult
+
+
+# Hecho de filesystem: (condición, ruta evaluada, resultado obtenido)
+Fact = Tuple[Condition, str, bool]
+
+# (ruta, query, atributos del request que leen las condiciones)
+MemoKey = Tuple[str, str, Tuple[Hashable, ...]]
+
+
+class MemoEntry:
+    """Resultado memorizado de RewriteEngine.rewrite"""
+
+    __slots__ = ('result', 'facts', 'checked_at')
+
+    def __init__(self, result: RewriteResult, facts: Tuple[Fact, ...]):
+        self.result = result
+        self.facts = facts
+        self.checked_at = time.monotonic()
+
+
+class RewriteMemo:
+    """
+    LRU acotado de resultados de rewrite para un virtual host
+
+    Un resultado que no consultó el filesystem es válido para siempre (las
+    reglas son deterministas). Uno que dependió de condiciones de filesystem
+    guarda esos hechos: durante fact_ttl segundos se confía en ellos sin
+    hacer I/O; después se vuelven a evaluar solo las condiciones (sin regex)
+    y si alguna cambió la entrada se descarta. invalidate_path descarta de
+    inmediato las entradas que dependían de una ruta; el servidor la llama
+    con cada cambio que inotify informa al manifiesto del document_root.
+
+    Si las reglas tienen condiciones sobre el request (host, método,
+    headers...) el motor pasa los atributos que leen como variant, que
+    forma parte de la clave.
+
+    Es seguro usarla desde los threads del executor de I/O.
+    """
+
+    def __init__(self, max_entries: int = 4096, fact_ttl: float = 2.0):
+        """
+        Inicializa la memo
+
+        Args:
+            max_entries: Cantidad máxima de resultados (0 deshabilita)
+            fact_ttl: Segundos que se confía en los hechos de filesystem
+        """
+        self.max_entries = max_entries
+        self.fact_ttl = fact_ttl
+        self.enabled = max_entries > 0
+
+        self._entries: 'OrderedDict[MemoKey, MemoEntry]' = OrderedDict()
+        self._tags: Dict[str, Set[MemoKey]] = {}
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.revalidations = 0
+        self.invalidations = 0
+        self.evictions = 0
+
+    def lookup(self, path: str, query: str, variant: Tuple[Hashable, ...] = ()) -> Optional[RewriteResult]:
+        """
+        Busca un resultado vigente sin tocar el filesystem
+
+        Returns:
+            Resultado memorizado, o None si no está o hay que revalidarlo
+        """
+        if not self.enabled:
+            return None
+
+        key = (path, query, variant)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry.facts and time.monotonic() - entry.checked_at >= self.fact_ttl:
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry.result
+
+    def get(self, path: str, query: str, document_root: str,
+            variant: Tuple[Hashable, ...] = ()) -> Optional[RewriteResult]:
+        """
+        Busca un resultado, revalidando sus hechos de filesystem si expiraron
+
+        Hace I/O cuando revalida; debe llamarse fuera del event loop si las
+        reglas tienen condiciones de filesystem.
+        """
+        result = self.lookup(path, query, variant)
+        if result is not None or not self.enabled:
+            return result
+
+        key = (path, query, variant)
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        # Solo se reevalúan las condiciones; las regex no se vuelven a ejecutar
+        for condition, fact_path, outcome in entry.facts:
+            if condition.evaluate(fact_path, document_root) != outcome:
+                with self._lock:
+                    self._remove(key)
+                    self.invalidations += 1
+                    self.misses += 1
+                return None
+
+        with self._lock:
+            entry.checked_at = time.monotonic()
+            if key in self._entries:
+                self._entries.move_to_end(key)
+            self.revalidations += 1
+            self.hits += 1
+        return entry.result
+
+    def put(self, path: str, query: str, result: RewriteResult, facts: List[Fact],
+            variant: Tuple[Hashable, ...] = ()) -> None:
+        """
+        Memoriza un resultado
+
+        Args:
+            path: Ruta original del request
+            query: Query string original
+            result: Resultado de aplicar las reglas
+            facts: Hechos de filesystem evaluados para obtenerlo
+            variant: Atributos del request que leen las condiciones
+        """
+        if not self.enabled:
+            return
+
+        key = (path, query, variant)
+        entry = MemoEntry(result, tuple(facts))
+        with self._lock:
+            self._remove(key)
+            self._entries[key] = entry
+            for _, fact_path, _ in entry.facts:
+                self._tags.setdefault(fact_path, set()).add(key)
+
+            while len(self._entries) > self.max_entries:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.evictions += 1
+
+    def _remove(self, key: MemoKey) -> None:
+        """Quita una entrada y sus etiquetas (con el lock tomado)"""
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        for _, fact_path, _ in entry.facts:
+            keys = self._tags.get(fact_path)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[fact_path]
+
+    def invalidate_path(self, path: str, recursive: bool = False) -> int:
+        """
+        Descarta los resultados que dependían de una ruta del document_root
+
+        Args:
+            path: Ruta del request tal como la evaluó la condición (ej: /blog/post)
+            recursive: Incluir las rutas debajo de path (cambió un directorio)
+
+        Returns:
+            Cantidad de entradas descartadas
+        """
+        with self._lock:
+            keys = set(self._tags.get(path, ()))
+            if recursive:
+                prefix = path.rstrip('/') + '/'
+                for tagged, tagged_keys in self._tags.items():
+                    if tagged.startswith(prefix):
+                        keys.update(tagged_keys)
+            for key in keys:
+                self._remove(key)
+            self.invalidations += len(keys)
+            return len(keys)
+
+    def clear(self) -> None:
+        """Descarta todos los resultados (ej: cambió el document_root)"""
+        with self._lock:
+            self._entries.clear()
+            self._tags.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Retorna contadores para el dashboard"""
+        lookups = self.hits + self.misses
+        return {
+            'enabled': self.enabled,
+            'entries': len(self._entries),
+            'max_entries': self.max_entries,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+            'revalidations': self.revalidations,
+            'invalidations': self.invalidations,
+            'evictions': self.evictions,
+            'tagged_paths': len(self._tags),
+        }
+
+    def __len__(self) -> int:
+        return len(self._entries)
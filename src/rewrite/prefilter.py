@@ -0,0 +1,127 @@
+"""
+Prefiltro de reglas de rewrite
+Índice por prefijo literal que descarta en una pasada las reglas que no pueden coincidir
+"""
+
+from typing import Dict, List, Sequence
+
+from .rewrite_rule import RewriteRule
+
+
+# Caracteres con significado especial al inicio de una expresión regular
+_REGEX_META = set('.^$*+?{}[]\\|()')
+
+# Escapes que representan un carácter literal (\/ \. \- ...)
+_ESCAPABLE_LITERALS = set('/.-_~:@!&=,;%#<>\'"{}[]()*+?^$|\\ ')
+
+_QUANTIFIERS = set('*?{')
+
+
+def literal_prefix(pattern: str) -> str:
+    """
+    Extrae el prefijo literal con el que debe empezar toda ruta que coincida
+
+    RewriteRule usa re.match, así que el patrón está anclado al inicio aunque
+    no empiece con ^. Si el patrón tiene alternativas (|) o flags inline se
+    retorna '' (la regla es candidata para cualquier ruta).
+
+    Args:
+        pattern: Expresión regular de la regla (ej: "^/blog/(.*)$")
+
+    Returns:
+        Prefijo literal (ej: "/blog/"), o '' si no hay uno seguro
+    """
+    if '|' in pattern or pattern.startswith('(?'):
+        return ''
+
+    index = 1 if pattern.startswith('^') else 0
+    prefix: List[str] = []
+
+    while index < len(pattern):
+        char = pattern[index]
+        if char == '\\':
+            if index + 1 >= len(pattern) or pattern[index + 1] not in _ESCAPABLE_LITERALS:
+                break
+            literal, width = pattern[index + 1], 2
+        elif char in _REGEX_META:
+            break
+        else:
+            literal, width = char, 1
+
+        # Un cuantificador vuelve opcional (o repetible) al carácter anterior
+        following = pattern[index + width] if index + width < len(pattern) else ''
+        if following in _QUANTIFIERS:
+            break
+        if following == '+':
+            prefix.append(literal)
+            break
+
+        prefix.append(literal)
+        index += width
+
+    return ''.join(prefix)
+
+
+class _PrefixNode:
+    """Nodo del trie de prefijos literales (un carácter por nivel)"""
+
+    __slots__ = ('children', 'rules')
+
+    def __init__(self):
+        self.children: Dict[str, '_PrefixNode'] = {}
+        self.rules: List[int] = []
+
+
+class RulePrefilter:
+    """
+    Índice de reglas por prefijo literal
+
+    candidates(ruta) recorre el trie con los caracteres de la ruta y junta
+    las reglas cuyo prefijo es prefijo de la ruta, más las reglas sin prefijo
+    literal. El costo depende del largo de la ruta, no de la cantidad de
+    reglas. Los índices se retornan en orden para preservar la semántica de
+    evaluación secuencial.
+    """
+
+    def __init__(self, rules: Sequence[RewriteRule]):
+        """
+        Construye el índice
+
+        Args:
+            rules: Reglas en el orden en que deben evaluarse
+        """
+        self._root = _PrefixNode()
+        self._unprefixed: List[int] = []
+        self.prefixed_count = 0
+
+        for index, rule in enumerate(rules):
+            prefix = literal_prefix(rule.pattern_str)
+            if not prefix:
+                self._unprefixed.append(index)
+                continue
+
+            node = self._root
+            for char in prefix:
+                node = node.children.setdefault(char, _PrefixNode())
+            node.rules.append(index)
+            self.prefixed_count += 1
+
+    def candidates(self, path: str) -> List[int]:
+        """
+        Índices de las reglas que pueden coincidir con la ruta, en orden
+
+        Args:
+            path: Ruta actual del request
+        """
+        found = list(self._unprefixed)
+        node = self._root
+        for char in path:
+            node = node.children.get(char)
+            if node is None:
+                break
+            if node.rules:
+                found.extend(node.rules)
+
+        if len(found) > len(self._unprefixed):
+            found.sort()
+        return found
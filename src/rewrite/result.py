@@ -0,0 +1,50 @@
+"""
+Resultado de aplicar las reglas de rewrite
+Ruta y query string finales, o una acción terminal (redirección, 403, 410)
+"""
+
+from typing import Optional, Tuple
+
+
+class RewriteResult:
+    """
+    Resultado de RewriteEngine.rewrite
+
+    Si status es None el request continúa con path y query. Si no, es una
+    respuesta terminal que el servidor envía sin tocar el filesystem ni
+    PHP-FPM: una redirección (status 3xx con location) o un error (403, 410).
+    """
+
+    __slots__ = ('path', 'query', 'status', 'location')
+
+    def __init__(self, path: str, query: str, status: Optional[int] = None,
+                 location: Optional[str] = None):
+        self.path = path
+        self.query = query
+        self.status = status
+        self.location = location
+
+    @property
+    def is_terminal(self) -> bool:
+        """Indica si el request debe responderse con status sin continuar"""
+        return self.status is not None
+
+    @property
+    def is_redirect(self) -> bool:
+        """Indica si la respuesta terminal es una redirección"""
+        return self.location is not None
+
+    def as_tuple(self) -> Tuple[str, str]:
+        """(ruta, query_string), la forma que retorna RewriteEngine.process"""
+        return self.path, self.query
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, RewriteResult):
+            return NotImplemented
+        return (self.path, self.query, self.status, self.location) == \
+            (other.path, other.query, other.status, other.location)
+
+    def __repr__(self) -> str:
+        if self.status is None:
+            return f"RewriteResult(path='{self.path}', query='{self.query}')"
+        return f"RewriteResult(status={self.status}, location={self.location!r})"
@@ -3,9 +3,19 @@ Motor de Rewrite Engine
 Procesa las reglas de rewrite configuradas en virtual_hosts.yaml
 """
 
-from typing import Dict, List, Tuple, Optional
+import time
+from typing import Any, Dict, List, Tuple, Optional
+from utils.file_metadata import FileMetadataCache
 from .rewrite_rule import RewriteRule
-from .conditions import FileNotExistsCondition, DirNotExistsCondition
+from .conditions import (
+    Condition, FileNotExistsCondition, DirNotExistsCondition, HostCondition, MethodCondition,
+    HeaderCondition, QueryCondition, ClientIPCondition, CookieCondition
+)
+from .context import EMPTY_CONTEXT, RequestContext
+from .instrumentation import RuleStats
+from .memo import RewriteMemo
+from .prefilter import RulePrefilter
+from .result import RewriteResult
 
 
 class RewriteEngine:
@@ -16,21 +26,58 @@ class RewriteEngine:
     a las rutas de los requests.
     """
     
-    def __init__(self, vhost: Dict, document_root: str):
+    def __init__(self, vhost: Dict, document_root: str, memo_size: int = 4096,
+                 fact_ttl: float = 2.0, metadata: Optional[FileMetadataCache] = None,
+                 instrument: bool = False):
         """
         Inicializa el motor de rewrite para un virtual host
         
         Args:
             vhost: Configuración del virtual host (dict)
             document_root: Raíz del documento del virtual host
+            memo_size: Resultados memorizados como máximo (0 deshabilita la memo)
+            fact_ttl: Segundos que se confía en las condiciones de filesystem memorizadas
+            metadata: Cache de metadatos para las condiciones (por defecto la global)
+            instrument: Contar evaluaciones, matches, condiciones y tiempo por regla
         """
         self.vhost = vhost
         self.document_root = document_root
+        self.metadata = metadata
         self.rules: List[RewriteRule] = []
         self.enabled = False
         
         # Cargar las reglas desde la configuración
         self._load_rules()
+        
+        # Condiciones sobre el request: los atributos que leen (host, método,
+        # headers y cookies nombrados...) forman parte de la clave de la memo
+        self._context_conditions: List[Condition] = [
+            condition for rule in self.rules for condition in rule.conditions
+            if condition.uses_context
+        ]
+        readers = {}
+        for condition in self._context_conditions:
+            readers.setdefault(condition.reads, condition)
+        self._variant_readers: List[Condition] = list(readers.values())
+        
+        # Si alguna condición consulta el filesystem (se pregunta en cada request)
+        self._uses_filesystem = any(
+            condition.uses_filesystem for rule in self.rules for condition in rule.conditions
+        )
+        
+        # Índice por prefijo literal para descartar reglas sin evaluar su regex
+        self.prefilter = RulePrefilter(self.rules)
+        
+        # Resultados memorizados por (ruta, query)
+        self.memo = RewriteMemo(memo_size, fact_ttl)
+        
+        # Instrumentación opcional: sin ella el único costo es un if por request
+        self.instrumented = instrument
+        self.requests = 0
+        self.nanoseconds = 0
+        if instrument:
+            for rule in self.rules:
+                rule.stats = RuleStats()
     
     def _load_rules(self) -> None:
         """
@@ -45,7 +92,14 @@ class RewriteEngine:
             conditions:
               - type: "file_not_exists"
               - type: "dir_not_exists"
+              - type: "method"
+                methods: ["GET", "HEAD"]
         ```
+        
+        Tipos de condición: file_not_exists, dir_not_exists, host (pattern),
+        method (methods), header (name, pattern opcional), query (pattern),
+        client_ip (networks en notación CIDR) y cookie (name). Las condiciones
+        sobre el request aceptan negate: true.
         """
         if 'rewrite_rules' not in self.vhost:
             return
@@ -76,14 +130,9 @@ class RewriteEngine:
                 conditions_config = rule_config.get('conditions', [])
                 
                 for cond_config in conditions_config:
-                    cond_type = cond_config.get('type') if isinstance(cond_config, dict) else cond_config
-                    
-                    if cond_type == 'file_not_exists':
-                        conditions.append(FileNotExistsCondition())
-                    elif cond_type == 'dir_not_exists':
-                        conditions.append(DirNotExistsCondition())
-                    else:
-                        print(f"⚠️  Tipo de condición desconocido: {cond_type}")
+                    condition = self._build_condition(cond_config)
+                    if condition is not None:
+                        conditions.append(condition)
                 
                 # Crear la regla
                 rule = RewriteRule(
@@ -99,10 +148,43 @@ class RewriteEngine:
             except Exception as e:
                 print(f"❌ Error cargando regla de rewrite en {self.vhost.get('domain')}: {e}")
     
+    def _build_condition(self, cond_config) -> Optional[Condition]:
+        """
+        Crea una condición a partir de su configuración YAML
+        
+        Raises:
+            ValueError: si faltan parámetros o una regex/red es inválida
+        """
+        if not isinstance(cond_config, dict):
+            cond_config = {'type': cond_config}
+        cond_type = cond_config.get('type')
+        negate = bool(cond_config.get('negate', False))
+        
+        if cond_type == 'file_not_exists':
+            return FileNotExistsCondition(self.metadata)
+        elif cond_type == 'dir_not_exists':
+            return DirNotExistsCondition(self.metadata)
+        elif cond_type == 'host':
+            return HostCondition(cond_config.get('pattern', ''), negate)
+        elif cond_type == 'method':
+            return MethodCondition(cond_config.get('methods') or cond_config.get('method'), negate)
+        elif cond_type == 'header':
+            return HeaderCondition(cond_config.get('name', ''), cond_config.get('pattern'), negate)
+        elif cond_type == 'query':
+            return QueryCondition(cond_config.get('pattern', ''), negate)
+        elif cond_type == 'client_ip':
+            return ClientIPCondition(cond_config.get('networks') or cond_config.get('network'), negate)
+        elif cond_type == 'cookie':
+            return CookieCondition(cond_config.get('name', ''), negate)
+        
+        print(f"⚠️  Tipo de condición desconocido: {cond_type}")
+        return None
+    
     def process(
         self,
         request_path: str,
-        query_string: str = ""
+        query_string: str = "",
+        context: Optional[RequestContext] = None
     ) -> Tuple[str, str]:
         """
         Procesa una ruta de request aplicando las reglas de rewrite
@@ -110,36 +192,190 @@ class RewriteEngine:
         Args:
             request_path: Ruta del request (ej: /usuarios/123)
             query_string: Query string original (ej: "foo=bar")
+            context: Datos del request para las condiciones que los usan
+            
+        Returns:
+            Tupla (ruta_final, query_string_final); para una regla R, F o G
+            es el target expandido (ver rewrite para obtener la acción)
+        """
+        return self.rewrite(request_path, query_string, context).as_tuple()
+    
+    def rewrite(self, request_path: str, query_string: str = "",
+                context: Optional[RequestContext] = None) -> RewriteResult:
+        """
+        Aplica las reglas de rewrite, incluyendo las acciones terminales
+        
+        El resultado se memoriza por (ruta, query); las condiciones de
+        filesystem de las que dependió se revalidan al vencer fact_ttl.
+        
+        Args:
+            request_path: Ruta del request (ej: /usuarios/123)
+            query_string: Query string original (ej: "foo=bar")
+            context: Datos del request para las condiciones que los usan
             
         Returns:
-            Tupla (ruta_final, query_string_final)
+            RewriteResult con la ruta final, o con status (y location) si
+            una regla R, F o G coincidió
         """
         if not self.enabled or not self.rules:
-            return request_path, query_string
+            return RewriteResult(request_path, query_string)
+        
+        if self.instrumented:
+            started = time.perf_counter_ns()
+            result = self._rewrite(request_path, query_string, context)
+            self.requests += 1
+            self.nanoseconds += time.perf_counter_ns() - started
+            return result
+        return self._rewrite(request_path, query_string, context)
+    
+    def _rewrite(self, request_path: str, query_string: str,
+                 context: Optional[RequestContext]) -> RewriteResult:
+        """rewrite a través de la memo"""
+        variant = self._variant(context)
+        cached = self.memo.get(request_path, query_string, self.document_root, variant)
+        if cached is not None:
+            return cached
+        
+        facts = [] if self.memo.enabled else None
+        result = self._process_rules(request_path, query_string, facts, context)
+        self.memo.put(request_path, query_string, result, facts or [], variant)
+        return result
+    
+    def lookup(self, request_path: str, query_string: str = "",
+               context: Optional[RequestContext] = None) -> Optional[RewriteResult]:
+        """
+        Resultado memorizado y vigente, sin evaluar reglas ni tocar el filesystem
         
-        # Aplicar reglas en orden
+        Returns:
+            El mismo RewriteResult que daría rewrite, o None si hay que llamar
+            a rewrite (no memorizado o con hechos de filesystem vencidos)
+        """
+        if not self.enabled or not self.rules:
+            return RewriteResult(request_path, query_string)
+        result = self.memo.lookup(request_path, query_string, self._variant(context))
+        if result is not None and self.instrumented:
+            self.requests += 1
+        return result
+    
+    def _variant(self, context: Optional[RequestContext]) -> tuple:
+        """
+        Atributos del request que leen las condiciones (parte de la clave de la memo)
+        
+        Se leen sin evaluar las condiciones: sus regex solo corren en las
+        reglas que el prefiltro deja pasar, en orden de costo.
+        """
+        if not self._variant_readers or not self.memo.enabled:
+            return ()
+        if context is None:
+            context = EMPTY_CONTEXT
+        return tuple(reader.read(context) for reader in self._variant_readers)
+    
+    def _process_rules(self, request_path: str, query_string: str, facts: Optional[list],
+                       context: Optional[RequestContext] = None) -> RewriteResult:
+        """Evalúa las reglas registrando los hechos de filesystem consultados"""
+        # Aplicar reglas en orden, evaluando solo las candidatas del prefiltro
         current_path = request_path
         current_query = query_string
         
-        for rule in self.rules:
-            if rule.matches(current_path, self.document_root):
-                # Aplicar la regla
-                new_path, new_query = rule.apply(current_path, current_query)
-                
-                # Actualizar path y query
-                current_path = new_path
-                current_query = new_query
+        candidates = self.prefilter.candidates(current_path)
+        position = 0
+        instrumented = self.instrumented
+        
+        while position < len(candidates):
+            index = candidates[position]
+            rule = self.rules[index]
+            position += 1
+            
+            if instrumented:
+                started = time.perf_counter_ns()
+                match = rule.matches_instrumented(current_path, self.document_root, facts, context)
+                if match is None:
+                    rule.stats.nanoseconds += time.perf_counter_ns() - started
+                    continue
+                new_path, new_query = rule.apply(current_path, current_query, match)
+                rule.stats.matches += 1
+                rule.stats.nanoseconds += time.perf_counter_ns() - started
+            else:
+                match = rule.matches(current_path, self.document_root, facts, context)
+                if match is None:
+                    continue
                 
-                # Si el flag "L" (Last) está presente, detener el procesamiento
-                if "L" in rule.flags or "l" in rule.flags:
-                    break
+                # Aplicar la regla reutilizando el match
+                new_path, new_query = rule.apply(current_path, current_query, match)
+            
+            # Redirección, 403 o 410: respuesta inmediata
+            if rule.status is not None:
+                location = None
+                if rule.redirect:
+                    location = f"{new_path}?{new_query}" if new_query else new_path
+                return RewriteResult(new_path, new_query, rule.status, location)
+            
+            # Si el flag "L" (Last) está presente, detener el procesamiento
+            if rule.last:
+                current_path, current_query = new_path, new_query
+                break
+            
+            # La ruta cambió: recalcular candidatas entre las reglas siguientes
+            if new_path != current_path:
+                candidates = [i for i in self.prefilter.candidates(new_path) if i > index]
+                position = 0
+            
+            current_path = new_path
+            current_query = new_query
         
-        return current_path, current_query
+        return RewriteResult(current_path, current_query)
     
     def is_enabled(self) -> bool:
         """Retorna True si el motor de rewrite está habilitado"""
         return self.enabled
     
+    def uses_filesystem(self) -> bool:
+        """Retorna True si alguna regla tiene condiciones que consultan el filesystem"""
+        return self._uses_filesystem
+    
+    def uses_request_context(self) -> bool:
+        """Retorna True si alguna regla tiene condiciones sobre el request (host, método...)"""
+        return bool(self._context_conditions)
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Estadísticas del motor para el dashboard
+        
+        Las reglas con evaluations=0 nunca pasaron el prefiltro y las que
+        tienen matches=0 nunca se aplicaron: ambas son candidatas a borrar.
+        """
+        rules = []
+        for index, rule in enumerate(self.rules):
+            entry: Dict[str, Any] = {
+                'index': index,
+                'pattern': rule.pattern_str,
+                'target': rule.target,
+                'flags': list(rule.flags),
+                'conditions': [type(condition).__name__ for condition in rule.conditions],
+            }
+            if rule.stats is not None:
+                entry.update(rule.stats.to_dict())
+            rules.append(entry)
+        
+        return {
+            'domain': self.vhost.get('domain'),
+            'port': self.vhost.get('port'),
+            'instrumented': self.instrumented,
+            'requests': self.requests,
+            'nanoseconds': self.nanoseconds,
+            'avg_nanoseconds': self.nanoseconds // self.requests if self.requests else 0,
+            'memo': self.memo.get_stats(),
+            'rules': rules,
+        }
+    
+    def reset_stats(self) -> None:
+        """Pone en cero los contadores del motor y de cada regla"""
+        self.requests = 0
+        self.nanoseconds = 0
+        for rule in self.rules:
+            if rule.stats is not None:
+                rule.stats.reset()
+    
     def get_rules_count(self) -> int:
         """Retorna la cantidad de reglas cargadas"""
         return len(self.rules)
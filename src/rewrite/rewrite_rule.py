@@ -4,8 +4,15 @@ Representa una regla de reescritura de URL
 """
 
 import re
-from typing import List, Tuple, Optional
+from typing import List, Match, Tuple, Optional
 from .conditions import Condition
+from .context import RequestContext
+from .instrumentation import RuleStats
+from .template import QueryTemplate, TargetTemplate
+
+
+# Códigos aceptados por el flag R=NNN (R solo equivale a 302)
+REDIRECT_STATUSES = (301, 302, 303, 307, 308)
 
 
 class RewriteRule:
@@ -21,7 +28,28 @@ class RewriteRule:
         conditions:
           - type: "file_not_exists"
           - type: "dir_not_exists"
+      - pattern: "^/api/(.*)$"
+        target: "/api.php"
+        query_string: "ruta=$1"
+        conditions:
+          - type: "method"
+            methods: ["POST"]
+      - pattern: "^/viejo/(.*)$"
+        target: '/nuevo/\\1'
+        flags: ["R=301"]
+      - pattern: "^/privado/"
+        target: "-"
+        flags: ["F"]
     ```
+    
+    Flags soportados:
+        L: Última regla a evaluar
+        QSA: Agrega el query string original
+        R / R=301|302|303|307|308: Redirección al target (implica L)
+        F: Responde 403 Forbidden (implica L)
+        G: Responde 410 Gone (implica L)
+    
+    Un target "-" deja la ruta sin cambios.
     """
     
     def __init__(
@@ -39,8 +67,12 @@ class RewriteRule:
             pattern: Patrón regex para la URL (ej: "^(.*)$")
             target: URL destino (ej: "/index.php")
             query_string: Query string a agregar (ej: "url=$1")
-            conditions: Lista de condiciones que deben cumplirse
+            conditions: Lista de condiciones que deben cumplirse (se evalúan
+                de menor a mayor costo: atributos del request antes que el filesystem)
             flags: Flags de la regla (ej: ["QSA", "L"])
+        
+        Raises:
+            ValueError: si el patrón, el target o un flag R=NNN son inválidos
         """
         try:
             self.pattern = re.compile(pattern)
@@ -50,35 +82,97 @@ class RewriteRule:
         self.pattern_str = pattern
         self.target = target
         self.query_string = query_string
-        self.conditions = conditions or []
+        self.conditions = sorted(conditions or [], key=lambda condition: condition.cost)
         self.flags = flags or []
+        
+        # Plantillas compiladas: apply expande desde el match sin volver a ejecutar la regex
+        self.target_template = TargetTemplate(target, self.pattern, pattern)
+        self.query_template = QueryTemplate(query_string, self.pattern.groups)
+        self.qsa = "QSA" in self.flags or "qsa" in self.flags
+        
+        # Acción terminal (R, F, G): status de la respuesta y si es redirección
+        self.status, self.redirect = self._parse_terminal_flags(self.flags)
+        self.last = self.status is not None or "L" in self.flags or "l" in self.flags
+        
+        # Contadores (solo si el motor está instrumentado)
+        self.stats: Optional[RuleStats] = None
+    
+    @staticmethod
+    def _parse_terminal_flags(flags: List[str]) -> Tuple[Optional[int], bool]:
+        """Obtiene (status, es_redirección) de los flags R, F y G"""
+        for flag in flags:
+            name, _, value = str(flag).upper().partition('=')
+            if name == 'R':
+                status = int(value) if value.isdigit() else 302 if not value else None
+                if status not in REDIRECT_STATUSES:
+                    raise ValueError(f"Flag de redirección inválido: {flag}")
+                return status, True
+            if name == 'F':
+                return 403, False
+            if name == 'G':
+                return 410, False
+        return None, False
     
-    def matches(self, request_path: str, document_root: str) -> bool:
+    def matches(self, request_path: str, document_root: str, facts: Optional[list] = None,
+                context: Optional[RequestContext] = None) -> Optional[Match]:
         """
         Verifica si la regla coincide con la ruta del request
         
         Args:
             request_path: Ruta del request (ej: /usuarios/123)
             document_root: Raíz del documento del virtual host
+            facts: Si se indica, se agrega (condición, ruta, resultado) por
+                cada condición de filesystem evaluada
+            context: Datos del request para las condiciones que los usan
             
         Returns:
-            True si el patrón coincide y todas las condiciones se cumplen
+            El objeto match (verdadero) si el patrón coincide y todas las
+            condiciones se cumplen; None en caso contrario. Puede pasarse a
+            apply para no volver a ejecutar la regex.
         """
         # Verificar que el patrón coincida
-        if not self.pattern.match(request_path):
-            return False
+        match = self.pattern.match(request_path)
+        if match is None:
+            return None
         
         # Verificar todas las condiciones
         for condition in self.conditions:
-            if not condition.evaluate(request_path, document_root):
-                return False
+            result = condition.evaluate(request_path, document_root, context)
+            if facts is not None and condition.uses_filesystem:
+                facts.append((condition, request_path, result))
+            if not result:
+                return None
         
-        return True
+        return match
+    
+    def matches_instrumented(self, request_path: str, document_root: str, facts: Optional[list] = None,
+                             context: Optional[RequestContext] = None) -> Optional[Match]:
+        """Igual que matches, actualizando self.stats (requiere stats inicializado)"""
+        stats = self.stats
+        stats.evaluations += 1
+        
+        match = self.pattern.match(request_path)
+        if match is None:
+            return None
+        
+        for condition in self.conditions:
+            result = condition.evaluate(request_path, document_root, context)
+            stats.condition_evaluations += 1
+            if condition.uses_filesystem:
+                stats.filesystem_probes += 1
+                if facts is not None:
+                    facts.append((condition, request_path, result))
+            if not result:
+                stats.condition_failures += 1
+                return None
+        
+        return match
     
     def apply(
         self,
         request_path: str,
-        original_query: str = ""
+        original_query: str = "",
+        match: Optional[Match] = None
     ) -> Tuple[str, str]:
         """
         Aplica la regla de rewrite a la ruta del request
@@ -86,28 +180,26 @@ class RewriteRule:
         Args:
             request_path: Ruta del request original
             original_query: Query string original
+            match: Resultado de matches() para request_path (si no se indica
+                se ejecuta la regex)
             
         Returns:
             Tupla (ruta_reescrita, query_string_final)
         """
-        # Aplicar el patrón de rewrite
-        match = self.pattern.match(request_path)
-        if not match:
-            return request_path, original_query
-        
-        # Reemplazar el patrón con el target
-        rewritten_path = self.pattern.sub(self.target, request_path)
+        if match is None:
+            match = self.pattern.match(request_path)
+            if match is None:
+                return request_path, original_query
         
-        # Procesar query string con capturas del regex
-        query = self.query_string
-        if match and query:
-            # Reemplazar $1, $2, etc. con los grupos capturados
-            for i, group in enumerate(match.groups(), 1):
-                if group is not None:
-                    query = query.replace(f"${i}", group)
+        # Expandir target y query string desde el mismo match
+        if self.target == '-':
+            rewritten_path = request_path
+        else:
+            rewritten_path = self.target_template.substitute(request_path, match)
+        query = self.query_template.expand(match)
         
         # Manejar flag QSA (Query String Append)
-        if "QSA" in self.flags or "qsa" in self.flags:
+        if self.qsa:
             if original_query:
                 query = f"{query}&{original_query}" if query else original_query
         
@@ -0,0 +1,161 @@
+"""
+Plantillas de sustitución de reglas de rewrite
+Target y query_string precompilados en segmentos literales y referencias a grupos
+"""
+
+import re
+from typing import List, Match, Optional, Pattern, Union
+
+
+# Segmento de una plantilla: texto literal o número de grupo capturado
+Segment = Union[str, int]
+
+# $1 .. $9 en el query_string (estilo Apache, un dígito)
+_QUERY_REFERENCE = re.compile(r'\$([1-9])')
+
+# \1 .. \99, \g<n> y \g<nombre> en el target (sintaxis de re.sub)
+_TARGET_REFERENCE = re.compile(r'\\(?:([1-9]\d?)|g<([^>]*)>)')
+
+
+def _join(segments: List[Segment]) -> tuple:
+    """Une literales consecutivos para expandir con la menor cantidad de piezas"""
+    joined: List[Segment] = []
+    for segment in segments:
+        if isinstance(segment, str):
+            if not segment:
+                continue
+            if joined and isinstance(joined[-1], str):
+                joined[-1] += segment
+                continue
+        joined.append(segment)
+    return tuple(joined)
+
+
+class QueryTemplate:
+    """
+    query_string de una regla con referencias $N
+
+    Conserva la semántica anterior (str.replace por grupo): un $N cuyo grupo
+    no existe o no participó del match queda como texto literal.
+    """
+
+    __slots__ = ('source', 'segments', 'is_literal')
+
+    def __init__(self, template: str, group_count: int):
+        """
+        Compila la plantilla
+
+        Args:
+            template: query_string de la regla (ej: "url=$1&id=$2")
+            group_count: Cantidad de grupos del patrón de la regla
+        """
+        self.source = template
+        segments: List[Segment] = []
+        position = 0
+        for reference in _QUERY_REFERENCE.finditer(template):
+            group = int(reference.group(1))
+            if group > group_count:
+                continue
+            segments.append(template[position:reference.start()])
+            segments.append(group)
+            position = reference.end()
+        segments.append(template[position:])
+
+        self.segments = _join(segments)
+        self.is_literal = all(isinstance(segment, str) for segment in self.segments)
+
+    def expand(self, match: Match) -> str:
+        """Construye el query_string a partir del match de la regla"""
+        if self.is_literal:
+            return self.source
+        parts = []
+        for segment in self.segments:
+            if segment.__class__ is int:
+                value = match.group(segment)
+                parts.append(value if value is not None else f"${segment}")
+            else:
+                parts.append(segment)
+        return ''.join(parts)
+
+
+class TargetTemplate:
+    """
+    target de una regla, con la sintaxis de reemplazo de re.sub
+
+    Las referencias \\N, \\g<N> y \\g<nombre> se resuelven al compilar; un grupo
+    que no participó del match se reemplaza por '' (como re.sub). Si el
+    target usa otros escapes se delega en match.expand.
+
+    Para patrones anclados con ^ y sin alternativas de primer nivel solo puede
+    haber un match, así que el resultado es target expandido + resto de la
+    ruta, igual que pattern.sub. En los demás casos se usa pattern.sub para
+    conservar el reemplazo de todas las ocurrencias.
+    """
+
+    __slots__ = ('source', 'pattern', 'segments', 'single_match', 'is_literal')
+
+    def __init__(self, template: str, pattern: Pattern, pattern_source: str):
+        """
+        Compila la plantilla
+
+        Args:
+            template: target de la regla (ej: "/index.php" o "/blog/\\1.php")
+            pattern: Patrón compilado de la regla
+            pattern_source: Patrón original (para detectar el anclaje)
+
+        Raises:
+            ValueError: si referencia un grupo inexistente
+        """
+        self.source = template
+        self.pattern = pattern
+        self.single_match = pattern_source.startswith('^') and '|' not in pattern_source
+
+        segments: Optional[List[Segment]] = []
+        position = 0
+        for reference in _TARGET_REFERENCE.finditer(template):
+            name = reference.group(1) or reference.group(2)
+            if name.isdigit():
+                group = int(name)
+            elif name in pattern.groupindex:
+                group = pattern.groupindex[name]
+            else:
+                raise ValueError(f"Grupo desconocido en el target: {reference.group(0)}")
+            if group > pattern.groups:
+                raise ValueError(f"Grupo inexistente en el target: {reference.group(0)}")
+            segments.append(template[position:reference.start()])
+            segments.append(group)
+            position = reference.end()
+        segments.append(template[position:])
+
+        # Otros escapes (\n, \\, ...) los interpreta match.expand
+        literals = [segment for segment in segments if isinstance(segment, str)]
+        if any('\\' in literal for literal in literals):
+            segments = None
+
+        self.segments = _join(segments) if segments is not None else None
+        self.is_literal = self.segments is not None and all(
+            isinstance(segment, str) for segment in self.segments
+        )
+
+    def expand(self, match: Match) -> str:
+        """Expande el target para un match (sin volver a ejecutar el patrón)"""
+        if self.is_literal:
+            return self.segments[0] if self.segments else ''
+        if self.segments is None:
+            return match.expand(self.source)
+        return ''.join(
+            (match.group(segment) or '') if segment.__class__ is int else segment
+            for segment in self.segments
+        )
+
+    def substitute(self, request_path: str, match: Match) -> str:
+        """
+        Equivalente a pattern.sub(target, request_path) partiendo del match inicial
+
+        Args:
+            request_path: Ruta sobre la que se obtuvo el match
+            match: Resultado de pattern.match(request_path)
+        """
+        if not self.single_match:
+            return self.pattern.sub(self.source, request_path)
+        return self.expand(match) + request_path[match.end():]
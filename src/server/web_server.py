@@ -3,11 +3,9 @@ import os
 import time
 import ssl
 from aiohttp import web, web_request
-from aiofiles import open as aio_open
-import mimetypes
-from pathlib import Path
 from typing import Optional, List, Tuple
 
+from config.blocklist import Blocklist
 from config.config_manager import config
 from php_fpm.php_manager import php_manager
 from dashboard.dashboard_server import DashboardServer
@@ -15,6 +13,14 @@ from utils.geoip import geoip_manager
 from database.mongodb_client import mongodb_client
 from tls.ssl_manager import ssl_manager
 from rewrite.rewrite_engine import RewriteEngine
+from rewrite.context import RequestContext
+from rewrite.result import RewriteResult
+from static_files.conditional import encoded_etag
+from static_files.path_resolver import PathDecision, path_resolver
+from static_files.static_handler import static_handler
+from utils.compression import add_vary, response_compressor
+from utils.docroot_manifest import ManifestMiss, docroot_manifests
+from utils.io_executor import io_executor
 
 class TechWebServer:
     """Servidor web principal con soporte para virtual hosts"""
@@ -22,6 +28,7 @@ class TechWebServer:
     def __init__(self):
         self.app = web.Application()
         self.dashboard = DashboardServer()
+        config.compile_rewrite_engines()
         self.setup_routes()
         
     def setup_routes(self):
@@ -78,110 +85,95 @@ class TechWebServer:
             # Obtener el host del request
             host = request.headers.get('Host', 'localhost').split(':')[0]
 
-            # Buscar virtual host correspondiente
-            vhost = None
-
-            # Si SSL está deshabilitado, usar routing ESTRICTO por (dominio, puerto)
-            if not config.get('ssl_enabled', True):
-                # Obtener puerto del servidor desde el request
-                server_port = request.transport.get_extra_info('sockname')[1] if request.transport else None
-                if server_port:
-                    vhost = config.get_virtual_host_by_domain_and_port(host, server_port)
-                # NO hacer fallback - routing estricto por (dominio, puerto)
-            else:
-                # Modo SSL: usar routing tradicional por dominio únicamente
-                vhost = config.get_virtual_host_by_domain(host)
+            # Buscar virtual host correspondiente (índice por nombre/puerto, con
+            # aliases, comodines y default por puerto)
+            sockname = request.transport.get_extra_info('sockname') if request.transport else None
+            server_port = sockname[1] if sockname else None
+            vhost = config.resolve_virtual_host(host, server_port)
 
             if not vhost:
-                # Si no se encuentra, usar el primer virtual host como default
-                virtual_hosts = config.get_virtual_hosts()
-                if virtual_hosts:
-                    vhost = virtual_hosts[0]
-                else:
-                    return web.Response(text="No virtual hosts configured", status=500)
+                return web.Response(text="No virtual hosts configured", status=500)
 
             # Verificar si necesita redirección HTTP → HTTPS
             if self._should_redirect_to_https(request, vhost):
                 return self._create_https_redirect(request, vhost)
 
-            # Aplicar reglas de rewrite si están configuradas
-            path = request.path.lstrip('/')
+            document_root = vhost['document_root']
             query_string = request.query_string or ''
+            blocklist = config.get_blocklist(vhost)
+
+            # Reglas de rewrite compiladas al cargar la configuración
+            rewrite_engine = config.get_rewrite_engine(vhost)
+
+            # Host, método, headers, IP y cookies para las condiciones que los usan
+            context = None
+            if rewrite_engine is not None and rewrite_engine.uses_request_context():
+                context = RequestContext(
+                    host=host, method=request.method, headers=request.headers,
+                    query_string=query_string, client_ip=self._get_real_client_ip(request),
+                    cookies=request.cookies
+                )
 
-            if vhost.get('rewrite_rules'):
-                try:
-                    rewrite_engine = RewriteEngine(vhost, vhost['document_root'])
-                    if rewrite_engine.is_enabled():
-                        # Procesar rewrite rules
-                        path, query_string = rewrite_engine.process(request.path, query_string)
-                        # Limpiar la ruta después del rewrite
-                        path = path.lstrip('/')
-                except Exception as e:
-                    print(f"⚠️  Error en rewrite engine para {vhost.get('domain')}: {e}")
+            # Un resultado memorizado vigente se usa directo; si no está (o sus
+            # hechos de filesystem vencieron) las condiciones necesitan I/O
+            rewritten = None
+            needs_io = False
+            if rewrite_engine is not None and rewrite_engine.uses_filesystem():
+                rewritten = rewrite_engine.lookup(request.path, query_string, context)
+                needs_io = rewritten is None
+
+            # Con el manifiesto del document_root listo las verificaciones de
+            # existencia suelen ser consultas en memoria: se intenta sin el
+            # executor y, si el manifiesto no alcanza, se repite en él
+            in_memory = docroot_manifests.is_ready(document_root)
+
+            routed = None
+            if needs_io and in_memory:
+                routed = self._in_memory(
+                    self._route_path, rewrite_engine, vhost, blocklist, request.path, query_string, context
+                )
 
-            if not path:
-                path = ''  # Dejar vacío para que se resuelva como directorio
+            decision = None
+            if routed is not None:
+                rewritten, decision = routed
+            elif needs_io:
+                # Las condiciones del rewrite y la resolución de la ruta se
+                # verifican juntas, en un único salto al executor de I/O
+                rewritten, decision = await io_executor.run(
+                    document_root, self._route_path, rewrite_engine, vhost, blocklist,
+                    request.path, query_string, context
+                )
+            elif rewritten is None:
+                rewritten = self._apply_rewrite(rewrite_engine, vhost, request.path, query_string, context)
 
-            # Verificar rutas bloqueadas antes de construir el path completo
-            if path:
-                blocked_directories = ['.git', '.svn', '.hg', '.bzr', 'node_modules', '.vscode', '.idea']
-                path_parts = path.split('/')
-                for part in path_parts:
-                    if part.lower() in blocked_directories:
-                        return web.Response(text="Forbidden", status=403)
+            # Redirección, 403 o 410 de una regla R/F/G: sin filesystem ni PHP
+            if rewritten.is_terminal:
+                return self._create_rewrite_response(request, rewritten, vhost, start_time)
 
-            # Construir ruta completa del archivo
-            document_root = Path(vhost['document_root'])
+            # Vacío se resuelve como el document_root
+            path = rewritten.path.lstrip('/')
+            query_string = rewritten.query
 
-            # Si path está vacío, usar directamente el document_root
-            if not path:
-                file_path = document_root
-            else:
-                file_path = document_root / path
+            # Verificar rutas bloqueadas antes de servir
+            if blocklist.is_blocked_path(path):
+                return web.Response(text="Forbidden", status=403)
 
-            # Verificar que el archivo existe y está dentro del document_root
-            try:
-                file_path = file_path.resolve()
-                document_root = document_root.resolve()
-
-                if not str(file_path).startswith(str(document_root)):
-                    return web.Response(text="Forbidden", status=403)
-
-                if not file_path.exists():
-                    return web.Response(text="Not Found", status=404)
-                
-                if file_path.is_dir():
-                    # Si es directorio, buscar archivos index en orden de prioridad
-                    index_files = ['index.html', 'index.php', 'index.htm']
-                    index_found = False
-
-                    for index_name in index_files:
-                        index_file = file_path / index_name
-                        if index_file.exists():
-                            file_path = index_file
-                            index_found = True
-                            break
-
-                    if not index_found:
-                        return web.Response(text="Directory listing not allowed", status=403)
-                
-            except (OSError, ValueError):
-                return web.Response(text="Bad Request", status=400)
+            # Resolver la ruta (memoizado por document_root + ruta)
+            if decision is not None:
+                decision = path_resolver.store(document_root, path, decision)
+            else:
+                decision = path_resolver.lookup(document_root, path)
+                if decision is None:
+                    probed = self._in_memory(path_resolver.probe, document_root, path) if in_memory else None
+                    if probed is None:
+                        probed = await io_executor.run(document_root, path_resolver.probe, document_root, path)
+                    decision = path_resolver.store(document_root, path, probed)
+            if not decision.found:
+                return web.Response(text=decision.message, status=decision.status)
+            file_path = decision.file_path
 
             # Bloquear acceso a archivos sensibles específicos
-            blocked_files = ['.env', '.htaccess', '.htpasswd', 'config.php', 'wp-config.php',
-                           '.gitignore', '.gitattributes', '.gitmodules']
-            blocked_extensions = ['.bak', '.backup', '.old', '.orig', '.tmp', '.log', '.swp', '.swo']
-
-            # Archivos que empiezan con . que están específicamente bloqueados
-            blocked_dot_files = ['.env', '.htaccess', '.htpasswd', '.gitignore', '.gitattributes',
-                               '.gitmodules', '.git', '.svn', '.hg', '.bzr']
-
-            # Verificar si el archivo final está bloqueado
-            filename = file_path.name.lower()
-            if (filename in blocked_files or
-                any(filename.endswith(ext) for ext in blocked_extensions) or
-                any(filename.startswith(blocked) for blocked in blocked_dot_files)):
+            if blocklist.is_blocked_file(file_path.name):
                 return web.Response(text="Forbidden", status=403)
 
             # Verificar si es un archivo PHP
@@ -189,24 +181,38 @@ class TechWebServer:
                 try:
                     # Ejecutar PHP a través de FastCGI
                     # Pasar el query_string modificado por el rewrite engine
-                    status, headers, content = await php_manager.execute_php_file(request, vhost, file_path, query_string)
+                    output = await php_manager.start_php_file(request, vhost, file_path, query_string)
+                    if output.stream is not None:
+                        return await self._stream_php_output(request, output, vhost, start_time)
+                    status, content = output.status, output.body
 
                     # Crear respuesta
                     response = web.Response(
                         body=content,
                         status=status
                     )
-
-                    # Agregar headers de PHP con corrección de redirecciones
-                    for header_name, header_value in headers.items():
-                        if header_name.lower() != 'status':
-                            # Corregir redirecciones Location para incluir puerto personalizado
-                            if header_name.lower() == 'location':
-                                header_value = self._fix_redirect_location(header_value, request, vhost)
-                                # Usar el nombre correcto del header para Location
-                                response.headers['Location'] = header_value
-                            else:
-                                response.headers[header_name] = header_value
+                    self._apply_php_headers(response, output.headers, request, vhost)
+                    if request.can_read_body and not request.content.is_eof():
+                        # Cuerpo rechazado (413): cerrar en lugar de recibirlo para descartarlo
+                        response.force_close()
+
+                    # Comprimir la salida de PHP si el script no lo hizo
+                    if 'Content-Encoding' not in response.headers and request.method != 'HEAD':
+                        encoding = response_compressor.choose_encoding(
+                            request.headers.get('Accept-Encoding', ''),
+                            response.headers.get('Content-Type', 'text/html'),
+                            len(content)
+                        )
+                        if encoding:
+                            # El Content-Length de PHP corresponde al cuerpo sin comprimir
+                            response.headers.pop('Content-Length', None)
+                            response.body = await response_compressor.compress(content, encoding)
+                            response.headers['Content-Encoding'] = encoding
+                            response.headers['Vary'] = add_vary(response.headers.get('Vary'))
+                            # La representación comprimida necesita su propio ETag
+                            etag = response.headers.get('ETag')
+                            if etag and etag.endswith('"'):
+                                response.headers['ETag'] = encoded_etag(etag, encoding)
 
                     # Agregar headers de seguridad básicos
                     if not config.get('hide_server_header', True):
@@ -217,46 +223,104 @@ class TechWebServer:
 
                     return response
 
+                except ConnectionResetError:
+                    # El cliente o PHP-FPM cortaron una salida transmitida
+                    raise
                 except Exception as e:
                     print(f"Error ejecutando PHP: {e}")
                     return web.Response(text="PHP execution error", status=500)
 
             else:
-                # Servir archivo estático
-                # Determinar tipo MIME
-                content_type, _ = mimetypes.guess_type(str(file_path))
-                if content_type is None:
-                    content_type = 'application/octet-stream'
-
-                # Leer y servir el archivo
+                # Servir archivo estático (sendfile/streaming para archivos grandes)
                 try:
-                    async with aio_open(file_path, 'rb') as f:
-                        content = await f.read()
-
-                    # Crear respuesta
-                    response = web.Response(
-                        body=content,
-                        content_type=content_type
-                    )
-
-                    # Agregar headers de seguridad básicos
-                    if not config.get('hide_server_header', True):
-                        response.headers['Server'] = 'TechWebServer/1.0'
+                    response = await static_handler.serve(request, file_path, vhost)
 
                     # Registrar estadísticas
-                    self._log_request(request, 200, 'static', start_time, vhost)
+                    self._log_request(request, response.status, 'static', start_time, vhost)
 
                     return response
 
+                except ConnectionResetError:
+                    # El cliente cerró la conexión durante el envío
+                    raise
                 except IOError:
                     return web.Response(text="Internal Server Error", status=500)
             
+        except ConnectionResetError:
+            raise
         except Exception as e:
             print(f"Error handling request: {e}")
             response = web.Response(text="Internal Server Error", status=500)
             self._log_request(request, 500, 'error', start_time, None)
             return response
 
+    def _apply_rewrite(self, rewrite_engine: Optional[RewriteEngine], vhost: dict,
+                       request_path: str, query_string: str,
+                       context: Optional[RequestContext] = None) -> RewriteResult:
+        """Aplica las reglas de rewrite (sin reglas o ante un error la ruta queda igual)"""
+        if rewrite_engine is not None and rewrite_engine.is_enabled():
+            try:
+                return rewrite_engine.rewrite(request_path, query_string, context)
+            except Exception as e:
+                print(f"⚠️  Error en rewrite engine para {vhost.get('domain')}: {e}")
+        return RewriteResult(request_path, query_string)
+
+    def _route_path(self, rewrite_engine: RewriteEngine, vhost: dict, blocklist: Blocklist,
+                    request_path: str, query_string: str,
+                    context: Optional[RequestContext] = None) -> Tuple[RewriteResult, Optional[PathDecision]]:
+        """
+        Rewrite con condiciones de filesystem + resolución de la ruta
+
+        Se ejecuta en el executor de I/O, o en el event loop con _in_memory si
+        el manifiesto está listo; la decisión se registra después en el
+        path_resolver desde el event loop. Las acciones terminales no
+        resuelven la ruta.
+        """
+        rewritten = self._apply_rewrite(rewrite_engine, vhost, request_path, query_string, context)
+        path = rewritten.path.lstrip('/')
+        if rewritten.is_terminal or blocklist.is_blocked_path(path):
+            return rewritten, None
+        return rewritten, path_resolver.probe(vhost['document_root'], path)
+
+    @staticmethod
+    def _in_memory(func, *args):
+        """
+        Ejecuta func en el event loop respondiendo solo desde el manifiesto
+
+        Returns:
+            El resultado de func, o None si necesitaba el filesystem (symlinks,
+            '..', manifiesto desbordado): hay que repetir en el executor de I/O
+        """
+        try:
+            with docroot_manifests.memory_only():
+                return func(*args)
+        except ManifestMiss:
+            return None
+
+    @staticmethod
+    def _on_docroot_change(document_root: str, path: str, is_dir: bool) -> None:
+        """Invalida la memo de rewrite de los virtual hosts del document_root (thread del manifiesto)"""
+        for vhost in config.get_virtual_hosts():
+            if vhost.get('document_root') != document_root:
+                continue
+            rewrite_engine = config.get_rewrite_engine(vhost)
+            if rewrite_engine is not None:
+                rewrite_engine.memo.invalidate_path(path, recursive=is_dir)
+
+    def _create_rewrite_response(self, request: web_request.Request, rewritten: RewriteResult,
+                                 vhost: dict, start_time: float) -> web.Response:
+        """Responde una regla R (redirección), F (403) o G (410)"""
+        if rewritten.is_redirect:
+            location = self._fix_redirect_location(rewritten.location, request, vhost)
+            response = web.Response(status=rewritten.status, headers={'Location': location})
+        elif rewritten.status == 410:
+            response = web.Response(text="Gone", status=410)
+        else:
+            response = web.Response(text="Forbidden", status=rewritten.status)
+
+        self._log_request(request, rewritten.status, 'rewrite', start_time, vhost)
+        return response
+
     def _should_redirect_to_https(self, request: web_request.Request, vhost: dict) -> bool:
         """Determina si la petición HTTP debe ser redirigida a HTTPS"""
         # Solo redirigir si:
@@ -294,6 +358,56 @@ class TechWebServer:
 
         return response
 
+    def _apply_php_headers(self, response: web.StreamResponse, headers: dict,
+                           request: web_request.Request, vhost: dict):
+        """Copia los headers de PHP a la respuesta con corrección de redirecciones"""
+        for header_name, header_value in headers.items():
+            if header_name.lower() not in ('status', 'x-accel-buffering'):
+                # Corregir redirecciones Location para incluir puerto personalizado
+                if header_name.lower() == 'location':
+                    header_value = self._fix_redirect_location(header_value, request, vhost)
+                    # Usar el nombre correcto del header para Location
+                    response.headers['Location'] = header_value
+                else:
+                    response.headers[header_name] = header_value
+
+    async def _stream_php_output(self, request: web_request.Request, output, vhost: dict,
+                                 start_time: float) -> web.StreamResponse:
+        """
+        Transmite una salida PHP grande a medida que PHP-FPM la produce
+
+        write() espera (drain) cuando el buffer del cliente está lleno y
+        mientras tanto no se lee el próximo registro de PHP-FPM. La salida
+        transmitida no se comprime.
+        """
+        response = web.StreamResponse(status=output.status)
+        self._apply_php_headers(response, output.headers, request, vhost)
+        if not config.get('hide_server_header', True):
+            response.headers['Server'] = 'TechWebServer/1.0'
+
+        try:
+            await response.prepare(request)
+            if output.body:
+                await response.write(output.body)
+            while True:
+                try:
+                    chunk = await php_manager.read_stream(output)
+                except Exception as e:
+                    # Los headers ya se enviaron: solo queda cortar la conexión
+                    print(f"Error transmitiendo salida PHP: {e}")
+                    if request.transport is not None:
+                        request.transport.close()
+                    raise ConnectionResetError("Salida PHP truncada durante el envío")
+                if not chunk:
+                    break
+                await response.write(chunk)
+            await response.write_eof()
+        finally:
+            php_manager.finish_stream(output)
+
+        self._log_request(request, output.status, 'php', start_time, vhost)
+        return response
+
     def _fix_redirect_location(self, location: str, request: web_request.Request, vhost: dict) -> str:
         """Corrige redirecciones Location para incluir puerto personalizado cuando sea necesario"""
         # Si ya es una URL absoluta, no modificar
@@ -442,6 +556,11 @@ class TechWebServer:
             ssl_info = " [SSL]" if vhost.get('ssl_enabled', False) else ""
             print(f"   - {vhost['domain']} -> {vhost['document_root']}{php_info}{ssl_info}")
 
+        # Manifiestos en memoria de los document_root que lo habilitan; sus
+        # cambios descartan los rewrites memorizados que dependían de ellos
+        docroot_manifests.add_listener(self._on_docroot_change)
+        docroot_manifests.configure(config.get_virtual_hosts())
+
         # Crear runner
         runner = web.AppRunner(self.app)
         await runner.setup()
@@ -575,9 +694,16 @@ async def main():
         await runner.cleanup()
         await dashboard_runner.cleanup()
 
+        # Cerrar las conexiones persistentes a PHP-FPM
+        await php_manager.close_connections()
+
         # Limpiar contextos SSL
         ssl_manager.cleanup_ssl_contexts()
 
+        # Detener el executor de I/O de filesystem y los manifiestos
+        io_executor.shutdown()
+        docroot_manifests.stop()
+
         print("✅ Servidor detenido")
 
 if __name__ == '__main__':
@@ -0,0 +1,31 @@
+"""
+Módulo de entrega de archivos estáticos para Tech Web Server
+Sirve archivos del document_root con memoria acotada usando sendfile del kernel
+"""
+
+from .conditional import build_validators, is_not_modified
+from .file_cache import CachedFile, StaticFileCache, static_file_cache
+from .file_sender import FileSender, file_sender
+from .path_resolver import PathDecision, PathResolver, path_resolver
+from .precompressed import PrecompressedResolver, precompressed_resolver
+from .ranges import RangeNotSatisfiable, parse_range_header
+from .static_handler import StaticFileHandler, static_handler
+
+__all__ = [
+    'build_validators',
+    'is_not_modified',
+    'CachedFile',
+    'StaticFileCache',
+    'static_file_cache',
+    'FileSender',
+    'file_sender',
+    'PathDecision',
+    'PathResolver',
+    'path_resolver',
+    'PrecompressedResolver',
+    'precompressed_resolver',
+    'RangeNotSatisfiable',
+    'parse_range_header',
+    'StaticFileHandler',
+    'static_handler',
+]
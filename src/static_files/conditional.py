@@ -0,0 +1,138 @@
+"""
+Validadores HTTP para archivos estáticos
+Genera ETag / Last-Modified y evalúa If-None-Match / If-Modified-Since (RFC 7232)
+"""
+
+import hashlib
+import os
+import re
+from email.utils import formatdate, parsedate_to_datetime
+from typing import Dict, Optional
+
+from aiohttp import web_request
+
+
+ETAG_MODE_STRONG = 'strong'
+ETAG_MODE_WEAK = 'weak'
+ETAG_MODE_HASH = 'hash'
+ETAG_MODES = (ETAG_MODE_STRONG, ETAG_MODE_WEAK, ETAG_MODE_HASH)
+
+# Una entidad del header If-None-Match: W/"valor" o "valor"
+_ETAG_RE = re.compile(r'(W/)?"([^"]*)"')
+
+
+def stat_etag(st: os.stat_result, weak: bool = False) -> str:
+    """
+    Genera un ETag a partir de inode, tamaño y mtime
+
+    Args:
+        st: Resultado de stat del archivo
+        weak: Si es True genera un ETag débil (W/"...")
+    """
+    tag = f'"{st.st_ino:x}-{st.st_size:x}-{st.st_mtime_ns:x}"'
+    return f'W/{tag}' if weak else tag
+
+
+def content_etag(body: bytes) -> str:
+    """Genera un ETag fuerte a partir del hash del contenido"""
+    return f'"{hashlib.blake2b(body, digest_size=16).hexdigest()}"'
+
+
+def encoded_etag(etag: str, encoding: str) -> str:
+    """
+    Deriva el ETag de una representación comprimida dinámicamente
+
+    Cada codificación es una representación distinta y necesita su propio
+    ETag (ej: "abc" -> "abc-gzip").
+    """
+    return f'{etag[:-1]}-{encoding}"'
+
+
+def http_date(timestamp: float) -> str:
+    """Formatea un timestamp como fecha HTTP (IMF-fixdate)"""
+    return formatdate(timestamp, usegmt=True)
+
+
+def build_validators(st: os.stat_result, mode: str = ETAG_MODE_STRONG,
+                     body: Optional[bytes] = None) -> Dict[str, str]:
+    """
+    Construye los headers ETag y Last-Modified de un archivo
+
+    Args:
+        st: Resultado de stat del archivo
+        mode: strong, weak o hash
+        body: Contenido del archivo (necesario para el modo hash)
+
+    Returns:
+        Diccionario con ETag y Last-Modified
+    """
+    if mode == ETAG_MODE_HASH and body is not None:
+        etag = content_etag(body)
+    else:
+        etag = stat_etag(st, weak=(mode == ETAG_MODE_WEAK))
+
+    return {
+        'ETag': etag,
+        'Last-Modified': http_date(st.st_mtime),
+    }
+
+
+def has_conditional_headers(request: web_request.Request) -> bool:
+    """Indica si el request trae validadores para un GET condicional"""
+    return ('If-None-Match' in request.headers or
+            'If-Modified-Since' in request.headers)
+
+
+def _opaque_tag(etag: str) -> str:
+    """Quita el prefijo W/ para la comparación débil"""
+    return etag[2:] if etag.startswith('W/') else etag
+
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    """
+    Compara un If-None-Match contra un ETag usando comparación débil
+
+    Args:
+        if_none_match: Valor del header If-None-Match
+        etag: ETag actual del recurso
+    """
+    if if_none_match.strip() == '*':
+        return True
+
+    current = _opaque_tag(etag)
+    for match in _ETAG_RE.finditer(if_none_match):
+        if f'"{match.group(2)}"' == current:
+            return True
+    return False
+
+
+def is_not_modified(request: web_request.Request, etag: Optional[str],
+                    mtime: float) -> bool:
+    """
+    Determina si corresponde responder 304 Not Modified
+
+    If-None-Match tiene precedencia: si está presente If-Modified-Since se
+    ignora (RFC 7232 sección 6). Solo aplica a GET y HEAD.
+
+    Args:
+        request: Request HTTP
+        etag: ETag actual del recurso
+        mtime: Fecha de modificación del recurso (timestamp)
+    """
+    if request.method not in ('GET', 'HEAD'):
+        return False
+
+    if_none_match = request.headers.get('If-None-Match')
+    if if_none_match is not None:
+        return etag is not None and etag_matches(if_none_match, etag)
+
+    if_modified_since = request.headers.get('If-Modified-Since')
+    if if_modified_since is not None:
+        try:
+            since = parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError, IndexError):
+            return False
+        # Las fechas HTTP tienen resolución de segundos
+        return int(mtime) <= since
+
+    return False
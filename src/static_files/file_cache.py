@@ -0,0 +1,208 @@
+"""
+Cache en memoria de archivos estáticos
+LRU acotado por bytes totales y tamaño máximo por objeto, revalidado por mtime/size
+"""
+
+import os
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Any
+
+from config.config_manager import config
+
+
+class CachedFile:
+    """Archivo estático cacheado con sus headers precalculados"""
+
+    __slots__ = ('path', 'body', 'content_type', 'headers', 'size',
+                 'mtime_ns', 'ino', 'checked_at')
+
+    def __init__(self, path: str, body: bytes, content_type: str,
+                 headers: Dict[str, str], st: os.stat_result):
+        self.path = path
+        self.body = body
+        self.content_type = content_type
+        self.headers = headers
+        self.size = st.st_size
+        self.mtime_ns = st.st_mtime_ns
+        self.ino = st.st_ino
+        self.checked_at = time.monotonic()
+
+    def matches_stat(self, st: os.stat_result) -> bool:
+        """Verifica que el archivo en disco no cambió"""
+        return (st.st_mtime_ns == self.mtime_ns and
+                st.st_size == self.size and
+                st.st_ino == self.ino)
+
+
+class StaticFileCache:
+    """
+    Cache LRU de archivos estáticos acotado por bytes
+
+    Las entradas se revalidan contra el filesystem (mtime, size, inode) como
+    mucho una vez cada validate_interval segundos, de modo que los hits
+    frecuentes no hacen syscalls.
+    """
+
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024, max_object_size: int = 1024 * 1024,
+                 validate_interval: float = 1.0, enabled: bool = True):
+        """
+        Inicializa la cache
+
+        Args:
+            max_bytes: Presupuesto total de bytes de contenido
+            max_object_size: Tamaño máximo de un archivo cacheable
+            validate_interval: Segundos entre revalidaciones de una entrada
+            enabled: Si es False la cache no almacena nada
+        """
+        self.max_bytes = max_bytes
+        self.max_object_size = max_object_size
+        self.validate_interval = validate_interval
+        self.enabled = enabled and max_bytes > 0 and max_object_size > 0
+
+        self._entries: 'OrderedDict[str, CachedFile]' = OrderedDict()
+        self._current_bytes = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self.rejected = 0
+
+    def is_cacheable(self, size: int) -> bool:
+        """Indica si un archivo de ese tamaño puede cachearse"""
+        return self.enabled and size <= self.max_object_size
+
+    def get(self, path: str) -> Optional[CachedFile]:
+        """
+        Busca un archivo en la cache
+
+        Args:
+            path: Ruta absoluta resuelta del archivo
+
+        Returns:
+            La entrada vigente o None si no está o cambió en disco
+        """
+        if not self.enabled:
+            return None
+
+        entry = self._entries.get(path)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        now = time.monotonic()
+        if now - entry.checked_at >= self.validate_interval:
+            try:
+                st = os.stat(path)
+            except OSError:
+                st = None
+
+            if st is None or not entry.matches_stat(st):
+                self.invalidate(path)
+                self.misses += 1
+                return None
+
+            entry.checked_at = now
+
+        self._entries.move_to_end(path)
+        self.hits += 1
+        return entry
+
+    def needs_validation(self, path: str) -> bool:
+        """Indica si la entrada existe y get haría un stat para revalidarla"""
+        entry = self._entries.get(path)
+        return entry is not None and time.monotonic() - entry.checked_at >= self.validate_interval
+
+    def validate(self, path: str, st: Optional[os.stat_result]) -> None:
+        """
+        Revalida una entrada con un stat obtenido fuera del event loop
+
+        Args:
+            path: Ruta absoluta resuelta del archivo
+            st: Resultado de stat, o None si el archivo ya no existe
+        """
+        entry = self._entries.get(path)
+        if entry is None:
+            return
+        if st is None or not entry.matches_stat(st):
+            self.invalidate(path)
+        else:
+            entry.checked_at = time.monotonic()
+
+    def put(self, path: str, body: bytes, content_type: str, headers: Dict[str, str],
+            st: os.stat_result) -> Optional[CachedFile]:
+        """
+        Almacena un archivo en la cache, desalojando los menos usados
+
+        Args:
+            path: Ruta absoluta resuelta del archivo
+            body: Contenido completo
+            content_type: Tipo MIME
+            headers: Headers precalculados de la respuesta
+            st: Resultado de stat correspondiente al contenido
+
+        Returns:
+            La entrada creada o None si el archivo no es cacheable
+        """
+        if not self.is_cacheable(len(body)):
+            self.rejected += 1
+            return None
+
+        if path in self._entries:
+            self._remove(path)
+
+        entry = CachedFile(path, body, content_type, headers, st)
+        self._entries[path] = entry
+        self._current_bytes += len(body)
+
+        while self._current_bytes > self.max_bytes and self._entries:
+            oldest_path = next(iter(self._entries))
+            self._remove(oldest_path)
+            self.evictions += 1
+
+        return entry
+
+    def invalidate(self, path: str) -> None:
+        """Elimina una entrada porque el archivo cambió"""
+        if path in self._entries:
+            self._remove(path)
+            self.invalidations += 1
+
+    def clear(self) -> None:
+        """Vacía la cache"""
+        self._entries.clear()
+        self._current_bytes = 0
+
+    def _remove(self, path: str) -> None:
+        entry = self._entries.pop(path)
+        self._current_bytes -= len(entry.body)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Retorna contadores para el dashboard"""
+        lookups = self.hits + self.misses
+        return {
+            'enabled': self.enabled,
+            'entries': len(self._entries),
+            'bytes': self._current_bytes,
+            'max_bytes': self.max_bytes,
+            'max_object_size': self.max_object_size,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+            'evictions': self.evictions,
+            'invalidations': self.invalidations,
+            'rejected': self.rejected,
+        }
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+# Instancia global de la cache de archivos estáticos
+static_file_cache = StaticFileCache(
+    max_bytes=config.get('static_cache_max_bytes', 64 * 1024 * 1024),
+    max_object_size=config.get('static_cache_max_object_size', 1024 * 1024),
+    validate_interval=config.get('static_cache_validate_interval', 1.0),
+    enabled=config.get('static_cache_enabled', True)
+)
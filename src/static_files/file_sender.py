@@ -0,0 +1,323 @@
+"""
+Envío de archivos estáticos
+Entrega archivos al cliente con os.sendfile (zero-copy) o en bloques acotados
+"""
+
+import asyncio
+import os
+from pathlib import Path
+from typing import BinaryIO, Dict, List, Optional, Tuple
+
+from aiohttp import web, web_request
+
+from config.config_manager import config
+from utils.io_executor import IOExecutor, io_executor
+from .ranges import Segment, segments_length
+
+
+class FileSender:
+    """
+    Entrega archivos regulares al cliente con memoria acotada
+
+    Modos de envío:
+    - memory:   lee el archivo completo y responde con web.Response
+    - sendfile: el kernel copia el archivo directo al socket (os.sendfile)
+    - chunked:  lee y escribe en bloques de tamaño fijo (fallback para TLS)
+    - auto:     memory por debajo del umbral, sendfile/chunked por encima
+    """
+
+    MODE_AUTO = 'auto'
+    MODE_MEMORY = 'memory'
+    MODE_SENDFILE = 'sendfile'
+    MODE_CHUNKED = 'chunked'
+    MODES = (MODE_AUTO, MODE_MEMORY, MODE_SENDFILE, MODE_CHUNKED)
+
+    def __init__(self, mode: str = MODE_AUTO, sendfile_min_size: int = 64 * 1024,
+                 chunk_size: int = 256 * 1024, io: Optional[IOExecutor] = None):
+        """
+        Inicializa el emisor de archivos
+
+        Args:
+            mode: Modo de envío (auto, memory, sendfile, chunked)
+            sendfile_min_size: Tamaño a partir del cual se evita leer a memoria
+            chunk_size: Tamaño de bloque para el modo chunked
+            io: Executor de I/O para abrir y leer (por defecto el global)
+        """
+        if mode not in self.MODES:
+            print(f"⚠️  Modo de envío estático desconocido: {mode}, usando '{self.MODE_AUTO}'")
+            mode = self.MODE_AUTO
+
+        self.mode = mode
+        self.sendfile_min_size = sendfile_min_size
+        self.chunk_size = chunk_size
+        self.io = io if io is not None else io_executor
+        self.stats = {
+            'memory': 0,
+            'sendfile': 0,
+            'chunked': 0,
+            'bytes_sent': 0,
+        }
+
+    def select_mode(self, request: web_request.Request, size: int,
+                    mode: Optional[str] = None) -> str:
+        """
+        Determina el modo de envío para un archivo
+
+        Args:
+            request: Request HTTP
+            size: Tamaño del archivo en bytes
+            mode: Modo forzado (por defecto el configurado)
+
+        Returns:
+            Modo efectivo: memory, sendfile o chunked
+        """
+        mode = mode or self.mode
+
+        if mode == self.MODE_AUTO:
+            if size < self.sendfile_min_size:
+                return self.MODE_MEMORY
+            mode = self.MODE_SENDFILE
+
+        # sendfile solo es posible sobre sockets planos
+        if mode == self.MODE_SENDFILE and not self._can_sendfile(request):
+            return self.MODE_CHUNKED
+
+        return mode
+
+    def _can_sendfile(self, request: web_request.Request) -> bool:
+        """Verifica si el transporte admite os.sendfile"""
+        transport = request.transport
+        if transport is None:
+            return False
+
+        # Con TLS el kernel no puede cifrar: los bytes deben pasar por Python
+        return transport.get_extra_info('sslcontext') is None
+
+    def memory_limit(self, mode: Optional[str] = None) -> Optional[int]:
+        """
+        Tamaño máximo que se lee completo a memoria según el modo
+
+        Args:
+            mode: Modo de envío (por defecto el configurado)
+
+        Returns:
+            Límite en bytes, o None si no hay límite (modo memory)
+        """
+        mode = mode or self.mode
+        if mode == self.MODE_MEMORY:
+            return None
+        if mode == self.MODE_AUTO:
+            return self.sendfile_min_size
+        return 0
+
+    @staticmethod
+    def open_file(file_path: Path, memory_limit: Optional[int]) -> Tuple[Optional[BinaryIO], os.stat_result, Optional[bytes]]:
+        """
+        Abre el archivo y obtiene su tamaño real (se ejecuta en un thread)
+
+        Si el archivo es menor que memory_limit lee el contenido completo y
+        lo cierra, evitando un segundo salto al executor para archivos chicos.
+        """
+        fobj = open(file_path, 'rb')
+        try:
+            st = os.fstat(fobj.fileno())
+            if memory_limit is None or st.st_size < memory_limit:
+                body = fobj.read()
+                fobj.close()
+                return None, st, body
+            return fobj, st, None
+        except BaseException:
+            fobj.close()
+            raise
+
+    async def open(self, file_path: Path, memory_limit: Optional[int],
+                   root: str = '') -> Tuple[Optional[BinaryIO], os.stat_result, Optional[bytes]]:
+        """
+        Abre un archivo en el executor de I/O
+
+        Args:
+            file_path: Ruta del archivo ya validada
+            memory_limit: Tamaño por debajo del cual se lee completo (None = siempre)
+            root: document_root del archivo (clave de concurrencia del executor)
+
+        Returns:
+            Tupla (archivo_abierto, stat, contenido); exactamente uno de
+            archivo_abierto o contenido es None
+        """
+        return await self.io.run(root, self.open_file, file_path, memory_limit)
+
+    async def send(self, request: web_request.Request, file_path: Path, content_type: str,
+                   headers: Optional[Dict[str, str]] = None, status: int = 200,
+                   mode: Optional[str] = None, root: str = '') -> web.StreamResponse:
+        """
+        Envía un archivo completo al cliente
+
+        Args:
+            request: Request HTTP
+            file_path: Ruta del archivo ya validada
+            content_type: Tipo MIME del archivo
+            headers: Headers adicionales de la respuesta
+            status: Código de estado HTTP
+            mode: Modo forzado (útil para tests y benchmarks)
+            root: document_root del archivo (clave de concurrencia del executor)
+
+        Returns:
+            Respuesta lista para devolver desde el handler
+        """
+        mode = mode or self.mode
+        fobj, st, body = await self.open(file_path, self.memory_limit(mode), root)
+
+        if body is not None:
+            return self.respond_body(body, content_type, headers, status)
+
+        return await self.stream(request, fobj, st, content_type, headers, status, mode, root)
+
+    def respond_body(self, body: bytes, content_type: Optional[str] = None,
+                     headers: Optional[Dict[str, str]] = None, status: int = 200) -> web.Response:
+        """
+        Crea una respuesta con el contenido ya en memoria
+
+        Args:
+            body: Contenido completo
+            content_type: Tipo MIME (omitir si headers ya trae Content-Type)
+            headers: Headers adicionales de la respuesta
+            status: Código de estado HTTP
+        """
+        self.stats['memory'] += 1
+        self.stats['bytes_sent'] += len(body)
+        return web.Response(body=body, status=status, content_type=content_type, headers=headers)
+
+    async def stream(self, request: web_request.Request, fobj: BinaryIO, st: os.stat_result,
+                     content_type: Optional[str] = None, headers: Optional[Dict[str, str]] = None,
+                     status: int = 200, mode: Optional[str] = None, root: str = '') -> web.StreamResponse:
+        """
+        Envía un archivo abierto completo por sendfile o en bloques y lo cierra
+
+        Args:
+            request: Request HTTP
+            fobj: Archivo abierto (obtenido con open)
+            st: Resultado de fstat del archivo
+            content_type: Tipo MIME (omitir si headers ya trae Content-Type)
+            headers: Headers adicionales de la respuesta
+            status: Código de estado HTTP
+            mode: Modo forzado (por defecto el configurado)
+            root: document_root del archivo (clave de concurrencia del executor)
+
+        Returns:
+            Respuesta ya enviada
+        """
+        return await self.stream_segments(
+            request, fobj, [(0, st.st_size)], content_type, headers, status, mode, root
+        )
+
+    async def stream_segments(self, request: web_request.Request, fobj: BinaryIO,
+                              segments: List[Segment], content_type: Optional[str] = None,
+                              headers: Optional[Dict[str, str]] = None, status: int = 200,
+                              mode: Optional[str] = None, root: str = '') -> web.StreamResponse:
+        """
+        Envía una secuencia de segmentos (bytes literales o porciones del archivo)
+
+        Se usa para archivos completos, rangos simples (206) y respuestas
+        multipart/byteranges. Cierra el archivo al terminar.
+
+        Args:
+            request: Request HTTP
+            fobj: Archivo abierto en modo binario
+            segments: Lista de bytes o (offset, cantidad)
+            content_type: Tipo MIME (omitir si headers ya trae Content-Type)
+            headers: Headers adicionales de la respuesta
+            status: Código de estado HTTP
+            mode: Modo forzado (por defecto el configurado)
+            root: document_root del archivo (clave de concurrencia del executor)
+
+        Returns:
+            Respuesta ya enviada
+        """
+        try:
+            total = segments_length(segments)
+            mode = self.select_mode(request, total, mode)
+            if mode == self.MODE_MEMORY:
+                # Modo memory forzado sobre un archivo abierto: enviar por bloques
+                mode = self.MODE_CHUNKED
+
+            response = web.StreamResponse(status=status, headers=headers)
+            if content_type:
+                response.content_type = content_type
+            response.content_length = total
+            await response.prepare(request)
+
+            # HEAD lleva los mismos headers pero nunca body
+            if request.method != 'HEAD':
+                for segment in segments:
+                    if isinstance(segment, bytes):
+                        await response.write(segment)
+                    else:
+                        await self.write_file(request, response, fobj, segment[0], segment[1], mode, root)
+
+            await response.write_eof()
+        finally:
+            fobj.close()
+
+        return response
+
+    async def write_file(self, request: web_request.Request, response: web.StreamResponse,
+                         fobj: BinaryIO, offset: int, count: int, mode: str, root: str = '') -> None:
+        """
+        Escribe una porción del archivo en una respuesta ya preparada
+
+        Args:
+            request: Request HTTP
+            response: Respuesta con headers ya enviados
+            fobj: Archivo abierto en modo binario
+            offset: Posición inicial dentro del archivo
+            count: Cantidad de bytes a enviar
+            mode: sendfile o chunked
+            root: document_root del archivo (clave de concurrencia del executor)
+        """
+        if count <= 0:
+            return
+
+        if mode == self.MODE_SENDFILE:
+            loop = asyncio.get_running_loop()
+            try:
+                await loop.sendfile(request.transport, fobj, offset, count, fallback=False)
+                self.stats['sendfile'] += 1
+                self.stats['bytes_sent'] += count
+                return
+            except (NotImplementedError, asyncio.SendfileNotAvailableError):
+                # Event loop o transporte sin soporte nativo: usar bloques
+                pass
+
+        await self._write_chunks(response, fobj, offset, count, root)
+
+    async def _write_chunks(self, response: web.StreamResponse, fobj: BinaryIO,
+                            offset: int, count: int, root: str = '') -> None:
+        """Envía el archivo en bloques de chunk_size respetando el backpressure"""
+        fd = fobj.fileno()
+        remaining = count
+
+        while remaining > 0:
+            chunk = await self.io.run(root, os.pread, fd, min(self.chunk_size, remaining), offset)
+            if not chunk:
+                # El archivo se truncó durante el envío
+                raise ConnectionResetError("Archivo truncado durante el envío")
+
+            # write() hace drain cuando el buffer del transporte se llena
+            await response.write(chunk)
+            offset += len(chunk)
+            remaining -= len(chunk)
+
+        self.stats['chunked'] += 1
+        self.stats['bytes_sent'] += count
+
+    def get_stats(self) -> Dict[str, int]:
+        """Retorna los contadores de envío por modo"""
+        return dict(self.stats)
+
+
+# Instancia global del emisor de archivos
+file_sender = FileSender(
+    mode=config.get('static_send_mode', FileSender.MODE_AUTO),
+    sendfile_min_size=config.get('static_sendfile_min_size', 64 * 1024),
+    chunk_size=config.get('static_chunk_size', 256 * 1024)
+)
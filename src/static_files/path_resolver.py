@@ -0,0 +1,313 @@
+"""
+Cache de resolución de rutas
+Memoriza la decisión URL -> archivo (index elegido, 403 o 404) por document_root
+"""
+
+import os
+import stat
+import time
+from collections import OrderedDict
+from pathlib import Path, PurePosixPath
+from typing import Any, Dict, Optional, Tuple
+
+from config.config_manager import config
+from utils.docroot_manifest import ABSENT, FILE, ManifestEntry, ManifestRegistry, docroot_manifests
+from utils.file_metadata import FileMetadataCache, file_metadata
+
+
+DEFAULT_INDEX_FILES = ('index.html', 'index.php', 'index.htm')
+
+
+class PathDecision:
+    """Resultado de resolver una ruta dentro de un document_root"""
+
+    __slots__ = ('status', 'file_path', 'index_file', 'message',
+                 'watch_dir', 'dir_mtime_ns', 'checked_at', 'expires_at')
+
+    def __init__(self, status: int, file_path: Optional[Path] = None,
+                 index_file: Optional[str] = None, message: str = '',
+                 watch_dir: Optional[str] = None, dir_mtime_ns: Optional[int] = None):
+        self.status = status
+        self.file_path = file_path
+        self.index_file = index_file
+        self.message = message
+        self.watch_dir = watch_dir
+        self.dir_mtime_ns = dir_mtime_ns
+        self.checked_at = time.monotonic()
+        self.expires_at: Optional[float] = None
+
+    @property
+    def found(self) -> bool:
+        """Indica si la ruta resolvió a un archivo servible"""
+        return self.status == 200
+
+
+class PathResolver:
+    """
+    Resuelve rutas de URL a archivos del document_root con memoización
+
+    La clave es (document_root, ruta normalizada). Las decisiones positivas
+    y los directorios sin index se revalidan comparando el mtime del
+    directorio que las contiene (crear o borrar un archivo lo modifica) como
+    mucho una vez cada validate_interval segundos. Las negativas (404, ruta
+    fuera del document_root) expiran tras negative_ttl segundos.
+
+    lookup solo consulta memoria; probe hace el I/O y puede ejecutarse en el
+    executor de I/O; store actualiza la cache desde el event loop. Si el
+    document_root tiene manifiesto listo, probe lo usa en lugar de stat.
+    """
+
+    def __init__(self, enabled: bool = True, max_entries: int = 10000,
+                 negative_ttl: float = 2.0, validate_interval: float = 1.0,
+                 index_files: Tuple[str, ...] = DEFAULT_INDEX_FILES,
+                 metadata: Optional[FileMetadataCache] = None,
+                 manifests: Optional[ManifestRegistry] = None):
+        """
+        Inicializa el resolvedor
+
+        Args:
+            enabled: Si es False resuelve siempre contra el filesystem
+            max_entries: Cantidad máxima de decisiones memorizadas
+            negative_ttl: Segundos que se confía en un 404
+            validate_interval: Segundos entre revalidaciones por mtime de directorio
+            index_files: Archivos index en orden de prioridad
+            metadata: Cache de stat/realpath (por defecto la compartida con rewrite)
+            manifests: Manifiestos de document_root (por defecto los globales)
+        """
+        self.enabled = enabled and max_entries > 0
+        self.max_entries = max_entries
+        self.negative_ttl = negative_ttl
+        self.validate_interval = validate_interval
+        self.index_files = index_files
+        self.metadata = metadata if metadata is not None else file_metadata
+        self.manifests = manifests if manifests is not None else docroot_manifests
+
+        self._entries: 'OrderedDict[Tuple[str, str], PathDecision]' = OrderedDict()
+
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.evictions = 0
+
+    @staticmethod
+    def normalize(path: str) -> str:
+        """
+        Normaliza la ruta para usarla como clave
+
+        Colapsa barras repetidas y segmentos '.', pero conserva '..' para que
+        la verificación de salida del document_root siga aplicando.
+        """
+        if not path:
+            return ''
+        normalized = PurePosixPath(path).as_posix()
+        return '' if normalized == '.' else normalized
+
+    def lookup(self, document_root: str, path: str) -> Optional[PathDecision]:
+        """
+        Busca una decisión vigente sin tocar el filesystem
+
+        Args:
+            document_root: document_root del virtual host
+            path: Ruta de la URL (ya reescrita) sin la barra inicial
+
+        Returns:
+            La decisión memorizada, o None si no está o hay que revalidarla
+            (en ese caso usar probe en el executor de I/O y luego store)
+        """
+        if not self.enabled:
+            return None
+
+        key = (document_root, self.normalize(path))
+        decision = self._entries.get(key)
+        if decision is None:
+            return None
+
+        now = time.monotonic()
+        if decision.expires_at is not None:
+            fresh = now < decision.expires_at
+        else:
+            fresh = now - decision.checked_at < self.validate_interval
+        if not fresh:
+            return None
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return decision
+
+    def probe(self, document_root: str, path: str) -> PathDecision:
+        """
+        Revalida o resuelve la ruta contra el filesystem
+
+        Hace I/O bloqueante y no modifica la cache, por lo que puede correr en
+        un thread; el resultado se registra luego con store. Dentro de
+        manifests.memory_only lanza ManifestMiss en lugar de hacer I/O.
+        """
+        normalized = self.normalize(path)
+        decision = self._entries.get((document_root, normalized)) if self.enabled else None
+
+        if decision is not None and decision.expires_at is None:
+            mtime_ns = self.manifests.mtime_ns(document_root, decision.watch_dir)
+            if mtime_ns is None:
+                self.manifests.filesystem_access(decision.watch_dir)
+                st = self.metadata.stat(decision.watch_dir)
+                mtime_ns = st.st_mtime_ns if st is not None else None
+            if mtime_ns == decision.dir_mtime_ns:
+                decision.checked_at = time.monotonic()
+                return decision
+
+        return self._resolve_uncached(document_root, normalized)
+
+    def store(self, document_root: str, path: str, decision: PathDecision) -> PathDecision:
+        """
+        Registra en la cache el resultado de probe
+
+        Returns:
+            La misma decisión
+        """
+        if not self.enabled:
+            self.misses += 1
+            return decision
+
+        key = (document_root, self.normalize(path))
+        current = self._entries.get(key)
+        if current is decision:
+            # Revalidada por mtime del directorio: sigue siendo un hit
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return decision
+
+        if current is not None:
+            self.invalidations += 1
+        self.misses += 1
+
+        if decision.watch_dir is None:
+            decision.expires_at = decision.checked_at + self.negative_ttl
+        self._entries[key] = decision
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+        return decision
+
+    def resolve(self, document_root: str, path: str) -> PathDecision:
+        """
+        Obtiene la decisión para una ruta, desde la cache o el filesystem
+
+        Versión sincrónica de lookup + probe + store.
+
+        Args:
+            document_root: document_root del virtual host
+            path: Ruta de la URL (ya reescrita) sin la barra inicial
+
+        Returns:
+            PathDecision con status 200 (file_path listo para servir), 400, 403 o 404
+        """
+        decision = self.lookup(document_root, path)
+        if decision is not None:
+            return decision
+        return self.store(document_root, path, self.probe(document_root, path))
+
+    def _resolve_uncached(self, document_root: str, path: str) -> PathDecision:
+        """
+        Resuelve la ruta contra el filesystem
+
+        stat y realpath pasan por la cache de metadatos, compartida con las
+        condiciones de rewrite: un archivo que file_not_exists acaba de
+        consultar no vuelve a tocar el disco aquí.
+        """
+        entry = self.manifests.lookup(document_root, path)
+        if entry is not None:
+            decision = self._resolve_from_manifest(entry)
+            if decision is not None:
+                return decision
+
+        self.manifests.filesystem_access(path)
+        try:
+            root = self.metadata.realpath(document_root)
+            resolved = self.metadata.realpath(os.path.join(document_root, path)) if path else root
+
+            if resolved != root and not resolved.startswith(root.rstrip(os.sep) + os.sep):
+                return PathDecision(403, message='Forbidden')
+
+            st = self.metadata.stat(resolved)
+            if st is None:
+                return PathDecision(404, message='Not Found')
+
+            if not stat.S_ISDIR(st.st_mode):
+                parent = os.path.dirname(resolved)
+                parent_st = self.metadata.stat(parent)
+                if parent_st is None:
+                    return PathDecision(404, message='Not Found')
+                return PathDecision(200, file_path=Path(resolved), watch_dir=parent,
+                                    dir_mtime_ns=parent_st.st_mtime_ns)
+
+            # Directorio: buscar archivos index en orden de prioridad
+            for index_name in self.index_files:
+                index_path = os.path.join(resolved, index_name)
+                if self.metadata.stat(index_path) is not None:
+                    return PathDecision(200, file_path=Path(index_path), index_file=index_name,
+                                        watch_dir=resolved, dir_mtime_ns=st.st_mtime_ns)
+
+            return PathDecision(403, message='Directory listing not allowed',
+                                watch_dir=resolved, dir_mtime_ns=st.st_mtime_ns)
+
+        except (OSError, ValueError):
+            return PathDecision(400, message='Bad Request')
+
+    def _resolve_from_manifest(self, entry: ManifestEntry) -> Optional[PathDecision]:
+        """
+        Misma decisión que _resolve_uncached a partir del manifiesto, sin syscalls
+
+        Returns:
+            La decisión, o None si un index candidato es un symlink (hay que
+            consultar al filesystem)
+        """
+        if entry.kind == ABSENT:
+            return PathDecision(404, message='Not Found')
+
+        if entry.kind == FILE:
+            return PathDecision(200, file_path=Path(entry.path), watch_dir=os.path.dirname(entry.path),
+                                dir_mtime_ns=entry.mtime_ns)
+
+        for index_name in self.index_files:
+            exists = entry.child_exists(index_name)
+            if exists is None:
+                return None
+            if exists:
+                return PathDecision(200, file_path=Path(os.path.join(entry.path, index_name)),
+                                    index_file=index_name, watch_dir=entry.path,
+                                    dir_mtime_ns=entry.mtime_ns)
+
+        return PathDecision(403, message='Directory listing not allowed',
+                            watch_dir=entry.path, dir_mtime_ns=entry.mtime_ns)
+
+    def clear(self) -> None:
+        """Vacía la cache (ej: al recargar la configuración de virtual hosts)"""
+        self._entries.clear()
+        self.metadata.invalidate()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Retorna contadores para el dashboard"""
+        lookups = self.hits + self.misses
+        return {
+            'enabled': self.enabled,
+            'entries': len(self._entries),
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+            'invalidations': self.invalidations,
+            'evictions': self.evictions,
+        }
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+# Instancia global del resolvedor de rutas
+path_resolver = PathResolver(
+    enabled=config.get('static_path_cache_enabled', True),
+    max_entries=config.get('static_path_cache_max_entries', 10000),
+    negative_ttl=config.get('static_path_cache_negative_ttl', 2.0),
+    validate_interval=config.get('static_path_cache_validate_interval', 1.0)
+)
@@ -0,0 +1,151 @@
+"""
+Variantes precomprimidas de archivos estáticos
+Negocia Accept-Encoding y localiza archivos hermanos .br / .gz generados en el build
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+from config.config_manager import config
+from utils.compression import negotiate_encodings
+
+
+# Codificaciones soportadas en orden de preferencia del servidor
+SIDECAR_ENCODINGS = (
+    ('br', '.br'),
+    ('gzip', '.gz'),
+)
+
+
+class PrecompressedResolver:
+    """
+    Localiza variantes precomprimidas (foo.js.br, foo.js.gz)
+
+    Una variante se usa solo si existe y es al menos tan nueva como el
+    original. El resultado de cada verificación se cachea durante check_ttl
+    segundos, incluyendo la ausencia del archivo hermano; al llenarse se
+    descartan las verificaciones usadas hace más tiempo (LRU).
+
+    find corre en los threads del executor de I/O: la cache y los contadores
+    se modifican con el lock tomado (los stat se hacen sin él).
+    """
+
+    def __init__(self, enabled: bool = True, check_ttl: float = 5.0, max_entries: int = 10000):
+        """
+        Inicializa el resolvedor
+
+        Args:
+            enabled: Habilita la búsqueda de variantes
+            check_ttl: Segundos que se confía en una verificación
+            max_entries: Cantidad máxima de verificaciones cacheadas
+        """
+        self.enabled = enabled
+        self.check_ttl = check_ttl
+        self.max_entries = max_entries
+        self._checks: 'OrderedDict[Tuple[str, str], Tuple[float, Optional[os.stat_result]]]' = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.lookups = 0
+
+    def _check(self, path: str, encoding: str, suffix: str) -> Optional[os.stat_result]:
+        """Verifica (con cache) si existe una variante fresca"""
+        key = (path, encoding)
+        now = time.monotonic()
+
+        with self._lock:
+            cached = self._checks.get(key)
+            if cached is not None and now - cached[0] < self.check_ttl:
+                self._checks.move_to_end(key)
+                return cached[1]
+
+        sidecar_stat = None
+        try:
+            original_stat = os.stat(path)
+            candidate = os.stat(path + suffix)
+            if candidate.st_mtime_ns >= original_stat.st_mtime_ns:
+                sidecar_stat = candidate
+        except OSError:
+            pass
+
+        with self._lock:
+            self._checks[key] = (now, sidecar_stat)
+            self._checks.move_to_end(key)
+            while len(self._checks) > self.max_entries:
+                self._checks.popitem(last=False)
+        return sidecar_stat
+
+    def peek(self, path: str, accept_encoding: str) -> Tuple[bool, Optional[Tuple[str, str, os.stat_result]]]:
+        """
+        Resuelve la variante usando solo verificaciones vigentes en memoria
+
+        Returns:
+            Tupla (resuelto, variante). Si resuelto es False alguna
+            verificación expiró y hay que llamar a find (hace stat).
+        """
+        if not self.enabled:
+            return True, None
+
+        now = time.monotonic()
+        available = tuple(encoding for encoding, _ in SIDECAR_ENCODINGS)
+        suffixes = dict(SIDECAR_ENCODINGS)
+
+        with self._lock:
+            for encoding in negotiate_encodings(accept_encoding, available):
+                cached = self._checks.get((path, encoding))
+                if cached is None or now - cached[0] >= self.check_ttl:
+                    return False, None
+                self._checks.move_to_end((path, encoding))
+                self.lookups += 1
+                if cached[1] is not None:
+                    self.hits += 1
+                    return True, (path + suffixes[encoding], encoding, cached[1])
+
+        return True, None
+
+    def find(self, path: str, accept_encoding: str) -> Optional[Tuple[str, str, os.stat_result]]:
+        """
+        Busca la mejor variante precomprimida aceptada por el cliente
+
+        Args:
+            path: Ruta absoluta del archivo original
+            accept_encoding: Valor del header Accept-Encoding
+
+        Returns:
+            Tupla (ruta_variante, codificación, stat) o None
+        """
+        if not self.enabled:
+            return None
+
+        suffixes = dict(SIDECAR_ENCODINGS)
+        available = tuple(encoding for encoding, _ in SIDECAR_ENCODINGS)
+
+        for encoding in negotiate_encodings(accept_encoding, available):
+            sidecar_stat = self._check(path, encoding, suffixes[encoding])
+            with self._lock:
+                self.lookups += 1
+                if sidecar_stat is not None:
+                    self.hits += 1
+            if sidecar_stat is not None:
+                return path + suffixes[encoding], encoding, sidecar_stat
+
+        return None
+
+    def get_stats(self) -> Dict[str, int]:
+        """Retorna contadores para el dashboard"""
+        return {
+            'enabled': self.enabled,
+            'lookups': self.lookups,
+            'hits': self.hits,
+            'cached_checks': len(self._checks),
+        }
+
+
+# Instancia global del resolvedor de variantes precomprimidas
+precompressed_resolver = PrecompressedResolver(
+    enabled=config.get('static_precompressed_enabled', True),
+    check_ttl=config.get('static_precompressed_check_ttl', 5.0)
+)
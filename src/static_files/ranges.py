@@ -0,0 +1,180 @@
+"""
+Soporte de HTTP Range para archivos estáticos
+Parseo de Range / If-Range y armado de respuestas multipart/byteranges (RFC 7233)
+"""
+
+import re
+import uuid
+from email.utils import parsedate_to_datetime
+from typing import List, Optional, Tuple, Union
+
+
+# Un segmento del body: bytes literales o (offset, cantidad) dentro del archivo
+Segment = Union[bytes, Tuple[int, int]]
+
+_RANGE_SPEC_RE = re.compile(r'^(\d*)-(\d*)$')
+
+DEFAULT_MAX_RANGES = 16
+
+
+class RangeNotSatisfiable(ValueError):
+    """Ningún rango pedido se superpone con el recurso (416)"""
+
+
+def parse_range_header(value: str, size: int,
+                       max_ranges: int = DEFAULT_MAX_RANGES) -> Optional[List[Tuple[int, int]]]:
+    """
+    Parsea un header Range de bytes
+
+    Args:
+        value: Valor del header (ej: "bytes=0-99,200-")
+        size: Tamaño total del recurso
+        max_ranges: Cantidad máxima de rangos aceptados
+
+    Returns:
+        Lista de (inicio, fin) inclusivos, o None si el header debe ignorarse
+        (unidad desconocida, sintaxis inválida o demasiados rangos)
+
+    Raises:
+        RangeNotSatisfiable: si ningún rango es satisfacible
+    """
+    unit, sep, spec = value.partition('=')
+    if not sep or unit.strip().lower() != 'bytes':
+        return None
+
+    ranges = []
+    specs = [item.strip() for item in spec.split(',') if item.strip()]
+    if not specs or len(specs) > max_ranges:
+        return None
+
+    for item in specs:
+        match = _RANGE_SPEC_RE.match(item)
+        if not match:
+            return None
+
+        first, last = match.groups()
+        if not first:
+            # Rango sufijo: los últimos N bytes
+            if not last:
+                return None
+            suffix = int(last)
+            if suffix == 0 or size == 0:
+                continue
+            ranges.append((max(size - suffix, 0), size - 1))
+            continue
+
+        start = int(first)
+        if last and int(last) < start:
+            return None
+        if start >= size:
+            continue
+        end = min(int(last), size - 1) if last else size - 1
+        ranges.append((start, end))
+
+    if not ranges:
+        raise RangeNotSatisfiable(f"Rango no satisfacible para {size} bytes")
+
+    return _coalesce(ranges)
+
+
+def _coalesce(ranges: List[Tuple[int, int]]) -> List[Tuple[int, int]]:
+    """
+    Une rangos superpuestos o contiguos
+
+    Solo reordena cuando hay superposición, para no alterar el orden pedido
+    por el cliente en el caso normal.
+    """
+    ordered = sorted(ranges)
+    overlapping = any(ordered[i + 1][0] <= ordered[i][1] + 1 for i in range(len(ordered) - 1))
+    if not overlapping:
+        return ranges
+
+    merged = [ordered[0]]
+    for start, end in ordered[1:]:
+        last_start, last_end = merged[-1]
+        if start <= last_end + 1:
+            merged[-1] = (last_start, max(last_end, end))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def if_range_matches(if_range: Optional[str], etag: str, last_modified: str) -> bool:
+    """
+    Evalúa If-Range: True si el rango debe aplicarse
+
+    Un ETag se compara en forma fuerte (un ETag débil nunca coincide); una
+    fecha debe coincidir exactamente con Last-Modified.
+
+    Args:
+        if_range: Valor del header If-Range (None si no vino)
+        etag: ETag actual del recurso
+        last_modified: Last-Modified actual del recurso
+    """
+    if if_range is None:
+        return True
+
+    if_range = if_range.strip()
+    if if_range.startswith(('"', 'W/')):
+        return not etag.startswith('W/') and if_range == etag
+
+    try:
+        return (parsedate_to_datetime(if_range).timestamp() ==
+                parsedate_to_datetime(last_modified).timestamp())
+    except (TypeError, ValueError, IndexError):
+        return False
+
+
+def content_range(start: int, end: int, size: int) -> str:
+    """Valor del header Content-Range para un rango"""
+    return f'bytes {start}-{end}/{size}'
+
+
+def build_byteranges(ranges: List[Tuple[int, int]], content_type: str, size: int,
+                     boundary: Optional[str] = None) -> Tuple[str, List[Segment]]:
+    """
+    Arma el body multipart/byteranges como lista de segmentos
+
+    Los segmentos de datos quedan como (offset, cantidad) para que el emisor
+    los envíe con sendfile o desde memoria sin copiar el archivo.
+
+    Args:
+        ranges: Rangos (inicio, fin) inclusivos
+        content_type: Tipo MIME de cada parte
+        size: Tamaño total del recurso
+        boundary: Separador (se genera uno aleatorio si no se indica)
+
+    Returns:
+        Tupla (valor_content_type, segmentos)
+    """
+    boundary = boundary or uuid.uuid4().hex
+    segments: List[Segment] = []
+
+    for index, (start, end) in enumerate(ranges):
+        # Cada parte después de la primera arranca con el CRLF que cierra la anterior
+        prefix = b'' if index == 0 else b'\r\n'
+        part_header = (
+            f"--{boundary}\r\n"
+            f"Content-Type: {content_type}\r\n"
+            f"Content-Range: {content_range(start, end, size)}\r\n"
+            f"\r\n"
+        )
+        segments.append(prefix + part_header.encode('latin-1'))
+        segments.append((start, end - start + 1))
+
+    segments.append(f'\r\n--{boundary}--\r\n'.encode('latin-1'))
+    return f'multipart/byteranges; boundary={boundary}', segments
+
+
+def segments_length(segments: List[Segment]) -> int:
+    """Longitud total en bytes de una lista de segmentos"""
+    return sum(len(seg) if isinstance(seg, bytes) else seg[1] for seg in segments)
+
+
+def render_segments(body: bytes, segments: List[Segment]) -> bytes:
+    """Materializa los segmentos a partir de un contenido en memoria"""
+    view = memoryview(body)
+    return b''.join(
+        seg if isinstance(seg, bytes) else view[seg[0]:seg[0] + seg[1]]
+        for seg in segments
+    )
@@ -0,0 +1,286 @@
+"""
+Handler de archivos estáticos
+Arma la respuesta para un archivo ya resuelto dentro del document_root
+"""
+
+import os
+from pathlib import Path
+from typing import BinaryIO, Dict, List, Optional, Tuple
+
+from aiohttp import web, web_request
+
+from config.config_manager import config
+from utils.compression import ResponseCompressor, response_compressor
+from utils.io_executor import IOExecutor, io_executor, stat_or_none
+from utils.mime_types import guess_content_type, is_compressible
+from .conditional import (ETAG_MODES, ETAG_MODE_HASH, ETAG_MODE_STRONG, build_validators,
+                          encoded_etag, has_conditional_headers, is_not_modified)
+from .file_cache import StaticFileCache, static_file_cache
+from .file_sender import FileSender, file_sender
+from .precompressed import PrecompressedResolver, precompressed_resolver
+from .ranges import (RangeNotSatisfiable, build_byteranges, content_range, if_range_matches,
+                     parse_range_header, render_segments)
+
+
+class StaticFileHandler:
+    """
+    Sirve archivos estáticos
+
+    Los archivos chicos se sirven desde la cache en memoria; el resto se
+    delega en FileSender (sendfile o bloques). Todas las respuestas llevan
+    ETag y Last-Modified, los GET condicionales vigentes se responden con
+    304 sin leer el archivo y los pedidos Range se responden con 206 enviando
+    solo los bytes solicitados. Los archivos de texto que se sirven desde
+    memoria y no tienen variante precomprimida se comprimen dinámicamente.
+
+    Todo acceso al filesystem pasa por el executor de I/O, con el
+    document_root del virtual host como clave de concurrencia.
+    """
+
+    def __init__(self, sender: FileSender, cache: StaticFileCache,
+                 precompressed: PrecompressedResolver, compressor: ResponseCompressor,
+                 io: IOExecutor, etag_mode: str = ETAG_MODE_STRONG):
+        """
+        Inicializa el handler
+
+        Args:
+            sender: Emisor de archivos a utilizar
+            cache: Cache en memoria de archivos chicos
+            precompressed: Resolvedor de variantes .br / .gz
+            compressor: Compresor dinámico (respeta COMPRESSION_ENABLED)
+            io: Executor de I/O de filesystem
+            etag_mode: strong, weak o hash (hash del contenido)
+        """
+        if etag_mode not in ETAG_MODES:
+            print(f"⚠️  Modo de ETag desconocido: {etag_mode}, usando '{ETAG_MODE_STRONG}'")
+            etag_mode = ETAG_MODE_STRONG
+
+        self.sender = sender
+        self.cache = cache
+        self.precompressed = precompressed
+        self.compressor = compressor
+        self.io = io
+        self.etag_mode = etag_mode
+
+    def _base_headers(self, content_type: str, encoding: Optional[str] = None,
+                      vary: bool = False) -> Dict[str, str]:
+        """
+        Headers comunes a todas las respuestas estáticas
+
+        Args:
+            content_type: Tipo MIME del archivo original
+            encoding: Content-Encoding de la variante servida (si la hay)
+            vary: Si la respuesta depende de Accept-Encoding
+        """
+        headers = {'Content-Type': content_type, 'Accept-Ranges': 'bytes'}
+        if encoding:
+            headers['Content-Encoding'] = encoding
+        if vary:
+            headers['Vary'] = 'Accept-Encoding'
+        if not config.get('hide_server_header', True):
+            headers['Server'] = 'TechWebServer/1.0'
+        return headers
+
+    def _not_modified(self, headers: Dict[str, str]) -> web.Response:
+        """Crea una respuesta 304 conservando validadores y headers comunes"""
+        not_modified_headers = {
+            name: value for name, value in headers.items()
+            if name not in ('Content-Type', 'Content-Length')
+        }
+        return web.Response(status=304, headers=not_modified_headers)
+
+    def _select_ranges(self, request: web_request.Request, headers: Dict[str, str],
+                       size: int) -> Optional[List[Tuple[int, int]]]:
+        """
+        Determina los rangos a servir
+
+        Returns:
+            Lista de rangos, o None para responder el recurso completo
+
+        Raises:
+            RangeNotSatisfiable: si corresponde responder 416
+        """
+        range_header = request.headers.get('Range')
+        if range_header is None or request.method not in ('GET', 'HEAD'):
+            return None
+
+        if not if_range_matches(request.headers.get('If-Range'),
+                                headers['ETag'], headers['Last-Modified']):
+            return None
+
+        return parse_range_header(range_header, size)
+
+    def _negotiate_compression(self, request: web_request.Request, headers: Dict[str, str],
+                               size: int) -> Tuple[Dict[str, str], Optional[str]]:
+        """
+        Decide si la respuesta se comprime dinámicamente
+
+        No aplica a variantes precomprimidas, a pedidos Range ni a archivos
+        que se envían por streaming.
+
+        Returns:
+            Tupla (headers de la representación, codificación o None)
+        """
+        if 'Content-Encoding' in headers or 'Range' in request.headers:
+            return headers, None
+
+        limit = self._read_limit()
+        if limit is not None and size >= limit:
+            return headers, None
+
+        encoding = self.compressor.choose_encoding(
+            request.headers.get('Accept-Encoding', ''), headers['Content-Type'], size
+        )
+        if encoding is None:
+            return headers, None
+
+        encoded_headers = dict(headers)
+        encoded_headers['Content-Encoding'] = encoding
+        encoded_headers['ETag'] = encoded_etag(headers['ETag'], encoding)
+        return encoded_headers, encoding
+
+    async def _respond(self, request: web_request.Request, headers: Dict[str, str],
+                       size: int, body: Optional[bytes] = None,
+                       fobj: Optional[BinaryIO] = None,
+                       st: Optional[os.stat_result] = None,
+                       compress: Optional[Tuple[str, str, int]] = None,
+                       root: str = '') -> web.StreamResponse:
+        """
+        Responde el contenido completo o los rangos pedidos
+
+        Exactamente uno de body (contenido en memoria) o fobj (archivo
+        abierto, junto con su stat) debe estar presente. compress es
+        (codificación, ruta, mtime_ns) cuando el body se comprime dinámicamente;
+        root es el document_root para las lecturas en el executor de I/O.
+        """
+        try:
+            ranges = self._select_ranges(request, headers, size)
+        except RangeNotSatisfiable:
+            if fobj is not None:
+                fobj.close()
+            error_headers = {name: value for name, value in headers.items() if name != 'Content-Type'}
+            error_headers['Content-Range'] = f'bytes */{size}'
+            return web.Response(status=416, headers=error_headers)
+
+        if ranges is None:
+            if body is not None and compress is not None:
+                encoding, path, mtime_ns = compress
+                body = await self.compressor.compress_static(path, mtime_ns, body, encoding)
+            if body is not None:
+                return self.sender.respond_body(body, headers=headers)
+            return await self.sender.stream(request, fobj, st, headers=headers, root=root)
+
+        partial_headers = dict(headers)
+        if len(ranges) == 1:
+            start, end = ranges[0]
+            partial_headers['Content-Range'] = content_range(start, end, size)
+            segments = [(start, end - start + 1)]
+        else:
+            multipart_type, segments = build_byteranges(ranges, headers['Content-Type'], size)
+            partial_headers['Content-Type'] = multipart_type
+
+        if body is not None:
+            return self.sender.respond_body(
+                render_segments(body, segments), headers=partial_headers, status=206
+            )
+        return await self.sender.stream_segments(
+            request, fobj, segments, headers=partial_headers, status=206, root=root
+        )
+
+    def _read_limit(self) -> Optional[int]:
+        """Tamaño máximo que conviene leer a memoria (envío o cache)"""
+        limit = self.sender.memory_limit()
+        if limit is None:
+            return None
+        if self.cache.enabled:
+            # +1 porque el límite del sender es exclusivo y el de la cache inclusivo
+            return max(limit, self.cache.max_object_size + 1)
+        return limit
+
+    async def serve(self, request: web_request.Request, file_path: Path,
+                    vhost: Dict) -> web.StreamResponse:
+        """
+        Sirve un archivo estático
+
+        Args:
+            request: Request HTTP
+            file_path: Ruta del archivo (resuelta y validada)
+            vhost: Configuración del virtual host
+
+        Returns:
+            Respuesta HTTP (puede estar ya enviada si se usó streaming)
+        """
+        content_type = guess_content_type(file_path)
+        compressible = is_compressible(content_type)
+        root = vhost.get('document_root', '')
+
+        # Preferir una variante precomprimida (.br/.gz) si el cliente la acepta
+        encoding = None
+        if compressible and self.precompressed.enabled:
+            accept_encoding = request.headers.get('Accept-Encoding', '')
+            resolved, variant = self.precompressed.peek(str(file_path), accept_encoding)
+            if not resolved:
+                variant = await self.io.run(root, self.precompressed.find, str(file_path), accept_encoding)
+            if variant is not None:
+                file_path = Path(variant[0])
+                encoding = variant[1]
+
+        cache_key = str(file_path)
+
+        if self.cache.needs_validation(cache_key):
+            self.cache.validate(cache_key, await self.io.run(root, stat_or_none, cache_key))
+
+        entry = self.cache.get(cache_key)
+        if entry is not None:
+            headers, dynamic = self._negotiate_compression(request, entry.headers, len(entry.body))
+            if is_not_modified(request, headers.get('ETag'), entry.mtime_ns / 1e9):
+                return self._not_modified(headers)
+            return await self._respond(
+                request, headers, len(entry.body), body=entry.body,
+                compress=(dynamic, cache_key, entry.mtime_ns) if dynamic else None
+            )
+
+        vary = compressible and (self.precompressed.enabled or self.compressor.enabled)
+        headers = self._base_headers(content_type, encoding, vary=vary)
+
+        # GET condicional: validar con un stat antes de abrir o leer el archivo.
+        # En modo hash el ETag depende del contenido y no puede anticiparse.
+        if self.etag_mode != ETAG_MODE_HASH and has_conditional_headers(request):
+            st = await self.io.run(root, os.stat, file_path)
+            validators = dict(headers, **build_validators(st, self.etag_mode))
+            validators, _ = self._negotiate_compression(request, validators, st.st_size)
+            if is_not_modified(request, validators['ETag'], st.st_mtime):
+                return self._not_modified(validators)
+
+        fobj, st, body = await self.io.run(root, self.sender.open_file, file_path, self._read_limit())
+        headers.update(build_validators(st, self.etag_mode, body))
+
+        if body is not None and self.cache.is_cacheable(len(body)):
+            self.cache.put(cache_key, body, content_type, headers, st)
+
+        size = st.st_size if body is None else len(body)
+        headers, dynamic = self._negotiate_compression(request, headers, size)
+
+        if is_not_modified(request, headers['ETag'], st.st_mtime):
+            if fobj is not None:
+                fobj.close()
+            return self._not_modified(headers)
+
+        if body is None:
+            return await self._respond(request, headers, size, fobj=fobj, st=st, root=root)
+
+        return await self._respond(
+            request, headers, size, body=body,
+            compress=(dynamic, cache_key, st.st_mtime_ns) if dynamic else None
+        )
+
+
+# Instancia global del handler de archivos estáticos
+static_handler = StaticFileHandler(
+    file_sender,
+    static_file_cache,
+    precompressed_resolver,
+    response_compressor,
+    io_executor,
+    etag_mode=config.get('static_etag_mode', ETAG_MODE_STRONG)
+)
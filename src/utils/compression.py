@@ -0,0 +1,268 @@
+"""
+Compresión dinámica de respuestas
+Negocia Accept-Encoding y comprime con gzip, brotli o zstd según disponibilidad
+"""
+
+import asyncio
+import gzip
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple, Any
+
+try:
+    import brotli
+    BROTLI_AVAILABLE = True
+except ImportError:
+    BROTLI_AVAILABLE = False
+
+try:
+    import zstandard
+    ZSTD_AVAILABLE = True
+except ImportError:
+    ZSTD_AVAILABLE = False
+
+from config.config_manager import config
+from utils.mime_types import is_compressible
+
+
+def parse_accept_encoding(header: str) -> Dict[str, float]:
+    """
+    Parsea Accept-Encoding en un diccionario codificación -> q
+
+    Args:
+        header: Valor del header (ej: "gzip, br;q=0.9, *;q=0")
+    """
+    preferences = {}
+    for item in header.split(','):
+        name, _, params = item.strip().partition(';')
+        name = name.strip().lower()
+        if not name:
+            continue
+
+        quality = 1.0
+        for param in params.split(';'):
+            key, _, value = param.strip().partition('=')
+            if key.strip().lower() == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        preferences[name] = quality
+    return preferences
+
+
+def negotiate_encodings(header: str, available: Tuple[str, ...]) -> List[str]:
+    """
+    Ordena las codificaciones disponibles según lo que acepta el cliente
+
+    Args:
+        header: Valor de Accept-Encoding
+        available: Codificaciones ofrecidas en orden de preferencia del servidor
+
+    Returns:
+        Codificaciones aceptables, de la más a la menos preferida
+    """
+    if not header:
+        return []
+
+    preferences = parse_accept_encoding(header)
+    wildcard = preferences.get('*', 0.0)
+
+    ranked = []
+    for priority, encoding in enumerate(available):
+        quality = preferences.get(encoding, wildcard)
+        if quality > 0:
+            ranked.append((-quality, priority, encoding))
+
+    return [encoding for _, _, encoding in sorted(ranked)]
+
+
+def add_vary(current: Optional[str], field: str = 'Accept-Encoding') -> str:
+    """Agrega un campo al header Vary sin duplicarlo"""
+    if not current:
+        return field
+    fields = [item.strip().lower() for item in current.split(',')]
+    if field.lower() in fields or '*' in fields:
+        return current
+    return f'{current}, {field}'
+
+
+class ResponseCompressor:
+    """
+    Compresión dinámica de respuestas (gzip y, si están instalados, brotli/zstd)
+
+    Solo comprime tipos MIME comprimibles dentro de [min_size, max_size]. Los
+    cuerpos grandes se comprimen en el executor para no bloquear el event
+    loop, y las variantes de archivos estáticos se cachean por
+    (ruta, mtime, codificación). Se registra el tiempo de CPU consumido por
+    codificación para poder ajustar los niveles.
+    """
+
+    def __init__(self, enabled: bool = True, min_size: int = 1024, max_size: int = 8 * 1024 * 1024,
+                 executor_threshold: int = 64 * 1024, gzip_level: int = 6,
+                 brotli_quality: int = 5, zstd_level: int = 3,
+                 cache_max_bytes: int = 32 * 1024 * 1024):
+        """
+        Inicializa el compresor
+
+        Args:
+            enabled: Habilita la compresión dinámica (COMPRESSION_ENABLED)
+            min_size: Tamaño mínimo del body a comprimir
+            max_size: Tamaño máximo del body a comprimir
+            executor_threshold: A partir de este tamaño se comprime en un thread
+            gzip_level: Nivel de gzip (1-9)
+            brotli_quality: Calidad de brotli (0-11)
+            zstd_level: Nivel de zstd (1-22)
+            cache_max_bytes: Presupuesto de la cache de variantes estáticas
+        """
+        self.enabled = enabled
+        self.min_size = min_size
+        self.max_size = max_size
+        self.executor_threshold = executor_threshold
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+        self.zstd_level = zstd_level
+        self.cache_max_bytes = cache_max_bytes
+
+        # Preferencia del servidor ante igual q del cliente
+        encodings = []
+        if BROTLI_AVAILABLE:
+            encodings.append('br')
+        if ZSTD_AVAILABLE:
+            encodings.append('zstd')
+        encodings.append('gzip')
+        self.encodings = tuple(encodings)
+
+        self._cache: 'OrderedDict[Tuple[str, int, str], bytes]' = OrderedDict()
+        self._cache_bytes = 0
+
+        self.stats: Dict[str, Any] = {
+            'cache_hits': 0,
+            'cache_misses': 0,
+            'executor_jobs': 0,
+            'encodings': {
+                encoding: {'responses': 0, 'bytes_in': 0, 'bytes_out': 0, 'cpu_seconds': 0.0}
+                for encoding in self.encodings
+            },
+        }
+
+    def choose_encoding(self, accept_encoding: str, content_type: str, size: int) -> Optional[str]:
+        """
+        Elige la codificación para una respuesta, o None si no se comprime
+
+        Args:
+            accept_encoding: Valor del header Accept-Encoding
+            content_type: Tipo MIME de la respuesta
+            size: Tamaño del body sin comprimir
+        """
+        if not self.enabled or not accept_encoding:
+            return None
+        if size < self.min_size or size > self.max_size:
+            return None
+        if not is_compressible(content_type):
+            return None
+
+        accepted = negotiate_encodings(accept_encoding, self.encodings)
+        return accepted[0] if accepted else None
+
+    def _compress_sync(self, body: bytes, encoding: str) -> Tuple[bytes, float]:
+        """Comprime el body y mide el tiempo de CPU del thread que lo hace"""
+        cpu_start = time.thread_time()
+
+        if encoding == 'br':
+            compressed = brotli.compress(body, quality=self.brotli_quality)
+        elif encoding == 'zstd':
+            compressed = zstandard.ZstdCompressor(level=self.zstd_level).compress(body)
+        else:
+            compressed = gzip.compress(body, compresslevel=self.gzip_level, mtime=0)
+
+        return compressed, time.thread_time() - cpu_start
+
+    async def compress(self, body: bytes, encoding: str) -> bytes:
+        """
+        Comprime un body, en el executor si supera executor_threshold
+
+        Args:
+            body: Contenido sin comprimir
+            encoding: br, zstd o gzip
+        """
+        if len(body) >= self.executor_threshold:
+            loop = asyncio.get_running_loop()
+            self.stats['executor_jobs'] += 1
+            compressed, cpu_seconds = await loop.run_in_executor(
+                None, self._compress_sync, body, encoding
+            )
+        else:
+            compressed, cpu_seconds = self._compress_sync(body, encoding)
+
+        encoding_stats = self.stats['encodings'][encoding]
+        encoding_stats['responses'] += 1
+        encoding_stats['bytes_in'] += len(body)
+        encoding_stats['bytes_out'] += len(compressed)
+        encoding_stats['cpu_seconds'] += cpu_seconds
+        return compressed
+
+    async def compress_static(self, path: str, mtime_ns: int, body: bytes, encoding: str) -> bytes:
+        """
+        Comprime el contenido de un archivo estático usando la cache de variantes
+
+        Args:
+            path: Ruta absoluta del archivo
+            mtime_ns: mtime del archivo (invalida la variante al cambiar)
+            body: Contenido sin comprimir
+            encoding: br, zstd o gzip
+        """
+        key = (path, mtime_ns, encoding)
+        compressed = self._cache.get(key)
+        if compressed is not None:
+            self._cache.move_to_end(key)
+            self.stats['cache_hits'] += 1
+            return compressed
+
+        self.stats['cache_misses'] += 1
+        compressed = await self.compress(body, encoding)
+
+        if len(compressed) <= self.cache_max_bytes:
+            # Otro request con la misma clave pudo terminar antes durante el await
+            previous = self._cache.pop(key, None)
+            if previous is not None:
+                self._cache_bytes -= len(previous)
+            self._cache[key] = compressed
+            self._cache_bytes += len(compressed)
+            while self._cache_bytes > self.cache_max_bytes:
+                _, evicted = self._cache.popitem(last=False)
+                self._cache_bytes -= len(evicted)
+
+        return compressed
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Retorna contadores y tiempo de CPU para el dashboard"""
+        encodings = {}
+        for encoding, values in self.stats['encodings'].items():
+            ratio = values['bytes_out'] / values['bytes_in'] if values['bytes_in'] else 0.0
+            encodings[encoding] = {**values, 'cpu_seconds': round(values['cpu_seconds'], 6),
+                                   'ratio': round(ratio, 4)}
+
+        return {
+            'enabled': self.enabled,
+            'available_encodings': list(self.encodings),
+            'cache_entries': len(self._cache),
+            'cache_bytes': self._cache_bytes,
+            'cache_hits': self.stats['cache_hits'],
+            'cache_misses': self.stats['cache_misses'],
+            'executor_jobs': self.stats['executor_jobs'],
+            'encodings': encodings,
+        }
+
+
+# Instancia global del compresor de respuestas
+response_compressor = ResponseCompressor(
+    enabled=config.get('compression_enabled', True),
+    min_size=config.get('compression_min_size', 1024),
+    max_size=config.get('compression_max_size', 8 * 1024 * 1024),
+    executor_threshold=config.get('compression_executor_threshold', 64 * 1024),
+    gzip_level=config.get('compression_gzip_level', 6),
+    brotli_quality=config.get('compression_brotli_quality', 5),
+    zstd_level=config.get('compression_zstd_level', 3),
+    cache_max_bytes=config.get('compression_cache_max_bytes', 32 * 1024 * 1024)
+)
@@ -0,0 +1,715 @@
+"""
+Manifiesto en memoria del document_root
+Árbol de archivos y directorios para responder "¿existe?" sin syscalls,
+actualizado con inotify o, si no está disponible, con un rescan periódico
+"""
+
+import ctypes
+import ctypes.util
+import errno
+import os
+import select
+import stat
+import struct
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from config.config_manager import config
+
+
+# Resultado de una consulta
+FILE = 'file'
+DIR = 'dir'
+ABSENT = 'absent'
+
+# Hojas del árbol: archivo regular, o entrada que hay que consultar al
+# filesystem (symlink, socket, directorio ilegible)
+_FILE = 1
+_OTHER = 2
+
+# Estados del manifiesto
+BUILDING = 'building'
+READY = 'ready'
+OVERFLOW = 'overflow'
+STOPPED = 'stopped'
+
+# Constantes de <sys/inotify.h>
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_DONT_FOLLOW = 0x02000000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = os.O_NONBLOCK
+IN_CLOEXEC = getattr(os, 'O_CLOEXEC', 0o2000000)
+
+WATCH_MASK = (IN_CREATE | IN_DELETE | IN_MOVED_FROM | IN_MOVED_TO |
+              IN_DELETE_SELF | IN_MOVE_SELF | IN_ONLYDIR | IN_DONT_FOLLOW)
+
+_EVENT_HEADER = struct.Struct('iIII')
+
+
+class _Dir:
+    """Nodo directorio: hijos por nombre y mtime del directorio"""
+
+    __slots__ = ('children', 'mtime_ns')
+
+    def __init__(self, mtime_ns: int):
+        self.children: Dict[str, Any] = {}
+        self.mtime_ns = mtime_ns
+
+
+class ManifestMiss(Exception):
+    """El manifiesto no alcanzó para responder y el modo solo-memoria está activo"""
+
+
+# Activo mientras el event loop resuelve desde el manifiesto (ver memory_only)
+_memory_only: ContextVar[bool] = ContextVar('memory_only', default=False)
+
+
+class _Overflow(Exception):
+    """El document_root supera max_entries"""
+
+
+class ManifestEntry:
+    """Resultado de buscar una ruta en el manifiesto"""
+
+    __slots__ = ('kind', 'path', 'mtime_ns', '_node')
+
+    def __init__(self, kind: str, path: Optional[str] = None,
+                 mtime_ns: Optional[int] = None, node: Optional[_Dir] = None):
+        self.kind = kind
+        self.path = path            # ruta absoluta real (None si no existe)
+        self.mtime_ns = mtime_ns    # mtime del directorio (o del que contiene al archivo)
+        self._node = node
+
+    def child_exists(self, name: str) -> Optional[bool]:
+        """
+        Indica si el directorio tiene una entrada con ese nombre
+
+        Returns:
+            True/False, o None si hay que consultar al filesystem
+        """
+        child = self._node.children.get(name) if self._node is not None else None
+        if child is None:
+            return False
+        if child is _OTHER:
+            return None
+        return True
+
+
+class Inotify:
+    """Acceso mínimo a inotify(7) mediante ctypes"""
+
+    def __init__(self):
+        """
+        Raises:
+            OSError: si inotify no está disponible (no es Linux, sin libc)
+        """
+        if not sys.platform.startswith('linux'):
+            raise OSError(errno.ENOSYS, 'inotify solo existe en Linux')
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        self._add_watch = libc.inotify_add_watch
+        self._add_watch.argtypes = (ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32)
+        self._add_watch.restype = ctypes.c_int
+
+        self.fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            code = ctypes.get_errno()
+            raise OSError(code, os.strerror(code))
+
+    def add_watch(self, path: str, mask: int = WATCH_MASK) -> int:
+        """
+        Agrega (o actualiza) el watch de un directorio
+
+        Raises:
+            OSError: ENOSPC al superar fs.inotify.max_user_watches, entre otros
+        """
+        wd = self._add_watch(self.fd, os.fsencode(path), mask)
+        if wd < 0:
+            code = ctypes.get_errno()
+            raise OSError(code, os.strerror(code), path)
+        return wd
+
+    def read_events(self, timeout: float) -> List[Tuple[int, int, str]]:
+        """
+        Espera eventos como mucho timeout segundos
+
+        Returns:
+            Lista de (wd, mask, nombre)
+        """
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return []
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return []
+
+        events = []
+        offset = 0
+        while offset + _EVENT_HEADER.size <= len(data):
+            wd, mask, _cookie, length = _EVENT_HEADER.unpack_from(data, offset)
+            offset += _EVENT_HEADER.size
+            name = os.fsdecode(data[offset:offset + length].rstrip(b'\0'))
+            offset += length
+            events.append((wd, mask, name))
+        return events
+
+    def close(self) -> None:
+        """Cierra el descriptor (el kernel descarta todos los watches)"""
+        if self.fd >= 0:
+            os.close(self.fd)
+            self.fd = -1
+
+
+class DocumentRootManifest:
+    """
+    Árbol en memoria de un document_root
+
+    Se construye en un thread de fondo. Mientras se construye, si el sitio
+    supera max_entries o si la ruta pasa por un symlink, lookup retorna None
+    y quien consulta usa el filesystem como siempre. Con inotify los cambios
+    se aplican al llegar; sin inotify (o sin watches disponibles) el
+    árbol se reconstruye cada rescan_interval segundos.
+
+    Las lecturas no toman locks: el thread de fondo solo asigna entradas de
+    dict y reemplaza la raíz completa en cada rescan.
+
+    on_change, si está definido, recibe cada ruta que cambió según inotify
+    ('/blog/post', es_directorio) desde el thread de fondo.
+    """
+
+    def __init__(self, document_root: str, max_entries: int = 200000,
+                 rescan_interval: float = 30.0, use_inotify: bool = True):
+        """
+        Args:
+            document_root: document_root del virtual host
+            max_entries: Máximo de archivos y directorios a mantener en memoria
+            rescan_interval: Segundos entre reconstrucciones sin inotify
+            use_inotify: Intentar inotify antes del rescan periódico
+        """
+        self.document_root = document_root
+        self.root = os.path.realpath(document_root)
+        self.max_entries = max_entries
+        self.rescan_interval = rescan_interval
+        self.use_inotify = use_inotify
+
+        self.state = BUILDING
+        self.mode = 'inotify' if use_inotify else 'rescan'
+        self.entries = 0
+        self.memory_bytes = 0
+        self.builds = 0
+        self.events = 0
+        self.last_build_seconds = 0.0
+
+        self._tree: Optional[_Dir] = None
+        self._count = 0
+        self._inotify: Optional[Inotify] = None
+        self._watches: Dict[int, Tuple[str, ...]] = {}
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.on_change: Optional[Callable[[str, bool], None]] = None
+
+    @property
+    def ready(self) -> bool:
+        """Indica si las consultas se responden desde memoria"""
+        return self.state == READY
+
+    def start(self) -> None:
+        """Construye y mantiene el manifiesto en un thread de fondo"""
+        self._thread = threading.Thread(target=self._run, name=f'manifest:{self.root}', daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Detiene el thread y vuelve a consultar siempre al filesystem"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+        self.state = STOPPED
+        self._tree = None
+        self._close_inotify()
+
+    def build(self) -> bool:
+        """
+        Construye el árbol completo (sincrónico; el thread de fondo lo usa)
+
+        Returns:
+            True si quedó listo, False si se superó max_entries
+        """
+        started = time.monotonic()
+        self._count = 0
+        self._watches = {}
+        try:
+            tree = self._scan(())
+        except _Overflow:
+            self._tree = None
+            self.state = OVERFLOW
+            self.entries = 0
+            self.memory_bytes = 0
+            self._close_inotify()
+            print(f"⚠️  Manifiesto de {self.root}: más de {self.max_entries} entradas, "
+                  f"se usa el filesystem")
+            return False
+
+        self._tree = tree
+        self.entries = self._count
+        self.memory_bytes = _tree_size(tree)
+        self.builds += 1
+        self.last_build_seconds = time.monotonic() - started
+        self.state = READY
+        return True
+
+    def lookup(self, path: str) -> Optional[ManifestEntry]:
+        """
+        Busca una ruta relativa al document_root
+
+        Args:
+            path: Ruta de la URL (con o sin barra inicial)
+
+        Returns:
+            ManifestEntry, o None si hay que consultar al filesystem (manifiesto
+            no listo, '..', symlinks o entradas especiales en el camino)
+        """
+        tree = self._tree
+        if tree is None or self.state != READY or '\0' in path:
+            return None
+
+        parts = [part for part in path.split('/') if part and part != '.']
+        if '..' in parts:
+            return None
+
+        parent: Optional[_Dir] = None
+        node: Any = tree
+        for part in parts:
+            if node is _FILE:
+                # Un componente después de un archivo: ENOTDIR
+                return ManifestEntry(ABSENT)
+            child = node.children.get(part)
+            if child is None:
+                return ManifestEntry(ABSENT)
+            if child is _OTHER:
+                return None
+            parent, node = node, child
+
+        resolved = os.path.join(self.root, *parts) if parts else self.root
+        if node is _FILE:
+            return ManifestEntry(FILE, resolved, parent.mtime_ns)
+        return ManifestEntry(DIR, resolved, node.mtime_ns, node)
+
+    def mtime_ns(self, directory: str) -> Optional[int]:
+        """mtime de un directorio absoluto según el manifiesto (None si no se sabe)"""
+        if directory == self.root:
+            relative = ''
+        elif directory.startswith(self.root + os.sep):
+            relative = directory[len(self.root) + 1:]
+        else:
+            return None
+        entry = self.lookup(relative)
+        if entry is None or entry.kind != DIR:
+            return None
+        return entry.mtime_ns
+
+    def _run(self) -> None:
+        """Thread de fondo: construir y mantener actualizado"""
+        if self.use_inotify:
+            try:
+                self._inotify = Inotify()
+            except OSError as e:
+                print(f"⚠️  inotify no disponible para {self.root} ({e}), rescan cada "
+                      f"{self.rescan_interval:g}s")
+                self.mode = 'rescan'
+
+        try:
+            if not self.build():
+                return
+        except OSError as e:
+            print(f"⚠️  No se pudo construir el manifiesto de {self.root}: {e}")
+            self.state = STOPPED
+            return
+
+        if self._inotify is not None:
+            print(f"🗂️  Manifiesto de {self.root}: {self.entries} entradas (inotify)")
+            self._watch_loop()
+        else:
+            self.mode = 'rescan'
+            print(f"🗂️  Manifiesto de {self.root}: {self.entries} entradas "
+                  f"(rescan cada {self.rescan_interval:g}s)")
+
+        # Sin inotify, o si se agotaron los watches: reconstruir periódicamente
+        while not self._stop.wait(self.rescan_interval):
+            if not self.build():
+                return
+
+    def _watch_loop(self) -> None:
+        """Aplica los eventos de inotify hasta stop o hasta perder el seguimiento"""
+        while not self._stop.is_set() and self._inotify is not None:
+            try:
+                events = self._inotify.read_events(1.0)
+            except OSError:
+                break
+
+            for wd, mask, name in events:
+                self.events += 1
+                if mask & IN_Q_OVERFLOW:
+                    # Se perdieron eventos: reconstruir con watches nuevos
+                    self._close_inotify()
+                    try:
+                        self._inotify = Inotify()
+                    except OSError:
+                        pass
+                    if not self.build():
+                        return
+                    break
+                try:
+                    self._apply_event(wd, mask, name)
+                except _Overflow:
+                    self._tree = None
+                    self.state = OVERFLOW
+                    self._close_inotify()
+                    print(f"⚠️  Manifiesto de {self.root}: más de {self.max_entries} entradas, "
+                          f"se usa el filesystem")
+                    return
+
+        if not self._stop.is_set():
+            print(f"⚠️  Manifiesto de {self.root}: inotify sin watches, rescan cada "
+                  f"{self.rescan_interval:g}s")
+        self.mode = 'rescan'
+        self._close_inotify()
+
+    def _apply_event(self, wd: int, mask: int, name: str) -> None:
+        """Actualiza el árbol con un evento de inotify"""
+        parts = self._watches.get(wd)
+        if mask & IN_IGNORED:
+            self._watches.pop(wd, None)
+            return
+        if parts is None or mask & (IN_DELETE_SELF | IN_MOVE_SELF):
+            # El padre recibe IN_DELETE / IN_MOVED_FROM por la misma entrada
+            return
+
+        directory = self._node(parts)
+        if directory is None:
+            return
+
+        if mask & (IN_DELETE | IN_MOVED_FROM):
+            removed = directory.children.pop(name, None)
+            if removed is not None:
+                self._count -= _count_entries(removed)
+                self.memory_bytes -= _tree_size(removed) + sys.getsizeof(name)
+                if isinstance(removed, _Dir):
+                    prefix = parts + (name,)
+                    for child_wd in [w for w, p in self._watches.items() if p[:len(prefix)] == prefix]:
+                        del self._watches[child_wd]
+
+        if mask & (IN_CREATE | IN_MOVED_TO):
+            previous = directory.children.get(name)
+            if previous is not None:
+                self._count -= _count_entries(previous)
+                self.memory_bytes -= _tree_size(previous) + sys.getsizeof(name)
+            node = self._scan_entry(parts, name)
+            if node is None:
+                directory.children.pop(name, None)
+            else:
+                directory.children[name] = node
+                self.memory_bytes += _tree_size(node) + sys.getsizeof(name)
+
+        st = _stat_or_none(os.path.join(self.root, *parts))
+        if st is not None:
+            directory.mtime_ns = st.st_mtime_ns
+        self.entries = self._count
+
+        if self.on_change is not None:
+            self.on_change('/' + '/'.join(parts + (name,)), bool(mask & IN_ISDIR))
+
+    def _node(self, parts: Tuple[str, ...]) -> Optional[_Dir]:
+        """Directorio del árbol en esa ruta relativa"""
+        node: Any = self._tree
+        for part in parts:
+            if not isinstance(node, _Dir):
+                return None
+            node = node.children.get(part)
+        return node if isinstance(node, _Dir) else None
+
+    def _scan_entry(self, parts: Tuple[str, ...], name: str) -> Any:
+        """Nodo de una entrada recién creada (None si ya no existe)"""
+        try:
+            st = os.lstat(os.path.join(self.root, *parts, name))
+        except OSError:
+            return None
+        self._count += 1
+        if self._count > self.max_entries:
+            raise _Overflow()
+        if stat.S_ISDIR(st.st_mode):
+            self._count -= 1  # _scan cuenta el propio directorio
+            return self._scan(parts + (name,))
+        return _FILE if stat.S_ISREG(st.st_mode) else _OTHER
+
+    def _scan(self, parts: Tuple[str, ...]) -> Any:
+        """
+        Recorre un directorio y sus subdirectorios
+
+        El watch se agrega antes de listar cada directorio para no perder
+        archivos creados durante el recorrido.
+        """
+        if parts:
+            self._count += 1
+        top = os.path.join(self.root, *parts) if parts else self.root
+        root_node = self._scan_dir(parts, top)
+        if root_node is _OTHER:
+            return _OTHER
+
+        pending = [(parts, top, root_node, None)]
+        while pending:
+            dir_parts, dir_path, node, parent = pending.pop()
+            try:
+                with os.scandir(dir_path) as entries:
+                    for entry in entries:
+                        self._count += 1
+                        if self._count > self.max_entries:
+                            raise _Overflow()
+                        if entry.is_symlink():
+                            node.children[entry.name] = _OTHER
+                        elif entry.is_dir(follow_symlinks=False):
+                            child_parts = dir_parts + (entry.name,)
+                            child = self._scan_dir(child_parts, entry.path)
+                            node.children[entry.name] = child
+                            if child is not _OTHER:
+                                pending.append((child_parts, entry.path, child, node))
+                        elif entry.is_file(follow_symlinks=False):
+                            node.children[entry.name] = _FILE
+                        else:
+                            node.children[entry.name] = _OTHER
+            except OSError:
+                if parent is None:
+                    raise
+                # Ilegible: que lo resuelva el filesystem
+                parent.children[dir_parts[-1]] = _OTHER
+        return root_node
+
+    def _scan_dir(self, parts: Tuple[str, ...], path: str) -> Any:
+        """Nodo vacío de un directorio con su watch (o _OTHER si no se puede seguir)"""
+        if self._inotify is not None:
+            try:
+                self._watches[self._inotify.add_watch(path)] = parts
+            except OSError as e:
+                if e.errno == errno.ENOSPC:
+                    # Sin watches disponibles: el loop pasa a rescan periódico
+                    self._close_inotify()
+                elif not parts:
+                    raise
+                else:
+                    return _OTHER
+        st = _stat_or_none(path)
+        if st is None:
+            if not parts:
+                raise FileNotFoundError(errno.ENOENT, os.strerror(errno.ENOENT), path)
+            return _OTHER
+        return _Dir(st.st_mtime_ns)
+
+    def _close_inotify(self) -> None:
+        if self._inotify is not None:
+            self._inotify.close()
+            self._inotify = None
+        self._watches = {}
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Retorna contadores para el dashboard"""
+        return {
+            'document_root': self.document_root,
+            'state': self.state,
+            'mode': self.mode,
+            'entries': self.entries,
+            'max_entries': self.max_entries,
+            'memory_bytes': self.memory_bytes,
+            'watches': len(self._watches),
+            'builds': self.builds,
+            'events': self.events,
+            'last_build_ms': round(self.last_build_seconds * 1000, 3),
+        }
+
+
+def _stat_or_none(path: str) -> Optional[os.stat_result]:
+    try:
+        return os.stat(path)
+    except OSError:
+        return None
+
+
+def _count_entries(node: Any) -> int:
+    """Entradas de un subárbol (incluyendo el propio nodo)"""
+    if not isinstance(node, _Dir):
+        return 1
+    total = 1
+    pending = [node]
+    while pending:
+        for child in pending.pop().children.values():
+            total += 1
+            if isinstance(child, _Dir):
+                pending.append(child)
+    return total
+
+
+def _tree_size(node: Any) -> int:
+    """Memoria aproximada de un subárbol (dicts, nodos y nombres)"""
+    if not isinstance(node, _Dir):
+        return 0
+    total = 0
+    pending = [node]
+    while pending:
+        current = pending.pop()
+        total += sys.getsizeof(current) + sys.getsizeof(current.children)
+        for name, child in current.children.items():
+            total += sys.getsizeof(name)
+            if isinstance(child, _Dir):
+                pending.append(child)
+    return total
+
+
+class ManifestRegistry:
+    """Manifiestos por document_root de los virtual hosts que los habilitan"""
+
+    def __init__(self, enabled: bool = False, max_entries: int = 200000,
+                 rescan_interval: float = 30.0, use_inotify: bool = True):
+        """
+        Args:
+            enabled: Valor por defecto para los virtual hosts sin la clave manifest
+            max_entries: Máximo de entradas por document_root
+            rescan_interval: Segundos entre reconstrucciones sin inotify
+            use_inotify: Usar inotify si está disponible
+        """
+        self.enabled = enabled
+        self.max_entries = max_entries
+        self.rescan_interval = rescan_interval
+        self.use_inotify = use_inotify
+        self._manifests: Dict[str, DocumentRootManifest] = {}
+        self._listeners: List[Callable[[str, str, bool], None]] = []
+
+    def configure(self, virtual_hosts: Iterable[Dict[str, Any]], start: bool = True) -> None:
+        """
+        Crea los manifiestos de los virtual hosts con manifest habilitado
+
+        Los document_root que dejaron de usarse se detienen; los que siguen
+        conservan su manifiesto.
+        """
+        wanted = []
+        for vhost in virtual_hosts:
+            document_root = vhost.get('document_root')
+            if document_root and vhost.get('manifest', self.enabled) and document_root not in wanted:
+                wanted.append(document_root)
+
+        for document_root in list(self._manifests):
+            if document_root not in wanted:
+                self._manifests.pop(document_root).stop()
+
+        for document_root in wanted:
+            if document_root in self._manifests or not os.path.isdir(document_root):
+                continue
+            manifest = DocumentRootManifest(document_root, self.max_entries,
+                                            self.rescan_interval, self.use_inotify)
+            self.add(manifest)
+            if start:
+                manifest.start()
+
+    @contextmanager
+    def memory_only(self) -> Iterator[None]:
+        """
+        Prohíbe consultar al filesystem dentro del bloque
+
+        Para resolver en el event loop: si el manifiesto no alcanza (symlinks,
+        '..', desbordamiento, no listo) el código que iba a hacer stat o
+        realpath lanza ManifestMiss y el llamador repite en el executor de I/O.
+        """
+        token = _memory_only.set(True)
+        try:
+            yield
+        finally:
+            _memory_only.reset(token)
+
+    def filesystem_access(self, path: str) -> None:
+        """
+        Se llama antes de consultar al filesystem por una ruta que el
+        manifiesto no pudo responder
+
+        Raises:
+            ManifestMiss: dentro de memory_only
+        """
+        if _memory_only.get():
+            raise ManifestMiss(path)
+
+    def get(self, document_root: str) -> Optional[DocumentRootManifest]:
+        """Manifiesto de un document_root (listo o no)"""
+        return self._manifests.get(document_root)
+
+    def add(self, manifest: DocumentRootManifest) -> None:
+        """Registra un manifiesto ya creado"""
+        manifest.on_change = lambda path, is_dir: self._notify(manifest.document_root, path, is_dir)
+        self._manifests[manifest.document_root] = manifest
+
+    def add_listener(self, callback: Callable[[str, str, bool], None]) -> None:
+        """
+        Registra una función que recibe (document_root, ruta, es_directorio)
+        por cada cambio que inotify informa (se llama desde el thread de fondo)
+        """
+        if callback not in self._listeners:
+            self._listeners.append(callback)
+
+    def _notify(self, document_root: str, path: str, is_dir: bool) -> None:
+        """Avisa un cambio a los listeners sin dejar que un error detenga el manifiesto"""
+        for callback in self._listeners:
+            try:
+                callback(document_root, path, is_dir)
+            except Exception as e:
+                print(f"⚠️  Error notificando el cambio de {path} en {document_root}: {e}")
+
+    def is_ready(self, document_root: str) -> bool:
+        """Indica si el document_root se responde desde memoria"""
+        manifest = self._manifests.get(document_root)
+        return manifest is not None and manifest.ready
+
+    def lookup(self, document_root: str, path: str) -> Optional[ManifestEntry]:
+        """Busca la ruta en el manifiesto (None: consultar al filesystem)"""
+        manifest = self._manifests.get(document_root)
+        if manifest is None:
+            return None
+        return manifest.lookup(path)
+
+    def mtime_ns(self, document_root: str, directory: str) -> Optional[int]:
+        """mtime de un directorio según el manifiesto (None si no se sabe)"""
+        manifest = self._manifests.get(document_root)
+        if manifest is None:
+            return None
+        return manifest.mtime_ns(directory)
+
+    def stop(self) -> None:
+        """Detiene todos los manifiestos"""
+        for manifest in self._manifests.values():
+            manifest.stop()
+        self._manifests.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Retorna contadores para el dashboard"""
+        manifests = [manifest.get_stats() for manifest in self._manifests.values()]
+        return {
+            'enabled': self.enabled,
+            'manifests': manifests,
+            'entries': sum(manifest['entries'] for manifest in manifests),
+            'memory_bytes': sum(manifest['memory_bytes'] for manifest in manifests),
+        }
+
+
+# Instancia global de los manifiestos de document_root
+docroot_manifests = ManifestRegistry(
+    enabled=config.get('docroot_manifest_enabled', False),
+    max_entries=config.get('docroot_manifest_max_entries', 200000),
+    rescan_interval=config.get('docroot_manifest_rescan_interval', 30.0),
+    use_inotify=config.get('docroot_manifest_inotify', True)
+)
@@ -0,0 +1,135 @@
+"""
+Cache de metadatos de filesystem
+stat y realpath compartidos entre las condiciones de rewrite y la resolución de rutas
+"""
+
+import os
+import stat
+import time
+from typing import Any, Dict, Optional, Tuple
+
+from config.config_manager import config
+
+
+class FileMetadataCache:
+    """
+    Cache con TTL de os.stat y os.path.realpath
+
+    Cada ruta se consulta al filesystem como mucho una vez por ventana de
+    ttl segundos, sin importar cuántos componentes del pipeline la pidan
+    (condiciones file_not_exists / dir_not_exists, resolución de la ruta,
+    búsqueda de index). La ausencia de un archivo también se cachea.
+
+    Las escrituras son asignaciones simples de dict, por lo que puede usarse
+    desde los threads del executor de I/O.
+    """
+
+    def __init__(self, ttl: float = 1.0, max_entries: int = 50000, enabled: bool = True):
+        """
+        Inicializa la cache
+
+        Args:
+            ttl: Segundos que se confía en un resultado
+            max_entries: Cantidad máxima de rutas por tabla (se vacía al superarla)
+            enabled: Si es False todas las consultas van al filesystem
+        """
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.enabled = enabled and ttl > 0 and max_entries > 0
+
+        self._stats: Dict[str, Tuple[float, Optional[os.stat_result]]] = {}
+        self._realpaths: Dict[str, Tuple[float, str]] = {}
+
+        self.hits = 0
+        self.misses = 0
+
+    def stat(self, path: str) -> Optional[os.stat_result]:
+        """
+        os.stat cacheado (sigue symlinks)
+
+        Returns:
+            El stat, o None si la ruta no existe o no es accesible
+        """
+        if self.enabled:
+            cached = self._stats.get(path)
+            if cached is not None and time.monotonic() - cached[0] < self.ttl:
+                self.hits += 1
+                return cached[1]
+
+        self.misses += 1
+        try:
+            result = os.stat(path)
+        except OSError:
+            result = None
+
+        if self.enabled:
+            if len(self._stats) >= self.max_entries:
+                self._stats.clear()
+            self._stats[path] = (time.monotonic(), result)
+        return result
+
+    def realpath(self, path: str) -> str:
+        """
+        os.path.realpath cacheado
+
+        Raises:
+            ValueError: si la ruta contiene bytes nulos
+        """
+        if self.enabled:
+            cached = self._realpaths.get(path)
+            if cached is not None and time.monotonic() - cached[0] < self.ttl:
+                self.hits += 1
+                return cached[1]
+
+        self.misses += 1
+        result = os.path.realpath(path)
+
+        if self.enabled:
+            if len(self._realpaths) >= self.max_entries:
+                self._realpaths.clear()
+            self._realpaths[path] = (time.monotonic(), result)
+        return result
+
+    def is_file(self, path: str) -> bool:
+        """Indica si la ruta es un archivo regular"""
+        st = self.stat(path)
+        return st is not None and stat.S_ISREG(st.st_mode)
+
+    def is_dir(self, path: str) -> bool:
+        """Indica si la ruta es un directorio"""
+        st = self.stat(path)
+        return st is not None and stat.S_ISDIR(st.st_mode)
+
+    def invalidate(self, path: Optional[str] = None) -> None:
+        """
+        Descarta los metadatos de una ruta, o todos si no se indica
+
+        Args:
+            path: Ruta absoluta a olvidar
+        """
+        if path is None:
+            self._stats.clear()
+            self._realpaths.clear()
+            return
+        self._stats.pop(path, None)
+        self._realpaths.pop(path, None)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Retorna contadores para el dashboard"""
+        lookups = self.hits + self.misses
+        return {
+            'enabled': self.enabled,
+            'ttl': self.ttl,
+            'stat_entries': len(self._stats),
+            'realpath_entries': len(self._realpaths),
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+# Instancia global de la cache de metadatos de filesystem
+file_metadata = FileMetadataCache(
+    ttl=config.get('file_metadata_ttl', 1.0),
+    max_entries=config.get('file_metadata_max_entries', 50000)
+)
@@ -0,0 +1,176 @@
+"""
+Executor de I/O de filesystem
+Pool de threads acotado con límite de concurrencia por document_root y métricas de cola
+"""
+
+import asyncio
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from config.config_manager import config
+
+
+def stat_or_none(path: str) -> Optional[os.stat_result]:
+    """os.stat que retorna None si el archivo no existe o no es accesible"""
+    try:
+        return os.stat(path)
+    except OSError:
+        return None
+
+
+class RootStats:
+    """Contadores de un document_root"""
+
+    __slots__ = ('queued', 'active', 'completed', 'errors', 'max_queued',
+                 'wait_seconds', 'run_seconds', 'slowest')
+
+    def __init__(self):
+        self.queued = 0
+        self.active = 0
+        self.completed = 0
+        self.errors = 0
+        self.max_queued = 0
+        self.wait_seconds = 0.0
+        self.run_seconds = 0.0
+        self.slowest = 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'queued': self.queued,
+            'active': self.active,
+            'completed': self.completed,
+            'errors': self.errors,
+            'max_queued': self.max_queued,
+            'avg_wait_ms': round(self.wait_seconds / self.completed * 1000, 3) if self.completed else 0.0,
+            'avg_run_ms': round(self.run_seconds / self.completed * 1000, 3) if self.completed else 0.0,
+            'slowest_ms': round(self.slowest * 1000, 3),
+        }
+
+
+class IOExecutor:
+    """
+    Ejecuta operaciones bloqueantes de filesystem fuera del event loop
+
+    Cada document_root tiene un límite de operaciones simultáneas en el pool:
+    un montaje lento (ej: NFS) acumula cola propia pero no ocupa todos los
+    threads, así que los demás sitios siguen respondiendo.
+    """
+
+    def __init__(self, max_workers: int = 16, per_root_limit: int = 4):
+        """
+        Inicializa el executor
+
+        Args:
+            max_workers: Cantidad de threads del pool
+            per_root_limit: Operaciones simultáneas máximas por document_root
+        """
+        self.max_workers = max(1, max_workers)
+        self.per_root_limit = max(1, min(per_root_limit, self.max_workers))
+
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._semaphores: Dict[str, asyncio.Semaphore] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._roots: Dict[str, RootStats] = {}
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.max_workers,
+                                                thread_name_prefix='fs-io')
+        return self._executor
+
+    def _get_semaphore(self, root: str) -> asyncio.Semaphore:
+        """Semáforo del document_root (se recrean si cambia el event loop)"""
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            self._loop = loop
+            self._semaphores = {}
+
+        semaphore = self._semaphores.get(root)
+        if semaphore is None:
+            semaphore = asyncio.Semaphore(self.per_root_limit)
+            self._semaphores[root] = semaphore
+        return semaphore
+
+    def _get_root_stats(self, root: str) -> RootStats:
+        stats = self._roots.get(root)
+        if stats is None:
+            stats = RootStats()
+            self._roots[root] = stats
+        return stats
+
+    @staticmethod
+    def _timed(func: Callable, args: Tuple) -> Tuple[Any, float]:
+        """Ejecuta func en el thread y mide su duración"""
+        started = time.perf_counter()
+        result = func(*args)
+        return result, time.perf_counter() - started
+
+    async def run(self, root: str, func: Callable, *args) -> Any:
+        """
+        Ejecuta una función bloqueante en el pool
+
+        Args:
+            root: document_root al que pertenece la operación
+            func: Función sincrónica (stat, open, resolve, ...)
+            *args: Argumentos de func
+
+        Returns:
+            El resultado de func (sus excepciones se propagan)
+        """
+        stats = self._get_root_stats(root)
+        semaphore = self._get_semaphore(root)
+
+        queued_at = time.perf_counter()
+        stats.queued += 1
+        stats.max_queued = max(stats.max_queued, stats.queued)
+        try:
+            await semaphore.acquire()
+        finally:
+            stats.queued -= 1
+
+        stats.active += 1
+        try:
+            loop = asyncio.get_running_loop()
+            result, elapsed = await loop.run_in_executor(
+                self._get_executor(), self._timed, func, args
+            )
+        except BaseException:
+            stats.errors += 1
+            raise
+        finally:
+            stats.active -= 1
+            semaphore.release()
+
+        stats.completed += 1
+        # La espera incluye la cola del semáforo y la del pool
+        stats.wait_seconds += (time.perf_counter() - queued_at) - elapsed
+        stats.run_seconds += elapsed
+        stats.slowest = max(stats.slowest, elapsed)
+        return result
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Retorna métricas de cola para el dashboard"""
+        pending = self._executor._work_queue.qsize() if self._executor is not None else 0
+        return {
+            'max_workers': self.max_workers,
+            'per_root_limit': self.per_root_limit,
+            'pool_queue_depth': pending,
+            'queued': sum(stats.queued for stats in self._roots.values()),
+            'active': sum(stats.active for stats in self._roots.values()),
+            'roots': {root: stats.to_dict() for root, stats in self._roots.items()},
+        }
+
+    def shutdown(self) -> None:
+        """Detiene el pool de threads"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+# Instancia global del executor de I/O
+io_executor = IOExecutor(
+    max_workers=config.get('io_executor_threads', 16),
+    per_root_limit=config.get('io_executor_per_root_limit', 4)
+)
@@ -0,0 +1,39 @@
+"""
+Tipos MIME
+Detecta el Content-Type de un archivo e indica si conviene comprimirlo
+"""
+
+import mimetypes
+from pathlib import Path
+from typing import Union
+
+# Tipos no textuales que igualmente se benefician de la compresión
+COMPRESSIBLE_TYPES = frozenset([
+    'application/javascript',
+    'application/x-javascript',
+    'application/json',
+    'application/ld+json',
+    'application/manifest+json',
+    'application/xml',
+    'application/xhtml+xml',
+    'application/rss+xml',
+    'application/atom+xml',
+    'application/wasm',
+    'image/svg+xml',
+    'image/x-icon',
+    'font/ttf',
+    'font/otf',
+    'application/vnd.ms-fontobject',
+])
+
+
+def guess_content_type(path: Union[str, Path]) -> str:
+    """Determina el tipo MIME de un archivo por su extensión"""
+    content_type, _ = mimetypes.guess_type(str(path))
+    return content_type or 'application/octet-stream'
+
+
+def is_compressible(content_type: str) -> bool:
+    """Indica si un tipo MIME es texto o similar y vale la pena comprimirlo"""
+    media_type = content_type.split(';', 1)[0].strip().lower()
+    return media_type.startswith('text/') or media_type in COMPRESSIBLE_TYPES
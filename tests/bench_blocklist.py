@@ -0,0 +1,77 @@
+"""
+Benchmark de la lista de bloqueo de seguridad
+
+Compara el chequeo anterior (listas reconstruidas en cada request y
+recorridas con any(...)) contra el Blocklist compilado por virtual host.
+
+Uso:
+    python tests/bench_blocklist.py [iteraciones]
+"""
+
+import os
+import sys
+import time
+
+# Agregar src al path para importar los módulos
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from config.blocklist import Blocklist
+
+
+SAMPLE_PATHS = [
+    'index.php',
+    'assets/css/app.min.css',
+    'blog/2024/05/un-articulo-largo/imagen-destacada.webp',
+    'app/.git/config',
+    'uploads/backup.sql.bak',
+    '.env',
+    'vendor/composer/autoload_real.php',
+]
+
+
+def legacy_check(path: str) -> bool:
+    """Camino anterior de handle_request"""
+    blocked_directories = ['.git', '.svn', '.hg', '.bzr', 'node_modules', '.vscode', '.idea']
+    for part in path.split('/'):
+        if part.lower() in blocked_directories:
+            return True
+
+    blocked_files = ['.env', '.htaccess', '.htpasswd', 'config.php', 'wp-config.php',
+                     '.gitignore', '.gitattributes', '.gitmodules']
+    blocked_extensions = ['.bak', '.backup', '.old', '.orig', '.tmp', '.log', '.swp', '.swo']
+    blocked_dot_files = ['.env', '.htaccess', '.htpasswd', '.gitignore', '.gitattributes',
+                         '.gitmodules', '.git', '.svn', '.hg', '.bzr']
+
+    filename = path.rsplit('/', 1)[-1].lower()
+    return (filename in blocked_files or
+            any(filename.endswith(ext) for ext in blocked_extensions) or
+            any(filename.startswith(blocked) for blocked in blocked_dot_files))
+
+
+def compiled_check(blocklist: Blocklist, path: str) -> bool:
+    """Camino nuevo: Blocklist compilado una vez"""
+    return blocklist.is_blocked_path(path) or blocklist.is_blocked_file(path.rsplit('/', 1)[-1])
+
+
+def run_benchmark(iterations: int) -> None:
+    blocklist = Blocklist()
+
+    for path in SAMPLE_PATHS:
+        assert legacy_check(path) == compiled_check(blocklist, path), path
+
+    print(f"Iteraciones: {iterations} x {len(SAMPLE_PATHS)} rutas")
+    print(f"{'camino':<12}{'ns/request':>12}")
+
+    for name, check in (('legacy', legacy_check),
+                        ('compilado', lambda path: compiled_check(blocklist, path))):
+        started = time.perf_counter()
+        for _ in range(iterations):
+            for path in SAMPLE_PATHS:
+                check(path)
+        elapsed = time.perf_counter() - started
+        per_request = elapsed / (iterations * len(SAMPLE_PATHS)) * 1e9
+        print(f"{name:<12}{per_request:>12.0f}")
+
+
+if __name__ == '__main__':
+    run_benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else 100000)
@@ -0,0 +1,175 @@
+"""
+Benchmark del codec FastCGI
+
+Compara la implementación anterior de FastCGIClient (_pack_params y
+_pack_fcgi_record con concatenación, lectura de la respuesta con dos
+wait_for por registro, slice del padding y stdout += contenido) contra
+fastcgi_codec (bytearray que crece en el lugar, RecordReader y memoryview).
+
+Uso:
+    python tests/bench_fastcgi_codec.py [tamaño_mb] [repeticiones]
+"""
+
+import asyncio
+import os
+import struct
+import sys
+import time
+
+# Agregar src al path para importar los módulos
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from php_fpm.fastcgi_codec import RecordReader, encode_params, encode_stream
+
+FCGI_END_REQUEST = 3
+FCGI_PARAMS = 4
+FCGI_STDOUT = 6
+FCGI_STDERR = 7
+
+
+def legacy_pack_record(req_type: int, req_id: int, content: bytes) -> bytes:
+    """Camino anterior: header + contenido + padding concatenados"""
+    content_length = len(content)
+    padding_length = (8 - (content_length % 8)) % 8
+    header = struct.pack('!BBHHBx', 1, req_type, req_id, content_length, padding_length)
+    return header + content + b'\x00' * padding_length
+
+
+def legacy_pack_params(params: dict) -> bytes:
+    """Camino anterior: result += por cada longitud y par"""
+    result = b''
+    for key, value in params.items():
+        key_bytes = key.encode('utf-8')
+        value_bytes = value.encode('utf-8')
+        key_len = len(key_bytes)
+        value_len = len(value_bytes)
+        if key_len < 128:
+            result += struct.pack('!B', key_len)
+        else:
+            result += struct.pack('!I', key_len | 0x80000000)
+        if value_len < 128:
+            result += struct.pack('!B', value_len)
+        else:
+            result += struct.pack('!I', value_len | 0x80000000)
+        result += key_bytes + value_bytes
+    return result
+
+
+async def legacy_read_response(reader: asyncio.StreamReader, timeout: float):
+    """Camino anterior: readexactly con wait_for por lectura y stdout += contenido"""
+    stdout_data = b''
+    stderr_data = b''
+    while True:
+        header = await asyncio.wait_for(reader.readexactly(8), timeout=timeout)
+        _, req_type, _, content_length, padding_length = struct.unpack('!BBHHBx', header)
+        if content_length or padding_length:
+            body = await asyncio.wait_for(reader.readexactly(content_length + padding_length), timeout=timeout)
+            content = body[:content_length]
+        else:
+            content = b''
+        if req_type == FCGI_STDOUT:
+            if content:
+                stdout_data += content
+        elif req_type == FCGI_STDERR:
+            if content:
+                stderr_data += content
+        elif req_type == FCGI_END_REQUEST:
+            return stdout_data, stderr_data
+
+
+async def codec_read_response(reader: asyncio.StreamReader, timeout: float):
+    """fastcgi_codec: un timeout por registro, memoryview y un solo join"""
+    records = RecordReader(reader, timeout)
+    stdout = []
+    stderr = []
+    while True:
+        req_type, _, content = await records.read()
+        if req_type == FCGI_STDOUT:
+            if content:
+                stdout.append(content)
+        elif req_type == FCGI_STDERR:
+            if content:
+                stderr.append(content)
+        elif req_type == FCGI_END_REQUEST:
+            return b''.join(stdout), b''.join(stderr)
+
+
+def build_params() -> dict:
+    """Parámetros de un request típico de un navegador"""
+    params = {
+        'SCRIPT_FILENAME': '/var/www/sitio/index.php', 'SCRIPT_NAME': '/index.php',
+        'REQUEST_METHOD': 'GET', 'REQUEST_URI': '/productos/categoria/ofertas?pagina=3',
+        'QUERY_STRING': 'url=productos/categoria/ofertas&pagina=3', 'CONTENT_TYPE': '',
+        'CONTENT_LENGTH': '0', 'SERVER_SOFTWARE': 'TechWebServer/1.0', 'SERVER_NAME': 'sitio.local',
+        'SERVER_PORT': '443', 'REMOTE_ADDR': '203.0.113.7', 'GATEWAY_INTERFACE': 'CGI/1.1',
+        'SERVER_PROTOCOL': 'HTTP/1.1', 'REDIRECT_STATUS': '200', 'DOCUMENT_ROOT': '/var/www/sitio',
+        'HTTP_HOST': 'sitio.local', 'HTTPS': 'on',
+        'HTTP_USER_AGENT': 'Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) '
+                           'Chrome/120.0.0.0 Safari/537.36',
+        'HTTP_ACCEPT': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,*/*;q=0.8',
+        'HTTP_ACCEPT_LANGUAGE': 'es-AR,es;q=0.9,en;q=0.8', 'HTTP_ACCEPT_ENCODING': 'gzip, deflate, br',
+        'HTTP_COOKIE': '; '.join(f'cookie{i}={"v" * 40}' for i in range(20)),
+    }
+    return params
+
+
+def bench_sync(name: str, func, repetitions: int) -> float:
+    started = time.perf_counter()
+    for _ in range(repetitions):
+        func()
+    elapsed = time.perf_counter() - started
+    print(f"{name:<34}{elapsed / repetitions * 1e6:>12.2f} µs")
+    return elapsed
+
+
+async def bench_read(name: str, read_response, stream: bytes, size_mb: int, repetitions: int) -> float:
+    elapsed = 0.0
+    for _ in range(repetitions):
+        reader = asyncio.StreamReader(limit=len(stream) + 1)
+        reader.feed_data(stream)
+        reader.feed_eof()
+        started = time.perf_counter()
+        stdout, _ = await read_response(reader, 30)
+        elapsed += time.perf_counter() - started
+        assert len(stdout) == size_mb * 1024 * 1024
+    print(f"{name:<34}{size_mb * repetitions / elapsed:>12.1f} MB/s")
+    return elapsed
+
+
+async def run_benchmark(size_mb: int, repetitions: int) -> None:
+    params = build_params()
+    assert bytes(encode_params(params)) == legacy_pack_params(params)
+
+    print("Empaquetado de PARAMS (~2 KB por request)")
+    legacy = bench_sync('legacy _pack_params', lambda: legacy_pack_params(params), 20000)
+    codec = bench_sync('codec encode_params', lambda: encode_params(params), 20000)
+    print(f"{'speedup':<34}{legacy / codec:>12.2f} x")
+
+    print("\nEmpaquetado de PARAMS en registros")
+    legacy = bench_sync('legacy pack_params + record',
+                        lambda: legacy_pack_record(FCGI_PARAMS, 1, legacy_pack_params(params)), 20000)
+    codec = bench_sync('codec encode_stream',
+                       lambda: encode_stream(FCGI_PARAMS, 1, encode_params(params), terminate=True), 20000)
+    print(f"{'speedup':<34}{legacy / codec:>12.2f} x")
+
+    # PHP-FPM envía la salida en registros de hasta 8 KB con padding
+    payload = os.urandom(size_mb * 1024 * 1024)
+    for record_size in (8184, 65535):
+        stream = b''.join(
+            legacy_pack_record(FCGI_STDOUT, 1, payload[offset:offset + record_size])
+            for offset in range(0, len(payload), record_size)
+        ) + legacy_pack_record(FCGI_STDOUT, 1, b'') + legacy_pack_record(FCGI_END_REQUEST, 1, b'\0' * 8)
+
+        print(f"\nLectura de respuesta: {size_mb} MB en registros de {record_size} bytes, "
+              f"{repetitions} repeticiones")
+        legacy = await bench_read('legacy wait_for + stdout +=', legacy_read_response,
+                                  stream, size_mb, repetitions)
+        codec = await bench_read('codec RecordReader + memoryview', codec_read_response,
+                                 stream, size_mb, repetitions)
+        print(f"{'speedup':<34}{legacy / codec:>12.2f} x")
+
+
+if __name__ == '__main__':
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 16
+    reps = int(sys.argv[2]) if len(sys.argv) > 2 else 3
+    asyncio.run(run_benchmark(size, reps))
@@ -0,0 +1,120 @@
+"""
+Benchmark del motor de rewrite
+
+Compara construir RewriteEngine en cada request (camino anterior) contra
+reutilizar el motor compilado por virtual host (sin y con la memo de
+resultados), con 1, 20 y 200 reglas.
+
+También compara RewriteRule.apply con varias capturas: el camino anterior
+(match + sub + str.replace por grupo) contra la expansión de plantillas
+precompiladas desde el match de matches().
+
+Uso:
+    python tests/bench_rewrite_engine.py [segundos_por_caso]
+"""
+
+import os
+import sys
+import tempfile
+import time
+
+# Agregar src al path para importar los módulos
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from rewrite.rewrite_engine import RewriteEngine
+from rewrite.rewrite_rule import RewriteRule
+
+
+def build_vhost(rule_count: int, document_root: str) -> dict:
+    """Virtual host con reglas de sección y un front controller al final"""
+    rules = [
+        {'pattern': f'^/seccion{i}/(.*)$', 'target': f'/seccion{i}.php',
+         'query_string': 'ruta=$1', 'flags': ['QSA', 'L']}
+        for i in range(rule_count - 1)
+    ]
+    rules.append({
+        'pattern': '^(.*)$', 'target': '/index.php', 'query_string': 'url=$1',
+        'conditions': [{'type': 'file_not_exists'}, {'type': 'dir_not_exists'}],
+        'flags': ['QSA', 'L'],
+    })
+    return {'domain': 'bench.local', 'document_root': document_root, 'rewrite_rules': rules}
+
+
+def measure(func, seconds: float) -> float:
+    """Ejecuta func durante seconds y retorna llamadas por segundo"""
+    calls = 0
+    started = time.perf_counter()
+    deadline = started + seconds
+    while time.perf_counter() < deadline:
+        for _ in range(50):
+            func()
+        calls += 50
+    return calls / (time.perf_counter() - started)
+
+
+# Patrones con muchas capturas: (patrón, target, query_string, ruta)
+CAPTURE_CASES = [
+    (r'^/(\w+)/(\d{4})/(\d{2})/(\d{2})/([\w-]+)$', r'/\1.php',
+     'y=$2&m=$3&d=$4&slug=$5', '/blog/2024/05/17/notas-de-version'),
+    (r'^/(?P<lang>es|en)/(\w+)/(\w+)/(\d+)(?:/(\w+))?$', r'/\g<lang>/\2.php',
+     'accion=$3&id=$4&vista=$5', '/es/productos/editar/991/completa'),
+    (r'^/api/v(\d+)/(\w+)/(\d+)/(\w+)/(\d+)/(\w+)/(\d+)$', '/api.php',
+     'v=$1&a=$2&b=$3&c=$4&d=$5&e=$6&f=$7', '/api/v2/users/17/posts/3/comments/88'),
+]
+
+
+def legacy_apply(rule: RewriteRule, request_path: str, original_query: str):
+    """matches + apply tal como funcionaban antes (tres ejecuciones de la regex)"""
+    if not rule.pattern.match(request_path):
+        return request_path, original_query
+    match = rule.pattern.match(request_path)
+    rewritten_path = rule.pattern.sub(rule.target, request_path)
+    query = rule.query_string
+    for i, group in enumerate(match.groups(), 1):
+        if group is not None:
+            query = query.replace(f"${i}", group)
+    if original_query:
+        query = f"{query}&{original_query}" if query else original_query
+    return rewritten_path, query
+
+
+def run_capture_benchmark(seconds: float) -> None:
+    print(f"\n{'grupos':>8}{'anterior':>16}{'una pasada':>16}")
+    for pattern, target, query_string, request_path in CAPTURE_CASES:
+        rule = RewriteRule(pattern, target, query_string, flags=['QSA'])
+
+        def single_pass():
+            return rule.apply(request_path, 'a=1', rule.matches(request_path, ''))
+
+        assert single_pass() == legacy_apply(rule, request_path, 'a=1')
+        legacy = measure(lambda: legacy_apply(rule, request_path, 'a=1'), seconds)
+        current = measure(single_pass, seconds)
+        print(f"{rule.pattern.groups:>8}{legacy:>14.0f}/s{current:>14.0f}/s")
+
+
+def run_benchmark(seconds: float) -> None:
+    document_root = tempfile.mkdtemp()
+    request_path = '/productos/listado'
+
+    print(f"{'reglas':>8}{'por request':>16}{'compilado':>16}{'con memo':>16}")
+    for rule_count in (1, 20, 200):
+        vhost = build_vhost(rule_count, document_root)
+        compiled = RewriteEngine(vhost, document_root, memo_size=0)
+        memoized = RewriteEngine(vhost, document_root)
+        expected = ('/index.php', 'url=/productos/listado&a=1')
+        assert compiled.process(request_path, 'a=1') == memoized.process(request_path, 'a=1') == expected
+
+        per_request = measure(
+            lambda: RewriteEngine(vhost, document_root, memo_size=0).process(request_path, 'a=1'), seconds
+        )
+        reused = measure(lambda: compiled.process(request_path, 'a=1'), seconds)
+        memo_hits = measure(lambda: memoized.process(request_path, 'a=1'), seconds)
+        print(f"{rule_count:>8}{per_request:>14.0f}/s{reused:>14.0f}/s{memo_hits:>14.0f}/s")
+
+    os.rmdir(document_root)
+
+
+if __name__ == '__main__':
+    duration = float(sys.argv[1]) if len(sys.argv) > 1 else 1.0
+    run_benchmark(duration)
+    run_capture_benchmark(duration)
@@ -0,0 +1,90 @@
+"""
+Benchmark de entrega de archivos estáticos
+
+Compara el camino anterior (aiofiles + web.Response con el archivo completo en
+memoria) contra los modos de FileSender (sendfile y chunked).
+
+Uso:
+    python tests/bench_static_send.py [tamaño_mb] [repeticiones]
+"""
+
+import asyncio
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+# Agregar src al path para importar los módulos
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from aiofiles import open as aio_open
+from aiohttp import web
+from aiohttp.test_utils import TestClient, TestServer
+
+from static_files.file_sender import FileSender
+
+
+async def legacy_handler(request: web.Request) -> web.Response:
+    """Camino anterior: lee el archivo completo a memoria"""
+    async with aio_open(request.app['file_path'], 'rb') as f:
+        content = await f.read()
+    return web.Response(body=content, content_type='application/octet-stream')
+
+
+async def run_benchmark(size_mb: int, repetitions: int) -> None:
+    temp_dir = tempfile.mkdtemp()
+    file_path = Path(temp_dir, 'bench.bin')
+    file_path.write_bytes(os.urandom(size_mb * 1024 * 1024))
+
+    sender = FileSender()
+
+    async def sender_handler(request: web.Request) -> web.StreamResponse:
+        return await sender.send(
+            request, file_path, 'application/octet-stream', mode=request.match_info['mode']
+        )
+
+    app = web.Application()
+    app['file_path'] = file_path
+    app.router.add_get('/legacy', legacy_handler)
+    app.router.add_get('/send/{mode}', sender_handler)
+
+    client = TestClient(TestServer(app))
+    await client.start_server()
+
+    print(f"Archivo: {size_mb} MB, repeticiones: {repetitions}")
+    print(f"{'camino':<12}{'MB/s':>10}{'CPU s':>10}{'pico MB':>10}")
+
+    try:
+        for name, url in (('legacy', '/legacy'),
+                          ('memory', '/send/memory'),
+                          ('chunked', '/send/chunked'),
+                          ('sendfile', '/send/sendfile')):
+            tracemalloc.start()
+            wall_start = time.perf_counter()
+            cpu_start = time.process_time()
+
+            for _ in range(repetitions):
+                response = await client.get(url)
+                # Consumir el body sin acumularlo para no medir al cliente
+                async for _chunk in response.content.iter_chunked(1024 * 1024):
+                    pass
+
+            wall = time.perf_counter() - wall_start
+            cpu = time.process_time() - cpu_start
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+
+            throughput = size_mb * repetitions / wall
+            print(f"{name:<12}{throughput:>10.1f}{cpu:>10.2f}{peak / 1024 / 1024:>10.1f}")
+    finally:
+        await client.close()
+        import shutil
+        shutil.rmtree(temp_dir)
+
+
+if __name__ == '__main__':
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 64
+    reps = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    asyncio.run(run_benchmark(size, reps))
@@ -0,0 +1,57 @@
+"""
+Tests unitarios para la lista de bloqueo de seguridad
+"""
+
+import unittest
+import sys
+import os
+
+# Agregar src al path para importar los módulos
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from config.blocklist import Blocklist
+from config.config_manager import ConfigManager
+
+
+class TestBlocklist(unittest.TestCase):
+    """Tests del matcher compilado de rutas y archivos bloqueados"""
+
+    def test_default_rules(self):
+        """Verifica directorios, archivos, extensiones y prefijos por defecto"""
+        blocklist = Blocklist()
+        self.assertTrue(blocklist.is_blocked_path('app/.git/config'))
+        self.assertTrue(blocklist.is_blocked_path('Node_Modules/pkg/index.js'))
+        self.assertFalse(blocklist.is_blocked_path('assets/git/logo.png'))
+        self.assertFalse(blocklist.is_blocked_path(''))
+
+        self.assertTrue(blocklist.is_blocked_file('wp-config.php'))
+        self.assertTrue(blocklist.is_blocked_file('dump.SQL.bak'))
+        self.assertTrue(blocklist.is_blocked_file('.env.production'))
+        self.assertFalse(blocklist.is_blocked_file('index.php'))
+        self.assertFalse(blocklist.is_blocked_file('environment.js'))
+
+    def test_vhost_extensions(self):
+        """Verifica que el virtual host suma reglas a las de por defecto"""
+        blocklist = Blocklist.for_vhost({
+            'blocked_directories': ['Vendor'],
+            'blocked_extensions': '.sql',
+        })
+        self.assertTrue(blocklist.is_blocked_path('vendor/autoload.php'))
+        self.assertTrue(blocklist.is_blocked_file('backup.sql'))
+        self.assertTrue(blocklist.is_blocked_file('.htaccess'))
+
+    def test_compiled_once_per_vhost(self):
+        """Verifica que ConfigManager reutiliza la lista compilada"""
+        manager = ConfigManager(virtual_hosts_file='/no/existe.yaml')
+        vhost = {'domain': 'example.com', 'blocked_files': ['secret.txt']}
+        manager._virtual_hosts = [vhost]
+        manager._blocklists = manager._compile_blocklists()
+
+        blocklist = manager.get_blocklist(vhost)
+        self.assertIs(manager.get_blocklist(vhost), blocklist)
+        self.assertTrue(blocklist.is_blocked_file('secret.txt'))
+        self.assertFalse(manager.get_blocklist({'domain': 'other.com'}).is_blocked_file('secret.txt'))
+
+
+if __name__ == '__main__':
+    unittest.main()
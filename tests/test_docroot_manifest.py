@@ -0,0 +1,201 @@
+"""
+Tests unitarios para el manifiesto en memoria del document_root
+"""
+
+import os
+import shutil
+import tempfile
+import time
+import unittest
+from pathlib import Path
+import sys
+
+# Agregar src al path para importar los módulos
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from rewrite.conditions import DirNotExistsCondition, FileNotExistsCondition
+from static_files.path_resolver import PathResolver
+from utils.docroot_manifest import (
+    ABSENT, DIR, FILE, OVERFLOW, DocumentRootManifest, Inotify, ManifestMiss, ManifestRegistry
+)
+from utils.file_metadata import FileMetadataCache
+
+
+def wait_for(predicate, timeout: float = 3.0) -> bool:
+    """Espera a que el thread de fondo aplique un cambio"""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.02)
+    return predicate()
+
+
+class TestDocumentRootManifest(unittest.TestCase):
+    """Tests del árbol y de las consultas"""
+
+    def setUp(self):
+        """Document root con archivos, subdirectorios y un symlink"""
+        self.temp_dir = os.path.realpath(tempfile.mkdtemp())
+        Path(self.temp_dir, 'index.php').touch()
+        Path(self.temp_dir, 'css').mkdir()
+        Path(self.temp_dir, 'css', 'app.css').touch()
+        Path(self.temp_dir, 'vacio').mkdir()
+        os.symlink(os.path.join(self.temp_dir, 'css'), os.path.join(self.temp_dir, 'enlace'))
+
+    def tearDown(self):
+        """Limpiar directorio temporal"""
+        shutil.rmtree(self.temp_dir)
+
+    def test_lookup(self):
+        """Verifica archivos, directorios, ausentes y rutas que van al filesystem"""
+        manifest = DocumentRootManifest(self.temp_dir, use_inotify=False)
+        self.assertIsNone(manifest.lookup('index.php'))
+        self.assertTrue(manifest.build())
+        self.assertEqual(manifest.entries, 5)
+        self.assertGreater(manifest.memory_bytes, 0)
+
+        self.assertEqual(manifest.lookup('/index.php').kind, FILE)
+        self.assertEqual(manifest.lookup('css/app.css').path, os.path.join(self.temp_dir, 'css', 'app.css'))
+        self.assertEqual(manifest.lookup('css').kind, DIR)
+        self.assertEqual(manifest.lookup('').path, self.temp_dir)
+        self.assertEqual(manifest.lookup('no/existe').kind, ABSENT)
+        self.assertEqual(manifest.lookup('index.php/extra').kind, ABSENT)
+        self.assertIsNone(manifest.lookup('enlace/app.css'))
+        self.assertIsNone(manifest.lookup('css/../index.php'))
+
+        mtime_ns = os.stat(os.path.join(self.temp_dir, 'css')).st_mtime_ns
+        self.assertEqual(manifest.mtime_ns(os.path.join(self.temp_dir, 'css')), mtime_ns)
+        self.assertIsNone(manifest.mtime_ns('/fuera/del/root'))
+
+    def test_max_entries_falls_back(self):
+        """Verifica que un sitio más grande que el límite no se carga en memoria"""
+        manifest = DocumentRootManifest(self.temp_dir, max_entries=3, use_inotify=False)
+        self.assertFalse(manifest.build())
+        self.assertEqual(manifest.state, OVERFLOW)
+        self.assertIsNone(manifest.lookup('index.php'))
+
+    def test_inotify_keeps_manifest_fresh(self):
+        """Verifica que crear y borrar archivos y directorios actualiza el árbol"""
+        try:
+            Inotify().close()
+        except OSError:
+            self.skipTest('inotify no disponible')
+
+        manifest = DocumentRootManifest(self.temp_dir)
+        registry = ManifestRegistry()
+        changes = []
+        registry.add_listener(lambda root, path, is_dir: changes.append((root, path, is_dir)))
+        registry.add(manifest)
+        manifest.start()
+        try:
+            self.assertTrue(wait_for(lambda: manifest.ready))
+            self.assertEqual(manifest.mode, 'inotify')
+
+            Path(self.temp_dir, 'nuevo.html').touch()
+            self.assertTrue(wait_for(lambda: manifest.lookup('nuevo.html').kind == FILE))
+
+            Path(self.temp_dir, 'blog', '2024').mkdir(parents=True)
+            Path(self.temp_dir, 'blog', '2024', 'post.html').touch()
+            self.assertTrue(wait_for(lambda: manifest.lookup('blog/2024/post.html').kind == FILE))
+
+            os.rename(os.path.join(self.temp_dir, 'blog'), os.path.join(self.temp_dir, 'noticias'))
+            self.assertTrue(wait_for(lambda: manifest.lookup('noticias/2024/post.html').kind == FILE))
+            self.assertEqual(manifest.lookup('blog').kind, ABSENT)
+
+            os.remove(os.path.join(self.temp_dir, 'index.php'))
+            self.assertTrue(wait_for(lambda: manifest.lookup('index.php').kind == ABSENT))
+            self.assertEqual(manifest.entries, 8)
+
+            # Cada cambio se avisa a los listeners (la memo de rewrite)
+            self.assertIn((self.temp_dir, '/nuevo.html', False), changes)
+            self.assertIn((self.temp_dir, '/blog', True), changes)
+            self.assertIn((self.temp_dir, '/index.php', False), changes)
+        finally:
+            manifest.stop()
+
+
+class TestManifestConsumers(unittest.TestCase):
+    """Tests de las condiciones y la resolución de index usando el manifiesto"""
+
+    def setUp(self):
+        """Registro con un manifiesto construido y caches sin TTL"""
+        self.temp_dir = os.path.realpath(tempfile.mkdtemp())
+        Path(self.temp_dir, 'index.php').touch()
+        Path(self.temp_dir, 'docs').mkdir()
+        Path(self.temp_dir, 'docs', 'index.html').touch()
+
+        manifest = DocumentRootManifest(self.temp_dir, use_inotify=False)
+        manifest.build()
+        self.manifests = ManifestRegistry()
+        self.manifests.add(manifest)
+        self.metadata = FileMetadataCache(ttl=0)
+
+    def tearDown(self):
+        """Limpiar directorio temporal"""
+        shutil.rmtree(self.temp_dir)
+
+    def test_conditions_without_stat(self):
+        """Verifica que file_not_exists y dir_not_exists no tocan el filesystem"""
+        file_condition = FileNotExistsCondition(self.metadata, self.manifests)
+        dir_condition = DirNotExistsCondition(self.metadata, self.manifests)
+
+        self.assertFalse(file_condition.evaluate('/index.php', self.temp_dir))
+        self.assertTrue(file_condition.evaluate('/docs', self.temp_dir))
+        self.assertTrue(file_condition.evaluate('/blog/hola', self.temp_dir))
+        self.assertFalse(dir_condition.evaluate('/docs', self.temp_dir))
+        self.assertTrue(dir_condition.evaluate('/index.php', self.temp_dir))
+        self.assertEqual(self.metadata.get_stats()['misses'], 0)
+
+    def test_index_resolution(self):
+        """Verifica index, 403 y 404 resueltos desde memoria"""
+        resolver = PathResolver(metadata=self.metadata, manifests=self.manifests)
+        self.assertEqual(resolver.resolve(self.temp_dir, 'docs').index_file, 'index.html')
+        self.assertEqual(resolver.resolve(self.temp_dir, '').index_file, 'index.php')
+        self.assertEqual(resolver.resolve(self.temp_dir, 'no-existe').status, 404)
+        self.assertEqual(self.metadata.get_stats()['misses'], 0)
+
+        Path(self.temp_dir, 'vacio').mkdir()
+        self.manifests.get(self.temp_dir).build()
+        self.assertEqual(resolver.resolve(self.temp_dir, 'vacio').status, 403)
+
+    def test_memory_only_refuses_filesystem(self):
+        """Verifica que memory_only lanza ManifestMiss en lugar de hacer stat o realpath"""
+        os.symlink(os.path.join(self.temp_dir, 'docs'), os.path.join(self.temp_dir, 'enlace'))
+        self.manifests.get(self.temp_dir).build()
+        resolver = PathResolver(metadata=self.metadata, manifests=self.manifests)
+        condition = FileNotExistsCondition(self.metadata, self.manifests)
+
+        with self.manifests.memory_only():
+            self.assertEqual(resolver.probe(self.temp_dir, 'docs').index_file, 'index.html')
+            self.assertFalse(condition.evaluate('/index.php', self.temp_dir))
+            for path in ('enlace/index.html', 'docs/../index.php'):
+                with self.assertRaises(ManifestMiss):
+                    resolver.probe(self.temp_dir, path)
+                with self.assertRaises(ManifestMiss):
+                    condition.evaluate('/' + path, self.temp_dir)
+        self.assertEqual(self.metadata.get_stats()['misses'], 0)
+
+        # Fuera del bloque se consulta al filesystem como siempre
+        self.assertEqual(resolver.probe(self.temp_dir, 'enlace/index.html').status, 200)
+        self.assertFalse(condition.evaluate('/docs/../index.php', self.temp_dir))
+
+    def test_configure_per_vhost(self):
+        """Verifica que la clave manifest del virtual host pisa el valor global"""
+        registry = ManifestRegistry(enabled=False)
+        registry.configure([
+            {'domain': 'a.local', 'document_root': self.temp_dir, 'manifest': True},
+            {'domain': 'b.local', 'document_root': '/no/existe', 'manifest': True},
+            {'domain': 'c.local', 'document_root': tempfile.gettempdir()},
+        ], start=False)
+        self.assertIsNotNone(registry.get(self.temp_dir))
+        self.assertIsNone(registry.get('/no/existe'))
+        self.assertIsNone(registry.get(tempfile.gettempdir()))
+        self.assertFalse(registry.is_ready(self.temp_dir))
+
+        registry.configure([], start=False)
+        self.assertIsNone(registry.get(self.temp_dir))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,137 @@
+"""
+Tests unitarios para el codec de registros FastCGI
+"""
+
+import asyncio
+import os
+import struct
+import unittest
+import sys
+
+# Agregar src al path para importar los módulos
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from php_fpm.fastcgi_codec import (
+    FCGI_MAX_CONTENT, HEADER, RecordReader, decode_params, encode_params, encode_record, encode_stream
+)
+
+FCGI_STDOUT = 6
+
+
+def split_records(data: bytes) -> list:
+    """Decodifica registros de un buffer sin usar el codec"""
+    records = []
+    offset = 0
+    while offset < len(data):
+        version, req_type, req_id, length, padding = struct.unpack('!BBHHBx', data[offset:offset + 8])
+        records.append((req_type, req_id, data[offset + 8:offset + 8 + length], padding))
+        offset += 8 + length + padding
+    return records
+
+
+class TestEncoding(unittest.TestCase):
+    """Tests del empaquetado de registros y parámetros"""
+
+    def test_stream_larger_than_64k_is_split(self):
+        """Verifica registros de hasta 65535 bytes, padding y registro de cierre"""
+        data = os.urandom(200000)
+        records = split_records(bytes(encode_stream(5, 7, data, terminate=True)))
+
+        self.assertEqual([len(content) for _, _, content, _ in records],
+                         [FCGI_MAX_CONTENT, FCGI_MAX_CONTENT, FCGI_MAX_CONTENT, 3395, 0])
+        self.assertEqual(b''.join(content for _, _, content, _ in records), data)
+        for req_type, req_id, content, padding in records:
+            self.assertEqual((req_type, req_id), (5, 7))
+            self.assertEqual((len(content) + padding) % 8, 0)
+
+        self.assertEqual(encode_stream(5, 1), b'')
+        self.assertEqual(len(encode_stream(5, 1, memoryview(b'abc'))), 16)
+
+    def test_single_record(self):
+        """Verifica un registro completo y el rechazo de contenido demasiado grande"""
+        record = encode_record(3, 2, b'\0' * 8)
+        self.assertEqual(bytes(record[:8]), HEADER.pack(1, 3, 2, 8, 0))
+        self.assertEqual(len(encode_record(6, 1, b'x' * FCGI_MAX_CONTENT)), 8 + 65536)
+        with self.assertRaises(ValueError):
+            encode_record(6, 1, b'x' * (FCGI_MAX_CONTENT + 1))
+
+    def test_params_round_trip(self):
+        """Verifica longitudes de 1 y 4 bytes, UTF-8 y valores de más de 64 KB"""
+        params = {
+            'SCRIPT_FILENAME': '/srv/index.php',
+            'QUERY_STRING': '',
+            'HTTP_X_LARGO': 'v' * 300,
+            'N' * 200: 'ñandú',
+            'HTTP_COOKIE': 'c' * 70000,
+        }
+        encoded = encode_params(params)
+        self.assertEqual(decode_params(encoded), params)
+        self.assertEqual(decode_params(memoryview(bytes(encoded))), params)
+        self.assertEqual(encoded[:2], bytes([15, 14]))
+
+        with self.assertRaises(ValueError):
+            decode_params(encoded[:-1])
+        with self.assertRaises(ValueError):
+            decode_params(b'\x80\x00')
+
+
+class TestRecordReader(unittest.IsolatedAsyncioTestCase):
+    """Tests de la lectura de registros desde un StreamReader"""
+
+    def make_reader(self) -> asyncio.StreamReader:
+        return asyncio.StreamReader(limit=2 ** 20)
+
+    async def test_large_records_from_short_reads(self):
+        """Verifica registros de 64 KB que llegan en fragmentos chicos"""
+        data = os.urandom(150000)
+        stream = bytes(encode_stream(FCGI_STDOUT, 3, data, terminate=True))
+        reader = self.make_reader()
+
+        async def feed():
+            for offset in range(0, len(stream), 1000):
+                reader.feed_data(stream[offset:offset + 1000])
+                await asyncio.sleep(0)
+            reader.feed_eof()
+
+        feeder = asyncio.ensure_future(feed())
+        records = RecordReader(reader, timeout=5)
+        chunks = []
+        while True:
+            req_type, req_id, content = await records.read()
+            self.assertEqual((req_type, req_id), (FCGI_STDOUT, 3))
+            self.assertIsInstance(content, memoryview)
+            if not content:
+                break
+            chunks.append(content)
+        await feeder
+
+        self.assertEqual(len(chunks[0]), FCGI_MAX_CONTENT)
+        self.assertEqual(b''.join(chunks), data)
+
+    async def test_header_already_read(self):
+        """Verifica la lectura continuando desde un header ya leído"""
+        reader = self.make_reader()
+        reader.feed_data(bytes(encode_record(FCGI_STDOUT, 1, b'hola')))
+        records = RecordReader(reader)
+        header = await records.read_header()
+        req_type, _, content = await records.read(header)
+        self.assertEqual((req_type, bytes(content)), (FCGI_STDOUT, b'hola'))
+
+    async def test_truncated_record(self):
+        """Verifica que un registro cortado no se entrega a medias"""
+        reader = self.make_reader()
+        reader.feed_data(bytes(encode_record(FCGI_STDOUT, 1, b'x' * 100))[:50])
+        reader.feed_eof()
+        with self.assertRaises(asyncio.IncompleteReadError):
+            await RecordReader(reader).read()
+
+    async def test_timeout(self):
+        """Verifica el timeout por registro"""
+        reader = self.make_reader()
+        reader.feed_data(bytes(encode_record(FCGI_STDOUT, 1, b'x' * 100))[:50])
+        with self.assertRaises(asyncio.TimeoutError):
+            await RecordReader(reader, timeout=0.01).read()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,484 @@
+"""
+Tests unitarios para el pool de conexiones y el transporte multiplexado de PHP-FPM
+"""
+
+import asyncio
+import os
+import shutil
+import struct
+import tempfile
+import unittest
+import sys
+from pathlib import Path
+
+# Agregar src al path para importar los módulos
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from unittest import mock
+
+from aiohttp import StreamReader
+from aiohttp.test_utils import make_mocked_request
+
+from php_fpm.connection_pool import FastCGIConnectionPool
+from php_fpm.fastcgi_client import FastCGIClient
+from php_fpm.php_manager import PHPManager
+
+
+def decode_params(data: bytes) -> dict:
+    """Decodifica pares nombre-valor FastCGI"""
+    params = {}
+    offset = 0
+    while offset < len(data):
+        lengths = []
+        for _ in range(2):
+            if data[offset] < 128:
+                lengths.append(data[offset])
+                offset += 1
+            else:
+                lengths.append(struct.unpack('!I', data[offset:offset + 4])[0] & 0x7FFFFFFF)
+                offset += 4
+        name = data[offset:offset + lengths[0]].decode()
+        offset += lengths[0]
+        params[name] = data[offset:offset + lengths[1]].decode()
+        offset += lengths[1]
+    return params
+
+
+def encode_params(params: dict) -> bytes:
+    """Codifica pares nombre-valor FastCGI cortos"""
+    return b''.join(bytes([len(name), len(value)]) + name.encode() + value.encode()
+                    for name, value in params.items())
+
+
+class FakePHPFPM:
+    """
+    Servidor FastCGI mínimo sobre un socket Unix
+
+    Respeta FCGI_KEEP_CONN, responde FCGI_GET_VALUES y, con multiplex=True,
+    atiende requests intercalados sobre una misma conexión. Con output, la
+    respuesta es esa lista de registros STDOUT en lugar del eco del script.
+    """
+
+    def __init__(self, socket_path: str, close_after_response: bool = False, delay: float = 0.0,
+                 multiplex: bool = False, max_reqs: int = 4, output: list = None):
+        self.socket_path = socket_path
+        self.output = output
+        self.close_after_response = close_after_response
+        self.delay = delay
+        self.multiplex = multiplex
+        self.max_reqs = max_reqs
+        self.connections = 0
+        self.requests = 0
+        self.active = 0
+        self.max_active = 0
+        self.max_stdin_record = 0
+        self.server = None
+
+    async def start(self):
+        self.server = await asyncio.start_unix_server(self._handle, self.socket_path)
+
+    async def stop(self):
+        self.server.close()
+        await self.server.wait_closed()
+
+    @staticmethod
+    def record(req_type: int, req_id: int, content: bytes) -> bytes:
+        padding = (8 - len(content) % 8) % 8
+        return struct.pack('!BBHHBx', 1, req_type, req_id, len(content), padding) + content + b'\0' * padding
+
+    async def _handle(self, reader, writer):
+        self.connections += 1
+        requests = {}
+        tasks = []
+        try:
+            while True:
+                header = await reader.readexactly(8)
+                _, req_type, req_id, length, padding = struct.unpack('!BBHHBx', header)
+                content = (await reader.readexactly(length + padding))[:length]
+                if req_type == 9:
+                    values = {'FCGI_MPXS_CONNS': '1' if self.multiplex else '0',
+                              'FCGI_MAX_REQS': str(self.max_reqs)}
+                    names = decode_params(content)
+                    writer.write(self.record(10, 0, encode_params({n: values[n] for n in names if n in values})))
+                    await writer.drain()
+                    break
+                if req_type == 1:
+                    requests[req_id] = {'keep_conn': bool(content[2] & 1), 'params': b'', 'stdin': b''}
+                elif req_type == 4:
+                    requests[req_id]['params'] += content
+                elif req_type == 5 and content:
+                    requests[req_id]['stdin'] += content
+                    self.max_stdin_record = max(self.max_stdin_record, length)
+                elif req_type == 5:
+                    state = requests.pop(req_id)
+                    if self.multiplex:
+                        tasks.append(asyncio.ensure_future(self._respond(writer, req_id, state)))
+                        continue
+                    await self._respond(writer, req_id, state)
+                    if not state['keep_conn'] or self.close_after_response:
+                        break
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            await asyncio.gather(*tasks, return_exceptions=True)
+            writer.close()
+
+    async def _respond(self, writer, req_id: int, state: dict):
+        self.requests += 1
+        self.active += 1
+        self.max_active = max(self.max_active, self.active)
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        self.active -= 1
+        if self.output is not None:
+            for content in self.output:
+                writer.write(self.record(6, req_id, content))
+                await writer.drain()
+        else:
+            script = decode_params(state['params'])['SCRIPT_FILENAME']
+            body = b'Content-Type: text/plain\r\n\r\n' + f'{script}:{len(state["stdin"])}'.encode()
+            writer.write(self.record(6, req_id, body))
+        writer.write(self.record(6, req_id, b''))
+        writer.write(self.record(3, req_id, b'\0' * 8))
+        await writer.drain()
+
+
+class TestFastCGIConnectionPool(unittest.IsolatedAsyncioTestCase):
+    """Tests del pool contra un PHP-FPM simulado"""
+
+    async def asyncSetUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.socket_path = os.path.join(self.temp_dir, 'php-fpm.sock')
+
+    async def asyncTearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    async def start_backend(self, **kwargs) -> FakePHPFPM:
+        backend = FakePHPFPM(self.socket_path, **kwargs)
+        await backend.start()
+        self.addAsyncCleanup(backend.stop)
+        return backend
+
+    async def test_connections_are_reused(self):
+        """Verifica que requests sucesivos usan la misma conexión"""
+        backend = await self.start_backend()
+        pool = FastCGIConnectionPool(self.socket_path, max_size=4)
+        client = FastCGIClient(self.socket_path, timeout=5, pool=pool)
+
+        for _ in range(3):
+            stdout, _ = await client.execute_php('/srv/index.php', {}, b'abc')
+            self.assertTrue(stdout.endswith(b'/srv/index.php:3'))
+
+        self.assertEqual(backend.connections, 1)
+        stats = pool.get_stats()
+        self.assertEqual((stats['opens'], stats['reuses'], stats['idle']), (1, 2, 1))
+        await pool.close()
+
+    async def test_max_size_makes_requests_wait(self):
+        """Verifica el límite de conexiones y la espera de los demás requests"""
+        backend = await self.start_backend(delay=0.05)
+        pool = FastCGIConnectionPool(self.socket_path, max_size=2)
+        client = FastCGIClient(self.socket_path, timeout=5, pool=pool)
+
+        results = await asyncio.gather(*[client.execute_php(f'/srv/{i}.php', {}) for i in range(6)])
+        self.assertEqual(len(results), 6)
+        self.assertEqual(backend.connections, 2)
+        stats = pool.get_stats()
+        self.assertEqual(stats['size'], 2)
+        self.assertGreaterEqual(stats['waits'], 4)
+        await pool.close()
+
+    async def test_stale_connection_is_retried(self):
+        """Verifica el reintento cuando PHP-FPM cerró una conexión reutilizada"""
+        backend = await self.start_backend(close_after_response=True)
+        pool = FastCGIConnectionPool(self.socket_path, max_size=2)
+        client = FastCGIClient(self.socket_path, timeout=5, pool=pool)
+
+        for _ in range(3):
+            stdout, _ = await client.execute_php('/srv/index.php', {'REQUEST_METHOD': 'GET'})
+            self.assertTrue(stdout.endswith(b':0'))
+        self.assertEqual(backend.connections, 3)
+        # La última conexión queda ociosa hasta que el event loop registra su cierre
+        await asyncio.sleep(0.01)
+        self.assertIsNone(pool._pop_idle())
+        self.assertEqual(pool.get_stats()['size'], 0)
+        await pool.close()
+
+    async def test_idle_timeout(self):
+        """Verifica que las conexiones ociosas vencidas se cierran"""
+        await self.start_backend()
+        pool = FastCGIConnectionPool(self.socket_path, max_size=2, idle_timeout=0.01)
+        connection = await pool.acquire(1)
+        pool.release(connection)
+        await asyncio.sleep(0.05)
+
+        second = await pool.acquire(1)
+        self.assertIsNot(second, connection)
+        self.assertEqual(pool.get_stats()['expired'], 1)
+        pool.release(second, reusable=False)
+        self.assertEqual(pool.size, 0)
+
+    async def test_idle_connection_reaped_without_acquire(self):
+        """Verifica que el timer cierra la conexión ociosa sin otro acquire"""
+        await self.start_backend()
+        pool = FastCGIConnectionPool(self.socket_path, max_size=2, idle_timeout=0.02)
+        connection = await pool.acquire(1)
+        pool.release(connection)
+        self.assertEqual(pool.get_stats()['idle'], 1)
+
+        await asyncio.sleep(0.1)
+        stats = pool.get_stats()
+        self.assertEqual((stats['size'], stats['idle'], stats['expired']), (0, 0, 1))
+        self.assertTrue(connection.writer.is_closing())
+        self.assertIsNone(pool._reaper)
+        await pool.close()
+
+    async def test_without_pool_closes_connection(self):
+        """Verifica el modo sin pool (sin FCGI_KEEP_CONN)"""
+        backend = await self.start_backend()
+        client = FastCGIClient(self.socket_path, timeout=5)
+        await client.execute_php('/srv/a.php', {})
+        await client.execute_php('/srv/b.php', {})
+        self.assertEqual(backend.connections, 2)
+
+
+class TestFastCGIMultiplexing(unittest.IsolatedAsyncioTestCase):
+    """Tests de la negociación FCGI_MPXS_CONNS y del transporte multiplexado"""
+
+    async def asyncSetUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.socket_path = os.path.join(self.temp_dir, 'php-fpm.sock')
+
+    async def asyncTearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    async def start_backend(self, **kwargs) -> FakePHPFPM:
+        backend = FakePHPFPM(self.socket_path, **kwargs)
+        await backend.start()
+        self.addAsyncCleanup(backend.stop)
+        return backend
+
+    async def test_concurrent_requests_share_one_connection(self):
+        """Verifica IDs reales, enrutamiento de respuestas y el tope FCGI_MAX_REQS"""
+        backend = await self.start_backend(multiplex=True, delay=0.05)
+        pool = FastCGIConnectionPool(self.socket_path, max_size=8)
+        client = FastCGIClient(self.socket_path, timeout=5, pool=pool, multiplex=True)
+
+        results = await asyncio.gather(*[client.execute_php(f'/srv/{i}.php', {}) for i in range(10)])
+        for i, (stdout, _) in enumerate(results):
+            self.assertTrue(stdout.endswith(f'/srv/{i}.php:0'.encode()))
+
+        # Una conexión para FCGI_GET_VALUES y una compartida por los 10 requests
+        self.assertEqual(backend.connections, 2)
+        self.assertEqual(backend.max_active, 4)
+        stats = client.get_stats()
+        self.assertEqual(stats['mode'], 'multiplexed')
+        self.assertEqual(stats['multiplexer']['requests'], 10)
+        self.assertEqual(stats['multiplexer']['in_flight'], 0)
+        self.assertEqual(pool.get_stats()['opens'], 0)
+        await client.close()
+
+    async def test_falls_back_to_pool(self):
+        """Verifica el uso del pool cuando el backend responde FCGI_MPXS_CONNS=0"""
+        backend = await self.start_backend(multiplex=False)
+        pool = FastCGIConnectionPool(self.socket_path, max_size=2)
+        client = FastCGIClient(self.socket_path, timeout=5, pool=pool, multiplex=True)
+
+        for _ in range(3):
+            await client.execute_php('/srv/index.php', {})
+        self.assertEqual(client.get_stats()['mode'], 'pooled')
+        self.assertEqual(backend.connections, 2)
+        self.assertEqual(pool.get_stats()['reuses'], 2)
+        await client.close()
+
+    async def test_timeout_aborts_request(self):
+        """Verifica FCGI_ABORT_REQUEST y que el ID se libera al terminar"""
+        await self.start_backend(multiplex=True, delay=0.2)
+        client = FastCGIClient(self.socket_path, timeout=5, multiplex=True)
+        multiplexer = await client._get_multiplexer()
+        multiplexer.timeout = 0.05
+
+        with self.assertRaises(TimeoutError):
+            await client.execute_php('/srv/lento.php', {})
+        stats = multiplexer.get_stats()
+        self.assertEqual((stats['aborts'], stats['in_flight']), (1, 1))
+
+        await asyncio.sleep(0.3)
+        self.assertEqual(multiplexer.get_stats()['in_flight'], 0)
+        await client.close()
+
+
+class TestPHPOutputStreaming(unittest.IsolatedAsyncioTestCase):
+    """Tests de la salida PHP transmitida registro por registro"""
+
+    CHUNK = b'x' * 16384
+    HEADERS = [b'Status: 201 Created\r\nContent-Ty', b'pe: text/csv\r\n\r\n']
+
+    async def asyncSetUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.socket_path = os.path.join(self.temp_dir, 'php-fpm.sock')
+        self.script = os.path.join(self.temp_dir, 'export.php')
+        open(self.script, 'w').close()
+
+    async def asyncTearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    async def start_backend(self, **kwargs) -> FakePHPFPM:
+        backend = FakePHPFPM(self.socket_path, **kwargs)
+        await backend.start()
+        self.addAsyncCleanup(backend.stop)
+        return backend
+
+    def make_manager(self, client: FastCGIClient, threshold: int) -> PHPManager:
+        manager = PHPManager.__new__(PHPManager)
+        manager.clients = {'8.3': client}
+        manager.stream_threshold = threshold
+        return manager
+
+    async def start(self, manager: PHPManager, method: str = 'GET'):
+        request = make_mocked_request(method, '/export.php')
+        vhost = {'domain': 'a.local', 'document_root': self.temp_dir, 'php_version': '8.3'}
+        return await manager.start_php_file(request, vhost, Path(self.script))
+
+    async def test_stream_reads_records_and_reuses_connection(self):
+        """Verifica que open_php entrega cada registro y devuelve la conexión al terminar"""
+        await self.start_backend(output=[b'Content-Type: text/plain\r\n\r\n'] + [self.CHUNK] * 5)
+        pool = FastCGIConnectionPool(self.socket_path, max_size=2)
+        client = FastCGIClient(self.socket_path, timeout=5, pool=pool)
+
+        stream = await client.open_php('/srv/export.php', {})
+        chunks = []
+        while True:
+            chunk = await stream.read()
+            if not chunk:
+                break
+            chunks.append(chunk)
+        self.assertEqual(len(chunks), 6)
+        self.assertEqual(pool.get_stats()['idle'], 1)
+        await pool.close()
+
+    async def test_unfinished_stream_discards_connection(self):
+        """Verifica que cerrar una salida a medias no devuelve el socket al pool"""
+        await self.start_backend(output=[self.CHUNK] * 50)
+        pool = FastCGIConnectionPool(self.socket_path, max_size=2)
+        client = FastCGIClient(self.socket_path, timeout=5, pool=pool)
+
+        stream = await client.open_php('/srv/export.php', {})
+        await stream.read()
+        stream.close()
+        self.assertEqual((pool.size, pool.get_stats()['idle']), (0, 0))
+        await pool.close()
+
+    async def test_large_output_is_streamed(self):
+        """Verifica headers en varios registros, threshold y lectura del resto"""
+        await self.start_backend(output=self.HEADERS + [self.CHUNK] * 8)
+        manager = self.make_manager(FastCGIClient(self.socket_path, timeout=5), threshold=32768)
+
+        output = await self.start(manager)
+        self.assertIsNotNone(output.stream)
+        self.assertEqual(output.status, 201)
+        self.assertEqual(output.headers['content-type'], 'text/csv')
+        self.assertEqual(len(output.body), 32768)
+
+        total = len(output.body)
+        while True:
+            chunk = await manager.read_stream(output)
+            if not chunk:
+                break
+            total += len(chunk)
+        self.assertEqual(total, 8 * len(self.CHUNK))
+        self.assertIsNone(output.stream)
+
+    async def test_small_output_is_buffered(self):
+        """Verifica que una salida menor al threshold (o un HEAD) llega completa"""
+        await self.start_backend(output=self.HEADERS + [self.CHUNK] * 2)
+        manager = self.make_manager(FastCGIClient(self.socket_path, timeout=5), threshold=65536)
+
+        output = await self.start(manager)
+        self.assertIsNone(output.stream)
+        self.assertEqual((output.status, len(output.body)), (201, 2 * len(self.CHUNK)))
+
+        manager.stream_threshold = 0
+        output = await self.start(manager, 'HEAD')
+        self.assertIsNone(output.stream)
+
+    async def test_accel_buffering_header_streams_immediately(self):
+        """Verifica que X-Accel-Buffering: no fuerza la transmisión inmediata"""
+        await self.start_backend(output=[b'X-Accel-Buffering: no\r\n\r\nhola', self.CHUNK])
+        manager = self.make_manager(FastCGIClient(self.socket_path, timeout=5), threshold=65536)
+
+        output = await self.start(manager)
+        self.assertIsNotNone(output.stream)
+        self.assertEqual(output.body, b'hola')
+        manager.finish_stream(output)
+
+
+class TestRequestBodyStreaming(unittest.IsolatedAsyncioTestCase):
+    """Tests del envío del cuerpo del request en registros STDIN"""
+
+    async def asyncSetUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.socket_path = os.path.join(self.temp_dir, 'php-fpm.sock')
+        self.script = os.path.join(self.temp_dir, 'upload.php')
+        open(self.script, 'w').close()
+        self.backend = FakePHPFPM(self.socket_path)
+        await self.backend.start()
+        self.addAsyncCleanup(self.backend.stop)
+
+    async def asyncTearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def make_body(self, data: bytes) -> StreamReader:
+        body = StreamReader(mock.Mock(_reading_paused=False), 2 ** 16, loop=asyncio.get_running_loop())
+        body.feed_data(data)
+        body.feed_eof()
+        return body
+
+    async def upload(self, data: bytes, chunked: bool = False, max_body_size: int = None):
+        manager = PHPManager.__new__(PHPManager)
+        manager.clients = {'8.3': FastCGIClient(self.socket_path, timeout=5)}
+        manager.stream_threshold = 65536
+        manager.max_body_size = 100000
+        headers = {'Transfer-Encoding': 'chunked'} if chunked else {'Content-Length': str(len(data))}
+        request = make_mocked_request('POST', '/upload.php', headers=headers, payload=self.make_body(data))
+        vhost = {'domain': 'a.local', 'document_root': self.temp_dir, 'php_version': '8.3'}
+        if max_body_size is not None:
+            vhost['max_body_size'] = max_body_size
+        return await manager.start_php_file(request, vhost, Path(self.script))
+
+    async def test_records_respect_protocol_limit(self):
+        """Verifica que cuerpos de más de 64 KB (bytes o stream) se parten en registros válidos"""
+        client = FastCGIClient(self.socket_path, timeout=5)
+        stdout, _ = await client.execute_php('/srv/upload.php', {}, b'a' * 150000)
+        self.assertTrue(stdout.endswith(b':150000'))
+
+        stream = await client.open_php('/srv/upload.php', {}, self.make_body(b'b' * 200000), 200000)
+        self.assertTrue(bytes(await stream.read()).endswith(b':200000'))
+        stream.close()
+        self.assertEqual(self.backend.max_stdin_record, 65535)
+
+    async def test_body_is_streamed_to_php(self):
+        """Verifica el envío de request.content con Content-Length y con chunked"""
+        output = await self.upload(b'x' * 90000)
+        self.assertEqual(output.status, 200)
+        self.assertTrue(output.body.endswith(b'upload.php:90000'))
+
+        output = await self.upload(b'y' * 5000, chunked=True)
+        self.assertTrue(output.body.endswith(b':5000'))
+
+    async def test_oversized_body_is_rejected_early(self):
+        """Verifica el 413 sin contactar a PHP-FPM y el límite propio del virtual host"""
+        output = await self.upload(b'x' * 100001)
+        self.assertEqual(output.status, 413)
+        output = await self.upload(b'x' * 200000, chunked=True)
+        self.assertEqual(output.status, 413)
+        self.assertEqual(self.backend.connections, 0)
+
+        output = await self.upload(b'x' * 200000, max_body_size=0)
+        self.assertTrue(output.body.endswith(b':200000'))
+        output = await self.upload(b'x' * 2000, max_body_size=1000)
+        self.assertEqual(output.status, 413)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,152 @@
+"""
+Tests unitarios para el importador de .htaccess
+"""
+
+import unittest
+import tempfile
+from pathlib import Path
+import sys
+import os
+
+# Agregar src al path para importar los módulos
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from rewrite.context import RequestContext
+from rewrite.htaccess_parser import (
+    HtaccessInterpreter, convert_htaccess, convert_pattern, parse_htaccess
+)
+from rewrite.rewrite_engine import RewriteEngine
+from utils.file_metadata import FileMetadataCache
+
+
+WORDPRESS = r"""
+# BEGIN WordPress
+<IfModule mod_rewrite.c>
+RewriteEngine On
+RewriteBase /
+RewriteRule ^index\.php$ - [L]
+RewriteCond %{HTTP_HOST} ^ejemplo\.com$ [NC]
+RewriteRule ^(.*)$ https://www.ejemplo.com/$1 [R=301,L]
+RewriteRule ^privado/ - [F]
+RewriteCond %{REQUEST_FILENAME} !-f
+RewriteCond %{REQUEST_FILENAME} !-d
+RewriteRule . /index.php [L]
+</IfModule>
+Options -Indexes
+# END WordPress
+"""
+
+
+class TestHtaccessParser(unittest.TestCase):
+    """Tests del parser y del conversor"""
+
+    def test_parse(self):
+        """Verifica reglas, condiciones, flags y directivas no soportadas"""
+        htaccess = parse_htaccess(WORDPRESS)
+        self.assertTrue(htaccess.engine_on)
+        self.assertEqual(len(htaccess.rules), 4)
+        self.assertEqual(htaccess.rules[1].flags, {'R': '301', 'L': None})
+        self.assertEqual(htaccess.rules[1].conditions[0].test_string, '%{HTTP_HOST}')
+        self.assertEqual(len(htaccess.rules[3].conditions), 2)
+        self.assertEqual(htaccess.unsupported, [(14, 'Options -Indexes')])
+
+    def test_parse_quotes_and_long_flags(self):
+        """Verifica argumentos entre comillas y nombres largos de flags"""
+        htaccess = parse_htaccess('RewriteEngine on\nRewriteRule "^a b$" "/c d" [last,nocase]\n')
+        rule = htaccess.rules[0]
+        self.assertEqual((rule.pattern, rule.substitution), ('^a b$', '/c d'))
+        self.assertEqual(set(rule.flags), {'L', 'NC'})
+
+    def test_convert_pattern(self):
+        """Verifica el anclaje de patrones de directorio"""
+        self.assertEqual(convert_pattern('^(.*)$'), '^/(.*)$')
+        self.assertEqual(convert_pattern('^'), '^/.*')
+        self.assertEqual(convert_pattern('.'), '^/.*?..*')
+        self.assertEqual(convert_pattern('^blog/(\\d+)', nocase=True), '^/(?i:blog/(\\d+)).*')
+
+    def test_convert(self):
+        """Verifica la conversión de un .htaccess de WordPress"""
+        conversion = convert_htaccess(parse_htaccess(WORDPRESS))
+        self.assertEqual(conversion.skipped, 0)
+        self.assertEqual(conversion.rules[1], {
+            'pattern': '^/(.*)$',
+            'target': 'https://www.ejemplo.com/\\g<1>',
+            'conditions': [{'type': 'host', 'pattern': '^ejemplo\\.com$'}],
+            'flags': ['QSA', 'R=301'],
+        })
+        self.assertEqual(conversion.rules[3]['conditions'],
+                         [{'type': 'file_not_exists'}, {'type': 'dir_not_exists'}])
+
+    def test_unsupported_rules_are_reported(self):
+        """Verifica que las reglas sin equivalente se omiten con advertencia"""
+        text = (
+            "RewriteEngine On\n"
+            "RewriteRule .* - [E=AUTH:%{HTTP:Authorization}]\n"
+            "RewriteCond %{REQUEST_URI} (.+)/$\n"
+            "RewriteRule ^ %1 [L,R=301]\n"
+            "RewriteCond %{HTTP_HOST} ^a [OR]\n"
+            "RewriteCond %{HTTP_HOST} ^b\n"
+            "RewriteRule ^ /x [L]\n"
+        )
+        conversion = convert_htaccess(parse_htaccess(text))
+        self.assertEqual(conversion.rules, [])
+        self.assertEqual(conversion.skipped, 3)
+        self.assertEqual(len(conversion.warnings), 3)
+
+
+class TestHtaccessEquivalence(unittest.TestCase):
+    """Tests del intérprete de referencia contra las reglas importadas"""
+
+    def setUp(self):
+        """Document root con algunos archivos reales"""
+        self.temp_dir = tempfile.mkdtemp()
+        Path(self.temp_dir, 'index.php').touch()
+        Path(self.temp_dir, 'css').mkdir()
+        Path(self.temp_dir, 'css', 'app.css').touch()
+
+    def tearDown(self):
+        """Limpiar directorio temporal"""
+        import shutil
+        shutil.rmtree(self.temp_dir)
+
+    def test_imported_rules_match_interpreter(self):
+        """Verifica que el motor compilado da el mismo resultado que mod_rewrite"""
+        htaccess = parse_htaccess(WORDPRESS)
+        conversion = convert_htaccess(htaccess)
+        vhost = {'domain': 'test.local', 'rewrite_rules': conversion.rules}
+        engine = RewriteEngine(vhost, self.temp_dir, metadata=FileMetadataCache(ttl=0))
+        interpreter = HtaccessInterpreter(htaccess, self.temp_dir)
+
+        corpus = [
+            ('www.ejemplo.com', '/', ''),
+            ('www.ejemplo.com', '/hola-mundo', 'p=2'),
+            ('www.ejemplo.com', '/index.php', ''),
+            ('www.ejemplo.com', '/css/app.css', ''),
+            ('www.ejemplo.com', '/css', ''),
+            ('www.ejemplo.com', '/privado/datos', ''),
+            ('ejemplo.com', '/hola', 'a=1'),
+        ]
+        for host, path, query in corpus:
+            with self.subTest(host=host, path=path):
+                context = RequestContext(host=host, query_string=query)
+                expected = interpreter.rewrite(path, query, context)
+                actual = engine.rewrite(path, query, context)
+                self.assertEqual((actual.status, actual.location), (expected.status, expected.location))
+                if not expected.is_terminal:
+                    self.assertEqual((actual.path, actual.query), (expected.path, expected.query))
+
+    def test_interpreter_reinjects_until_stable(self):
+        """Verifica que el intérprete repite las reglas mientras la URL cambie (como Apache)"""
+        htaccess = parse_htaccess(
+            "RewriteEngine On\n"
+            "RewriteRule ^viejo$ nuevo.php [L]\n"
+            "RewriteCond %{REQUEST_FILENAME} !-f\n"
+            "RewriteRule ^ index.php [L]\n"
+        )
+        interpreter = HtaccessInterpreter(htaccess, self.temp_dir)
+        self.assertEqual(interpreter.rewrite('/viejo').path, '/index.php')
+        self.assertEqual(interpreter.rewrite('/index.php').path, '/index.php')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,63 @@
+"""
+Tests unitarios para el executor de I/O de filesystem
+"""
+
+import asyncio
+import threading
+import time
+import unittest
+import sys
+import os
+
+# Agregar src al path para importar los módulos
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from utils.io_executor import IOExecutor, stat_or_none
+
+
+class TestIOExecutor(unittest.IsolatedAsyncioTestCase):
+    """Tests del executor de I/O acotado por document_root"""
+
+    async def asyncSetUp(self):
+        self.executor = IOExecutor(max_workers=4, per_root_limit=2)
+
+    async def asyncTearDown(self):
+        self.executor.shutdown()
+
+    async def test_runs_off_event_loop(self):
+        """Verifica que la función corre en un thread del pool"""
+        name = await self.executor.run('/srv/a', lambda: threading.current_thread().name)
+        self.assertTrue(name.startswith('fs-io'))
+        self.assertIsNone(await self.executor.run('/srv/a', stat_or_none, '/no/existe'))
+
+    async def test_slow_root_does_not_block_other_roots(self):
+        """Verifica que un document_root lento no consume todos los threads"""
+        release = threading.Event()
+        slow = [asyncio.ensure_future(self.executor.run('/mnt/nfs', release.wait, 5))
+                for _ in range(6)]
+        await asyncio.sleep(0.05)
+
+        stats = self.executor.get_stats()['roots']['/mnt/nfs']
+        self.assertEqual(stats['active'], 2)
+        self.assertEqual(stats['queued'], 4)
+
+        started = time.perf_counter()
+        result = await self.executor.run('/srv/fast', os.getpid)
+        self.assertEqual(result, os.getpid())
+        self.assertLess(time.perf_counter() - started, 1.0)
+
+        release.set()
+        await asyncio.gather(*slow)
+        stats = self.executor.get_stats()['roots']['/mnt/nfs']
+        self.assertEqual(stats['completed'], 6)
+        self.assertEqual(stats['max_queued'], 4)
+
+    async def test_errors(self):
+        """Verifica la propagación de errores y su contador"""
+        with self.assertRaises(FileNotFoundError):
+            await self.executor.run('/srv/a', os.stat, '/no/existe')
+        self.assertEqual(self.executor.get_stats()['roots']['/srv/a']['errors'], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
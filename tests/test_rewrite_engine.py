@@ -2,6 +2,7 @@
 Tests unitarios para el motor de Rewrite Engine
 """
 
+import re
 import unittest
 import tempfile
 from pathlib import Path
@@ -12,8 +13,17 @@ import os
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
 
 from rewrite.rewrite_engine import RewriteEngine
+from rewrite.prefilter import literal_prefix
+from rewrite.result import RewriteResult
 from rewrite.rewrite_rule import RewriteRule
-from rewrite.conditions import FileNotExistsCondition, DirNotExistsCondition
+from rewrite.template import QueryTemplate, TargetTemplate
+from rewrite.conditions import (
+    FileNotExistsCondition, DirNotExistsCondition, HostCondition, MethodCondition,
+    HeaderCondition, QueryCondition, ClientIPCondition, CookieCondition
+)
+from rewrite.context import RequestContext
+from config.config_manager import ConfigManager
+from utils.file_metadata import FileMetadataCache
 
 
 class TestRewriteConditions(unittest.TestCase):
@@ -58,6 +68,19 @@ class TestRewriteConditions(unittest.TestCase):
         result = condition.evaluate('/public', self.document_root)
         self.assertFalse(result)
 
+    def test_conditions_share_metadata_cache(self):
+        """Verifica que file_not_exists y dir_not_exists reutilizan el mismo stat"""
+        metadata = FileMetadataCache(ttl=60)
+        self.assertTrue(FileNotExistsCondition(metadata).evaluate('/public', self.document_root))
+        misses = metadata.get_stats()['misses']
+        self.assertFalse(DirNotExistsCondition(metadata).evaluate('/public', self.document_root))
+        self.assertEqual(metadata.get_stats()['misses'], misses)
+
+    def test_path_outside_document_root(self):
+        """Verifica que una ruta fuera del document_root se considera inexistente"""
+        condition = FileNotExistsCondition(FileMetadataCache())
+        self.assertTrue(condition.evaluate('/../../etc/passwd', self.document_root))
+
 
 class TestRewriteRule(unittest.TestCase):
     """Tests para las reglas de rewrite"""
@@ -224,6 +247,428 @@ class TestRewriteEngine(unittest.TestCase):
         self.assertEqual(query, 'endpoint=users')
 
 
+class TestRulePrefilter(unittest.TestCase):
+    """Tests del prefiltro por prefijo literal"""
+
+    def test_literal_prefix(self):
+        """Verifica la extracción del prefijo literal de los patrones"""
+        self.assertEqual(literal_prefix('^/blog/(.*)$'), '/blog/')
+        self.assertEqual(literal_prefix('^/api/v1/users$'), '/api/v1/users')
+        self.assertEqual(literal_prefix('^/file\\.php'), '/file.php')
+        self.assertEqual(literal_prefix('/img/'), '/img/')
+        self.assertEqual(literal_prefix('^/pages?/'), '/page')
+        self.assertEqual(literal_prefix('^/a+b'), '/a')
+        self.assertEqual(literal_prefix('^/(es|en)/'), '')
+        self.assertEqual(literal_prefix('^/es/|^/en/'), '')
+        self.assertEqual(literal_prefix('^\\d+'), '')
+        self.assertEqual(literal_prefix('(?i)^/blog/'), '')
+
+    def test_preserves_order_and_last_flag(self):
+        """Verifica que el resultado es igual al de evaluar todas las reglas en orden"""
+        rules = [{'pattern': f'^/legacy{i}/(.*)$', 'target': f'/legacy{i}.php',
+                  'query_string': 'p=$1', 'flags': ['L']} for i in range(150)]
+        rules.insert(0, {'pattern': '^/legacy7/viejo$', 'target': '/legacy7/nuevo'})
+        rules.append({'pattern': '^(.*)$', 'target': '/index.php', 'query_string': 'url=$1', 'flags': ['L']})
+        engine = RewriteEngine({'domain': 'test.local', 'rewrite_rules': rules}, '/tmp')
+
+        # La primera regla (sin L) reescribe y la evaluación sigue con la regla posterior que coincide
+        self.assertEqual(engine.process('/legacy7/viejo'), ('/legacy7.php', 'p=nuevo'))
+        self.assertEqual(engine.process('/legacy120/x'), ('/legacy120.php', 'p=x'))
+        self.assertEqual(engine.process('/otra'), ('/index.php', 'url=/otra'))
+        self.assertLess(len(engine.prefilter.candidates('/legacy120/x')), 5)
+
+    def test_non_last_rewrite_recomputes_candidates(self):
+        """Verifica que tras una reescritura sin L se evalúan las reglas del nuevo prefijo"""
+        vhost = {'domain': 'test.local', 'rewrite_rules': [
+            {'pattern': '^/old/(.*)$', 'target': '/new/page'},
+            {'pattern': '^/old/', 'target': '/nunca', 'flags': ['L']},
+            {'pattern': '^/new/(.*)$', 'target': '/new.php', 'query_string': 'p=$1', 'flags': ['L']},
+        ]}
+        engine = RewriteEngine(vhost, '/tmp')
+        self.assertEqual(engine.process('/old/x'), ('/new.php', 'p=page'))
+
+
+class TestRewriteMemo(unittest.TestCase):
+    """Tests de la memoización de resultados de rewrite"""
+
+    def setUp(self):
+        """Crear document root con un front controller"""
+        self.temp_dir = tempfile.mkdtemp()
+        Path(self.temp_dir, 'index.php').touch()
+        self.vhost = {
+            'domain': 'app.local',
+            'rewrite_rules': [{
+                'pattern': '^(.*)$',
+                'target': '/index.php',
+                'query_string': 'url=$1',
+                'conditions': [{'type': 'file_not_exists'}, {'type': 'dir_not_exists'}],
+                'flags': ['QSA', 'L']
+            }]
+        }
+
+    def tearDown(self):
+        """Limpiar directorio temporal"""
+        import shutil
+        shutil.rmtree(self.temp_dir)
+
+    def test_hit_skips_conditions(self):
+        """Verifica que un resultado memorizado no vuelve a evaluar condiciones"""
+        engine = RewriteEngine(self.vhost, self.temp_dir)
+        evaluations = []
+        condition = engine.rules[0].conditions[0]
+        original = condition.evaluate
+        condition.evaluate = lambda *args: evaluations.append(args) or original(*args)
+
+        self.assertIsNone(engine.lookup('/blog/post', 'a=1'))
+        self.assertEqual(engine.process('/blog/post', 'a=1'), ('/index.php', 'url=/blog/post&a=1'))
+        self.assertEqual(engine.process('/blog/post', 'a=1'), ('/index.php', 'url=/blog/post&a=1'))
+        self.assertEqual(engine.lookup('/blog/post', 'a=1').as_tuple(), ('/index.php', 'url=/blog/post&a=1'))
+        self.assertEqual(len(evaluations), 1)
+        self.assertEqual(engine.memo.get_stats()['hits'], 2)
+
+    def test_expired_facts_are_revalidated(self):
+        """Verifica que al vencer fact_ttl un cambio en disco invalida el resultado"""
+        engine = RewriteEngine(self.vhost, self.temp_dir, fact_ttl=0,
+                               metadata=FileMetadataCache(ttl=0))
+        self.assertEqual(engine.process('/robots.txt'), ('/index.php', 'url=/robots.txt'))
+        Path(self.temp_dir, 'robots.txt').touch()
+        self.assertEqual(engine.process('/robots.txt'), ('/robots.txt', ''))
+        self.assertEqual(engine.memo.get_stats()['invalidations'], 1)
+
+    def test_invalidate_path_and_bound(self):
+        """Verifica la invalidación por etiqueta y el tamaño máximo"""
+        engine = RewriteEngine(self.vhost, self.temp_dir, memo_size=2)
+        engine.process('/a')
+        engine.process('/b')
+        self.assertEqual(engine.memo.invalidate_path('/a'), 1)
+        self.assertIsNone(engine.lookup('/a'))
+
+        # Un directorio que cambió invalida también las rutas debajo de él
+        engine.process('/a/x')
+        self.assertEqual(engine.memo.invalidate_path('/a'), 0)
+        self.assertEqual(engine.memo.invalidate_path('/a', recursive=True), 1)
+        self.assertIsNone(engine.lookup('/a/x'))
+
+        engine.process('/c')
+        engine.process('/d')
+        self.assertEqual(len(engine.memo), 2)
+        self.assertIsNone(engine.lookup('/b'))
+
+
+class TestServerRewriteMemo(unittest.IsolatedAsyncioTestCase):
+    """Tests del uso de la memo de rewrite desde el servidor"""
+
+    async def asyncSetUp(self):
+        from unittest import mock
+        from aiohttp.test_utils import TestClient, TestServer
+        from config.config_manager import config
+        from server.web_server import TechWebServer
+
+        self.temp_dir = tempfile.mkdtemp()
+        Path(self.temp_dir, 'page.html').write_text('page')
+        vhosts = [{
+            'domain': 'localhost', 'port': 3080, 'document_root': self.temp_dir,
+            'rewrite_rules': [{
+                'pattern': '^/(.*)$',
+                'target': '/page.html',
+                'conditions': [{'type': 'method', 'methods': ['GET']}, {'type': 'file_not_exists'}],
+                'flags': ['L']
+            }]
+        }]
+        for patcher in (mock.patch.object(config, '_virtual_hosts', vhosts),
+                        mock.patch.dict(config._config, {'ssl_enabled': True, 'logs_enabled': False}),
+                        mock.patch.object(config, '_router', None),
+                        mock.patch.object(config, '_blocklists', None),
+                        mock.patch.object(config, '_rewrite_engines', {})):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        config._router = config._build_router()
+        config._blocklists = config._compile_blocklists()
+
+        self.client = TestClient(TestServer(TechWebServer().app))
+        await self.client.start_server()
+        self.addAsyncCleanup(self.client.close)
+        self.engine = config.get_rewrite_engine(vhosts[0])
+
+    async def asyncTearDown(self):
+        import shutil
+        shutil.rmtree(self.temp_dir)
+
+    async def test_warm_request_looks_up_memo_once(self):
+        """Verifica que un request con la memo vigente hace una sola consulta sin evaluar condiciones"""
+        response = await self.client.get('/blog/post')
+        self.assertEqual(await response.text(), 'page')
+        hits = self.engine.memo.get_stats()['hits']
+
+        evaluations = []
+        condition = self.engine.rules[0].conditions[0]
+        original = condition.evaluate
+        condition.evaluate = lambda *args: evaluations.append(args) or original(*args)
+
+        response = await self.client.get('/blog/post')
+        self.assertEqual(await response.text(), 'page')
+        self.assertEqual(self.engine.memo.get_stats()['hits'], hits + 1)
+        self.assertEqual(evaluations, [])
+
+class TestRewriteTemplates(unittest.TestCase):
+    """Tests de las plantillas precompiladas de target y query string"""
+
+    def test_query_template_segments(self):
+        """Verifica la expansión de $N, los grupos ausentes y las referencias inexistentes"""
+        pattern = re.compile(r'^/blog/(\d+)/(\w+)?')
+        template = QueryTemplate('id=$1&slug=$2&x=$3', pattern.groups)
+        self.assertEqual(template.segments, ('id=', 1, '&slug=', 2, '&x=$3'))
+        self.assertEqual(template.expand(pattern.match('/blog/7/hola')), 'id=7&slug=hola&x=$3')
+        self.assertEqual(template.expand(pattern.match('/blog/7/')), 'id=7&slug=$2&x=$3')
+
+    def test_target_template_matches_sub(self):
+        """Verifica que la expansión equivale a pattern.sub"""
+        cases = [
+            (r'^/(?P<lang>es|en)/(.*)$', r'/\2.php?\g<lang>', '/es/contacto'),
+            (r'^/old', '/new', '/old/page'),
+            (r'/a', '/z', '/a/a'),
+            (r'^/x(y)?', r'/t\1\\', '/x'),
+        ]
+        for pattern_str, target, path in cases:
+            with self.subTest(pattern=pattern_str):
+                pattern = re.compile(pattern_str)
+                template = TargetTemplate(target, pattern, pattern_str)
+                self.assertEqual(template.substitute(path, pattern.match(path)),
+                                 pattern.sub(target, path))
+
+    def test_invalid_group_reference(self):
+        """Verifica que un grupo inexistente en el target se rechaza al compilar"""
+        with self.assertRaises(ValueError):
+            RewriteRule(pattern='^/(a)$', target=r'/\2')
+
+    def test_apply_reuses_match(self):
+        """Verifica que apply no vuelve a ejecutar la regex cuando recibe el match"""
+        rule = RewriteRule(pattern=r'^/p/(\d+)$', target='/p.php', query_string='id=$1', flags=['QSA'])
+        match = rule.matches('/p/42', '/tmp')
+        self.assertIsNotNone(match)
+        rule.pattern = None  # cualquier uso de la regex fallaría
+        self.assertEqual(rule.apply('/p/42', 'a=1', match), ('/p.php', 'id=42&a=1'))
+
+
+class TestTerminalFlags(unittest.TestCase):
+    """Tests de los flags R, F y G"""
+
+    def setUp(self):
+        """Virtual host con redirecciones, bloqueos y un front controller"""
+        self.vhost = {
+            'domain': 'test.local',
+            'rewrite_rules': [
+                {'pattern': r'^/viejo/(.*)$', 'target': r'/nuevo/\1', 'query_string': 'ref=$1',
+                 'flags': ['R=301', 'QSA']},
+                {'pattern': '^/temporal$', 'target': '/aviso', 'flags': ['R']},
+                {'pattern': '^/privado/', 'target': '-', 'flags': ['F']},
+                {'pattern': '^/retirado', 'target': '-', 'flags': ['G']},
+                {'pattern': '^(.*)$', 'target': '/index.php', 'query_string': 'url=$1', 'flags': ['L']},
+            ]
+        }
+
+    def test_redirect(self):
+        """Verifica la redirección con status, location y query string"""
+        engine = RewriteEngine(self.vhost, '/tmp')
+        result = engine.rewrite('/viejo/pagina', 'a=1')
+        self.assertTrue(result.is_terminal)
+        self.assertEqual(result.status, 301)
+        self.assertEqual(result.location, '/nuevo/pagina?ref=pagina&a=1')
+        self.assertEqual(engine.rewrite('/temporal').status, 302)
+        self.assertEqual(engine.rewrite('/temporal').location, '/aviso')
+
+    def test_forbidden_and_gone(self):
+        """Verifica F y G, que no reescriben la ruta con target '-'"""
+        engine = RewriteEngine(self.vhost, '/tmp')
+        self.assertEqual(engine.rewrite('/privado/datos'),
+                         RewriteResult('/privado/datos', '', 403))
+        self.assertEqual(engine.rewrite('/retirado').status, 410)
+        self.assertFalse(engine.rewrite('/retirado').is_redirect)
+
+    def test_non_terminal_and_memo(self):
+        """Verifica que process conserva la tupla y que la acción se memoriza"""
+        engine = RewriteEngine(self.vhost, '/tmp')
+        self.assertEqual(engine.process('/blog'), ('/index.php', 'url=/blog'))
+        self.assertFalse(engine.rewrite('/blog').is_terminal)
+        engine.rewrite('/viejo/x')
+        self.assertEqual(engine.rewrite('/viejo/x').status, 301)
+        self.assertEqual(engine.memo.get_stats()['hits'], 2)
+
+    def test_invalid_redirect_status(self):
+        """Verifica que un R=NNN no soportado se rechaza"""
+        with self.assertRaises(ValueError):
+            RewriteRule(pattern='^/x$', target='/y', flags=['R=200'])
+
+
+class TestRequestConditions(unittest.TestCase):
+    """Tests de las condiciones sobre atributos del request"""
+
+    def setUp(self):
+        """Request de ejemplo"""
+        self.context = RequestContext(
+            host='WWW.Example.com', method='post', headers={'User-Agent': 'Googlebot/2.1'},
+            query_string='debug=1&x=2', client_ip='10.1.2.3', cookies={'session': 'abc'}
+        )
+
+    def test_conditions(self):
+        """Verifica cada tipo de condición y negate"""
+        cases = [
+            (HostCondition(r'^www\.'), True),
+            (HostCondition(r'^www\.', negate=True), False),
+            (MethodCondition(['POST', 'PUT']), True),
+            (MethodCondition('GET'), False),
+            (HeaderCondition('user-agent', 'bot'), True),
+            (HeaderCondition('Referer'), False),
+            (QueryCondition(r'(^|&)debug=1'), True),
+            (ClientIPCondition(['10.0.0.0/8', '2001:db8::/32']), True),
+            (ClientIPCondition('192.168.0.0/16'), False),
+            (CookieCondition('session'), True),
+            (CookieCondition('session', negate=True), False),
+        ]
+        for condition, expected in cases:
+            with self.subTest(condition=type(condition).__name__):
+                self.assertEqual(condition.evaluate('/x', '/tmp', self.context), expected)
+
+    def test_invalid_configuration(self):
+        """Verifica que redes y regex inválidas se rechazan al cargar"""
+        with self.assertRaises(ValueError):
+            ClientIPCondition('10.0.0.0/33')
+        with self.assertRaises(ValueError):
+            HostCondition('(')
+
+    def test_cheap_conditions_run_first(self):
+        """Verifica que un método que no coincide evita el stat"""
+        metadata = FileMetadataCache()
+        vhost = {'domain': 'test.local', 'rewrite_rules': [{
+            'pattern': '^/api/.*$', 'target': '/api.php',
+            'conditions': ['file_not_exists', {'type': 'method', 'methods': ['POST']}],
+        }]}
+        engine = RewriteEngine(vhost, '/tmp', metadata=metadata)
+        self.assertEqual([type(c).__name__ for c in engine.rules[0].conditions],
+                         ['MethodCondition', 'FileNotExistsCondition'])
+
+        get = RequestContext(method='GET')
+        self.assertEqual(engine.process('/api/users', '', get), ('/api/users', ''))
+        self.assertEqual(metadata.get_stats()['misses'], 0)
+        self.assertTrue(engine.uses_request_context())
+
+        post = RequestContext(method='POST')
+        self.assertEqual(engine.process('/api/users', '', post), ('/api.php', ''))
+        self.assertGreater(metadata.get_stats()['misses'], 0)
+
+    def test_memo_keys_on_request_conditions(self):
+        """Verifica que la memo distingue requests con distinto resultado de las condiciones"""
+        vhost = {'domain': 'test.local', 'rewrite_rules': [{
+            'pattern': '^(.*)$', 'target': 'https://www.example.com\\1', 'flags': ['R=301'],
+            'conditions': [{'type': 'host', 'pattern': '^example\\.com$'}],
+        }]}
+        engine = RewriteEngine(vhost, '/tmp')
+        bare = RequestContext(host='example.com')
+        canonical = RequestContext(host='www.example.com')
+        self.assertEqual(engine.rewrite('/a', '', bare).location, 'https://www.example.com/a')
+        self.assertFalse(engine.rewrite('/a', '', canonical).is_terminal)
+        self.assertEqual(engine.rewrite('/a', '', bare).status, 301)
+        self.assertEqual(engine.memo.get_stats()['hits'], 1)
+
+    def test_memo_key_does_not_evaluate_filtered_rules(self):
+        """Verifica que la clave lee atributos sin correr las regex de reglas descartadas"""
+        vhost = {'domain': 'test.local', 'rewrite_rules': [
+            {'pattern': '^/admin/.*$', 'target': '/denied.html',
+             'conditions': [{'type': 'header', 'name': 'User-Agent', 'pattern': 'bot'},
+                            {'type': 'cookie', 'name': 'session', 'negate': True}]},
+            {'pattern': '^/blog/(.*)$', 'target': '/blog.php'},
+        ]}
+        engine = RewriteEngine(vhost, '/tmp')
+        condition = engine.rules[0].conditions[-1]
+        evaluations = []
+        original = condition.evaluate
+        condition.evaluate = lambda *args: evaluations.append(args) or original(*args)
+
+        bot = RequestContext(headers={'User-Agent': 'Googlebot'}, cookies={'session': 'a'})
+        self.assertEqual(engine.process('/blog/x', '', bot), ('/blog.php', ''))
+        self.assertEqual(evaluations, [])
+
+        # El valor de la cookie no cambia el resultado: misma entrada de la memo
+        other_session = RequestContext(headers={'User-Agent': 'Googlebot'}, cookies={'session': 'b'})
+        self.assertEqual(engine.process('/blog/x', '', other_session), ('/blog.php', ''))
+        self.assertEqual(engine.memo.get_stats()['hits'], 1)
+
+        # Un header distinto es otra entrada
+        human = RequestContext(headers={'User-Agent': 'Firefox'})
+        self.assertEqual(engine.process('/admin/x', '', bot), ('/admin/x', ''))
+        self.assertEqual(engine.process('/admin/x', '', RequestContext(headers={'User-Agent': 'Googlebot'})),
+                         ('/denied.html', ''))
+        self.assertEqual(engine.process('/admin/x', '', human), ('/admin/x', ''))
+
+
+class TestRewriteInstrumentation(unittest.TestCase):
+    """Tests de los contadores por regla"""
+
+    def setUp(self):
+        """Reglas con una regla que nunca se aplica"""
+        self.vhost = {'domain': 'test.local', 'rewrite_rules': [
+            {'pattern': '^/blog/(\\d+)$', 'target': '/post.php', 'query_string': 'id=$1', 'flags': ['L']},
+            {'pattern': '^/blog/.*$', 'target': '/blog.php',
+             'conditions': [{'type': 'method', 'methods': ['POST']}], 'flags': ['L']},
+            {'pattern': '^/viejo/.*$', 'target': '/nuevo.php', 'flags': ['L']},
+        ]}
+
+    def test_counts_and_dead_rules(self):
+        """Verifica evaluaciones, matches, fallas de condiciones y reglas muertas"""
+        engine = RewriteEngine(self.vhost, '/tmp', memo_size=0, instrument=True)
+        engine.process('/blog/7', '')
+        engine.process('/blog/hola', '', RequestContext(method='GET'))
+        engine.process('/otra', '')
+
+        stats = engine.get_stats()
+        self.assertTrue(stats['instrumented'])
+        self.assertEqual(stats['requests'], 3)
+        first, second, third = stats['rules']
+        self.assertEqual((first['evaluations'], first['matches']), (2, 1))
+        self.assertEqual((second['evaluations'], second['matches']), (1, 0))
+        self.assertEqual((second['condition_evaluations'], second['condition_failures']), (1, 1))
+        self.assertEqual((third['evaluations'], third['matches']), (0, 0))
+        self.assertEqual(second['conditions'], ['MethodCondition'])
+
+        engine.reset_stats()
+        self.assertEqual(engine.get_stats()['rules'][0]['evaluations'], 0)
+
+    def test_disabled_has_no_counters(self):
+        """Verifica que sin instrumentación no se crean contadores"""
+        engine = RewriteEngine(self.vhost, '/tmp')
+        self.assertEqual(engine.process('/blog/7', ''), ('/post.php', 'id=7'))
+        stats = engine.get_stats()
+        self.assertFalse(stats['instrumented'])
+        self.assertEqual(stats['requests'], 0)
+        self.assertNotIn('evaluations', stats['rules'][0])
+        self.assertIsNone(engine.rules[0].stats)
+
+
+class TestCompiledRewriteEngines(unittest.TestCase):
+    """Tests del motor de rewrite compilado por virtual host"""
+
+    def test_engine_compiled_once_per_vhost(self):
+        """Verifica que ConfigManager compila al cargar y reutiliza el motor"""
+        manager = ConfigManager(virtual_hosts_file='/no/existe.yaml')
+        with_rules = {
+            'domain': 'app.local',
+            'document_root': tempfile.gettempdir(),
+            'rewrite_rules': [{'pattern': '^/old/(.*)$', 'target': '/new.php', 'query_string': 'p=$1', 'flags': ['L']}]
+        }
+        without_rules = {'domain': 'static.local', 'document_root': tempfile.gettempdir()}
+        manager._virtual_hosts = [with_rules, without_rules]
+        manager.compile_rewrite_engines()
+
+        engine = manager.get_rewrite_engine(with_rules)
+        self.assertIsNotNone(engine)
+        self.assertIs(manager.get_rewrite_engine(with_rules), engine)
+        self.assertEqual(engine.process('/old/page'), ('/new.php', 'p=page'))
+        self.assertIsNone(manager.get_rewrite_engine(without_rules))
+
+        manager.reload()
+        self.assertIsNot(manager.get_rewrite_engine(with_rules), engine)
+
+
 if __name__ == '__main__':
     unittest.main()
 
@@ -0,0 +1,703 @@
+"""
+Tests unitarios para la entrega de archivos estáticos
+"""
+
+import unittest
+import tempfile
+from unittest import mock
+from pathlib import Path
+import sys
+import os
+
+# Agregar src al path para importar los módulos
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from aiohttp import web
+from aiohttp.test_utils import TestClient, TestServer, make_mocked_request
+
+from static_files.conditional import build_validators, etag_matches, http_date, is_not_modified
+from static_files.file_cache import StaticFileCache
+from static_files.file_sender import FileSender
+from config.config_manager import config
+from php_fpm.fastcgi_client import FastCGIClient
+from static_files.path_resolver import PathResolver, path_resolver
+from static_files.precompressed import PrecompressedResolver
+from static_files.ranges import RangeNotSatisfiable, parse_range_header
+from static_files.static_handler import StaticFileHandler
+from utils.compression import ResponseCompressor, negotiate_encodings
+from utils.file_metadata import FileMetadataCache
+from utils.io_executor import IOExecutor
+
+# PHP-FPM simulado de los tests del pool FastCGI
+from test_fastcgi_pool import FakePHPFPM
+
+
+class FakeTransport:
+    """Transporte mínimo para probar la selección de modo"""
+
+    def __init__(self, tls: bool = False):
+        self.tls = tls
+
+    def get_extra_info(self, name, default=None):
+        if name == 'sslcontext':
+            return object() if self.tls else None
+        return default
+
+
+class FakeRequest:
+    """Request mínimo con transporte configurable"""
+
+    def __init__(self, tls: bool = False):
+        self.transport = FakeTransport(tls)
+
+
+class TestFileSenderModes(unittest.TestCase):
+    """Tests para la selección del modo de envío"""
+
+    def test_auto_uses_memory_below_threshold(self):
+        """Verifica que los archivos chicos se leen a memoria"""
+        sender = FileSender(sendfile_min_size=1024)
+        self.assertEqual(sender.select_mode(FakeRequest(), 100), FileSender.MODE_MEMORY)
+
+    def test_auto_uses_sendfile_above_threshold(self):
+        """Verifica que los archivos grandes usan sendfile sobre sockets planos"""
+        sender = FileSender(sendfile_min_size=1024)
+        self.assertEqual(sender.select_mode(FakeRequest(), 4096), FileSender.MODE_SENDFILE)
+
+    def test_tls_falls_back_to_chunked(self):
+        """Verifica que sobre TLS se usa el envío por bloques"""
+        sender = FileSender(sendfile_min_size=1024)
+        self.assertEqual(sender.select_mode(FakeRequest(tls=True), 4096), FileSender.MODE_CHUNKED)
+        self.assertEqual(
+            sender.select_mode(FakeRequest(tls=True), 10, FileSender.MODE_SENDFILE),
+            FileSender.MODE_CHUNKED
+        )
+
+    def test_forced_mode_overrides_threshold(self):
+        """Verifica que un modo forzado ignora el umbral"""
+        sender = FileSender(mode=FileSender.MODE_CHUNKED, sendfile_min_size=1024)
+        self.assertEqual(sender.select_mode(FakeRequest(), 10), FileSender.MODE_CHUNKED)
+
+    def test_unknown_mode_defaults_to_auto(self):
+        """Verifica que un modo inválido vuelve a auto"""
+        sender = FileSender(mode='turbo')
+        self.assertEqual(sender.mode, FileSender.MODE_AUTO)
+
+
+class TestFileSenderDelivery(unittest.IsolatedAsyncioTestCase):
+    """Tests de envío real a través de un servidor aiohttp"""
+
+    async def asyncSetUp(self):
+        """Crear archivos de prueba y servidor"""
+        self.temp_dir = tempfile.mkdtemp()
+        self.content = os.urandom(300 * 1024 + 7)
+        self.file_path = Path(self.temp_dir, 'video.bin')
+        self.file_path.write_bytes(self.content)
+
+        self.io = IOExecutor(max_workers=2)
+        self.sender = FileSender(sendfile_min_size=64 * 1024, chunk_size=16 * 1024, io=self.io)
+
+        async def handler(request):
+            mode = request.query.get('mode') or None
+            return await self.sender.send(
+                request, self.file_path, 'application/octet-stream', mode=mode, root=self.temp_dir
+            )
+
+        app = web.Application()
+        app.router.add_get('/file', handler)
+        self.client = TestClient(TestServer(app))
+        await self.client.start_server()
+
+    async def asyncTearDown(self):
+        """Cerrar servidor y limpiar directorio temporal"""
+        await self.client.close()
+        self.io.shutdown()
+        import shutil
+        shutil.rmtree(self.temp_dir)
+
+    async def _fetch(self, mode: str = '') -> bytes:
+        response = await self.client.get('/file', params={'mode': mode} if mode else None)
+        self.assertEqual(response.status, 200)
+        self.assertEqual(int(response.headers['Content-Length']), len(self.content))
+        return await response.read()
+
+    async def test_all_modes_send_identical_content(self):
+        """Verifica que todos los modos entregan exactamente el archivo"""
+        for mode in FileSender.MODES:
+            with self.subTest(mode=mode):
+                self.assertEqual(await self._fetch(mode), self.content)
+
+    async def test_auto_mode_streams_large_files(self):
+        """Verifica que el modo auto no lee a memoria archivos grandes"""
+        await self._fetch()
+        stats = self.sender.get_stats()
+        self.assertEqual(stats['memory'], 0)
+        self.assertEqual(stats['sendfile'] + stats['chunked'], 1)
+        self.assertEqual(stats['bytes_sent'], len(self.content))
+
+    async def test_chunked_reads_use_root_executor(self):
+        """Verifica que open y cada pread pasan por el executor del document_root"""
+        self.assertEqual(await self._fetch(FileSender.MODE_CHUNKED), self.content)
+        stats = self.io.get_stats()['roots'][self.temp_dir]
+        # open + 19 bloques de 16 KB
+        self.assertEqual(stats['completed'], 20)
+
+
+class TestStaticFileCache(unittest.TestCase):
+    """Tests para la cache en memoria de archivos estáticos"""
+
+    def setUp(self):
+        """Crear directorio temporal con archivos de prueba"""
+        self.temp_dir = tempfile.mkdtemp()
+        self.paths = []
+        for i in range(4):
+            path = Path(self.temp_dir, f'asset{i}.css')
+            path.write_bytes(b'x' * 100)
+            self.paths.append(str(path))
+
+    def tearDown(self):
+        """Limpiar directorio temporal"""
+        import shutil
+        shutil.rmtree(self.temp_dir)
+
+    def _put(self, cache: StaticFileCache, path: str):
+        body = Path(path).read_bytes()
+        return cache.put(path, body, 'text/css', {'Content-Type': 'text/css'}, os.stat(path))
+
+    def test_hit_after_put(self):
+        """Verifica que una entrada almacenada se recupera"""
+        cache = StaticFileCache(max_bytes=1000, max_object_size=500)
+        self._put(cache, self.paths[0])
+
+        entry = cache.get(self.paths[0])
+        self.assertIsNotNone(entry)
+        self.assertEqual(entry.body, b'x' * 100)
+        self.assertEqual(cache.get_stats()['hits'], 1)
+
+    def test_rejects_objects_above_max_size(self):
+        """Verifica que los archivos grandes no se cachean"""
+        cache = StaticFileCache(max_bytes=1000, max_object_size=50)
+        self.assertIsNone(self._put(cache, self.paths[0]))
+        self.assertEqual(len(cache), 0)
+        self.assertEqual(cache.get_stats()['rejected'], 1)
+
+    def test_evicts_least_recently_used_within_budget(self):
+        """Verifica que se respeta el presupuesto de bytes desalojando por LRU"""
+        cache = StaticFileCache(max_bytes=300, max_object_size=500)
+        for path in self.paths[:3]:
+            self._put(cache, path)
+
+        # Usar asset0 para que asset1 sea el menos reciente
+        cache.get(self.paths[0])
+        self._put(cache, self.paths[3])
+
+        stats = cache.get_stats()
+        self.assertLessEqual(stats['bytes'], 300)
+        self.assertEqual(stats['evictions'], 1)
+        self.assertIsNotNone(cache.get(self.paths[0]))
+        self.assertIsNone(cache.get(self.paths[1]))
+
+    def test_revalidates_on_change(self):
+        """Verifica que un archivo modificado invalida la entrada"""
+        cache = StaticFileCache(max_bytes=1000, max_object_size=500, validate_interval=0)
+        self._put(cache, self.paths[0])
+
+        Path(self.paths[0]).write_bytes(b'y' * 120)
+
+        self.assertIsNone(cache.get(self.paths[0]))
+        self.assertEqual(cache.get_stats()['invalidations'], 1)
+
+    def test_disabled_cache_stores_nothing(self):
+        """Verifica que la cache deshabilitada no almacena"""
+        cache = StaticFileCache(enabled=False)
+        self.assertIsNone(self._put(cache, self.paths[0]))
+        self.assertIsNone(cache.get(self.paths[0]))
+
+
+class TestConditionalValidators(unittest.TestCase):
+    """Tests para ETag / Last-Modified y la evaluación de GET condicionales"""
+
+    def setUp(self):
+        """Crear archivo de prueba"""
+        self.temp_dir = tempfile.mkdtemp()
+        self.path = Path(self.temp_dir, 'app.js')
+        self.path.write_bytes(b'console.log(1);')
+        self.st = os.stat(self.path)
+
+    def tearDown(self):
+        """Limpiar directorio temporal"""
+        import shutil
+        shutil.rmtree(self.temp_dir)
+
+    def test_etag_modes(self):
+        """Verifica el formato de los ETag fuertes, débiles y por hash"""
+        strong = build_validators(self.st)['ETag']
+        weak = build_validators(self.st, 'weak')['ETag']
+        hashed = build_validators(self.st, 'hash', b'console.log(1);')['ETag']
+
+        self.assertTrue(strong.startswith('"'))
+        self.assertEqual(weak, f'W/{strong}')
+        self.assertNotEqual(hashed, strong)
+        self.assertEqual(hashed, build_validators(self.st, 'hash', b'console.log(1);')['ETag'])
+
+    def test_etag_matches_uses_weak_comparison(self):
+        """Verifica la comparación débil de If-None-Match"""
+        self.assertTrue(etag_matches('W/"abc"', '"abc"'))
+        self.assertTrue(etag_matches('"x", "abc"', 'W/"abc"'))
+        self.assertTrue(etag_matches('*', '"abc"'))
+        self.assertFalse(etag_matches('"abd"', '"abc"'))
+
+    def test_if_none_match_takes_precedence(self):
+        """Verifica que If-None-Match tiene prioridad sobre If-Modified-Since"""
+        request = make_mocked_request('GET', '/', headers={
+            'If-None-Match': '"other"',
+            'If-Modified-Since': http_date(self.st.st_mtime + 3600),
+        })
+        self.assertFalse(is_not_modified(request, '"current"', self.st.st_mtime))
+
+    def test_if_modified_since(self):
+        """Verifica la comparación por fecha de modificación"""
+        fresh = make_mocked_request('GET', '/', headers={'If-Modified-Since': http_date(self.st.st_mtime)})
+        stale = make_mocked_request('GET', '/', headers={'If-Modified-Since': http_date(self.st.st_mtime - 60)})
+        invalid = make_mocked_request('GET', '/', headers={'If-Modified-Since': 'ayer'})
+
+        self.assertTrue(is_not_modified(fresh, None, self.st.st_mtime))
+        self.assertFalse(is_not_modified(stale, None, self.st.st_mtime))
+        self.assertFalse(is_not_modified(invalid, None, self.st.st_mtime))
+
+    def test_only_safe_methods(self):
+        """Verifica que los validadores se ignoran en métodos no seguros"""
+        request = make_mocked_request('POST', '/', headers={'If-None-Match': '*'})
+        self.assertFalse(is_not_modified(request, '"abc"', self.st.st_mtime))
+
+
+class TestRangeParsing(unittest.TestCase):
+    """Tests para el parseo del header Range"""
+
+    def test_single_and_open_ranges(self):
+        """Verifica rangos cerrados, abiertos y sufijos"""
+        self.assertEqual(parse_range_header('bytes=0-99', 1000), [(0, 99)])
+        self.assertEqual(parse_range_header('bytes=900-', 1000), [(900, 999)])
+        self.assertEqual(parse_range_header('bytes=-100', 1000), [(900, 999)])
+        self.assertEqual(parse_range_header('bytes=990-2000', 1000), [(990, 999)])
+
+    def test_multiple_ranges_keep_order_and_merge_overlaps(self):
+        """Verifica que se respeta el orden y se unen superposiciones"""
+        self.assertEqual(parse_range_header('bytes=500-599, 0-9', 1000), [(500, 599), (0, 9)])
+        self.assertEqual(parse_range_header('bytes=0-10,5-20,21-30', 1000), [(0, 30)])
+
+    def test_invalid_headers_are_ignored(self):
+        """Verifica que los headers inválidos se ignoran (respuesta completa)"""
+        self.assertIsNone(parse_range_header('items=0-1', 1000))
+        self.assertIsNone(parse_range_header('bytes=10-5', 1000))
+        self.assertIsNone(parse_range_header('bytes=abc', 1000))
+        self.assertIsNone(parse_range_header('bytes=' + ','.join(['0-1'] * 50), 1000))
+
+    def test_unsatisfiable(self):
+        """Verifica el caso 416"""
+        with self.assertRaises(RangeNotSatisfiable):
+            parse_range_header('bytes=1000-', 1000)
+        with self.assertRaises(RangeNotSatisfiable):
+            parse_range_header('bytes=-0', 1000)
+
+
+class TestPrecompressedVariants(unittest.TestCase):
+    """Tests para la negociación y búsqueda de variantes precomprimidas"""
+
+    def setUp(self):
+        """Crear archivo original y variantes"""
+        self.temp_dir = tempfile.mkdtemp()
+        self.original = str(Path(self.temp_dir, 'app.js'))
+        Path(self.original).write_bytes(b'console.log(1);')
+        Path(self.original + '.gz').write_bytes(b'gz')
+        Path(self.original + '.br').write_bytes(b'br')
+
+    def tearDown(self):
+        """Limpiar directorio temporal"""
+        import shutil
+        shutil.rmtree(self.temp_dir)
+
+    def test_negotiation_order(self):
+        """Verifica el orden por q y la preferencia del servidor en empates"""
+        available = ('br', 'gzip')
+        self.assertEqual(negotiate_encodings('gzip, br', available), ['br', 'gzip'])
+        self.assertEqual(negotiate_encodings('gzip, br;q=0.5', available), ['gzip', 'br'])
+        self.assertEqual(negotiate_encodings('br;q=0, *', available), ['gzip'])
+        self.assertEqual(negotiate_encodings('', available), [])
+
+    def test_finds_preferred_variant(self):
+        """Verifica que se elige la variante preferida existente"""
+        resolver = PrecompressedResolver()
+        path, encoding, _ = resolver.find(self.original, 'gzip, br')
+        self.assertEqual(encoding, 'br')
+        self.assertEqual(path, self.original + '.br')
+
+        os.remove(self.original + '.br')
+        resolver = PrecompressedResolver()
+        self.assertEqual(resolver.find(self.original, 'gzip, br')[1], 'gzip')
+
+    def test_ignores_stale_variant(self):
+        """Verifica que una variante más vieja que el original se ignora"""
+        st = os.stat(self.original)
+        for suffix in ('.gz', '.br'):
+            os.utime(self.original + suffix, ns=(st.st_atime_ns, st.st_mtime_ns - 10**9))
+
+        resolver = PrecompressedResolver()
+        self.assertIsNone(resolver.find(self.original, 'gzip, br'))
+
+    def test_evicts_least_recently_used(self):
+        """Verifica que al llenarse se descarta la verificación más vieja, no todas"""
+        resolver = PrecompressedResolver(max_entries=2)
+        other = str(Path(self.temp_dir, 'other.js'))
+        resolver.find(self.original, 'br')
+        resolver.find(other, 'br')
+        self.assertTrue(resolver.peek(self.original, 'br')[0])
+
+        resolver.find(str(Path(self.temp_dir, 'third.js')), 'br')
+        self.assertEqual(resolver.get_stats()['cached_checks'], 2)
+        self.assertTrue(resolver.peek(self.original, 'br')[0])
+        self.assertFalse(resolver.peek(other, 'br')[0])
+
+    def test_concurrent_find_counters(self):
+        """Verifica los contadores con find desde varios threads a la vez"""
+        from concurrent.futures import ThreadPoolExecutor
+        resolver = PrecompressedResolver(check_ttl=0)
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            results = list(executor.map(lambda _: resolver.find(self.original, 'br'), range(400)))
+        self.assertTrue(all(result[1] == 'br' for result in results))
+        stats = resolver.get_stats()
+        self.assertEqual((stats['lookups'], stats['hits']), (400, 400))
+
+
+class TestPathResolver(unittest.TestCase):
+    """Tests del cache de resolución de rutas"""
+
+    def setUp(self):
+        """Crear document root de prueba"""
+        self.temp_dir = tempfile.mkdtemp()
+        os.makedirs(os.path.join(self.temp_dir, 'docs'))
+        Path(self.temp_dir, 'index.php').write_text('<?php echo 1;')
+        Path(self.temp_dir, 'page.html').write_text('page')
+
+    def tearDown(self):
+        """Limpiar directorio temporal"""
+        import shutil
+        shutil.rmtree(self.temp_dir)
+
+    def test_decisions(self):
+        """Verifica archivo, index, directorio sin index, 404 y salida del document_root"""
+        resolver = PathResolver(metadata=FileMetadataCache())
+        decision = resolver.resolve(self.temp_dir, 'page.html')
+        self.assertEqual(decision.status, 200)
+        self.assertEqual(decision.file_path.name, 'page.html')
+
+        decision = resolver.resolve(self.temp_dir, '')
+        self.assertEqual(decision.index_file, 'index.php')
+
+        self.assertEqual(resolver.resolve(self.temp_dir, 'docs').status, 403)
+        self.assertEqual(resolver.resolve(self.temp_dir, 'missing.html').status, 404)
+        self.assertEqual(resolver.resolve(self.temp_dir, 'page.html/x').status, 404)
+        self.assertEqual(resolver.resolve(self.temp_dir, '../etc/passwd').status, 403)
+
+    def test_repeated_lookup_is_cached(self):
+        """Verifica que la segunda resolución (con otra forma de la ruta) es un hit"""
+        resolver = PathResolver(metadata=FileMetadataCache())
+        first = resolver.resolve(self.temp_dir, 'docs/../page.html')
+        self.assertIs(resolver.resolve(self.temp_dir, 'docs/../page.html'), first)
+        resolver.resolve(self.temp_dir, 'page.html')
+        resolver.resolve(self.temp_dir, './page.html')
+        self.assertEqual(resolver.get_stats()['hits'], 2)
+
+    def test_directory_mtime_invalidation(self):
+        """Verifica que crear un index en el directorio invalida el 403 memorizado"""
+        resolver = PathResolver(validate_interval=0, metadata=FileMetadataCache(ttl=0))
+        self.assertEqual(resolver.resolve(self.temp_dir, 'docs').status, 403)
+
+        docs = os.path.join(self.temp_dir, 'docs')
+        Path(docs, 'index.html').write_text('docs')
+        st = os.stat(docs)
+        os.utime(docs, ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+
+        decision = resolver.resolve(self.temp_dir, 'docs')
+        self.assertEqual(decision.status, 200)
+        self.assertEqual(decision.index_file, 'index.html')
+
+    def test_negative_ttl(self):
+        """Verifica que un 404 se recuerda solo durante negative_ttl"""
+        metadata = FileMetadataCache(ttl=0)
+        resolver = PathResolver(negative_ttl=60, metadata=metadata)
+        self.assertEqual(resolver.resolve(self.temp_dir, 'new.html').status, 404)
+        Path(self.temp_dir, 'new.html').write_text('new')
+        self.assertEqual(resolver.resolve(self.temp_dir, 'new.html').status, 404)
+
+        resolver = PathResolver(negative_ttl=0, metadata=metadata)
+        self.assertEqual(resolver.resolve(self.temp_dir, 'new.html').status, 200)
+
+    def test_config_reload_clears_cache(self):
+        """Verifica que recargar la configuración descarta las decisiones memorizadas"""
+        path_resolver.resolve(self.temp_dir, 'page.html')
+        self.assertGreater(len(path_resolver), 0)
+
+        # Restaurar la configuración global al terminar
+        saved = ('_config', '_virtual_hosts', '_blocklists', '_rewrite_engines', '_router')
+        with mock.patch.multiple(config, **{name: getattr(config, name) for name in saved}):
+            config.reload()
+        self.assertEqual(len(path_resolver), 0)
+
+
+class TestResponseCompressor(unittest.IsolatedAsyncioTestCase):
+    """Tests del compresor dinámico"""
+
+    def test_choose_encoding(self):
+        """Verifica tamaño mínimo, tipo MIME, q=0 y COMPRESSION_ENABLED"""
+        compressor = ResponseCompressor(min_size=100)
+        self.assertEqual(compressor.choose_encoding('gzip', 'text/html', 500), 'gzip')
+        self.assertIsNone(compressor.choose_encoding('gzip', 'text/html', 50))
+        self.assertIsNone(compressor.choose_encoding('gzip', 'image/png', 500))
+        self.assertIsNone(compressor.choose_encoding('gzip;q=0', 'text/html', 500))
+        self.assertIsNone(ResponseCompressor(enabled=False).choose_encoding('gzip', 'text/html', 5000))
+
+    async def test_gzip_roundtrip_and_cpu_stats(self):
+        """Verifica que el gzip es válido y se contabiliza el CPU"""
+        import gzip
+        compressor = ResponseCompressor(executor_threshold=1024)
+        body = b'abc' * 10000
+        compressed = await compressor.compress(body, 'gzip')
+        self.assertEqual(gzip.decompress(compressed), body)
+
+        stats = compressor.get_stats()
+        self.assertEqual(stats['executor_jobs'], 1)
+        self.assertEqual(stats['encodings']['gzip']['bytes_in'], len(body))
+        self.assertLess(stats['encodings']['gzip']['ratio'], 0.1)
+
+    async def test_concurrent_misses_count_bytes_once(self):
+        """Verifica que misses simultáneos de la misma variante no duplican cache_bytes"""
+        import asyncio
+        compressor = ResponseCompressor(executor_threshold=0, cache_max_bytes=1000)
+        body = b'.a { color: red; }\n' * 300
+        results = await asyncio.gather(*[
+            compressor.compress_static('/srv/a.css', 1, body, 'gzip') for _ in range(4)
+        ])
+        self.assertEqual(len(set(results)), 1)
+
+        stats = compressor.get_stats()
+        self.assertEqual(stats['cache_entries'], 1)
+        self.assertEqual(stats['cache_bytes'], len(results[0]))
+
+
+class TestPHPCompression(unittest.IsolatedAsyncioTestCase):
+    """Tests de la compresión de la salida PHP en el servidor"""
+
+    async def asyncSetUp(self):
+        from php_fpm.php_manager import php_manager
+        from server.web_server import TechWebServer
+
+        self.temp_dir = tempfile.mkdtemp()
+        self.socket_path = os.path.join(self.temp_dir, 'php-fpm.sock')
+        open(os.path.join(self.temp_dir, 'index.php'), 'w').close()
+        self.backend = FakePHPFPM(self.socket_path, output=[
+            b'Content-Type: text/html\r\nContent-Length: 5000\r\nETag: "abc"\r\n\r\n' + b'a' * 5000
+        ])
+        await self.backend.start()
+        self.addAsyncCleanup(self.backend.stop)
+
+        vhosts = [{'domain': 'localhost', 'port': 3080, 'document_root': self.temp_dir,
+                   'php_enabled': True, 'php_version': '8.3'}]
+        for patcher in (mock.patch.object(config, '_virtual_hosts', vhosts),
+                        mock.patch.dict(config._config, {'ssl_enabled': True, 'logs_enabled': False}),
+                        mock.patch.dict(php_manager.clients, {'8.3': FastCGIClient(self.socket_path, 5)})):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        for name in ('_router', '_blocklists'):
+            patcher = mock.patch.object(config, name, None)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        config._router = config._build_router()
+        config._blocklists = config._compile_blocklists()
+
+        self.client = TestClient(TestServer(TechWebServer().app))
+        await self.client.start_server()
+        self.addAsyncCleanup(self.client.close)
+
+    async def asyncTearDown(self):
+        import shutil
+        shutil.rmtree(self.temp_dir)
+
+    async def test_compressed_output_drops_php_content_length(self):
+        """Verifica que el Content-Length de PHP no se envía con el cuerpo comprimido"""
+        response = await self.client.get('/index.php', headers={'Accept-Encoding': 'gzip'},
+                                         auto_decompress=False)
+        body = await response.read()
+        self.assertEqual(response.headers['Content-Encoding'], 'gzip')
+        self.assertEqual(int(response.headers['Content-Length']), len(body))
+        self.assertLess(len(body), 5000)
+        self.assertEqual(response.headers['ETag'], '"abc-gzip"')
+
+
+class TestStaticFileHandler(unittest.IsolatedAsyncioTestCase):
+    """Tests de integración del handler de archivos estáticos"""
+
+    async def asyncSetUp(self):
+        """Crear document root de prueba y servidor"""
+        self.temp_dir = tempfile.mkdtemp()
+        Path(self.temp_dir, 'style.css').write_bytes(b'body { color: red; }')
+        Path(self.temp_dir, 'app.js').write_bytes(b'console.log("original");')
+        import gzip
+        Path(self.temp_dir, 'app.js.gz').write_bytes(gzip.compress(b'console.log("original");'))
+        self.movie = os.urandom(200 * 1024)
+        Path(self.temp_dir, 'movie.bin').write_bytes(self.movie)
+        self.page = b'<p>contenido repetido</p>\n' * 200
+        Path(self.temp_dir, 'page.html').write_bytes(self.page)
+
+        self.static_handler = StaticFileHandler(
+            FileSender(sendfile_min_size=64 * 1024),
+            StaticFileCache(max_bytes=1024 * 1024, max_object_size=1024),
+            PrecompressedResolver(check_ttl=0),
+            ResponseCompressor(min_size=1024),
+            IOExecutor(max_workers=4)
+        )
+
+        async def handler(request):
+            file_path = Path(self.temp_dir, request.match_info['name'])
+            return await self.static_handler.serve(request, file_path, {})
+
+        app = web.Application()
+        app.router.add_route('*', '/{name}', handler)
+        self.client = TestClient(TestServer(app))
+        await self.client.start_server()
+
+    async def asyncTearDown(self):
+        """Cerrar servidor y limpiar directorio temporal"""
+        await self.client.close()
+        self.static_handler.io.shutdown()
+        import shutil
+        shutil.rmtree(self.temp_dir)
+
+    async def test_serves_validators_and_caches(self):
+        """Verifica que la respuesta trae validadores y el segundo hit sale de cache"""
+        first = await self.client.get('/style.css')
+        self.assertEqual(first.status, 200)
+        self.assertIn('ETag', first.headers)
+        self.assertIn('Last-Modified', first.headers)
+        self.assertEqual(first.headers['Content-Type'], 'text/css')
+
+        second = await self.client.get('/style.css')
+        self.assertEqual(await second.read(), b'body { color: red; }')
+        self.assertEqual(second.headers['ETag'], first.headers['ETag'])
+        self.assertEqual(self.static_handler.cache.get_stats()['hits'], 1)
+
+    async def test_not_modified_for_cached_and_streamed_files(self):
+        """Verifica el 304 tanto para archivos cacheados como para los de streaming"""
+        for name in ('style.css', 'movie.bin'):
+            with self.subTest(name=name):
+                first = await self.client.get(f'/{name}')
+                await first.read()
+
+                response = await self.client.get(f'/{name}', headers={'If-None-Match': first.headers['ETag']})
+                self.assertEqual(response.status, 304)
+                self.assertEqual(await response.read(), b'')
+                self.assertEqual(response.headers['ETag'], first.headers['ETag'])
+
+                response = await self.client.get(f'/{name}', headers={
+                    'If-Modified-Since': first.headers['Last-Modified']
+                })
+                self.assertEqual(response.status, 304)
+
+
+    async def test_single_range(self):
+        """Verifica 206 con un rango para archivos cacheados y de streaming"""
+        for name, content in (('style.css', b'body { color: red; }'), ('movie.bin', self.movie)):
+            with self.subTest(name=name):
+                response = await self.client.get(f'/{name}', headers={'Range': 'bytes=5-9'})
+                self.assertEqual(response.status, 206)
+                self.assertEqual(response.headers['Content-Range'], f'bytes 5-9/{len(content)}')
+                self.assertEqual(await response.read(), content[5:10])
+
+    async def test_multi_range(self):
+        """Verifica la respuesta multipart/byteranges"""
+        response = await self.client.get('/movie.bin', headers={'Range': 'bytes=0-3,100000-100009'})
+        self.assertEqual(response.status, 206)
+        content_type = response.headers['Content-Type']
+        self.assertTrue(content_type.startswith('multipart/byteranges; boundary='))
+        boundary = content_type.split('boundary=')[1].encode()
+
+        body = await response.read()
+        self.assertEqual(int(response.headers['Content-Length']), len(body))
+        parts = body.split(b'--' + boundary)
+        self.assertEqual(len(parts), 4)
+        self.assertTrue(parts[1].endswith(b'\r\n\r\n' + self.movie[0:4] + b'\r\n'))
+        self.assertIn(b'Content-Range: bytes 100000-100009/204800', parts[2])
+        self.assertTrue(parts[2].endswith(self.movie[100000:100010] + b'\r\n'))
+        self.assertEqual(parts[3], b'--\r\n')
+
+    async def test_unsatisfiable_range(self):
+        """Verifica 416 con Content-Range del tamaño total"""
+        response = await self.client.get('/movie.bin', headers={'Range': 'bytes=999999-'})
+        self.assertEqual(response.status, 416)
+        self.assertEqual(response.headers['Content-Range'], 'bytes */204800')
+
+    async def test_if_range_mismatch_sends_full_content(self):
+        """Verifica que un If-Range desactualizado devuelve el archivo completo"""
+        response = await self.client.get('/movie.bin', headers={
+            'Range': 'bytes=0-9', 'If-Range': '"desactualizado"'
+        })
+        self.assertEqual(response.status, 200)
+        self.assertEqual(await response.read(), self.movie)
+
+        first = await self.client.get('/movie.bin')
+        await first.read()
+        response = await self.client.get('/movie.bin', headers={
+            'Range': 'bytes=0-9', 'If-Range': first.headers['ETag']
+        })
+        self.assertEqual(response.status, 206)
+
+    async def test_head_has_no_body(self):
+        """Verifica que HEAD de un archivo grande no envía body"""
+        response = await self.client.head('/movie.bin')
+        self.assertEqual(response.status, 200)
+        self.assertEqual(response.headers['Content-Length'], str(len(self.movie)))
+        self.assertEqual(response.headers['Accept-Ranges'], 'bytes')
+        self.assertEqual(await response.read(), b'')
+
+
+    async def test_serves_precompressed_sidecar(self):
+        """Verifica que se sirve la variante .gz con los headers correctos"""
+        response = await self.client.get('/app.js', headers={'Accept-Encoding': 'gzip'})
+        self.assertEqual(response.status, 200)
+        self.assertEqual(response.headers['Content-Encoding'], 'gzip')
+        self.assertEqual(response.headers['Vary'], 'Accept-Encoding')
+        self.assertIn(response.headers['Content-Type'], ('application/javascript', 'text/javascript'))
+        # El cliente descomprime de forma transparente
+        self.assertEqual(await response.read(), b'console.log("original");')
+
+        plain = await self.client.get('/app.js', headers={'Accept-Encoding': 'identity'})
+        self.assertNotIn('Content-Encoding', plain.headers)
+        self.assertEqual(plain.headers['Vary'], 'Accept-Encoding')
+        self.assertNotEqual(plain.headers['ETag'], response.headers['ETag'])
+
+    async def test_dynamic_compression(self):
+        """Verifica la compresión gzip dinámica, su ETag propio y la cache de variantes"""
+        response = await self.client.get('/page.html', headers={'Accept-Encoding': 'gzip'})
+        self.assertEqual(response.status, 200)
+        self.assertEqual(response.headers['Content-Encoding'], 'gzip')
+        self.assertEqual(response.headers['Vary'], 'Accept-Encoding')
+        self.assertTrue(response.headers['ETag'].endswith('-gzip"'))
+        self.assertLess(int(response.headers['Content-Length']), len(self.page))
+        self.assertEqual(await response.read(), self.page)
+
+        again = await self.client.get('/page.html', headers={
+            'Accept-Encoding': 'gzip', 'If-None-Match': response.headers['ETag']
+        })
+        self.assertEqual(again.status, 304)
+
+        await (await self.client.get('/page.html', headers={'Accept-Encoding': 'gzip'})).read()
+        self.assertEqual(self.static_handler.compressor.get_stats()['cache_hits'], 1)
+
+        # Un pedido Range se sirve sin comprimir
+        ranged = await self.client.get('/page.html', headers={'Accept-Encoding': 'gzip', 'Range': 'bytes=0-9'})
+        self.assertEqual(ranged.status, 206)
+        self.assertNotIn('Content-Encoding', ranged.headers)
+
+
+if __name__ == '__main__':
+    unittest.main()
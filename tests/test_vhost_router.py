@@ -0,0 +1,58 @@
+"""
+Tests unitarios para la tabla de ruteo de virtual hosts
+"""
+
+import unittest
+import sys
+import os
+
+# Agregar src al path para importar los módulos
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from config.vhost_router import VirtualHostRouter
+
+
+class TestVirtualHostRouter(unittest.TestCase):
+    """Tests del índice de virtual hosts"""
+
+    def setUp(self):
+        """Configuración similar a virtual_hosts.yaml"""
+        self.main = {'domain': 'localhost', 'port': 3080}
+        self.shop = {'domain': 'shop.example.com', 'port': 3080,
+                     'server_aliases': ['tienda.example.com']}
+        self.wildcard = {'domain': '*.example.com', 'port': 3080}
+        self.deep = {'domain': 'api.example.com', 'port': 3081,
+                     'server_aliases': ['*.api.example.com']}
+        self.admin = {'domain': 'admin.local', 'port': 3081, 'default': True}
+        self.duplicate = {'domain': 'localhost', 'port': 3080}
+        self.router = VirtualHostRouter(
+            [self.main, self.shop, self.wildcard, self.deep, self.admin, self.duplicate]
+        )
+
+    def test_exact_and_alias(self):
+        """Verifica dominio, alias, mayúsculas y primer vhost ante repetidos"""
+        self.assertIs(self.router.find('shop.example.com'), self.shop)
+        self.assertIs(self.router.find('Tienda.Example.com.'), self.shop)
+        self.assertIs(self.router.find('localhost', 3080), self.main)
+        self.assertIsNone(self.router.find('localhost', 3081))
+
+    def test_wildcards(self):
+        """Verifica que gana el comodín más específico y que no cubre al dominio base"""
+        self.assertIs(self.router.find('blog.example.com'), self.wildcard)
+        self.assertIs(self.router.find('a.b.example.com'), self.wildcard)
+        self.assertIs(self.router.find('v1.api.example.com'), self.deep)
+        self.assertIsNone(self.router.find('example.com'))
+        self.assertIsNone(self.router.find('blog.example.com', 3081))
+        self.assertIs(self.router.find('v1.api.example.com', 3081), self.deep)
+
+    def test_port_defaults(self):
+        """Verifica el default explícito, el implícito y el global"""
+        self.assertIs(self.router.route('desconocido.com', 3081), self.admin)
+        self.assertIs(self.router.route('desconocido.com', 3080), self.main)
+        self.assertIs(self.router.route('desconocido.com', 9999), self.main)
+        self.assertIs(self.router.route('shop.example.com', 3081, strict_port=False), self.shop)
+        self.assertIsNone(VirtualHostRouter([]).route('localhost', 3080))
+
+
+if __name__ == '__main__':
+    unittest.main()